@@ -14,6 +14,7 @@
 #
 # Requires Python 2.7+
 
+import json
 from core.src.bootstrap.Bootstrapper import Bootstrapper
 from core.src.bootstrap.Constants import Constants
 
@@ -115,10 +116,18 @@ class CoreMain(object):
             composite_logger.log_debug("Completed exception handling.\n")
 
         finally:
+            if status_handler is not None:
+                status_handler.flush_status_file()
+
             if lifecycle_manager is not None:
                 lifecycle_manager.update_core_sequence(completed=True)
 
+            command_timings = bootstrapper.env_layer.get_command_timings()
+            if len(command_timings) != 0:
+                telemetry_writer.write_event("Command timings by type: " + json.dumps(command_timings, sort_keys=True), Constants.TelemetryEventLevel.Verbose)
+
             telemetry_writer.write_event("Completed Linux Patch core operation.", Constants.TelemetryEventLevel.Informational)
+            telemetry_writer.close()
 
             stdout_file_mirror.stop()
             file_logger.close(message_at_close="\n<End of output>")
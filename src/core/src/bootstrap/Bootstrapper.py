@@ -29,14 +29,17 @@ class Bootstrapper(object):
     def __init__(self, argv, capture_stdout=True):
         # Environment and basic execution awareness
         self.current_env = self.get_current_env()
+        self.log_verbosity = self.get_log_verbosity()
         self.argv = argv
         self.auto_assessment_only = bool(self.get_value_from_argv(self.argv, Constants.ARG_AUTO_ASSESS_ONLY, "False") == "True")
         self.log_file_path, self.real_record_path, self.events_folder, self.telemetry_supported = self.get_path_to_log_files_and_telemetry_dir(argv, self.auto_assessment_only)
-        self.recorder_enabled, self.emulator_enabled = self.get_recorder_emulator_flags(argv)
+        self.recorder_enabled, self.emulator_enabled, self.emulator_replay_delay_enabled = self.get_recorder_emulator_flags(argv)
 
         # Container initialization
         print("Building bootstrap container configuration...")
-        self.configuration_factory = ConfigurationFactory(self.log_file_path, self.real_record_path, self.recorder_enabled, self.emulator_enabled, self.events_folder, self.telemetry_supported)
+        max_log_file_size_in_bytes = Constants.MAX_AUTO_ASSESSMENT_LOGFILE_SIZE_IN_BYTES if self.auto_assessment_only else None     # the auto-assessment log file is reused across runs
+        self.configuration_factory = ConfigurationFactory(self.log_file_path, self.real_record_path, self.recorder_enabled, self.emulator_enabled, self.events_folder, self.telemetry_supported,
+                                                          max_log_file_size_in_bytes, self.emulator_replay_delay_enabled, self.log_verbosity)
         self.container = Container()
         self.container.build(self.configuration_factory.get_bootstrap_configuration(self.current_env))
 
@@ -44,7 +47,6 @@ class Bootstrapper(object):
         self.env_layer = self.container.get('env_layer')
 
         # Logging initializations
-        self.reset_auto_assessment_log_file_if_needed()
         self.file_logger = self.container.get('file_logger')
         if capture_stdout:
             self.stdout_file_mirror = StdOutFileMirror(self.env_layer, self.file_logger)
@@ -64,6 +66,18 @@ class Bootstrapper(object):
         print("Bootstrap environment: {0}".format(current_env))
         return current_env
 
+    @staticmethod
+    def get_log_verbosity():
+        """ Decides what log verbosity to bootstrap with. None leaves it to the environment's configuration. """
+        log_verbosity = os.getenv(Constants.LPE_LOG_VERBOSITY_VARIABLE)
+        if log_verbosity is None:
+            return None
+        if not hasattr(Constants.LogVerbosity, str(log_verbosity).upper()):
+            print("Unknown log verbosity requested: {0}".format(log_verbosity))
+            return None
+        print("Log verbosity: {0}".format(str(log_verbosity).upper()))
+        return getattr(Constants.LogVerbosity, str(log_verbosity).upper())
+
     def get_path_to_log_files_and_telemetry_dir(self, argv, auto_assessment_only):
         """ Performs the minimum steps required to determine where to start logging """
         sequence_number = self.get_value_from_argv(argv, Constants.ARG_SEQUENCE_NUMBER)
@@ -76,24 +90,17 @@ class Bootstrapper(object):
         telemetry_supported = environment_settings[Constants.EnvSettings.TELEMETRY_SUPPORTED]
         return log_file_path, real_rec_path, events_folder, telemetry_supported
 
-    def reset_auto_assessment_log_file_if_needed(self):
-        """ Deletes the auto assessment log file when needed to prevent excessive growth """
-        try:
-            if self.auto_assessment_only and os.path.exists(self.log_file_path) and os.path.getsize(self.log_file_path) > Constants.MAX_AUTO_ASSESSMENT_LOGFILE_SIZE_IN_BYTES:
-                os.remove(self.log_file_path)
-        except Exception as error:
-            print("INFO: Error while checking/removing auto-assessment log file. [Path={0}][ExistsRecheck={1}]".format(self.log_file_path, str(os.path.exists(self.log_file_path))))
-
     def get_recorder_emulator_flags(self, argv):
         """ Determines if the recorder or emulator flags need to be changed from the defaults """
         recorder_enabled = False
         emulator_enabled = False
+        emulator_replay_delay_enabled = str(self.get_value_from_argv(argv, Constants.ARG_INTERNAL_EMULATOR_REPLAY_DELAY_DISABLED, "False")) != "True"   # fast replay, if disabled
         try:
-            recorder_enabled = bool(self.get_value_from_argv(argv, Constants.ARG_INTERNAL_RECORDER_ENABLED))
-            emulator_enabled = bool(self.get_value_from_argv(argv, Constants.ARG_INTERNAL_EMULATOR_ENABLED))
+            recorder_enabled = str(self.get_value_from_argv(argv, Constants.ARG_INTERNAL_RECORDER_ENABLED)) == "True"
+            emulator_enabled = str(self.get_value_from_argv(argv, Constants.ARG_INTERNAL_EMULATOR_ENABLED)) == "True"
         except Exception as error:
             print("INFO: Default environment layer settings loaded.")
-        return recorder_enabled, emulator_enabled
+        return recorder_enabled, emulator_enabled, emulator_replay_delay_enabled
 
     @staticmethod
     def get_value_from_argv(argv, key, default_value=Constants.DEFAULT_UNSPECIFIED_VALUE):
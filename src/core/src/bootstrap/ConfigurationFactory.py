@@ -57,14 +57,14 @@ class ConfigurationFactory(object):
     """ Class for generating module definitions. Configuration is list of key value pairs. Please DON'T change key name.
     DI container relies on the key name to find and resolve dependencies. If you do need change it, please make sure to
     update the key name in all places that reference it. """
-    def __init__(self, log_file_path, real_record_path, recorder_enabled, emulator_enabled, events_folder, telemetry_supported):
+    def __init__(self, log_file_path, real_record_path, recorder_enabled, emulator_enabled, events_folder, telemetry_supported, max_log_file_size_in_bytes=None, emulator_replay_delay_enabled=True, log_verbosity=None):
         self.vm_cloud_type = self.get_vm_cloud_type()
         self.lifecycle_manager_component = self.get_lifecycle_manager_component(self.vm_cloud_type)
 
         self.bootstrap_configurations = {
-            'prod_config':  self.new_bootstrap_configuration(Constants.PROD, log_file_path, real_record_path, recorder_enabled, emulator_enabled, events_folder, telemetry_supported),
-            'dev_config':   self.new_bootstrap_configuration(Constants.DEV, log_file_path, real_record_path, recorder_enabled, emulator_enabled, events_folder, telemetry_supported),
-            'test_config':  self.new_bootstrap_configuration(Constants.TEST, log_file_path, real_record_path, recorder_enabled, emulator_enabled, events_folder, telemetry_supported)
+            'prod_config':  self.new_bootstrap_configuration(Constants.PROD, log_file_path, real_record_path, recorder_enabled, emulator_enabled, events_folder, telemetry_supported, max_log_file_size_in_bytes, emulator_replay_delay_enabled, log_verbosity),
+            'dev_config':   self.new_bootstrap_configuration(Constants.DEV, log_file_path, real_record_path, recorder_enabled, emulator_enabled, events_folder, telemetry_supported, max_log_file_size_in_bytes, emulator_replay_delay_enabled, log_verbosity),
+            'test_config':  self.new_bootstrap_configuration(Constants.TEST, log_file_path, real_record_path, recorder_enabled, emulator_enabled, events_folder, telemetry_supported, max_log_file_size_in_bytes, emulator_replay_delay_enabled, log_verbosity)
         }
 
         self.configurations = {
@@ -123,7 +123,7 @@ class ConfigurationFactory(object):
 
     # region - Configuration Builders
     @staticmethod
-    def new_bootstrap_configuration(config_env, log_file_path, real_record_path, recorder_enabled, emulator_enabled, events_folder, telemetry_supported):
+    def new_bootstrap_configuration(config_env, log_file_path, real_record_path, recorder_enabled, emulator_enabled, events_folder, telemetry_supported, max_log_file_size_in_bytes=None, emulator_replay_delay_enabled=True, log_verbosity=None):
         """ Core configuration definition. """
         configuration = {
             'config_env': config_env,
@@ -133,14 +133,16 @@ class ConfigurationFactory(object):
                 'component_kwargs': {
                     'real_record_path': real_record_path,
                     'recorder_enabled': recorder_enabled,
-                    'emulator_enabled': emulator_enabled
+                    'emulator_enabled': emulator_enabled,
+                    'emulator_replay_delay_enabled': emulator_replay_delay_enabled
                 }
             },
             'file_logger': {
                 'component': FileLogger,
                 'component_args': ['env_layer'],
                 'component_kwargs': {
-                    'log_file': log_file_path
+                    'log_file': log_file_path,
+                    'max_log_file_size_in_bytes': max_log_file_size_in_bytes
                 }
             },
             'composite_logger': {
@@ -148,6 +150,7 @@ class ConfigurationFactory(object):
                 'component_args': ['env_layer', 'file_logger'],
                 'component_kwargs': {
                     'current_env': config_env,
+                    'verbosity': log_verbosity if log_verbosity is not None else Constants.DEFAULT_LOG_VERBOSITY,
                     'telemetry_writer': None  # Has to be initialized without telemetry_writer to avoid running into a circular dependency loop. Telemetry writer within composite logger will be set later after telemetry writer has been initialized
                 }
             },
@@ -156,13 +159,18 @@ class ConfigurationFactory(object):
                 'component_args': ['env_layer', 'composite_logger'],
                 'component_kwargs': {
                     'events_folder_path': events_folder,
-                    'telemetry_supported': telemetry_supported
+                    'telemetry_supported': telemetry_supported,
+                    'events_writer_thread_enabled': True,
+                    'diagnostic_artifacts_folder_path': os.path.join(os.path.dirname(log_file_path), Constants.DIAGNOSTIC_ARTIFACTS_FOLDER)
                 }
             },
         }
 
         if config_env is Constants.DEV or config_env is Constants.TEST:
-            pass  # modify config as desired
+            configuration['telemetry_writer']['component_kwargs']['events_writer_thread_enabled'] = False    # events are written inline, for determinism
+            configuration['file_logger']['component_kwargs']['flush_interval_in_secs'] = 0   # no flush timer thread, for determinism
+            if log_verbosity is None:
+                configuration['composite_logger']['component_kwargs']['verbosity'] = Constants.LogVerbosity.VERBOSE    # everything is logged, for inspection
 
         return configuration
 
@@ -248,6 +256,13 @@ class ConfigurationFactory(object):
         configuration = self.new_prod_configuration(package_manager_name, package_manager_component)
         configuration['config_env'] = Constants.DEV
         # perform desired modifications to configuration
+        configuration['status_handler']['component_kwargs']['write_coalescing_interval_in_secs'] = 0     # every status update is written through, for inspection
+        configuration['package_manager']['component_kwargs']['package_metadata_cache_ttl_in_secs'] = 0  # updates are always discovered from (emulated) package manager output
+        configuration['package_manager']['component_kwargs']['repo_refresh_freshness_window_in_secs'] = 0   # repo is always refreshed
+        configuration['package_manager']['component_kwargs']['read_only_query_max_concurrency'] = 1    # queries run in order, for determinism
+        configuration['patch_installer']['component_kwargs']['package_prefetch_count'] = 0   # packages are only downloaded by installs, for determinism
+        configuration['lifecycle_manager']['component_kwargs']['state_file_check_min_interval_in_secs'] = 0  # handshake file changes are picked up by the next status check
+        configuration['lifecycle_manager']['component_kwargs']['core_sequence_heartbeat_interval_in_secs'] = 0    # every status check refreshes the heartbeat
         return configuration
 
     def new_test_configuration(self, package_manager_name, package_manager_component):
@@ -255,6 +270,13 @@ class ConfigurationFactory(object):
         configuration = self.new_prod_configuration(package_manager_name, package_manager_component)
         configuration['config_env'] = Constants.TEST
         # perform desired modifications to configuration
+        configuration['status_handler']['component_kwargs']['write_coalescing_interval_in_secs'] = 0     # every status update is written through, for inspection
+        configuration['package_manager']['component_kwargs']['package_metadata_cache_ttl_in_secs'] = 0  # updates are always discovered from (emulated) package manager output
+        configuration['package_manager']['component_kwargs']['repo_refresh_freshness_window_in_secs'] = 0   # repo is always refreshed
+        configuration['package_manager']['component_kwargs']['read_only_query_max_concurrency'] = 1    # queries run in order, for determinism
+        configuration['patch_installer']['component_kwargs']['package_prefetch_count'] = 0   # packages are only downloaded by installs, for determinism
+        configuration['lifecycle_manager']['component_kwargs']['state_file_check_min_interval_in_secs'] = 0  # handshake file changes are picked up by the next status check
+        configuration['lifecycle_manager']['component_kwargs']['core_sequence_heartbeat_interval_in_secs'] = 0    # every status check refreshes the heartbeat
         return configuration
 
     @staticmethod
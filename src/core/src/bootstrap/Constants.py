@@ -37,6 +37,7 @@ class Constants(object):
     DEV = 'Dev'
     PROD = 'Prod'
     LPE_ENV_VARIABLE = "LPE_ENV"    # Overrides environment setting
+    LPE_LOG_VERBOSITY_VARIABLE = "LPE_LOG_VERBOSITY"    # Overrides log verbosity setting (ERROR, WARNING, INFO, DEBUG or VERBOSE)
 
     # Execution Arguments
     ARG_SEQUENCE_NUMBER = '-sequenceNumber'
@@ -46,11 +47,29 @@ class Constants(object):
     ARG_PROTECTED_CONFIG_SETTINGS = "-protectedConfigSettings"
     ARG_INTERNAL_RECORDER_ENABLED = "-recorderEnabled"
     ARG_INTERNAL_EMULATOR_ENABLED = "-emulatorEnabled"
+    ARG_INTERNAL_EMULATOR_REPLAY_DELAY_DISABLED = "-emulatorReplayDelayDisabled"
 
     # Max values
-    MAX_AUTO_ASSESSMENT_LOGFILE_SIZE_IN_BYTES = 5*1024*1024
+    MAX_AUTO_ASSESSMENT_LOGFILE_SIZE_IN_BYTES = 5*1024*1024     # auto-assessment log files are rotated beyond this size
     MAX_AUTO_ASSESSMENT_WAIT_FOR_MAIN_CORE_EXEC_IN_MINUTES = 3 * 60
 
+    # Logging
+    MAX_ROTATED_LOG_FILE_COUNT = 1
+    LOG_FILE_BUFFER_SIZE_IN_BYTES = 64*1024     # buffered log file writes are written out once they reach this size
+    LOG_FILE_FLUSH_INTERVAL_IN_SECONDS = 5      # or at the latest this long after buffering starts
+    LOG_OUTPUT_MAX_LINE_COUNT = 500     # beyond this, only the head and tail lines of logged command output are kept
+    LOG_LIST_MAX_ITEM_COUNT = 100       # beyond this, only the count of further items of logged lists is kept
+
+    # Log verbosity - messages less severe than the configured verbosity are not logged (nor constructed)
+    class LogVerbosity(object):
+        ERROR = 1
+        WARNING = 2
+        INFO = 3
+        DEBUG = 4
+        VERBOSE = 5
+
+    DEFAULT_LOG_VERBOSITY = LogVerbosity.DEBUG      # verbose messages are only logged in production if requested through LPE_LOG_VERBOSITY
+
     class Paths(EnumBackport):
         SYSTEMD_ROOT = "/etc/systemd/system/"
 
@@ -132,8 +151,29 @@ class Constants(object):
     AUTO_ASSESSMENT_MAXIMUM_DURATION = "PT1H"
     MIN_AUTO_ASSESSMENT_INTERVAL = "PT6H"   # do not perform auto-assessment if the last assessment happened less than this time interval ago
 
+    # Discovered updates cached across invocations, valid while package metadata is unchanged
+    PACKAGE_METADATA_CACHE_FILE = "PackageMetadataCache.json"
+    PACKAGE_METADATA_CACHE_TTL_IN_SECONDS = 86400
+
+    class PackageMetadataCacheUpdateType(EnumBackport):
+        ALL = "All"
+        SECURITY = "Security"
+
+    # Successful repo refreshes are reused across invocations within the freshness window
+    REPO_REFRESH_STATE_FILE = "RepoRefreshState.json"
+    REPO_REFRESH_FRESHNESS_WINDOW_IN_SECONDS = 3600
+
+    # Measured package install durations (and sizes) kept across invocations, for per-package install time estimates
+    PACKAGE_INSTALL_HISTORY_FILE = "PackageInstallHistory.json"
+    PACKAGE_INSTALL_HISTORY_MAX_PACKAGES = 5000                 # least recently installed packages are dropped beyond this
+    PACKAGE_INSTALL_DURATION_SMOOTHING_FACTOR = 0.5             # weight of the latest measurement in a package's install duration
+
+    # Independent read-only package manager queries (e.g. all and security update discovery) run concurrently up to this count, where the package manager supports it
+    MAX_CONCURRENT_READ_ONLY_QUERIES = 2
+
     # wait time after status updates
     WAIT_TIME_AFTER_HEALTHSTORE_STATUS_UPDATE_IN_SECS = 20
+    STATUS_FILE_WRITE_COALESCING_INTERVAL_IN_SECS = 5   # transitioning status updates within this interval of the last write are batched into the next one
 
     # Status file states
     STATUS_TRANSITIONING = "Transitioning"
@@ -144,6 +184,8 @@ class Constants(object):
     # Wrapper-core handshake files
     EXT_STATE_FILE = 'ExtState.json'
     CORE_STATE_FILE = 'CoreState.json'
+    LIFECYCLE_STATE_FILE_CHECK_MIN_INTERVAL_IN_SECONDS = 5     # lifecycle status checks reuse handshake file contents checked for changes more recently than this
+    CORE_SEQUENCE_HEARTBEAT_INTERVAL_IN_SECONDS = 60           # lifecycle status checks refresh the core sequence heartbeat at most this often
 
     # Operating System distributions
     UBUNTU = 'Ubuntu'
@@ -171,6 +213,8 @@ class Constants(object):
     MAX_FILE_OPERATION_RETRY_COUNT = 5
     MAX_ASSESSMENT_RETRY_COUNT = 5
     MAX_INSTALLATION_RETRY_COUNT = 3
+    MAX_PACKAGE_INSTALL_BATCH_SIZE = 10     # parent packages per package manager transaction; 1 disables batching
+    PACKAGE_PREFETCH_COUNT = 10             # upcoming parent packages (+ dependencies) downloaded ahead of installation; 0 disables prefetching
     MAX_IMDS_CONNECTION_RETRY_COUNT = 5
     MAX_ZYPPER_REPO_REFRESH_RETRY_COUNT = 5
 
@@ -218,7 +262,10 @@ class Constants(object):
         PLATFORM = "Platform"
 
     # Maintenance Window
-    PACKAGE_INSTALL_EXPECTED_MAX_TIME_IN_MINUTES = 5
+    PACKAGE_INSTALL_EXPECTED_MAX_TIME_IN_MINUTES = 5            # expected install time of packages without install history
+    PACKAGE_INSTALL_EXPECTED_MIN_TIME_IN_MINUTES = 1            # floor for expected install times estimated from install history
+    PACKAGE_INSTALL_EXPECTED_TIME_SAFETY_FACTOR = 3             # headroom over measured install durations, which vary with download speed and machine load
+    MAINTENANCE_WINDOW_DEBUG_LOG_INTERVAL_IN_SECONDS = 60       # remaining time debug logs are written at most this often
 
     # Package Manager Setting
     PACKAGE_MGR_SETTING_REPEAT_PATCH_OPERATION = "RepeatUpdateRun"
@@ -251,6 +298,17 @@ class Constants(object):
     TELEMETRY_EVENT_COUNTER_MSG_SIZE_LIMIT_IN_CHARS = 15  # buffer for telemetry event counter text added at the end of every message sent to telemetry
     TELEMETRY_MAX_EVENT_COUNT_THROTTLE = 60
     TELEMETRY_MAX_TIME_IN_SECONDS_FOR_EVENT_COUNT_THROTTLE = 60
+    TELEMETRY_BUFFER_MAX_SIZE_IN_CHARS = 524288     # buffered events are flushed to a new event file once they reach this size
+    TELEMETRY_BUFFER_FLUSH_INTERVAL_IN_SECONDS = 15     # or once this much time has passed since the last flush
+    TELEMETRY_EVENT_QUEUE_MAX_SIZE = 1000   # events waiting on the events writer thread, beyond which events are coalesced or dropped
+    TELEMETRY_EVENTS_DRAIN_TIMEOUT_IN_SECONDS = 90   # max wait for queued events to be written out, allows for one event count throttle wait
+
+    # Diagnostic artifacts - large diagnostic payloads kept locally, and only referenced in telemetry
+    DIAGNOSTIC_ARTIFACTS_FOLDER = "diagnostics"     # within the log folder
+    DIAGNOSTIC_ARTIFACTS_INDEX_FILE = "index.json"
+    DIAGNOSTIC_ARTIFACT_FILE_MAX_SIZE_IN_BYTES = 4*1024*1024     # per activity id and operation, beyond which further records are dropped
+    DIAGNOSTIC_ARTIFACTS_MAX_SIZE_IN_BYTES = 32*1024*1024        # beyond which the oldest artifact files are deleted
+    DIAGNOSTIC_ARTIFACT_TELEMETRY_OUTPUT_MAX_LENGTH = 1024       # longer command output is only referenced in telemetry (or truncated, without an artifact store)
 
     # Telemetry Event Level
     class TelemetryEventLevel(EnumBackport):
@@ -278,6 +336,8 @@ class Constants(object):
         PRIVILEGED_OP_MARKER = "Privileged_Op_e6df678d-d09b-436a-a08a-65f2f70a6798"
         PRIVILEGED_OP_REBOOT = PRIVILEGED_OP_MARKER + "Reboot_Exception"
         PRIVILEGED_OP_EXIT = PRIVILEGED_OP_MARKER + "Exit_"
+        COMMAND_OUTPUT_MAX_SIZE_IN_BYTES = 32 * 1024 * 1024     # beyond this, only the head and tail of command output are retained
+        COMMAND_TIMEOUT_EXIT_CODE = 124                         # same as coreutils timeout
 
     # Package / Patch State Ordering Constants
     # This ordering ensures that the most important information is preserved in the case of patch object truncation
@@ -15,34 +15,35 @@
 # Requires Python 2.7+
 
 from __future__ import print_function
-import base64
+import codecs
+import collections
 import datetime
-import json
+import hashlib
 import os
 import re
 import platform
-import shutil
+import signal
 import subprocess
 import sys
-import tempfile
+import threading
 import time
 from core.src.bootstrap.Constants import Constants
+from core.src.bootstrap.RecordStore import RecordStore
 from core.src.external_dependencies import distro
 
 
 class EnvLayer(object):
     """ Environment related functions """
 
-    def __init__(self, real_record_path=None, recorder_enabled=False, emulator_enabled=False):
-        # Recorder / emulator storage
+    def __init__(self, real_record_path=None, recorder_enabled=False, emulator_enabled=False, record_store=None, emulator_replay_delay_enabled=True):
+        # Recorder / emulator storage - a record store other than the default one can be plugged in
         self.__real_record_path = real_record_path
-        self.__real_record_pointer_path = real_record_path + ".pt"
-        self.__real_record_handle = None
-        self.__real_record_pointer = 0
+        self.__record_store = record_store if record_store is not None or not (recorder_enabled or emulator_enabled) else RecordStore(real_record_path)
 
         # Recorder / emulator state section
         self.__recorder_enabled = recorder_enabled                                  # dumps black box recordings
         self.__emulator_enabled = False if recorder_enabled else emulator_enabled   # only one can be enabled at a time
+        self.__emulator_replay_delay_enabled = emulator_replay_delay_enabled        # replays recorded operation durations - disable for fast replay
 
         # Recorder / emulator initialization
         if self.__recorder_enabled:
@@ -55,6 +56,8 @@ class EnvLayer(object):
         self.datetime = self.DateTime(recorder_enabled, emulator_enabled, self.__write_record, self.__read_record)
         self.file_system = self.FileSystem(recorder_enabled, emulator_enabled, self.__write_record, self.__read_record,
                                            emulator_root_path=os.path.dirname(self.__real_record_path))
+        self.command_runner = self.CommandRunner()
+        self.concurrent_commands_supported = not (self.__recorder_enabled or self.__emulator_enabled)     # records need a deterministic command order
 
         # Constant paths
         self.etc_environment_file_path = "/etc/environment"
@@ -146,86 +149,54 @@ class EnvLayer(object):
             if raise_if_not_success:
                 raise
 
-    def run_command_output(self, cmd, no_output=False, chk_err=False):
+    def run_command_output(self, cmd, no_output=False, chk_err=False, timeout_in_secs=None, output_handler=None):
+        """ Returns the return code and output of the command. If an output handler is given, it is also called with output text as it is produced. """
         operation = "RUN_CMD_OUT"
         if not self.__emulator_enabled:
             start = time.time()
-            code, output = self.__run_command_output_raw(cmd, no_output, chk_err)
+            code, output = self.__run_command_output_raw(cmd, no_output, chk_err, timeout_in_secs, output_handler)
             self.__write_record(operation, code, output, delay=(time.time()-start))
             return code, output
         else:
-            return self.__read_record(operation)
+            code, output = self.__read_record(operation)
+            if output_handler is not None and output:
+                output_handler(output)
+            return code, output
 
-    def __run_command_output_raw(self, cmd, no_output, chk_err=True):
+    def __run_command_output_raw(self, cmd, no_output, chk_err=True, timeout_in_secs=None, output_handler=None):
         """
-        Wrapper for subprocess.check_output. Execute 'cmd'.
-        Returns return code and STDOUT, trapping expected exceptions.
-        Reports exceptions to Error if chk_err parameter is True
+        Execute 'cmd' through the command runner.
+        Returns return code and STDOUT (merged with STDERR), trapping expected exceptions.
+        Reports non-zero exit codes to stdout if chk_err parameter is True
         """
+        chunk_handler = None
+        if output_handler is not None and not no_output:
+            decoder = codecs.getincrementaldecoder('utf8')('ignore')     # output chunks may end within a multi-byte character
 
-        def check_output(*popenargs, **kwargs):
-            """
-            Backport from subprocess module from python 2.7
-            """
-            if 'stdout' in kwargs:
-                raise ValueError('stdout argument not allowed, it will be overridden.')
-
-            no_output = False
-            if type(popenargs[0]) is bool:
-                no_output = popenargs[0]
-                popenargs = popenargs[1:]
+            def chunk_handler(chunk):
+                text = decoder.decode(chunk)
+                output_handler(text.encode('ascii', 'ignore') if self.get_python_major_version() == 2 else text)
 
-            if no_output is True:
-                out_file = None
-            else:
-                out_file = subprocess.PIPE
-
-            process = subprocess.Popen(stdout=out_file, *popenargs, **kwargs)
-            output, unused_err = process.communicate()
-            retcode = process.poll()
-
-            if retcode:
-                cmd = kwargs.get("args")
-                if cmd is None:
-                    cmd = popenargs[0]
-                raise subprocess.CalledProcessError(retcode, cmd, output=output)
-            return output
-
-        # noinspection PyShadowingNames,PyShadowingNames
-        class CalledProcessError(Exception):
-            """Exception classes used by this module."""
-
-            def __init__(self, return_code, cmd, output=None):
-                self.return_code = return_code
-                self.cmd = cmd
-                self.output = output
-
-            def __str__(self):
-                return "Command '%s' returned non-zero exit status %d" \
-                       % (self.cmd, self.return_code)
-
-        subprocess.check_output = check_output
-        subprocess.CalledProcessError = CalledProcessError
         try:
-            output = subprocess.check_output(no_output, cmd, stderr=subprocess.STDOUT, shell=True)
-        except subprocess.CalledProcessError as e:
-            if chk_err:
-                print("Error: CalledProcessError.  Error Code is: " + str(e.returncode), file=sys.stdout)
-                print("Error: CalledProcessError.  Command string was: " + e.cmd, file=sys.stdout)
-                print("Error: CalledProcessError.  Command result was: " + self.__convert_process_output_to_ascii(e.output[:-1]), file=sys.stdout)
-            if no_output:
-                return e.return_code, None
-            else:
-                return e.return_code, self.__convert_process_output_to_ascii(e.output)
+            code, output = self.command_runner.run(cmd, no_output, timeout_in_secs, chunk_handler)
         except Exception as error:
-            message = "Exception during cmd execution. [Exception={0}][Cmd={1}]".format(repr(error),str(cmd))
+            message = "Exception during cmd execution. [Exception={0}][Cmd={1}]".format(repr(error), str(cmd))
             print(message)
-            raise message
+            raise Exception(message)
 
-        if no_output:
-            return 0, None
-        else:
-            return 0, self.__convert_process_output_to_ascii(output)
+        if output is not None:
+            output = self.__convert_process_output_to_ascii(output)
+
+        if code != 0 and chk_err:
+            print("Error: CalledProcessError.  Error Code is: " + str(code), file=sys.stdout)
+            print("Error: CalledProcessError.  Command string was: " + str(cmd), file=sys.stdout)
+            print("Error: CalledProcessError.  Command result was: " + (output[:-1] if output is not None else ''), file=sys.stdout)
+
+        return code, output
+
+    def get_command_timings(self):
+        """ Returns execution timing statistics per command type for commands run in this process """
+        return self.command_runner.get_timings()
 
     @staticmethod
     def __convert_process_output_to_ascii(output):
@@ -334,6 +305,10 @@ class EnvLayer(object):
             # file-names of files that other processes may changes the contents of
             self.__non_exclusive_files = [Constants.EXT_STATE_FILE]
 
+            # state file store caches - real path -> (file signature, content read) and real path -> (content digest, file signature after write)
+            self.__state_file_read_cache = {}
+            self.__state_file_write_digests = {}
+
         def resolve_path(self, requested_path):
             """ Resolves any paths used with desired file system paths """
             if self.__emulator_enabled and self.__emulator_root_path is not None and self.__emulator_root_path not in requested_path:
@@ -412,21 +387,87 @@ class EnvLayer(object):
             if was_path:  # what was passed in was not a file handle, so close the handle that was init here
                 file_handle.close()
 
+        # region - State files
+        def read_state_file(self, file_path):
+            """ Reads all content of a small state file that is only ever replaced as a whole (see write_state_file). Content is cached, and only read
+                again when the file changed (by inode, modification time and size). Reads are not cached when recording or emulating. """
+            if self.__recorder_enabled or self.__emulator_enabled:
+                return self.read_with_retry(file_path)
+
+            real_path = self.resolve_path(file_path)
+            file_signature = self.get_file_signature(real_path)
+            if file_signature is not None and real_path in self.__state_file_read_cache:
+                cached_file_signature, cached_data = self.__state_file_read_cache[real_path]
+                if cached_file_signature == file_signature:
+                    return cached_data
+
+            with self.open(real_path, 'r') as file_handle:
+                data = file_handle.read()
+            if file_signature is not None:
+                self.__state_file_read_cache[real_path] = (file_signature, data)
+            return data
+
         @staticmethod
-        def write_with_retry_using_temp_file(file_path, data, mode='w'):
-            """ Writes to a temp file in a single operation and then moves/overrides the original file with the temp """
-            for i in range(0, Constants.MAX_FILE_OPERATION_RETRY_COUNT):
+        def replace_file(source_file_path, target_file_path):
+            """ Renames a file over another. os.rename does not replace an existing file on Windows, and os.replace is not available in Python 2. """
+            if hasattr(os, 'replace'):
+                os.replace(source_file_path, target_file_path)
+                return
+            if os.name == 'nt' and os.path.exists(target_file_path):
+                os.remove(target_file_path)     # not atomic, but only on Windows with Python 2
+            os.rename(source_file_path, target_file_path)
+
+        def write_state_file(self, file_path, data, fsync=True):
+            """ Atomically replaces the content of a small state file - data is written to a temp file in the same directory, which is then renamed over
+                the file, so readers see either the previous or the new content in full. With fsync, the data (and the rename) are durable on return.
+                Writes of unchanged content to a file that was not changed since it was last written are skipped. Returns True if the file was written. """
+            real_path = self.resolve_path(file_path)
+            data = str(data)
+            data_digest = hashlib.sha256(data.encode('utf-8')).hexdigest()
+            if real_path in self.__state_file_write_digests:
+                written_data_digest, written_file_signature = self.__state_file_write_digests[real_path]
+                if written_data_digest == data_digest and written_file_signature == self.get_file_signature(real_path):
+                    return False
+
+            temp_file_path = "{0}.{1}.{2}.tmp".format(real_path, str(os.getpid()), str(threading.current_thread().ident))
+            try:
+                with self.open(temp_file_path, 'w') as file_handle:
+                    file_handle.write(data)
+                    if fsync:
+                        file_handle.flush()
+                        os.fsync(file_handle.fileno())
+                self.replace_file(temp_file_path, real_path)
+            except Exception:
+                if os.path.isfile(temp_file_path):
+                    os.remove(temp_file_path)
+                raise
+
+            if fsync:
+                self.__fsync_directory(os.path.dirname(real_path))
+            self.__state_file_write_digests[real_path] = (data_digest, self.get_file_signature(real_path))
+            return True
+
+        @staticmethod
+        def __fsync_directory(directory_path):
+            """ Makes a rename within the directory durable. Best effort, as not all file systems support it. """
+            try:
+                directory_fd = os.open(directory_path or '.', os.O_RDONLY)
                 try:
-                    with tempfile.NamedTemporaryFile(mode, dir=os.path.dirname(file_path), delete=False) as tf:
-                        tf.write(str(data))
-                        tempname = tf.name
-                    shutil.move(tempname, file_path)
-                    break
-                except Exception as error:
-                    if i < Constants.MAX_FILE_OPERATION_RETRY_COUNT - 1:
-                        time.sleep(i + 1)
-                    else:
-                        raise Exception("Unable to write to {0} (retries exhausted). Error: {1}.".format(str(file_path), repr(error)))
+                    os.fsync(directory_fd)
+                finally:
+                    os.close(directory_fd)
+            except OSError:
+                pass
+
+        @staticmethod
+        def get_file_signature(real_path):
+            """ Returns (inode, modification time, size) of the file, or None if it can't be determined """
+            try:
+                file_stat = os.stat(real_path)
+                return file_stat.st_ino, getattr(file_stat, 'st_mtime_ns', file_stat.st_mtime), file_stat.st_size
+            except OSError:
+                return None
+        # endregion
 
 # endregion - File system emulation and extensions
 
@@ -437,6 +478,7 @@ class EnvLayer(object):
             self.__emulator_enabled = False if recorder_enabled else emulator_enabled
             self.__write_record = write_record_delegate
             self.__read_record = read_record_delegate
+            self.monotonic_clock_supported = not (self.__recorder_enabled or self.__emulator_enabled)     # elapsed time can only be recorded and emulated as wall clock readings
 
         def time(self):
             operation = "DATETIME_TIME"
@@ -471,6 +513,11 @@ class EnvLayer(object):
         # --------------------------------------------------------------------------------------------------------------
         # Static library functions
         # --------------------------------------------------------------------------------------------------------------
+        @staticmethod
+        def monotonic():
+            """ Seconds on a clock unaffected by system clock changes (Python 3.3+), for measuring elapsed time. Falls back to the system clock. """
+            return time.monotonic() if hasattr(time, 'monotonic') else time.time()
+
         @staticmethod
         def total_minutes_from_time_delta(time_delta):
             return ((time_delta.microseconds + (time_delta.seconds + time_delta.days * 24 * 3600) * 10 ** 6) / 10.0 ** 6) / 60
@@ -486,71 +533,213 @@ class EnvLayer(object):
             return std_datetime.strftime("%Y-%m-%dT%H:%M:%SZ")
 # endregion - DateTime emulator and extensions
 
+# region - Command runner
+    class CommandRunner(object):
+        """ Runs commands directly from argv where no shell features are needed (otherwise through /bin/sh), streaming merged STDOUT and STDERR
+            into bounded memory, with optional timeouts and timing statistics per command type """
+
+        SHELL_CHARACTERS = frozenset('|&;<>()$`\\"\'*?[]{}~#!\n')
+        ENV_ASSIGNMENT_REGEX = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*=')
+        READ_CHUNK_SIZE_IN_BYTES = 64 * 1024
+
+        def __init__(self, max_output_size_in_bytes=Constants.EnvLayer.COMMAND_OUTPUT_MAX_SIZE_IN_BYTES):
+            self.max_output_size_in_bytes = max_output_size_in_bytes
+            self.__timings = {}
+            self.__timings_lock = threading.Lock()
+
+        def run(self, cmd, no_output=False, timeout_in_secs=None, chunk_handler=None):
+            """ Returns the exit code and raw output (bytes) of the command. Output is None if no_output is set.
+                If a chunk handler is given, it is called with each chunk of raw output as it is read (including any that is later truncated). """
+            start = time.time()
+            argv, env = self.get_argv_and_env(cmd)
+            has_timeout = timeout_in_secs is not None and timeout_in_secs > 0
+            try:
+                process = self.__start_process(argv if argv is not None else cmd, env, no_output, has_timeout)
+            except OSError:
+                if argv is None:
+                    raise
+                process = self.__start_process(cmd, None, no_output, has_timeout)   # executable not found - let the shell report it as usual
+
+            timer = None
+            timed_out = [False]
+            if has_timeout:
+                timer = threading.Timer(timeout_in_secs, self.__kill, (process, timed_out))
+                timer.daemon = True
+                timer.start()
+
+            try:
+                output = None if no_output else self.__read_bounded_output(process.stdout, chunk_handler)
+                code = process.wait()
+            finally:
+                if timer is not None:
+                    timer.cancel()
+                if process.stdout is not None:
+                    process.stdout.close()
+
+            if timed_out[0]:
+                code = Constants.EnvLayer.COMMAND_TIMEOUT_EXIT_CODE
+                if output is not None:
+                    output += "\n[Command timed out after {0} seconds]\n".format(str(timeout_in_secs)).encode('utf8')
+
+            self.__record_timing(self.get_command_type(cmd), time.time() - start, timed_out[0])
+            return code, output
+
+        @staticmethod
+        def __start_process(args, env, no_output, has_timeout):
+            return subprocess.Popen(args, shell=not isinstance(args, list), env=env,
+                                    stdout=None if no_output else subprocess.PIPE, stderr=None if no_output else subprocess.STDOUT,
+                                    preexec_fn=os.setsid if has_timeout and os.name == 'posix' else None)    # own process group, to be killable as a whole
+
+        def get_argv_and_env(self, cmd):
+            """ Returns the argv and environment for running the command without a shell, or (None, None) if a shell is needed for it.
+                Leading environment variable assignments (e.g. 'LANG=en_US.UTF8 apt-get ...') are moved into the environment. """
+            if any(character in self.SHELL_CHARACTERS for character in cmd):
+                return None, None
+
+            argv = cmd.split()
+            env_overrides = {}
+            while len(argv) != 0 and self.ENV_ASSIGNMENT_REGEX.match(argv[0]):
+                name, value = argv.pop(0).split('=', 1)
+                env_overrides[name] = value
+
+            if len(argv) == 0:
+                return None, None
+
+            env = None
+            if len(env_overrides) != 0:
+                env = dict(os.environ)
+                env.update(env_overrides)
+            return argv, env
+
+        def get_command_type(self, cmd):
+            """ Name of the executable the command runs, skipping environment assignments and sudo (e.g. 'apt-get', 'dpkg-query', 'rpm') """
+            for token in str(cmd).split():
+                if self.ENV_ASSIGNMENT_REGEX.match(token) or token == 'sudo' or (token.startswith('-') and token != '-'):
+                    continue
+                return os.path.basename(token)
+            return Constants.UNKNOWN
+
+        def get_timings(self):
+            """ Returns a copy of {command type: {count, total_time_in_secs, max_time_in_secs, timeout_count}} """
+            with self.__timings_lock:
+                return dict((command_type, dict(timing)) for command_type, timing in self.__timings.items())
+
+        def __record_timing(self, command_type, duration_in_secs, timed_out):
+            with self.__timings_lock:
+                timing = self.__timings.setdefault(command_type, {"count": 0, "total_time_in_secs": 0.0, "max_time_in_secs": 0.0, "timeout_count": 0})
+                timing["count"] += 1
+                timing["total_time_in_secs"] += duration_in_secs
+                timing["max_time_in_secs"] = max(timing["max_time_in_secs"], duration_in_secs)
+                if timed_out:
+                    timing["timeout_count"] += 1
+
+        def __read_bounded_output(self, stream, chunk_handler=None):
+            """ Reads the stream to the end, retaining at most the first and last half of the max output size with a marker for what was dropped """
+            head = []
+            head_size = 0
+            tail = collections.deque()
+            tail_size = 0
+            dropped_size = 0
+            half_size = max(self.max_output_size_in_bytes // 2, 1)
+            file_descriptor = stream.fileno()
+
+            while True:
+                chunk = os.read(file_descriptor, self.READ_CHUNK_SIZE_IN_BYTES)
+                if not chunk:
+                    break
+                if chunk_handler is not None:
+                    chunk_handler(chunk)
+
+                if head_size < half_size:
+                    head_part = chunk[:half_size - head_size]
+                    head.append(head_part)
+                    head_size += len(head_part)
+                    chunk = chunk[len(head_part):]
+                    if not chunk:
+                        continue
+
+                tail.append(chunk)
+                tail_size += len(chunk)
+                while tail_size > half_size:
+                    excess = tail_size - half_size
+                    if len(tail[0]) <= excess:
+                        excess = len(tail.popleft())
+                    else:
+                        tail[0] = tail[0][excess:]
+                    tail_size -= excess
+                    dropped_size += excess
+
+            output = b''.join(head)
+            if dropped_size != 0:
+                output += "\n[... {0} bytes of output truncated ...]\n".format(str(dropped_size)).encode('utf8')
+            return output + b''.join(tail)
+
+        @staticmethod
+        def __kill(process, timed_out):
+            """ Kills the process (and its process group, to include any children started by a shell) on timeout """
+            if process.poll() is not None:
+                return
+            timed_out[0] = True
+            try:
+                if os.name == 'posix':
+                    os.killpg(process.pid, signal.SIGKILL)
+                else:
+                    process.kill()
+            except OSError:
+                pass
+# endregion - Command runner
+
 # region - Core Emulator support functions
     def __write_record(self, operation, code, output, delay, timestamp=None):
-        """ Writes a single operation record to disk if the recorder is enabled """
-        if not self.__recorder_enabled or self.__real_record_handle is None:
+        """ Writes a single operation record to the record store if the recorder is enabled """
+        if not self.__recorder_enabled or self.__record_store is None:
             return
 
         try:
             record = {
-                "timestamp": str(timestamp) if timestamp is not None else datetime.datetime.strptime(str(datetime.datetime.utcnow()).split(".")[0], Constants.UTC_DATETIME_FORMAT), #WRONG
+                "timestamp": str(timestamp) if timestamp is not None else datetime.datetime.utcnow().strftime(Constants.UTC_DATETIME_FORMAT),
                 "operation": str(operation),
                 "code": int(code),
-                "output": base64.b64encode(str(output)),
+                "output": str(output),
                 "delay": float(delay)
             }
-            self.__real_record_handle.write('\n{0}'.format(json.dumps(record)))
-        except Exception:
-            print("EnvLayer: Unable to write real record to disk.")
+            self.__record_store.append(record)
+        except Exception as error:
+            print("EnvLayer: Unable to write real record to disk. [Error={0}]".format(repr(error)))
 
     def __record_writer_init(self):
-        """ Initializes the record writer handle """
-        self.__real_record_handle = open(self.__real_record_path, 'a+')
+        """ Opens the record store for recording """
+        self.__record_store.open_writer()
 
     def __read_record(self, expected_operation):
         """ Returns code, output for a given operation if it matches """
-        if self.__real_record_handle is None:
-            raise Exception("Invalid real record handle.")
+        if self.__record_store is None:
+            raise Exception("Invalid real record store.")
 
-        # Get single record
-        real_record_raw = self.__real_record_handle.readline().rstrip()
-        real_record = json.loads(real_record_raw)
+        # Get single record, and advance the replay position
+        record_number = self.__record_store.get_pointer()
+        real_record = self.__record_store.read_next()
 
         # Load data from record
         timestamp = real_record['timestamp']
         operation = real_record['operation']
         code = int(real_record['code'])
-        output = base64.b64decode(real_record['output'])
+        output = real_record['output']
         delay = float(real_record['delay'])
-        print("Real record read: {0}: {1} >> code({2}) - output.len({3} - {4})".format(timestamp, operation, str(code), str(len(output)), str(self.__real_record_pointer+1)))
+        print("Real record read: {0}: {1} >> code({2}) - output.len({3} - {4})".format(timestamp, operation, str(code), str(len(output)), str(record_number + 1)))
 
         # Verify operation
-        if real_record['operation'] != expected_operation:
-            raise Exception("Execution deviation detected. Add adaptations for operation expected: {0}. Operation data found for: {1}.".format(expected_operation, real_record['operation']))
-
-        # Advance and persist pointer
-        self.__real_record_pointer += 1
-        with open(self.__real_record_pointer_path, 'w') as file_handle:
-            file_handle.write(str(self.__real_record_pointer))
+        if operation != expected_operation:
+            raise Exception("Execution deviation detected. Add adaptations for operation expected: {0}. Operation data found for: {1}.".format(expected_operation, operation))
 
         # Return data
-        time.sleep(delay)
+        if self.__emulator_replay_delay_enabled:
+            time.sleep(delay)
         return code, output
 
     def __record_reader_init(self):
-        """ Seeks the real record pointer to the expected location """
-        # Initialize record pointer
-        if not os.path.exists(self.__real_record_pointer_path):
-            self.__real_record_pointer = 0
-        else:
-            with open(self.__real_record_pointer_path, 'r') as file_handle:
-                self.__real_record_pointer = int(file_handle.read().rstrip())  # no safety checks as there's no good recovery
-
-        # Have the handle seek to the desired position
-        self.__real_record_handle = open(self.__real_record_pointer_path, 'r')
-        for x in range(1, self.__real_record_pointer):
-            self.__real_record_handle.readline()
+        """ Opens the record store for replay, from the persisted replay position """
+        self.__record_store.open_reader()
 # endregion - Core Emulator support functions
 
 # region - Legacy mode extensions
@@ -0,0 +1,108 @@
+# Copyright 2020 Microsoft Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Requires Python 2.7+
+
+"""Record store for the recorder / emulator"""
+import gzip
+import json
+import os
+import struct
+import threading
+
+
+class RecordStore(object):
+    """Record file of the recorder / emulator. Each record (a JSON object) is appended to the record file as a separate gzip member, and its offset
+       to an index file of fixed-width offsets, so that any record is read by its number with two seeks - without reading the records before it.
+       The replay position of the emulator is kept in a fixed-width pointer file, overwritten in place, so that replay resumes where it left off
+       after a restart (e.g. a reboot). Other record stores can be plugged into the environment layer, if they provide the same methods."""
+
+    OFFSET_FORMAT = '>Q'    # big-endian unsigned 64-bit
+    OFFSET_SIZE = struct.calcsize(OFFSET_FORMAT)
+
+    def __init__(self, record_path):
+        self.record_path = record_path
+        self.index_path = record_path + ".idx"
+        self.pointer_path = record_path + ".pt"
+        self.__record_handle = None
+        self.__index_handle = None
+        self.__pointer_handle = None
+        self.__record_file_size = 0
+        self.__pointer = 0
+        self.__lock = threading.Lock()
+
+    # region - Writer
+    def open_writer(self):
+        """Opens the record store for appending records"""
+        self.__record_handle = open(self.record_path, 'ab')
+        self.__index_handle = open(self.index_path, 'ab')
+        self.__record_file_size = os.path.getsize(self.record_path)
+
+    def append(self, record):
+        """Appends the record, and returns its number"""
+        with self.__lock:
+            offset = self.__record_file_size
+            gzip_file = gzip.GzipFile(filename='', mode='wb', fileobj=self.__record_handle)
+            try:
+                gzip_file.write((json.dumps(record) + '\n').encode('utf-8'))
+            finally:
+                gzip_file.close()
+            self.__record_handle.flush()
+            self.__record_file_size = self.__record_handle.tell()
+
+            self.__index_handle.write(struct.pack(self.OFFSET_FORMAT, offset))     # indexed only once the record is fully written
+            self.__index_handle.flush()
+            return self.get_record_count() - 1
+    # endregion
+
+    # region - Reader
+    def open_reader(self):
+        """Opens the record store for reading, and restores the replay position"""
+        self.__record_handle = open(self.record_path, 'rb')
+        self.__index_handle = open(self.index_path, 'rb')
+        self.__pointer_handle = open(self.pointer_path, 'r+b' if os.path.exists(self.pointer_path) else 'w+b')
+        pointer_data = self.__pointer_handle.read(self.OFFSET_SIZE)
+        self.__pointer = struct.unpack(self.OFFSET_FORMAT, pointer_data)[0] if len(pointer_data) == self.OFFSET_SIZE else 0
+
+    def read(self, record_number):
+        """Returns the record with the given number"""
+        with self.__lock:
+            if record_number < 0 or record_number >= self.get_record_count():
+                raise Exception("Record not found. [RecordNumber={0}][RecordCount={1}]".format(str(record_number), str(self.get_record_count())))
+            self.__index_handle.seek(record_number * self.OFFSET_SIZE)
+            offset = struct.unpack(self.OFFSET_FORMAT, self.__index_handle.read(self.OFFSET_SIZE))[0]
+            self.__record_handle.seek(offset)
+            return json.loads(gzip.GzipFile(filename='', mode='rb', fileobj=self.__record_handle).readline().decode('utf-8'))
+
+    def read_next(self):
+        """Returns the record at the replay position, and advances it"""
+        record = self.read(self.__pointer)
+        self.__pointer += 1
+        self.__pointer_handle.seek(0)
+        self.__pointer_handle.write(struct.pack(self.OFFSET_FORMAT, self.__pointer))
+        self.__pointer_handle.flush()
+        return record
+
+    def get_pointer(self):
+        return self.__pointer
+    # endregion
+
+    def get_record_count(self):
+        return os.path.getsize(self.index_path) // self.OFFSET_SIZE if os.path.exists(self.index_path) else 0
+
+    def close(self):
+        for handle in (self.__record_handle, self.__index_handle, self.__pointer_handle):
+            if handle is not None:
+                handle.close()
+        self.__record_handle = self.__index_handle = self.__pointer_handle = None
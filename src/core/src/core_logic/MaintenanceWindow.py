@@ -31,24 +31,46 @@ class MaintenanceWindow(object):
         self.env_layer = env_layer
         self.status_handler = status_handler
 
+        # The window is fixed for the run, so its bounds are parsed only once. Parsing errors are reported when the remaining time is first needed.
+        self.standard_start_time = None
+        self.total_time_in_minutes = None
+        self.window_parsing_error = None
+        try:
+            self.standard_start_time = self.env_layer.datetime.utc_to_standard_datetime(self.start_time)
+            dur = datetime.datetime.strptime(self.duration, "%H:%M:%S")
+            self.total_time_in_minutes = self.env_layer.datetime.total_minutes_from_time_delta(timedelta(hours=dur.hour, minutes=dur.minute, seconds=dur.second))
+        except ValueError as error:
+            self.window_parsing_error = error
+
+        # Remaining time is tracked on the monotonic clock from one wall clock reading, unless clock readings are recorded or emulated
+        self.monotonic_clock_anchor = None      # (monotonic time, elapsed time in minutes) at the wall clock reading
+        self.last_log_times = {}                # log type -> monotonic time when last logged
+
     def get_remaining_time_in_minutes(self, current_time=None, log_to_stdout=False):
         """Calculate time remaining base on the given job start time"""
         try:
-            if current_time is None:
-                current_time = self.env_layer.datetime.datetime_utcnow()
-            start_time = self.env_layer.datetime.utc_to_standard_datetime(self.start_time)
-            dur = datetime.datetime.strptime(self.duration, "%H:%M:%S")
-            dura = timedelta(hours=dur.hour, minutes=dur.minute, seconds=dur.second)
-            total_time_in_minutes = self.env_layer.datetime.total_minutes_from_time_delta(dura)
-            elapsed_time_in_minutes = self.env_layer.datetime.total_minutes_from_time_delta(current_time - start_time)
-            remaining_time_in_minutes = max((total_time_in_minutes - elapsed_time_in_minutes), 0)
+            if self.window_parsing_error is not None:
+                raise self.window_parsing_error
 
-            log_line = "Maintenance Window Utilization: " + str(timedelta(seconds=int(elapsed_time_in_minutes*60))) + " / " + self.duration + "\
-                        [Job start: " + str(start_time) + ", Current time: " + str(current_time.strftime("%Y-%m-%d %H:%M:%S")) + "]"
-            if log_to_stdout:
-                self.composite_logger.log(log_line)
+            monotonic_time = self.env_layer.datetime.monotonic()
+            if current_time is None and self.monotonic_clock_anchor is not None:
+                elapsed_time_in_minutes = self.monotonic_clock_anchor[1] + (monotonic_time - self.monotonic_clock_anchor[0]) / 60.0
+                current_time = self.standard_start_time + timedelta(minutes=elapsed_time_in_minutes)
             else:
-                self.composite_logger.log_debug(log_line)
+                if current_time is None:
+                    current_time = self.env_layer.datetime.datetime_utcnow()
+                    if self.env_layer.datetime.monotonic_clock_supported:
+                        self.monotonic_clock_anchor = (monotonic_time, self.env_layer.datetime.total_minutes_from_time_delta(current_time - self.standard_start_time))
+                elapsed_time_in_minutes = self.env_layer.datetime.total_minutes_from_time_delta(current_time - self.standard_start_time)
+            remaining_time_in_minutes = max((self.total_time_in_minutes - elapsed_time_in_minutes), 0)
+
+            if log_to_stdout or self.__is_debug_log_due('Utilization', monotonic_time):
+                log_line = "Maintenance Window Utilization: " + str(timedelta(seconds=int(elapsed_time_in_minutes*60))) + " / " + self.duration + "\
+                            [Job start: " + str(self.standard_start_time) + ", Current time: " + str(current_time.strftime("%Y-%m-%d %H:%M:%S")) + "]"
+                if log_to_stdout:
+                    self.composite_logger.log(log_line)
+                else:
+                    self.composite_logger.log_debug(log_line)
         except ValueError as error:
             error_msg = "Error calculating time remaining. Check patch operation input parameters."
             self.composite_logger.log_error("\n" + error_msg)
@@ -59,14 +81,36 @@ class MaintenanceWindow(object):
 
         return remaining_time_in_minutes
 
-    def is_package_install_time_available(self, remaining_time_in_minutes=None):
-        """Check if time still available for package installation"""
-        cutoff_time_in_minutes = Constants.REBOOT_BUFFER_IN_MINUTES + Constants.PACKAGE_INSTALL_EXPECTED_MAX_TIME_IN_MINUTES
+    def __is_debug_log_due(self, log_type, monotonic_time):
+        """Rate limits debug logs of each type, as the remaining time is checked for every package"""
+        last_log_time = self.last_log_times.get(log_type)
+        if last_log_time is not None and monotonic_time - last_log_time < Constants.MAINTENANCE_WINDOW_DEBUG_LOG_INTERVAL_IN_SECONDS:
+            return False
+        self.last_log_times[log_type] = monotonic_time
+        return True
+
+    @staticmethod
+    def get_package_install_cutoff_time_in_minutes(expected_install_time_in_minutes=None):
+        """Remaining time below which package installation (of one or more packages in a single transaction) can no longer be started.
+           The expected install time of the packages, if known, is used in place of the expected maximum install time of a package."""
+        if expected_install_time_in_minutes is None:
+            expected_install_time_in_minutes = Constants.PACKAGE_INSTALL_EXPECTED_MAX_TIME_IN_MINUTES
+        return Constants.REBOOT_BUFFER_IN_MINUTES + expected_install_time_in_minutes
+
+    def has_time_for_package_install(self, remaining_time_in_minutes, expected_install_time_in_minutes=None):
+        """Side-effect free check if the remaining time fits a package installation (of one or more packages in a single transaction).
+           Used for scheduling decisions, where running out of time does not stop installation."""
+        return remaining_time_in_minutes > self.get_package_install_cutoff_time_in_minutes(expected_install_time_in_minutes)
+
+    def is_package_install_time_available(self, remaining_time_in_minutes=None, expected_install_time_in_minutes=None):
+        """Check if time still available for package installation (of one or more packages in a single transaction). Warns if out of time."""
+        cutoff_time_in_minutes = self.get_package_install_cutoff_time_in_minutes(expected_install_time_in_minutes)
         if remaining_time_in_minutes is None:
             remaining_time_in_minutes = self.get_remaining_time_in_minutes()
 
-        if remaining_time_in_minutes > cutoff_time_in_minutes:
-            self.composite_logger.log_debug("Time Remaining: " + str(timedelta(seconds=int(remaining_time_in_minutes * 60))) + ", Cutoff time: " + str(timedelta(minutes=cutoff_time_in_minutes)))
+        if self.has_time_for_package_install(remaining_time_in_minutes, expected_install_time_in_minutes):
+            if self.__is_debug_log_due('TimeRemaining', self.env_layer.datetime.monotonic()):
+                self.composite_logger.log_debug("Time Remaining: " + str(timedelta(seconds=int(remaining_time_in_minutes * 60))) + ", Cutoff time: " + str(timedelta(minutes=cutoff_time_in_minutes)))
             return True
         else:
             self.composite_logger.log_warning("Time Remaining: " + str(timedelta(seconds=int(remaining_time_in_minutes * 60))) + ", Cutoff time: " + str(timedelta(minutes=cutoff_time_in_minutes)) + " [Out of time!]")
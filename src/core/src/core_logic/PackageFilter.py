@@ -17,6 +17,7 @@
 """Package Filter"""
 
 from core.src.bootstrap.Constants import Constants
+from core.src.core_logic.PackageMaskMatcher import PackageMaskMatcher
 import fnmatch
 
 
@@ -26,6 +27,7 @@ class PackageFilter(object):
     def __init__(self, execution_config, composite_logger):
         self.execution_config = execution_config
         self.composite_logger = composite_logger
+        self.mask_matchers = {}     # compiled matchers by mask list
 
         # Exclusions - note: version based exclusion is not supported
         self.global_excluded_packages = self.sanitize_str_to_list(self.execution_config.global_exclusion_list)
@@ -100,21 +102,25 @@ class PackageFilter(object):
 
     def single_package_check_for_match(self, package, matching_list, package_version, version_matching_list):
         """Returns true if a single package (optionally, version) matches the filter list"""
-        for index, matching_package in enumerate(matching_list):
-            if fnmatch.fnmatch(package, matching_package) or fnmatch.fnmatch(self.get_product_name_without_arch(package), matching_package):
-                self.composite_logger.log_debug('    - [Package] {0} matches expression {1}'.format(package, matching_package))
-                if package_version == Constants.DEFAULT_UNSPECIFIED_VALUE or not version_matching_list or version_matching_list[index] == Constants.DEFAULT_UNSPECIFIED_VALUE:
-                    self.composite_logger.log_debug('    - [Version] Check skipped as not specified.')
-                    return True
-                elif len(version_matching_list) > index and fnmatch.fnmatch(package_version, version_matching_list[index]):
-                    self.composite_logger.log_debug('    - [Version] {0} matches expression {1}'.format(package, version_matching_list[index]))
-                    return True
-                elif len(version_matching_list) <= index:   # This should never happen - something has gone horribly wrong
-                    self.composite_logger.log_error('    - [Version] Index error - ({0} of {1})'.format(index + 1, len(version_matching_list)))
-                else:
-                    self.composite_logger.log_debug('    - Package {0} (version={1}) was found, but it did not match filter specified for version ({2})'.format(package, package_version, version_matching_list[index]))
+        for index in self.get_mask_matcher(matching_list).get_matching_mask_indices(package):
+            if package_version == Constants.DEFAULT_UNSPECIFIED_VALUE or not version_matching_list or version_matching_list[index] == Constants.DEFAULT_UNSPECIFIED_VALUE:
+                return True     # version check not specified
+            elif len(version_matching_list) > index and fnmatch.fnmatch(package_version, version_matching_list[index]):
+                self.composite_logger.log_debug('    - [Version] {0} matches expression {1}'.format(package, version_matching_list[index]))
+                return True
+            elif len(version_matching_list) <= index:   # This should never happen - something has gone horribly wrong
+                self.composite_logger.log_error('    - [Version] Index error - ({0} of {1})'.format(index + 1, len(version_matching_list)))
+            else:
+                self.composite_logger.log_debug('    - Package {0} (version={1}) was found, but it did not match filter specified for version ({2})'.format(package, package_version, version_matching_list[index]))
         return False
 
+    def get_mask_matcher(self, matching_list):
+        """Returns the compiled matcher for the filter list"""
+        matching_list_key = tuple(matching_list)
+        if matching_list_key not in self.mask_matchers:
+            self.mask_matchers[matching_list_key] = PackageMaskMatcher(matching_list, self.get_product_name_without_arch, self.composite_logger)
+        return self.mask_matchers[matching_list_key]
+
     @staticmethod
     def get_product_name_without_arch(package_name):
         """Splits out product name without architecture - if this is changed, review YumPackageManager"""
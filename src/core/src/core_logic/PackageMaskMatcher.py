@@ -0,0 +1,96 @@
+# Copyright 2020 Microsoft Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Requires Python 2.7+
+
+"""Package Mask Matcher"""
+import fnmatch
+import re
+
+
+class PackageMaskMatcher(object):
+    """Compiled matcher for a list of package name masks. A mask matches a package if fnmatch.fnmatch matches it to the package name or the
+       package name without architecture. Exact masks are hashed, simple 'prefix*' masks are held in a prefix trie and the rest are combined
+       into a single regex. Matches are memoized (and logged) once per package."""
+
+    WILDCARD_CHARACTERS = ('*', '?', '[')
+
+    def __init__(self, masks, get_product_name_without_arch, composite_logger=None):
+        self.masks = list(masks)
+        self.get_product_name_without_arch = get_product_name_without_arch
+        self.composite_logger = composite_logger
+
+        self.__exact_masks = {}         # mask -> mask indices
+        self.__prefix_trie = {}         # character -> node, with mask indices of prefixes ending at a node under the None key
+        self.__pattern_masks = []       # (mask index, compiled mask) for all other masks
+        self.__combined_pattern = None  # any of the other masks, to reject non-matches in a single regex match
+        self.__matching_mask_indices_cache = {}
+
+        patterns = []
+        for index, mask in enumerate(self.masks):
+            wildcard_positions = [position for position, character in enumerate(mask) if character in self.WILDCARD_CHARACTERS]
+            if len(wildcard_positions) == 0:
+                self.__exact_masks.setdefault(mask, []).append(index)
+            elif wildcard_positions == [len(mask) - 1] and mask.endswith('*'):
+                node = self.__prefix_trie
+                for character in mask[:-1]:
+                    node = node.setdefault(character, {})
+                node.setdefault(None, []).append(index)
+            else:
+                pattern = self.__translate(mask)
+                patterns.append(pattern)
+                self.__pattern_masks.append((index, re.compile(pattern, re.M | re.S)))
+
+        if len(patterns) != 0:
+            self.__combined_pattern = re.compile('|'.join(['(?:{0})'.format(pattern) for pattern in patterns]), re.M | re.S)
+
+    @staticmethod
+    def __translate(mask):
+        """fnmatch regex for the mask, without the trailing global flags Python 2.7 appends (not allowed within a combined regex)"""
+        pattern = fnmatch.translate(mask)
+        return pattern[:-len('(?ms)')] if pattern.endswith('(?ms)') else pattern
+
+    def get_matching_mask_indices(self, package):
+        """Returns the indices of all masks matching the package, in mask order"""
+        if package in self.__matching_mask_indices_cache:
+            return self.__matching_mask_indices_cache[package]
+
+        package_names = [package]
+        package_name_without_arch = self.get_product_name_without_arch(package)
+        if package_name_without_arch != package:
+            package_names.append(package_name_without_arch)
+
+        matching_mask_indices = set()
+        for package_name in package_names:
+            matching_mask_indices.update(self.__exact_masks.get(package_name, []))
+
+            node = self.__prefix_trie
+            matching_mask_indices.update(node.get(None, []))
+            for character in package_name:
+                node = node.get(character)
+                if node is None:
+                    break
+                matching_mask_indices.update(node.get(None, []))
+
+            if self.__combined_pattern is not None and self.__combined_pattern.match(package_name):
+                for index, pattern in self.__pattern_masks:
+                    if pattern.match(package_name):
+                        matching_mask_indices.add(index)
+
+        matching_mask_indices = sorted(matching_mask_indices)
+        if self.composite_logger is not None:
+            for index in matching_mask_indices:
+                self.composite_logger.log_debug('    - [Package] {0} matches expression {1}'.format(package, self.masks[index]))
+        self.__matching_mask_indices_cache[package] = matching_mask_indices
+        return matching_mask_indices
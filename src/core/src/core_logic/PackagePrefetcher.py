@@ -0,0 +1,145 @@
+# Copyright 2020 Microsoft Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Requires Python 2.7+
+
+"""Package prefetcher"""
+import collections
+import threading
+
+
+class PackagePrefetcher(object):
+    """Downloads the packages (+ dependencies) of upcoming installs on a background worker, while earlier installs run, so that download time is hidden
+       behind installation. Completed downloads are handed off to the package manager between installs. Nothing is downloaded that there is no time
+       left in the maintenance window to install, and no download runs past the maintenance window cutoff."""
+
+    def __init__(self, package_manager, maintenance_window, composite_logger, prefetch_count):
+        self.package_manager = package_manager
+        self.maintenance_window = maintenance_window
+        self.composite_logger = composite_logger
+        self.prefetch_count = prefetch_count
+        self.enabled = prefetch_count > 0 and package_manager.is_download_prefetch_supported()
+
+        self.__pending_downloads = collections.deque()  # (packages, package versions, dependency filter), in install order
+        self.__requested_packages = set()                # parent packages already requested
+        self.__resolved_dependent_lists = {}            # parent package -> dependent list, for parent packages resolved on the worker
+        self.__condition = threading.Condition()
+        self.__worker = None
+        self.__download_in_progress = False
+        self.__stopped = False
+        self.downloaded_count = 0
+        self.handed_off_count = 0
+
+    def request(self, package_and_dependencies, package_and_dependency_versions, dependency_filter=None):
+        """Queues a download of a parent package (+ dependencies), unless already requested. If a dependency filter is given, the dependencies of the parent
+           package aren't known yet - they are resolved on the worker ahead of the download, and dependency_filter(dependent_list) returns the dependencies
+           (and their versions) to download along with it."""
+        if not self.enabled or len(package_and_dependencies) == 0 or package_and_dependencies[0] in self.__requested_packages:
+            return
+
+        self.__requested_packages.add(package_and_dependencies[0])
+        with self.__condition:
+            if self.__stopped:
+                return
+            self.__pending_downloads.append((package_and_dependencies, package_and_dependency_versions, dependency_filter))
+            if self.__worker is None:
+                self.package_manager.discard_downloaded_packages()     # leftovers of an interrupted run
+                self.__worker = threading.Thread(target=self.__worker_loop, name="PackagePrefetchWorker")
+                self.__worker.daemon = True     # never holds up termination - downloads are not installed until handed off
+                self.__worker.start()
+            else:
+                self.__condition.notify()
+
+    def hand_off(self):
+        """Hands off completed downloads to the package manager, ahead of an install. Skipped while a download is in progress (downloads in progress
+           are never handed off), in which case the install downloads anything it still needs itself."""
+        if self.__worker is None:
+            return
+        with self.__condition:
+            if self.__download_in_progress:
+                return
+            handed_off_count = self.package_manager.hand_off_downloaded_packages()
+        self.handed_off_count += handed_off_count
+        if handed_off_count != 0:
+            self.composite_logger.log_debug(" - Handed off prefetched package downloads. [Count={0}]".format(str(handed_off_count)))
+
+    def get_resolved_dependent_list(self, package):
+        """Dependent list of a parent package resolved on the worker, or None if it wasn't"""
+        with self.__condition:
+            return self.__resolved_dependent_lists.get(package)
+
+    def is_active(self):
+        """True while downloads are pending or in progress"""
+        with self.__condition:
+            return not self.__stopped and (len(self.__pending_downloads) != 0 or self.__download_in_progress)
+
+    def stop(self):
+        """Drops pending downloads. A download in progress is not waited for - its results are discarded when it completes."""
+        with self.__condition:
+            self.__stopped = True
+            self.__pending_downloads.clear()
+            self.__condition.notify_all()
+            if self.__worker is not None and not self.__download_in_progress:
+                self.package_manager.discard_downloaded_packages()
+
+    def __worker_loop(self):
+        while True:
+            with self.__condition:
+                while len(self.__pending_downloads) == 0 and not self.__stopped:
+                    self.__condition.wait()
+                if self.__stopped:
+                    return
+                packages, package_versions, dependency_filter = self.__pending_downloads.popleft()
+                self.__download_in_progress = True
+
+            try:
+                self.__download(packages, package_versions, dependency_filter)
+            except Exception as error:
+                self.composite_logger.log_debug(" - Package download prefetch failed. [Package={0}][Error={1}]".format(str(packages[0]), repr(error)))
+            finally:
+                with self.__condition:
+                    self.__download_in_progress = False
+                    if self.__stopped:
+                        self.package_manager.discard_downloaded_packages()
+
+    def __download(self, packages, package_versions, dependency_filter):
+        remaining_time_in_minutes = self.__get_remaining_time_for_download_in_minutes()
+        if remaining_time_in_minutes is None:
+            return
+
+        if dependency_filter is not None:
+            dependent_list = self.package_manager.get_dependent_list(packages[0])
+            with self.__condition:
+                self.__resolved_dependent_lists[packages[0]] = dependent_list
+            dependencies, dependency_versions = dependency_filter(dependent_list)
+            packages, package_versions = packages + dependencies, package_versions + dependency_versions
+            remaining_time_in_minutes = self.__get_remaining_time_for_download_in_minutes()     # resolution takes time too
+            if remaining_time_in_minutes is None:
+                return
+
+        timeout_in_secs = int((remaining_time_in_minutes - self.maintenance_window.get_package_install_cutoff_time_in_minutes()) * 60)
+        if self.package_manager.download_packages(packages, package_versions, timeout_in_secs):
+            self.downloaded_count += 1
+
+    def __get_remaining_time_for_download_in_minutes(self):
+        """Remaining time in the maintenance window, or None (and prefetching is stopped) if there is no time left to install further packages"""
+        remaining_time_in_minutes = self.maintenance_window.get_remaining_time_in_minutes()
+        if self.maintenance_window.has_time_for_package_install(remaining_time_in_minutes):
+            return remaining_time_in_minutes
+
+        self.composite_logger.log_debug(" - Stopped package download prefetch as there is no time left to install further packages.")
+        with self.__condition:
+            self.__stopped = True
+            self.__pending_downloads.clear()
+        return None
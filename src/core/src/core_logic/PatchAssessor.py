@@ -55,20 +55,28 @@ class PatchAssessor(object):
         self.composite_logger.log("Operation request time: " + self.execution_config.start_time)
 
         self.composite_logger.log("\n\nGetting available patches...")
-        self.package_manager.refresh_repo()
+        self.package_manager.refresh_repo_if_stale()
         self.status_handler.reset_assessment_data()
 
         for i in range(0, Constants.MAX_ASSESSMENT_RETRY_COUNT):
+            query_pool = self.package_manager.new_read_only_query_pool()
             try:
                 if self.lifecycle_manager is not None:
                     self.lifecycle_manager.lifecycle_status_check()     # may terminate the code abruptly, as designed
-                packages, package_versions = self.package_manager.get_all_updates()
-                self.telemetry_writer.write_event("Full assessment: " + str(packages), Constants.TelemetryEventLevel.Verbose)
+
+                # security updates are discovered alongside all updates where independent, otherwise while the full assessment is persisted
+                all_updates_query = query_pool.submit(self.package_manager.get_all_updates)
+                security_updates_query = query_pool.submit(self.package_manager.get_security_updates) if self.package_manager.security_updates_query_independent else None
+                packages, package_versions = all_updates_query.result()
+                if security_updates_query is None:
+                    security_updates_query = query_pool.submit(self.package_manager.get_security_updates)
+
+                self.telemetry_writer.write_diagnostic_artifact("Full assessment", packages)
                 self.status_handler.set_package_assessment_status(packages, package_versions)
                 if self.lifecycle_manager is not None:
                     self.lifecycle_manager.lifecycle_status_check()     # may terminate the code abruptly, as designed
-                sec_packages, sec_package_versions = self.package_manager.get_security_updates()
-                self.telemetry_writer.write_event("Security assessment: " + str(sec_packages), Constants.TelemetryEventLevel.Verbose)
+                sec_packages, sec_package_versions = security_updates_query.result()
+                self.telemetry_writer.write_diagnostic_artifact("Security assessment", sec_packages)
                 self.status_handler.set_package_assessment_status(sec_packages, sec_package_versions, "Security")
                 self.status_handler.set_assessment_substatus_json(status=Constants.STATUS_SUCCESS)
                 break
@@ -86,6 +94,8 @@ class PatchAssessor(object):
                         error.args = (error.args, "[{0}]".format(Constants.ERROR_ADDED_TO_STATUS))
                     self.status_handler.set_assessment_substatus_json(status=Constants.STATUS_ERROR)
                     raise
+            finally:
+                query_pool.shutdown()
 
         self.composite_logger.log("\nPatch assessment completed.\n")
         return True
@@ -134,18 +144,11 @@ class PatchAssessor(object):
             # Writes a vanilla assessment statefile
             self.write_assessment_state(first_write=True)
 
-        # Read (with retries for only IO Errors)
-        for i in range(0, Constants.MAX_FILE_OPERATION_RETRY_COUNT):
-            try:
-                with self.env_layer.file_system.open(self.assessment_state_file_path, mode="r") as file_handle:
-                    return json.load(file_handle)['assessmentState']
-            except Exception as error:
-                if i < Constants.MAX_FILE_OPERATION_RETRY_COUNT - 1:
-                    self.composite_logger.log_warning("Exception on assessment state read. [Exception={0}] [RetryCount={1}]".format(repr(error), str(i)))
-                    time.sleep(i + 1)
-                else:
-                    self.composite_logger.log_error("Unable to read assessment state file (retries exhausted). [Exception={0}]".format(repr(error)))
-                    raise
+        try:
+            return json.loads(self.env_layer.file_system.read_state_file(self.assessment_state_file_path))['assessmentState']
+        except Exception as error:
+            self.composite_logger.log_error("Unable to read assessment state file. [Exception={0}]".format(repr(error)))
+            raise
 
     def write_assessment_state(self, first_write=False):
         """
@@ -173,18 +176,11 @@ class PatchAssessor(object):
             self.composite_logger.log_error("Assessment state file path returned a directory. Attempting to reset.")
             shutil.rmtree(self.assessment_state_file_path)
 
-        for i in range(0, Constants.MAX_FILE_OPERATION_RETRY_COUNT):
-            try:
-                with self.env_layer.file_system.open(self.assessment_state_file_path, 'w+') as file_handle:
-                    file_handle.write(assessment_state_payload)
-                    break
-            except Exception as error:
-                if i < Constants.MAX_FILE_OPERATION_RETRY_COUNT - 1:
-                    self.composite_logger.log_warning("Exception on assessment state update. [Exception={0}] [RetryCount={1}]".format(repr(error), str(i)))
-                    time.sleep(i + 1)
-                else:
-                    self.composite_logger.log_error("Unable to write to assessment state file (retries exhausted). [Exception={0}]".format(repr(error)))
-                    raise
+        try:
+            self.env_layer.file_system.write_state_file(self.assessment_state_file_path, assessment_state_payload)
+        except Exception as error:
+            self.composite_logger.log_error("Unable to write to assessment state file. [Exception={0}]".format(repr(error)))
+            raise
 
         self.composite_logger.log_debug("Completed updating assessment state.")
 
@@ -19,11 +19,13 @@ import datetime
 import os
 import time
 from core.src.bootstrap.Constants import Constants
+from core.src.core_logic.PackagePrefetcher import PackagePrefetcher
+from core.src.package_managers.PackageCollection import PackageCollection
 
 
 class PatchInstaller(object):
     """" Wrapper class for a single patch installation operation """
-    def __init__(self, env_layer, execution_config, composite_logger, telemetry_writer, status_handler, lifecycle_manager, package_manager, package_filter, maintenance_window, reboot_manager):
+    def __init__(self, env_layer, execution_config, composite_logger, telemetry_writer, status_handler, lifecycle_manager, package_manager, package_filter, maintenance_window, reboot_manager, package_prefetch_count=Constants.PACKAGE_PREFETCH_COUNT):
         self.env_layer = env_layer
         self.execution_config = execution_config
 
@@ -36,11 +38,18 @@ class PatchInstaller(object):
         self.package_filter = package_filter
         self.maintenance_window = maintenance_window
         self.reboot_manager = reboot_manager
+        self.package_prefetch_count = package_prefetch_count
+        self.package_prefetcher = None      # PackagePrefetcher - for the current install_updates run
 
-        self.last_still_needed_packages = None  # Used for 'Installed' status records
-        self.last_still_needed_package_versions = None
+        self.last_still_needed_updates = None  # PackageCollection - used for 'Installed' status records
         self.progress_template = "[Time available: {0} | A: {1}, S: {2}, F: {3} | D: {4}]\t {5}"
 
+        # Progress counters for the current install_updates run
+        self.attempted_parent_update_count = 0
+        self.successful_parent_update_count = 0
+        self.failed_parent_update_count = 0
+        self.installed_update_count = 0  # includes dependencies
+
         # Constants
         self.REBOOT_PENDING_FILE_PATH = '/var/run/reboot-required'
 
@@ -112,19 +121,19 @@ class PatchInstaller(object):
     def install_updates(self, maintenance_window, package_manager, simulate=False):
         """wrapper function of installing updates"""
         self.composite_logger.log("\n\nGetting available updates...")
-        package_manager.refresh_repo()
+        package_manager.refresh_repo_if_stale(force_refresh=not package_manager.repo_refreshed_in_current_run)    # installs only use a repo refreshed within this run
 
         packages, package_versions = package_manager.get_available_updates(self.package_filter)  # Initial, ignoring exclusions
-        self.telemetry_writer.write_event("Initial package list: " + str(packages), Constants.TelemetryEventLevel.Verbose)
+        self.telemetry_writer.write_diagnostic_artifact("Initial package list", packages)
 
         not_included_packages, not_included_package_versions = self.get_not_included_updates(package_manager, packages)
-        self.telemetry_writer.write_event("Not Included package list: " + str(not_included_packages), Constants.TelemetryEventLevel.Verbose)
+        self.telemetry_writer.write_diagnostic_artifact("Not Included package list", not_included_packages)
 
         excluded_packages, excluded_package_versions = self.get_excluded_updates(package_manager, packages, package_versions)
-        self.telemetry_writer.write_event("Excluded package list: " + str(excluded_packages), Constants.TelemetryEventLevel.Verbose)
+        self.telemetry_writer.write_diagnostic_artifact("Excluded package list", excluded_packages)
 
         packages, package_versions = self.filter_out_excluded_updates(packages, package_versions, excluded_packages)  # Final, honoring exclusions
-        self.telemetry_writer.write_event("Final package list: " + str(packages), Constants.TelemetryEventLevel.Verbose)
+        self.telemetry_writer.write_diagnostic_artifact("Final package list", packages)
 
         # Set initial statuses
         if not package_manager.get_package_manager_setting(Constants.PACKAGE_MGR_SETTING_REPEAT_PATCH_OPERATION, False):  # 'Not included' list is not accurate when a repeat is required
@@ -134,34 +143,53 @@ class PatchInstaller(object):
         self.composite_logger.log("\nList of packages to be updated: \n" + str(packages))
 
         sec_packages, sec_package_versions = self.package_manager.get_security_updates()
-        self.telemetry_writer.write_event("Security packages out of the final package list: " + str(sec_packages), Constants.TelemetryEventLevel.Verbose)
+        self.telemetry_writer.write_diagnostic_artifact("Security packages out of the final package list", sec_packages)
         self.status_handler.set_package_install_status_classification(sec_packages, sec_package_versions, classification="Security")
 
         self.composite_logger.log("\nNote: Packages that are neither included nor excluded may still be installed if an included package has a dependency on it.")
         # We will see this as packages going from NotSelected --> Installed. We could remove them preemptively from not_included_packages, but we're explicitly choosing not to.
 
+        packages, package_versions = self.get_scheduled_install_order(package_manager, packages, package_versions, sec_packages)
+        expected_install_times = [package_manager.get_expected_package_install_time_in_minutes(package) for package in packages]
+        shortest_upcoming_install_times = list(expected_install_times)     # shortest expected install time of each package and the ones after it
+        for index in range(len(packages) - 2, -1, -1):
+            shortest_upcoming_install_times[index] = min(shortest_upcoming_install_times[index], shortest_upcoming_install_times[index + 1])
+        self.telemetry_writer.write_diagnostic_artifact("Scheduled install order", packages)
+
         self.composite_logger.log("\n\nInstalling patches in sequence...")
         self.composite_logger.log("[Progress Legend: (A)ttempted, (S)ucceeded, (F)ailed, (D)ependencies est.* (Important: Dependencies are excluded in all other counts)]")
-        attempted_parent_update_count = 0
-        successful_parent_update_count = 0
-        failed_parent_update_count = 0
-        installed_update_count = 0  # includes dependencies
+        self.attempted_parent_update_count = 0
+        self.successful_parent_update_count = 0
+        self.failed_parent_update_count = 0
+        self.installed_update_count = 0  # includes dependencies
 
-        patch_installation_successful = True
         maintenance_window_exceeded = False
+        packages_skipped_for_time = False
         all_packages, all_package_versions = package_manager.get_all_updates(True)  # cached is fine
-        self.telemetry_writer.write_event("All available packages list: " + str(all_packages), Constants.TelemetryEventLevel.Verbose)
-        self.last_still_needed_packages = all_packages
-        self.last_still_needed_package_versions = all_package_versions
-
-        for package, version in zip(packages, package_versions):
+        self.telemetry_writer.write_diagnostic_artifact("All available packages list", all_packages)
+        all_updates = PackageCollection(all_packages, all_package_versions)
+        self.last_still_needed_updates = PackageCollection(all_packages, all_package_versions)
+        requested_updates = PackageCollection(packages, package_versions)
+        requested_packages_by_name_without_arch = None    # for yum multilib resolution
+        dependent_lists = None  # resolved for the whole install list on first use
+        install_batch = []      # parent packages (+ dependencies) to be installed in a single transaction
+        install_batch_versions = []
+        install_batch_expected_install_time = 0
+        self.package_prefetcher = PackagePrefetcher(package_manager, maintenance_window, self.composite_logger, self.package_prefetch_count if not simulate else 0)
+
+        for index, (package, version) in enumerate(zip(packages, package_versions)):
             # Extension state check
             if self.lifecycle_manager is not None:
                 self.lifecycle_manager.lifecycle_status_check()     # may terminate the code abruptly, as designed
 
-            # maintenance window check
+            # maintenance window check - packages that don't fit in the time left are skipped while shorter ones (scheduled later) still do
             remaining_time = maintenance_window.get_remaining_time_in_minutes()
-            if maintenance_window.is_package_install_time_available(remaining_time) is False:
+            if not maintenance_window.has_time_for_package_install(remaining_time, install_batch_expected_install_time + expected_install_times[index]) and shortest_upcoming_install_times[index] < expected_install_times[index] \
+                    and maintenance_window.has_time_for_package_install(remaining_time, install_batch_expected_install_time + shortest_upcoming_install_times[index]):
+                self.composite_logger.log_warning("Skipping package as its expected install time exceeds the time left in the maintenance window. [Package={0}][ExpectedInstallTimeInMinutes={1}]".format(str(package), str(round(expected_install_times[index], 2))))
+                packages_skipped_for_time = True
+                continue
+            if maintenance_window.is_package_install_time_available(remaining_time, expected_install_time_in_minutes=install_batch_expected_install_time + expected_install_times[index]) is False:
                 error_msg = "Stopped patch installation as it is past the maintenance window cutoff time."
                 self.composite_logger.log_error("\n" + error_msg)
                 self.status_handler.add_error_to_status(error_msg, Constants.PatchOperationErrorCodes.DEFAULT_ERROR)
@@ -170,7 +198,7 @@ class PatchInstaller(object):
                 break
 
             # point in time status
-            progress_status = self.progress_template.format(str(datetime.timedelta(minutes=remaining_time)), str(attempted_parent_update_count), str(successful_parent_update_count), str(failed_parent_update_count), str(installed_update_count - successful_parent_update_count),
+            progress_status = self.progress_template.format(str(datetime.timedelta(minutes=remaining_time)), str(self.attempted_parent_update_count), str(self.successful_parent_update_count), str(self.failed_parent_update_count), str(self.installed_update_count - self.successful_parent_update_count),
                                                             "Processing package: " + str(package) + " (" + str(version) + ")")
             if version == Constants.UA_ESM_REQUIRED:
                 progress_status += "[Skipping - requires Ubuntu Advantage for Infrastructure with Extended Security Maintenance]"
@@ -180,73 +208,63 @@ class PatchInstaller(object):
             self.composite_logger.log(progress_status)
 
             # include all dependencies (with specified versions) explicitly
-            package_and_dependencies = [package]
-            package_and_dependency_versions = [version]
-            dependencies = package_manager.get_dependent_list(package)
-            for dependency in dependencies:
-                if dependency not in all_packages:
-                    continue
-                package_and_dependencies.append(dependency)
-                package_and_dependency_versions.append(package_versions[packages.index(dependency)] if dependency in packages else Constants.DEFAULT_UNSPECIFIED_VALUE)
+            if dependent_lists is None:     # ESM packages are skipped during installation, so they are not resolved
+                dependent_lists = package_manager.get_dependent_lists([candidate for candidate, candidate_version in zip(packages, package_versions) if candidate_version != Constants.UA_ESM_REQUIRED],
+                                                                      [candidate_version for candidate_version in package_versions if candidate_version != Constants.UA_ESM_REQUIRED])
+            dependent_list = dependent_lists.get(package, self.package_prefetcher.get_resolved_dependent_list(package))
+            dependencies, dependency_versions = self.get_dependencies_to_install(dependent_list if dependent_list is not None else package_manager.get_dependent_list(package), all_updates, requested_updates)
+            package_and_dependencies = [package] + dependencies
+            package_and_dependency_versions = [version] + dependency_versions
 
             # multilib resolution for yum
             if package_manager.get_package_manager_setting(Constants.PKG_MGR_SETTING_IDENTITY) == Constants.YUM:
-                package_name_without_arch = package_manager.get_product_name_without_arch(package)
-                for possible_arch_dependency, possible_arch_dependency_version in zip(packages, package_versions):
-                    if package_manager.get_product_name_without_arch(possible_arch_dependency) == package_name_without_arch and possible_arch_dependency not in package_and_dependencies:
-                        package_and_dependencies.append(possible_arch_dependency)
-                        package_and_dependency_versions.append(possible_arch_dependency_version)
+                if requested_packages_by_name_without_arch is None:
+                    requested_packages_by_name_without_arch = {}
+                    for requested_package in requested_updates:
+                        requested_packages_by_name_without_arch.setdefault(package_manager.get_product_name_without_arch(requested_package), []).append(requested_package)
+                for possible_arch_dependency in requested_packages_by_name_without_arch.get(package_manager.get_product_name_without_arch(package), []):
+                    package_and_dependencies.append(possible_arch_dependency)
+                    package_and_dependency_versions.append(requested_updates.get_version(possible_arch_dependency))
 
             # remove duplicates
             package_and_dependencies, package_and_dependency_versions = package_manager.dedupe_update_packages(package_and_dependencies, package_and_dependency_versions)
 
-            # parent package install (+ dependencies) and parent package result management
-            install_result = Constants.FAILED
-            for i in range(0, Constants.MAX_INSTALLATION_RETRY_COUNT):
-                install_result = package_manager.install_update_and_dependencies(package_and_dependencies, package_and_dependency_versions, simulate)
-                if install_result != Constants.INSTALLED:
-                    if i < Constants.MAX_INSTALLATION_RETRY_COUNT - 1:
-                        time.sleep(i + 1)
-                        self.composite_logger.log_warning("Retrying installation of package. [Package={0}]".format(package_manager.get_product_name(package_and_dependencies[0])))
-
-            # Update reboot pending status in status_handler
-            self.status_handler.set_reboot_pending(self.is_reboot_pending())
-
-            if install_result == Constants.FAILED:
-                self.status_handler.set_package_install_status(package_manager.get_product_name(str(package_and_dependencies[0])), str(package_and_dependency_versions[0]), Constants.FAILED)
-                failed_parent_update_count += 1
-                patch_installation_successful = False
-            elif install_result == Constants.INSTALLED:
-                self.status_handler.set_package_install_status(package_manager.get_product_name(str(package_and_dependencies[0])), str(package_and_dependency_versions[0]), Constants.INSTALLED)
-                successful_parent_update_count += 1
-                if package in self.last_still_needed_packages:
-                    index = self.last_still_needed_packages.index(package)
-                    self.last_still_needed_packages.pop(index)
-                    self.last_still_needed_package_versions.pop(index)
-                    installed_update_count += 1
-            attempted_parent_update_count += 1
-
-            # dependency package result management
-            for dependency, dependency_version in zip(package_and_dependencies, package_and_dependency_versions):
-                if dependency not in self.last_still_needed_packages or dependency == package:
+            # downloads of upcoming parent packages (+ dependencies) overlap with installs - dependencies not resolved yet are resolved on the prefetch worker
+            upcoming_index_range = range(index + 1, min(index + 1 + self.package_prefetch_count, len(packages))) if self.package_prefetcher.enabled else []
+            for upcoming_package, upcoming_version in [(packages[upcoming_index], package_versions[upcoming_index]) for upcoming_index in upcoming_index_range]:
+                if upcoming_version == Constants.UA_ESM_REQUIRED:
                     continue
-
-                if package_manager.is_package_version_installed(dependency, dependency_version):
-                    self.composite_logger.log_debug(" - Marking dependency as succeeded: " + str(dependency) + "(" + str(dependency_version) + ")")
-                    self.status_handler.set_package_install_status(package_manager.get_product_name(str(dependency)), str(dependency_version), Constants.INSTALLED)
-                    index = self.last_still_needed_packages.index(dependency)
-                    self.last_still_needed_packages.pop(index)
-                    self.last_still_needed_package_versions.pop(index)
-                    installed_update_count += 1
+                if upcoming_package in dependent_lists:
+                    upcoming_dependencies, upcoming_dependency_versions = self.get_dependencies_to_install(dependent_lists[upcoming_package], all_updates, requested_updates)
+                    self.package_prefetcher.request([upcoming_package] + upcoming_dependencies, [upcoming_version] + upcoming_dependency_versions)
                 else:
-                    # status is not logged by design here, in case you were wondering if that's a bug
-                    message = " - [Info] Dependency appears to have failed to install (note: it *may* be retried): " + str(dependency) + "(" + str(dependency_version) + ")"
-                    self.composite_logger.log_debug(message)
-
-            # dependency package result management fallback (not reliable enough to be used as primary, and will be removed; remember to retain last_still_needed refresh when you do that)
-            installed_update_count += self.perform_status_reconciliation_conditionally(package_manager, condition=(attempted_parent_update_count % Constants.PACKAGE_STATUS_REFRESH_RATE_IN_SECONDS == 0))  # reconcile status after every 10 attempted installs
-
-        progress_status = self.progress_template.format(str(datetime.timedelta(minutes=maintenance_window.get_remaining_time_in_minutes())), str(attempted_parent_update_count), str(successful_parent_update_count), str(failed_parent_update_count), str(installed_update_count - successful_parent_update_count),
+                    self.package_prefetcher.request([upcoming_package], [upcoming_version], lambda upcoming_dependent_list: self.get_dependencies_to_install(upcoming_dependent_list, all_updates, requested_updates))
+
+            # parent package install (+ dependencies) is batched until the batch is full, or there isn't time for it to grow any further
+            install_batch.append(package_and_dependencies)
+            install_batch_versions.append(package_and_dependency_versions)
+            install_batch_expected_install_time += expected_install_times[index]
+            next_expected_install_time = expected_install_times[index + 1] if index + 1 < len(packages) else Constants.PACKAGE_INSTALL_EXPECTED_MAX_TIME_IN_MINUTES
+            if len(install_batch) >= Constants.MAX_PACKAGE_INSTALL_BATCH_SIZE or not maintenance_window.has_time_for_package_install(remaining_time, install_batch_expected_install_time + next_expected_install_time):
+                self.install_batch_and_record_results(package_manager, install_batch, install_batch_versions, simulate)
+                install_batch = []
+                install_batch_versions = []
+                install_batch_expected_install_time = 0
+
+        if len(install_batch) != 0:
+            self.install_batch_and_record_results(package_manager, install_batch, install_batch_versions, simulate)
+        self.package_prefetcher.stop()
+
+        if packages_skipped_for_time and not maintenance_window_exceeded:
+            error_msg = "Some packages were not installed as their expected install time exceeded the time left in the maintenance window."
+            self.composite_logger.log_error("\n" + error_msg)
+            self.status_handler.add_error_to_status(error_msg, Constants.PatchOperationErrorCodes.DEFAULT_ERROR)
+            maintenance_window_exceeded = True
+            self.status_handler.set_maintenance_window_exceeded(True)
+
+        installed_update_count = self.installed_update_count
+        patch_installation_successful = self.failed_parent_update_count == 0
+        progress_status = self.progress_template.format(str(datetime.timedelta(minutes=maintenance_window.get_remaining_time_in_minutes())), str(self.attempted_parent_update_count), str(self.successful_parent_update_count), str(self.failed_parent_update_count), str(installed_update_count - self.successful_parent_update_count),
                                                         "Completed processing packages!")
         self.composite_logger.log(progress_status)
 
@@ -297,6 +315,102 @@ class PatchInstaller(object):
                 report_to_healthstore=True,
                 wait_after_update=False)
 
+    # region Batched installation support
+    def install_batch_and_record_results(self, package_manager, package_and_dependencies_batch, package_and_dependency_versions_batch, simulate=False):
+        """Installs a batch of parent packages (+ dependencies) and records the results for each parent package and its dependencies"""
+        if self.package_prefetcher is not None:
+            self.package_prefetcher.hand_off()
+        install_results = self.install_batch(package_manager, package_and_dependencies_batch, package_and_dependency_versions_batch, simulate)
+
+        # Update reboot pending status in status_handler
+        self.status_handler.set_reboot_pending(self.is_reboot_pending())
+
+        previously_attempted_parent_update_count = self.attempted_parent_update_count
+        for package_and_dependencies, package_and_dependency_versions, install_result in zip(package_and_dependencies_batch, package_and_dependency_versions_batch, install_results):
+            package = package_and_dependencies[0]
+
+            # parent package result management
+            if install_result == Constants.FAILED:
+                self.status_handler.set_package_install_status(package_manager.get_product_name(str(package)), str(package_and_dependency_versions[0]), Constants.FAILED)
+                self.failed_parent_update_count += 1
+            elif install_result == Constants.INSTALLED:
+                self.status_handler.set_package_install_status(package_manager.get_product_name(str(package)), str(package_and_dependency_versions[0]), Constants.INSTALLED)
+                self.successful_parent_update_count += 1
+                if self.last_still_needed_updates.remove(package) is not None:
+                    self.installed_update_count += 1
+            self.attempted_parent_update_count += 1
+
+            # dependency package result management
+            for dependency, dependency_version in zip(package_and_dependencies, package_and_dependency_versions):
+                if dependency not in self.last_still_needed_updates or dependency == package:
+                    continue
+
+                if package_manager.is_package_version_installed(dependency, dependency_version):
+                    self.composite_logger.log_debug(" - Marking dependency as succeeded: " + str(dependency) + "(" + str(dependency_version) + ")")
+                    self.status_handler.set_package_install_status(package_manager.get_product_name(str(dependency)), str(dependency_version), Constants.INSTALLED)
+                    self.last_still_needed_updates.remove(dependency)
+                    self.installed_update_count += 1
+                else:
+                    # status is not logged by design here, in case you were wondering if that's a bug
+                    message = " - [Info] Dependency appears to have failed to install (note: it *may* be retried): " + str(dependency) + "(" + str(dependency_version) + ")"
+                    self.composite_logger.log_debug(message)
+
+        # dependency package result management fallback (not reliable enough to be used as primary, and will be removed; remember to retain last_still_needed refresh when you do that)
+        refresh_rate = Constants.PACKAGE_STATUS_REFRESH_RATE_IN_SECONDS
+        self.installed_update_count += self.perform_status_reconciliation_conditionally(package_manager, condition=(self.attempted_parent_update_count // refresh_rate != previously_attempted_parent_update_count // refresh_rate))  # reconcile status after every 10 attempted installs
+
+        package_manager.save_package_install_history()
+
+        # batch results are a progress boundary - don't leave them held back by status write coalescing while the next batch runs
+        self.status_handler.flush_status_file()
+
+    def install_batch(self, package_manager, package_and_dependencies_batch, package_and_dependency_versions_batch, simulate=False):
+        """Installs a batch of parent packages (+ dependencies) in as few transactions as possible. Parent packages the transaction did not install are
+           bisected into smaller transactions, down to individual installs, so every parent package gets an exact result. Returns results aligned with the batch.
+           Simulated transactions install nothing, so no parent package could be verified by a batch - they are simulated individually instead."""
+        if len(package_and_dependencies_batch) == 1 or simulate:
+            return [self.install_update_and_dependencies_with_retries(package_manager, package_and_dependencies, package_and_dependency_versions, simulate)
+                    for package_and_dependencies, package_and_dependency_versions in zip(package_and_dependencies_batch, package_and_dependency_versions_batch)]
+
+        install_results = package_manager.install_update_and_dependencies_batch(package_and_dependencies_batch, package_and_dependency_versions_batch, simulate)
+        inconclusive_indices = [index for index, install_result in enumerate(install_results) if install_result is None]
+        if len(inconclusive_indices) == 0:
+            return install_results
+
+        self.composite_logger.log_debug(" - Bisecting parent packages not installed by the batch transaction. [Count={0}]".format(str(len(inconclusive_indices))))
+        middle = (len(inconclusive_indices) + 1) // 2
+        for indices in [inconclusive_indices[:middle], inconclusive_indices[middle:]]:
+            if len(indices) == 0:
+                continue
+            partial_install_results = self.install_batch(package_manager, [package_and_dependencies_batch[index] for index in indices], [package_and_dependency_versions_batch[index] for index in indices], simulate)
+            for index, install_result in zip(indices, partial_install_results):
+                install_results[index] = install_result
+
+        return install_results
+
+    def install_update_and_dependencies_with_retries(self, package_manager, package_and_dependencies, package_and_dependency_versions, simulate=False):
+        """Installs a single parent package (+ dependencies), retrying if it was not installed"""
+        install_result = Constants.FAILED
+        for i in range(0, Constants.MAX_INSTALLATION_RETRY_COUNT):
+            install_result = package_manager.install_update_and_dependencies(package_and_dependencies, package_and_dependency_versions, simulate)
+            if install_result == Constants.INSTALLED:
+                break
+            if i < Constants.MAX_INSTALLATION_RETRY_COUNT - 1:
+                time.sleep(i + 1)
+                self.composite_logger.log_warning("Retrying installation of package. [Package={0}]".format(package_manager.get_product_name(package_and_dependencies[0])))
+
+        return install_result
+    # endregion
+
+    # region Install scheduling
+    def get_scheduled_install_order(self, package_manager, packages, package_versions, security_packages):
+        """Orders packages to complete as many as possible before the maintenance window cutoff: security updates first, then the shortest expected
+           install time first. Discovery order is retained otherwise."""
+        security_packages = PackageCollection(security_packages)
+        install_order = sorted(range(len(packages)), key=lambda index: (packages[index] not in security_packages, package_manager.get_expected_package_install_time_in_minutes(packages[index]), index))
+        return [packages[index] for index in install_order], [package_versions[index] for index in install_order]
+    # endregion
+
     # region Installation Progress support
     def perform_status_reconciliation_conditionally(self, package_manager, condition=True):
         """Periodically based on the condition check, writes out success records as required; returns count of detected installs.
@@ -308,17 +422,16 @@ class PatchInstaller(object):
 
         self.composite_logger.log_debug("\nStarting status reconciliation...")
         start_time = time.time()
-        still_needed_packages, still_needed_package_versions = package_manager.get_all_updates(False)  # do not use cache
+        still_needed_updates = PackageCollection(*package_manager.get_all_updates(False))  # do not use cache
         successful_packages = []
         successful_package_versions = []
-        for i in range(0, len(self.last_still_needed_packages)):
-            if self.last_still_needed_packages[i] not in still_needed_packages:
-                successful_packages.append(self.last_still_needed_packages[i])
-                successful_package_versions.append(self.last_still_needed_package_versions[i])
+        for package, package_version in zip(*self.last_still_needed_updates.to_lists()):
+            if package not in still_needed_updates:
+                successful_packages.append(package)
+                successful_package_versions.append(package_version)
 
         self.status_handler.set_package_install_status(successful_packages, successful_package_versions, Constants.INSTALLED)
-        self.last_still_needed_packages = still_needed_packages
-        self.last_still_needed_package_versions = still_needed_package_versions
+        self.last_still_needed_updates = still_needed_updates
         self.composite_logger.log_debug("Completed status reconciliation. Time taken: " + str(time.time() - start_time) + " seconds.")
         return len(successful_packages)
     # endregion
@@ -328,6 +441,7 @@ class PatchInstaller(object):
         """Returns the list of updates not included given any list of packages that will be included"""
         self.composite_logger.log_debug("\nEvaluating for 'not included' packages...")
         all_packages, all_package_versions = package_manager.get_all_updates(True)  # cached is fine
+        included_packages = PackageCollection(included_packages)
         not_included_packages = []
         not_included_package_versions = []
         for i in range(0, len(all_packages)):
@@ -338,6 +452,12 @@ class PatchInstaller(object):
         self.composite_logger.log_debug(str(len(not_included_packages)) + " out of " + str(len(all_packages)) + " packages will be 'not included'.")
         return not_included_packages, not_included_package_versions
 
+    @staticmethod
+    def get_dependencies_to_install(dependent_list, all_updates, requested_updates):
+        """Returns the dependencies of a parent package that are pending updates, with their requested versions (if any)"""
+        dependencies = [dependency for dependency in dependent_list if dependency in all_updates]
+        return dependencies, [requested_updates.get_version(dependency, Constants.DEFAULT_UNSPECIFIED_VALUE) for dependency in dependencies]
+
     def get_excluded_updates(self, package_manager, packages, package_versions):
         """"Returns the list of updates explicitly excluded by entries in the exclusion list"""
         self.composite_logger.log_debug("\nEvaluating for 'excluded' packages...")
@@ -347,13 +467,19 @@ class PatchInstaller(object):
         if not self.package_filter.is_exclusion_list_present():
             return excluded_packages, excluded_package_versions
 
+        candidate_packages = []
+        candidate_package_versions = []
         for package, package_version in zip(packages, package_versions):
             if self.package_filter.check_for_exclusion(package):
                 excluded_packages.append(package)  # package is excluded, no need to check for dependency exclusion
                 excluded_package_versions.append(package_version)
-                continue
+            else:
+                candidate_packages.append(package)
+                candidate_package_versions.append(package_version)
 
-            dependency_list = package_manager.get_dependent_list(package)
+        dependent_lists = package_manager.get_dependent_lists(candidate_packages, is_attribution_required=self.package_filter.check_for_exclusion)   # only excluded dependencies matter here
+        for package, package_version in zip(candidate_packages, candidate_package_versions):
+            dependency_list = dependent_lists[package] if package in dependent_lists else package_manager.get_dependent_list(package)
             if dependency_list and self.package_filter.check_for_exclusion(dependency_list):
                 self.composite_logger.log_debug(" - Exclusion list match on dependency list for package '{0}': {1}".format(str(package), str(dependency_list)))
                 excluded_packages.append(package)  # one of the package's dependencies are excluded, so exclude the package
@@ -367,6 +493,7 @@ class PatchInstaller(object):
         self.composite_logger.log_debug("\nFiltering out 'excluded' packages from included packages...")
         new_included_packages = []
         new_included_package_versions = []
+        excluded_packages = PackageCollection(excluded_packages)
 
         for package, version in zip(included_packages, included_package_versions):
             if package not in excluded_packages:
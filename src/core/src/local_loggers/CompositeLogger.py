@@ -20,9 +20,11 @@ from core.src.bootstrap.Constants import Constants
 
 
 class CompositeLogger(object):
-    """ Manages diverting different kinds of output to the right sinks for them. """
+    """ Manages diverting different kinds of output to the right sinks for them.
+        Messages less severe than the verbosity are dropped before they are constructed - messages can be passed as a format string with its args,
+        or as a callable returning the message, to defer their construction until they're known to be logged. """
 
-    def __init__(self, env_layer=None, file_logger=None, current_env=None, telemetry_writer=None):
+    def __init__(self, env_layer=None, file_logger=None, current_env=None, telemetry_writer=None, verbosity=Constants.DEFAULT_LOG_VERBOSITY):
         self.env_layer = env_layer
         self.file_logger = file_logger
         self.telemetry_writer = telemetry_writer  # Although telemetry_writer is an independent entity, it is used within composite_logger for ease of sending all logs to telemetry
@@ -34,9 +36,20 @@ class CompositeLogger(object):
         self.TELEMETRY_LOG = "TELEMETRY_LOG:"
         self.current_env = current_env
         self.NEWLINE_REPLACE_CHAR = " "
+        self.verbosity = verbosity
 
-    def log(self, message, message_type=Constants.TelemetryEventLevel.Informational):
-        """log output"""
+    def is_enabled(self, verbosity):
+        """ True if messages of the verbosity level are logged """
+        return verbosity <= self.verbosity
+
+    def log(self, message, *args, **kwargs):
+        """log output. The message type is passed as the message_type keyword argument, so that positional args are always format args"""
+        message_type = kwargs.get('message_type', Constants.TelemetryEventLevel.Informational)
+        if not self.is_enabled(self.__get_verbosity_for_message_type(message_type)):
+            return
+        self.__log(self.__construct_message(message, args), message_type)
+
+    def __log(self, message, message_type):
         message = self.__remove_substring_from_message(message, Constants.ERROR_ADDED_TO_STATUS)
         message = message.strip()
         if self.telemetry_writer is not None and self.telemetry_writer.events_folder_path is not None and self.current_env != Constants.DEV:  # turned off for dev environment as it severely slows down execution
@@ -45,45 +58,89 @@ class CompositeLogger(object):
             for line in message.splitlines():  # allows the extended file logger to strip unnecessary white space
                 print(line)
         elif self.file_logger is not None:
-            timestamp = self.env_layer.datetime.timestamp()
-            self.file_logger.write("\n" + timestamp + "> " + message.strip(), fail_silently=False)
+            timestamp = self.file_logger.get_timestamp()
+            self.file_logger.write("\n" + timestamp + "> " + message.strip(), fail_silently=False, flush=message_type in (Constants.TelemetryEventLevel.Error, Constants.TelemetryEventLevel.Critical))
 
-    def log_error(self, message):
+    def log_error(self, message, *args):
         """log errors"""
-        message = self.__remove_substring_from_message(message, Constants.ERROR_ADDED_TO_STATUS)
+        if not self.is_enabled(Constants.LogVerbosity.ERROR):
+            return
+        message = self.__remove_substring_from_message(self.__construct_message(message, args), Constants.ERROR_ADDED_TO_STATUS)
         message = self.ERROR + (self.NEWLINE_REPLACE_CHAR.join(message.split(os.linesep))).strip()
-        self.log(message, message_type=Constants.TelemetryEventLevel.Error)
+        self.__log(message, message_type=Constants.TelemetryEventLevel.Error)
 
-    def log_warning(self, message):
+    def log_warning(self, message, *args):
         """log warning"""
-        message = self.__remove_substring_from_message(message, Constants.ERROR_ADDED_TO_STATUS)
+        if not self.is_enabled(Constants.LogVerbosity.WARNING):
+            return
+        message = self.__remove_substring_from_message(self.__construct_message(message, args), Constants.ERROR_ADDED_TO_STATUS)
         message = self.WARNING + (self.NEWLINE_REPLACE_CHAR.join(message.split(os.linesep))).strip()
-        self.log(message, message_type=Constants.TelemetryEventLevel.Warning)
+        self.__log(message, message_type=Constants.TelemetryEventLevel.Warning)
 
-    def log_debug(self, message):
+    def log_debug(self, message, *args):
         """log debug"""
-        message = self.__remove_substring_from_message(message, Constants.ERROR_ADDED_TO_STATUS)
+        if not self.is_enabled(Constants.LogVerbosity.DEBUG):
+            return
+        message = self.__remove_substring_from_message(self.__construct_message(message, args), Constants.ERROR_ADDED_TO_STATUS)
         message = message.strip()
         if self.telemetry_writer is not None and self.telemetry_writer.events_folder_path is not None and self.current_env not in (Constants.DEV, Constants.TEST):
             self.telemetry_writer.write_event(message, Constants.TelemetryEventLevel.Verbose)
         if self.current_env in (Constants.DEV, Constants.TEST):
-            self.log(self.current_env + ": " + str(self.env_layer.datetime.datetime_utcnow()) + ": " + message, Constants.TelemetryEventLevel.Verbose)  # send to standard output if dev or test env
+            self.__log(self.current_env + ": " + str(self.env_layer.datetime.datetime_utcnow()) + ": " + message, Constants.TelemetryEventLevel.Verbose)  # send to standard output if dev or test env
         elif self.file_logger is not None:
             self.file_logger.write("\n\t" + self.DEBUG + " " + "\n\t".join(message.splitlines()).strip())
 
-    def log_verbose(self, message):
+    def log_verbose(self, message, *args):
         """log verbose"""
-        message = self.__remove_substring_from_message(message, Constants.ERROR_ADDED_TO_STATUS)
+        if not self.is_enabled(Constants.LogVerbosity.VERBOSE):
+            return
+        message = self.__remove_substring_from_message(self.__construct_message(message, args), Constants.ERROR_ADDED_TO_STATUS)
         # Only log verbose events to file, not to telemetry
         if self.file_logger is not None:
             self.file_logger.write("\n\t" + self.VERBOSE + " " + "\n\t".join(message.strip().splitlines()).strip())
 
+    @staticmethod
+    def format_output(output):
+        """ Formats command output for logging as '|'-prefixed lines. Beyond the maximum line count, only the head and tail lines are kept. """
+        lines = output.splitlines()
+        max_line_count = Constants.LOG_OUTPUT_MAX_LINE_COUNT
+        if len(lines) > max_line_count:
+            lines = lines[:max_line_count // 2] + ["<{0} lines omitted>".format(str(len(lines) - max_line_count))] + lines[len(lines) - max_line_count // 2:]
+        return "\n|\t" + "\n|\t".join(lines)
+
+    @staticmethod
+    def format_list(items):
+        """ Formats a list (e.g. of packages) for logging. Beyond the maximum item count, only the count of further items is kept. """
+        max_item_count = Constants.LOG_LIST_MAX_ITEM_COUNT
+        if len(items) <= max_item_count:
+            return str(items)
+        return "{0} <and {1} more>".format(str(items[:max_item_count]), str(len(items) - max_item_count))
+
+    @staticmethod
+    def __construct_message(message, args):
+        """ Constructs a message passed as a callable, or as a format string with args """
+        if callable(message):
+            return message()
+        if len(args) != 0:
+            return message.format(*args)
+        return message
+
+    @staticmethod
+    def __get_verbosity_for_message_type(message_type):
+        if message_type in (Constants.TelemetryEventLevel.Critical, Constants.TelemetryEventLevel.Error):
+            return Constants.LogVerbosity.ERROR
+        elif message_type == Constants.TelemetryEventLevel.Warning:
+            return Constants.LogVerbosity.WARNING
+        elif message_type == Constants.TelemetryEventLevel.Verbose:
+            return Constants.LogVerbosity.DEBUG
+        return Constants.LogVerbosity.INFO
+
     def log_telemetry_module_error(self, message):
         """Used exclusively by telemetry writer to log any errors raised within it's operation"""
         message = (self.NEWLINE_REPLACE_CHAR.join(message.split(os.linesep))).strip()
         if self.file_logger is not None:
-            timestamp = self.env_layer.datetime.timestamp()
-            self.file_logger.write("\n" + timestamp + "> " + self.TELEMETRY_ERROR + message.strip(), fail_silently=False)
+            timestamp = self.file_logger.get_timestamp()
+            self.file_logger.write("\n" + timestamp + "> " + self.TELEMETRY_ERROR + message.strip(), fail_silently=False, flush=True)
         else:
             print(self.TELEMETRY_ERROR + " " + message)
 
@@ -91,7 +148,7 @@ class CompositeLogger(object):
         """Used exclusively by telemetry writer to log messages from it's operation"""
         message = (self.NEWLINE_REPLACE_CHAR.join(message.split(os.linesep))).strip()
         if self.file_logger is not None:
-            timestamp = self.env_layer.datetime.timestamp()
+            timestamp = self.file_logger.get_timestamp()
             self.file_logger.write("\n" + timestamp + "> " + self.TELEMETRY_LOG + message.strip(), fail_silently=False)
         else:
             print(self.TELEMETRY_LOG + " " + message)
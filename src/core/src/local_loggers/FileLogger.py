@@ -13,20 +13,38 @@
 # limitations under the License.
 #
 # Requires Python 2.7+
+import datetime
 import os
 import sys
+import threading
+import time
+from core.src.bootstrap.Constants import Constants
 
 
 class FileLogger(object):
-    """Facilitates writing selected logs to a file"""
+    """Facilitates writing selected logs to a file. Writes are buffered in memory and written out to the file when the buffer fills up, on error-level
+       writes, and at the latest once the flush interval elapsed. The file is rotated when it would grow beyond its maximum size, if it has one."""
 
-    def __init__(self, env_layer, log_file):
+    def __init__(self, env_layer, log_file, buffer_size_in_bytes=Constants.LOG_FILE_BUFFER_SIZE_IN_BYTES, flush_interval_in_secs=Constants.LOG_FILE_FLUSH_INTERVAL_IN_SECONDS,
+                 max_log_file_size_in_bytes=None, max_rotated_log_file_count=Constants.MAX_ROTATED_LOG_FILE_COUNT):
         self.env_layer = env_layer
         self.log_file = log_file
         self.log_failure_log_file = log_file + ".failure"
         self.log_file_handle = None
+
+        self.buffer_size_in_bytes = buffer_size_in_bytes
+        self.flush_interval_in_secs = flush_interval_in_secs
+        self.max_log_file_size_in_bytes = max_log_file_size_in_bytes
+        self.max_rotated_log_file_count = max_rotated_log_file_count
+        self.__buffer = []
+        self.__buffered_size = 0
+        self.__log_file_size = 0
+        self.__flush_timer = None
+        self.__lock = threading.RLock()     # the flush timer writes out the buffer on its own thread
+        self.__timestamp = (None, None)     # (second, formatted timestamp)
+
         try:
-            self.log_file_handle = self.env_layer.file_system.open(self.log_file, "a+")
+            self.__open_log_file()
         except Exception as error:
             failure_message = "FileLogger - Error opening '" + self.log_file + "': " + repr(error)
             sys.stdout.write(failure_message)
@@ -36,10 +54,21 @@ class FileLogger(object):
     def __del__(self):
         self.close()
 
-    def write(self, message, fail_silently=True):
+    def write(self, message, fail_silently=True, flush=False):
+        """ Buffers the message. With flush (e.g. for errors), the buffer is written out to the file right away. """
         try:
-            if self.log_file_handle is not None:
-                self.log_file_handle.write(message)
+            with self.__lock:
+                if self.log_file_handle is None:
+                    return
+                self.__buffer.append(message)
+                self.__buffered_size += len(message)
+                if flush or self.__buffered_size >= self.buffer_size_in_bytes:
+                    self.__write_buffer()
+                    self.log_file_handle.flush()
+                elif self.__flush_timer is None and self.flush_interval_in_secs > 0:
+                    self.__flush_timer = threading.Timer(self.flush_interval_in_secs, self.__flush_on_timer)
+                    self.__flush_timer.daemon = True
+                    self.__flush_timer.start()
         except Exception as error:
             # DO NOT write any errors here to stdout
             failure_message = "Fatal exception trying to write to log file: " + repr(error) + ". Attempted message: " + str(message)
@@ -47,6 +76,15 @@ class FileLogger(object):
                 self.write_irrecoverable_exception(message)
                 raise Exception(failure_message)
 
+    def get_timestamp(self):
+        """ UTC timestamp for log lines. Unlike env_layer.datetime.timestamp(), it is not recorded, and is only formatted once a second. """
+        current_second = int(time.time())
+        timestamp_second, timestamp = self.__timestamp
+        if timestamp_second != current_second:
+            timestamp = datetime.datetime.utcfromtimestamp(current_second).strftime("%Y-%m-%dT%H:%M:%SZ")
+            self.__timestamp = (current_second, timestamp)
+        return timestamp
+
     def write_irrecoverable_exception(self, message):
         """ A best-effort attempt to write out errors where writing to the primary log file was interrupted"""
         try:
@@ -57,13 +95,64 @@ class FileLogger(object):
             pass
 
     def flush(self):
-        if self.log_file_handle is not None:
-            self.log_file_handle.flush()
-            os.fsync(self.log_file_handle.fileno())
+        with self.__lock:
+            if self.log_file_handle is not None:
+                self.__write_buffer()
+                self.log_file_handle.flush()
+                os.fsync(self.log_file_handle.fileno())
 
     def close(self, message_at_close='<Log file was closed.>'):
-        if self.log_file_handle is not None:
-            if message_at_close is not None:
-                self.write(str(message_at_close))
+        with self.__lock:
+            if self.log_file_handle is not None:
+                if message_at_close is not None:
+                    self.write(str(message_at_close))
+                if self.__flush_timer is not None:
+                    self.__flush_timer.cancel()
+                    self.__flush_timer = None
+                try:
+                    self.__write_buffer()
+                finally:
+                    self.log_file_handle.close()
+                    self.log_file_handle = None     # Not having this can cause 'I/O exception on closed file' exceptions
+
+    def __flush_on_timer(self):
+        with self.__lock:
+            self.__flush_timer = None
+            try:
+                if self.log_file_handle is not None:
+                    self.__write_buffer()
+                    self.log_file_handle.flush()
+            except Exception as error:
+                self.write_irrecoverable_exception("Fatal exception trying to flush log file: " + repr(error))
+
+    def __write_buffer(self):
+        """ Writes out buffered messages, rotating the file first if they would grow it beyond its maximum size """
+        if len(self.__buffer) == 0:
+            return
+        data = "".join(self.__buffer)
+        self.__buffer = []
+        self.__buffered_size = 0
+        if self.max_log_file_size_in_bytes is not None and self.__log_file_size != 0 and self.__log_file_size + len(data) > self.max_log_file_size_in_bytes:
             self.log_file_handle.close()
-            self.log_file_handle = None     # Not having this can cause 'I/O exception on closed file' exceptions
+            self.log_file_handle = None
+            self.__open_log_file(rotate=True)
+        self.log_file_handle.write(data)
+        self.__log_file_size += len(data)
+
+    def __open_log_file(self, rotate=False):
+        real_log_file = self.env_layer.file_system.resolve_path(self.log_file)
+        log_file_size = os.path.getsize(real_log_file) if os.path.isfile(real_log_file) else 0
+        if rotate or (self.max_log_file_size_in_bytes is not None and log_file_size >= self.max_log_file_size_in_bytes):
+            self.__rotate_log_files(real_log_file)
+            log_file_size = 0
+        self.log_file_handle = self.env_layer.file_system.open(self.log_file, "a+")
+        self.__log_file_size = log_file_size
+
+    def __rotate_log_files(self, real_log_file):
+        """ Shifts log file -> .1 -> .2 ... up to the maximum rotated log file count, dropping the oldest """
+        for index in range(self.max_rotated_log_file_count, 0, -1):
+            source_log_file = real_log_file if index == 1 else "{0}.{1}".format(real_log_file, str(index - 1))
+            if os.path.isfile(source_log_file):
+                self.env_layer.file_system.replace_file(source_log_file, "{0}.{1}".format(real_log_file, str(index)))
+        if os.path.isfile(real_log_file):
+            os.remove(real_log_file)
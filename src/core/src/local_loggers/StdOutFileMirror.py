@@ -40,7 +40,7 @@ class StdOutFileMirror(object):
 
         if len(message.strip()) > 0:
             try:
-                timestamp = self.env_layer.datetime.timestamp()
+                timestamp = self.file_logger.get_timestamp()
                 self.file_logger.write("\n" + timestamp + "> " + message, fail_silently=False)  # also write to the file logger file
             except Exception as error:
                 sys.stdout = self.terminal  # suppresses further job output mirror failures
@@ -18,7 +18,10 @@
 import json
 import os
 import re
+import shutil
+from core.src.package_managers.PackageCollection import PackageCollection
 from core.src.package_managers.PackageManager import PackageManager
+from core.src.package_managers.StreamingLineParser import StreamingLineParser
 from core.src.bootstrap.Constants import Constants
 
 
@@ -26,18 +29,23 @@ class AptitudePackageManager(PackageManager):
     """Implementation of Debian/Ubuntu based package management operations"""
 
     # For more details, try `man apt-get` on any Debian/Ubuntu based box.
-    def __init__(self, env_layer, execution_config, composite_logger, telemetry_writer, status_handler):
-        super(AptitudePackageManager, self).__init__(env_layer, execution_config, composite_logger, telemetry_writer, status_handler)
+    def __init__(self, env_layer, execution_config, composite_logger, telemetry_writer, status_handler, package_metadata_cache_ttl_in_secs=Constants.PACKAGE_METADATA_CACHE_TTL_IN_SECONDS, repo_refresh_freshness_window_in_secs=Constants.REPO_REFRESH_FRESHNESS_WINDOW_IN_SECONDS, read_only_query_max_concurrency=Constants.MAX_CONCURRENT_READ_ONLY_QUERIES):
+        super(AptitudePackageManager, self).__init__(env_layer, execution_config, composite_logger, telemetry_writer, status_handler, package_metadata_cache_ttl_in_secs, repo_refresh_freshness_window_in_secs, read_only_query_max_concurrency)
         # Repo refresh
         self.repo_refresh = 'sudo apt-get -q update'
 
         # Support to get updates and their dependencies
-        self.security_sources_list = '/tmp/az-update-security.list'
-        self.prep_security_sources_list_cmd = 'sudo grep security /etc/apt/sources.list > ' + self.security_sources_list
+        self.security_updates_from_last_simulation = None   # security classification of the last dist-upgrade simulation, consumed by the next security update check
         self.dist_upgrade_simulation_cmd_template = 'LANG=en_US.UTF8 sudo apt-get -s dist-upgrade <SOURCES> '  # Dist-upgrade simulation template - <SOURCES> needs to be replaced before use; sudo is used as sometimes the sources list needs sudo to be readable
         self.single_package_check_versions = 'apt-cache madison <PACKAGE-NAME>'
         self.single_package_find_installed_dpkg = 'sudo dpkg -s <PACKAGE-NAME>'
         self.single_package_find_installed_apt = 'sudo apt list --installed <PACKAGE-NAME>'
+        self.installed_packages_query_cmd = "dpkg-query -W -f='${Package} ${Architecture} ${Version} ${Status}\\n'"
+        self.installed_packages_query_cmd_template = self.installed_packages_query_cmd + ' <PACKAGE-NAMES>'
+        self.native_architecture = None     # architecture of dpkg itself - apt names packages of other (foreign) architectures as <name>:<arch>
+        self.dpkg_status_file_path = '/var/lib/dpkg/status'     # read natively for the installed package snapshot, falling back to the query above
+        self.dpkg_status_file_signature = None                   # (inode, mtime, size) of the dpkg status file when it was last read
+        self.dpkg_status_file_failed_signature = None            # (inode, mtime, size) of the dpkg status file when it last could not be read
         self.single_package_upgrade_simulation_cmd = '''DEBIAN_FRONTEND=noninteractive apt-get -y --only-upgrade true -s install '''
         self.single_package_dependency_resolution_template = 'DEBIAN_FRONTEND=noninteractive LANG=en_US.UTF8 apt-get -y --only-upgrade true -s install <PACKAGE-NAME> '
 
@@ -45,6 +53,12 @@ class AptitudePackageManager(PackageManager):
         # --only-upgrade: upgrade only single package (only if it is installed)
         self.single_package_upgrade_cmd = '''sudo DEBIAN_FRONTEND=noninteractive apt-get -y --only-upgrade true install '''
 
+        # Download prefetch - 'apt-get download' opens the package cache read-only and takes no locks (unlike 'apt-get -d install'), so it runs alongside installs.
+        # Downloads are handed off into the archive cache, where installs use them instead of downloading (archives failing verification are downloaded again).
+        self.download_only_cmd_template = 'cd <DOWNLOAD-DIR> && sudo apt-get -q download '
+        self.download_prefetch_folder = '/var/cache/apt/prefetch'
+        self.package_archive_folder = '/var/cache/apt/archives'
+
         # Package manager exit code(s)
         self.apt_exitcode_ok = 0
 
@@ -55,6 +69,16 @@ class AptitudePackageManager(PackageManager):
         self.update_package_list_value = ""
         self.unattended_upgrade_value = ""
 
+        # Package metadata cache - repo lists, installed package state and sources/pinning
+        self.package_metadata_paths = ['/var/lib/apt/lists', '/var/lib/dpkg/status', '/etc/apt/sources.list', '/etc/apt/sources.list.d', '/etc/apt/preferences', '/etc/apt/preferences.d']
+        self.package_metadata_ignored_names = ['partial', 'lock']
+        self.repo_config_paths = ['/etc/apt/sources.list', '/etc/apt/sources.list.d']
+
+        # Read-only query concurrency - simulations (apt-get -s) and dpkg queries take no locks, but security updates are classified from the all updates simulation
+        self.concurrent_read_only_queries_supported = True
+        self.read_only_queries_contend_for_lock = False
+        self.security_updates_query_independent = False
+
         # Miscellaneous
         os.environ['DEBIAN_FRONTEND'] = 'noninteractive'  # Avoid a config prompt
         self.set_package_manager_setting(Constants.PKG_MGR_SETTING_IDENTITY, Constants.APT)
@@ -69,7 +93,7 @@ class AptitudePackageManager(PackageManager):
     def invoke_package_manager_advanced(self, command, raise_on_exception=True):
         """Get missing updates using the command input"""
         self.composite_logger.log_debug('\nInvoking package manager using: ' + command)
-        code, out = self.env_layer.run_command_output(command, False, False)
+        code, out = self.run_package_manager_command(command)
 
         if code != self.apt_exitcode_ok and self.STR_DPKG_WAS_INTERRUPTED in out:
             self.composite_logger.log_error('[ERROR] YOU NEED TO TAKE ACTION TO PROCEED. The package manager on this machine is not in a healthy state, and '
@@ -84,7 +108,7 @@ class AptitudePackageManager(PackageManager):
         elif code != self.apt_exitcode_ok:
             self.composite_logger.log('[ERROR] Package manager was invoked using: ' + command)
             self.composite_logger.log_warning(" - Return code from package manager: " + str(code))
-            self.composite_logger.log_warning(" - Output from package manager: \n|\t" + "\n|\t".join(out.splitlines()))
+            self.composite_logger.log_warning(lambda: " - Output from package manager: " + self.composite_logger.format_output(out))
             self.telemetry_writer.write_execution_error(command, code, out)
             error_msg = 'Unexpected return code (' + str(code) + ') from package manager on command: ' + command
             self.status_handler.add_error_to_status(error_msg, Constants.PatchOperationErrorCodes.PACKAGE_MANAGER_FAILURE)
@@ -94,7 +118,7 @@ class AptitudePackageManager(PackageManager):
         else:  # verbose diagnostic log
             self.composite_logger.log_verbose("\n\n==[SUCCESS]===============================================================")
             self.composite_logger.log_debug(" - Return code from package manager: " + str(code))
-            self.composite_logger.log_debug(" - Output from package manager: \n|\t" + "\n|\t".join(out.splitlines()))
+            self.composite_logger.log_debug(lambda: " - Output from package manager: " + self.composite_logger.format_output(out))
             self.composite_logger.log_verbose("==========================================================================\n\n")
         return out, code
 
@@ -105,7 +129,7 @@ class AptitudePackageManager(PackageManager):
         if code != 0:
             self.composite_logger.log('[ERROR] apt-cache was invoked using: ' + command)
             self.composite_logger.log_warning(" - Return code from apt-cache: " + str(code))
-            self.composite_logger.log_warning(" - Output from apt-cache: \n|\t" + "\n|\t".join(out.splitlines()))
+            self.composite_logger.log_warning(lambda: " - Output from apt-cache: " + self.composite_logger.format_output(out))
             error_msg = 'Unexpected return code (' + str(code) + ') from apt-cache on command: ' + command
             self.status_handler.add_error_to_status(error_msg, Constants.PatchOperationErrorCodes.PACKAGE_MANAGER_FAILURE)
             raise Exception(error_msg, "[{0}]".format(Constants.ERROR_ADDED_TO_STATUS))
@@ -113,42 +137,58 @@ class AptitudePackageManager(PackageManager):
         else:  # verbose diagnostic log
             self.composite_logger.log_verbose("\n\n==[SUCCESS]===============================================================")
             self.composite_logger.log_debug(" - Return code from apt-cache: " + str(code))
-            self.composite_logger.log_debug(" - Output from apt-cache: \n|\t" + "\n|\t".join(out.splitlines()))
+            self.composite_logger.log_debug(lambda: " - Output from apt-cache: " + self.composite_logger.format_output(out))
             self.composite_logger.log_verbose("==========================================================================\n\n")
         return out
 
     # region Classification-based (incl. All) update check
     def get_all_updates(self, cached=False):
         """Get all missing updates"""
-        self.composite_logger.log_debug("\nDiscovering all packages...")
-        if cached and not len(self.all_updates_cached) == 0:
-            self.composite_logger.log_debug(" - Returning cached package data.")
-            return self.all_updates_cached, self.all_update_versions_cached  # allows for high performance reuse in areas of the code explicitly aware of the cache
+        with self.all_updates_lock:     # concurrent queries using the cached updates wait for the discovery in progress
+            self.composite_logger.log_debug("\nDiscovering all packages...")
+            if cached and not len(self.all_updates_cached) == 0:
+                self.composite_logger.log_debug(" - Returning cached package data.")
+                return self.all_updates_cached, self.all_update_versions_cached  # allows for high performance reuse in areas of the code explicitly aware of the cache
+
+            self.all_updates_cached, self.all_update_versions_cached = self.get_updates_using_package_metadata_cache(Constants.PackageMetadataCacheUpdateType.ALL, self.__discover_all_updates)
 
+            self.composite_logger.log_debug("Discovered " + str(len(self.all_updates_cached)) + " package entries.")
+            return self.all_updates_cached, self.all_update_versions_cached
+
+    def __discover_all_updates(self):
+        """ Single dist-upgrade simulation for all updates, with security updates classified from the origin archives of the same simulation """
         cmd = self.dist_upgrade_simulation_cmd_template.replace('<SOURCES>', '')
-        out = self.invoke_package_manager(cmd)
-        self.all_updates_cached, self.all_update_versions_cached = self.extract_packages_and_versions(out)
+        output_parser = StreamingLineParser(self.simulation_output_line_parser)
+        self.invoke_package_manager(cmd, output_parser)
+        packages, package_versions, package_origins = self.get_packages_versions_and_origins(output_parser.close())
+
+        security_packages, security_package_versions = [], []
+        for index, package in enumerate(packages):
+            if self.is_security_origin(package_origins[index]):
+                security_packages.append(package)
+                security_package_versions.append(package_versions[index])
+        self.security_updates_from_last_simulation = (security_packages, security_package_versions)
 
-        self.composite_logger.log_debug("Discovered " + str(len(self.all_updates_cached)) + " package entries.")
-        return self.all_updates_cached, self.all_update_versions_cached
+        return packages, package_versions
 
     def get_security_updates(self):
         """Get missing security updates"""
         self.composite_logger.log("\nDiscovering 'security' packages...")
-        code, out = self.env_layer.run_command_output(self.prep_security_sources_list_cmd, False, False)
-        if code != 0:
-            self.composite_logger.log_warning(" - SLP:: Return code: " + str(code) + ", Output: \n|\t" + "\n|\t".join(out.splitlines()))
-            error_msg = 'Unexpected return code (' + str(code) + ') from command: ' + self.prep_security_sources_list_cmd
-            self.status_handler.add_error_to_status(error_msg, Constants.PatchOperationErrorCodes.PACKAGE_MANAGER_FAILURE)
-            raise Exception(error_msg, "[{0}]".format(Constants.ERROR_ADDED_TO_STATUS))
-
-        cmd = self.dist_upgrade_simulation_cmd_template.replace('<SOURCES>', '-oDir::Etc::Sourcelist=' + self.security_sources_list)
-        out = self.invoke_package_manager(cmd)
-        security_packages, security_package_versions = self.extract_packages_and_versions(out)
+        security_packages, security_package_versions = self.get_updates_using_package_metadata_cache(Constants.PackageMetadataCacheUpdateType.SECURITY, self.__discover_security_updates)
 
         self.composite_logger.log("Discovered " + str(len(security_packages)) + " 'security' package entries.")
         return security_packages, security_package_versions
 
+    def __discover_security_updates(self):
+        """ Reuses the classification of the simulation just done for all updates, if any, else simulates afresh (refreshing all updates as well) """
+        with self.all_updates_lock:
+            if self.security_updates_from_last_simulation is None:
+                self.all_updates_cached, self.all_update_versions_cached = self.__discover_all_updates()
+
+            security_packages, security_package_versions = self.security_updates_from_last_simulation
+            self.security_updates_from_last_simulation = None   # consumed, so a later check after installs does not see a stale classification
+            return security_packages, security_package_versions
+
     def get_other_updates(self):
         """Get missing other updates"""
         self.composite_logger.log("\nDiscovering 'other' packages...")
@@ -157,6 +197,7 @@ class AptitudePackageManager(PackageManager):
 
         all_packages, all_package_versions = self.get_all_updates(True)
         security_packages, security_package_versions = self.get_security_updates()
+        security_packages = PackageCollection(security_packages)
 
         for index, package in enumerate(all_packages):
             if package not in security_packages:
@@ -169,46 +210,91 @@ class AptitudePackageManager(PackageManager):
 
     # region Output Parser(s)
     def extract_packages_and_versions(self, output):
+        packages, versions, origins = self.extract_packages_versions_and_origins(output)
+        return packages, versions
+
+    def extract_packages_versions_and_origins(self, output):
+        return self.get_packages_versions_and_origins(StreamingLineParser.parse(output, self.simulation_output_line_parser))
+
+    def get_packages_versions_and_origins(self, records):
+        """Returns parallel package, version and origin lists from the records of simulation_output_line_parser"""
+        packages = [record[0] for record in records]
+        versions = [record[1] for record in records]
+        origins = [record[2] for record in records]
+        self.composite_logger.log_debug(" - Extracted package and version data for " + str(len([version for version in versions if version != Constants.UA_ESM_REQUIRED])) + " packages [BASIC].")
+        self.composite_logger.log_debug(" - Extracted package and version data for " + str(len(packages)) + " packages [TOTAL].")
+        return packages, versions, origins
+
+    def simulation_output_line_parser(self, records):
+        """Line parser (see StreamingLineParser) for (package, version, origins) records from upgrade simulation output"""
         # sample output format
         # Inst coreutils [8.25-2ubuntu2] (8.25-2ubuntu3~16.10 Ubuntu:16.10/yakkety-updates [amd64])
         # Inst python3-update-manager [1:16.10.7] (1:16.10.8 Ubuntu:16.10/yakkety-updates [all]) [update-manager-core:amd64 ]
         # Inst update-manager-core [1:16.10.7] (1:16.10.8 Ubuntu:16.10/yakkety-updates [all])
-
+        # Inst samba-libs [2:4.4.5+dfsg-2ubuntu5.2] (2:4.4.5+dfsg-2ubuntu5.4 Ubuntu:16.10/yakkety-updates, Ubuntu:16.10/yakkety-security [amd64])
+        # ...
+        # The following packages could receive security updates with UA Infra: ESM service enabled:
+        #   libgcab-1.0-0 libgcab-1.0-0
+        # ('origins' are the comma-separated origin archives the version is available from, or UA_ESM_REQUIRED for ESM packages)
         self.composite_logger.log_debug("\nExtracting package and version data...")
-        packages = []
-        versions = []
-
-        search_text = r'Inst[ ](.*?)[ ].*?[(](.*?)[ ](.*?)[ ]\[(.*?)\]'
-        search = re.compile(search_text, re.M | re.S)
-        package_list = search.findall(str(output))
-
-        for package in package_list:
-            packages.append(package[0])
-            versions.append(package[1])
-
-        self.composite_logger.log_debug(" - Extracted package and version data for " + str(len(packages)) + " packages [BASIC].")
-
-        # Discovering ESM packages - Distro versions with extended security maintenance
-        lines = output.strip().split('\n')
+        search = re.compile(r'Inst[ ](.*?)[ ].*?[(](.*?)[ ](.*?)[ ]\[(.*?)\]')
+        esm_records = []
         esm_marker_found = False
-        esm_packages = []
-        for line_index in range(0, len(lines)-1):
-            line = lines[line_index].strip()
 
-            if not esm_marker_found:
-                if self.ESM_MARKER in line:
-                   esm_marker_found = True
-                continue
-
-            esm_packages = line.split()
-            break
+        line = (yield)
+        while line is not None:
+            for match in search.finditer(line):
+                records.append((match.group(1), match.group(2), match.group(3)))
+
+            # Discovering ESM packages - Distro versions with extended security maintenance - listed on the line after the marker
+            if esm_marker_found:
+                esm_records = [(package, Constants.UA_ESM_REQUIRED, Constants.UA_ESM_REQUIRED) for package in line.split()]
+                esm_marker_found = None     # only the first list
+            elif esm_marker_found is False and self.ESM_MARKER in line:
+                esm_marker_found = True
+            line = (yield)
+
+        records.extend(esm_records)
+
+    def extract_installed_package_versions(self, output):
+        """Returns installed packages and versions from the output of a dpkg-query installed packages query"""
+        # Sample output format (packages that are not installed, e.g. only config-files, and 'no packages found' lines are ignored)
+        # mysql-server amd64 5.7.25-0ubuntu0.16.04.2 install ok installed
+        # mysql-client amd64 5.7.25-0ubuntu0.16.04.2 deinstall ok config-files
+        # libc6 i386 2.23-0ubuntu11 install ok installed
+        installed_packages = []
+        for line in output.strip().split('\n'):
+            package_details = line.split()
+            if len(package_details) == 6 and package_details[4] == 'ok' and package_details[5] == 'installed':
+                installed_packages.append((package_details[0], package_details[1], package_details[2]))
+                if package_details[0] == 'dpkg':
+                    self.native_architecture = package_details[1]
 
-        for package in esm_packages:
-            packages.append(package)
-            versions.append(Constants.UA_ESM_REQUIRED)
-        self.composite_logger.log_debug(" - Extracted package and version data for " + str(len(packages)) + " packages [TOTAL].")
-
-        return packages, versions
+        packages = []
+        package_versions = []
+        for package_name, package_architecture, package_version in installed_packages:
+            for package in self.get_installed_package_names(package_name, package_architecture):
+                packages.append(package)
+                package_versions.append(package_version)
+        return packages, package_versions
+
+    def get_installed_package_names(self, package_name, package_architecture):
+        """ Returns the names of an installed package as apt refers to them - qualified with the architecture (e.g. libc6:i386) if it is a foreign
+            architecture package. If the native architecture is not known, the package is known by both names. """
+        if package_architecture == 'all' or package_architecture == self.native_architecture:
+            return [package_name]
+        qualified_package_name = package_name + ':' + package_architecture
+        return [qualified_package_name] if self.native_architecture is not None else [package_name, qualified_package_name]
+
+    @staticmethod
+    def is_security_origin(origin):
+        """ True if any origin archive of an update is a security archive (e.g. Ubuntu:16.10/yakkety-security, Debian-Security:10/oldstable), or the update needs UA ESM """
+        if origin == Constants.UA_ESM_REQUIRED:
+            return True
+        for archive in origin.split(','):
+            if 'security' in archive.lower():
+                return True
+        return False
     # endregion
     # endregion
 
@@ -218,6 +304,21 @@ class AptitudePackageManager(PackageManager):
 
     def install_updates_fail_safe(self, excluded_packages):
         return
+
+    def hand_off_downloaded_packages(self):
+        """ Moves downloaded archives into the archive cache """
+        if not os.path.isdir(self.download_prefetch_folder):
+            return 0
+        handed_off_count = 0
+        for file_name in os.listdir(self.download_prefetch_folder):
+            if not file_name.endswith('.deb'):
+                continue
+            try:
+                shutil.move(os.path.join(self.download_prefetch_folder, file_name), os.path.join(self.package_archive_folder, file_name))
+                handed_off_count += 1
+            except Exception as error:
+                self.composite_logger.log_debug(" - Unable to hand off package download. [File={0}][Error={1}]".format(file_name, repr(error)))
+        return handed_off_count
     # endregion
 
     # region Package Information
@@ -240,7 +341,7 @@ class AptitudePackageManager(PackageManager):
                 self.composite_logger.log_debug(" - Applicable line: " + str(line))
                 package_versions.append(package_details[1].strip())
             else:
-                self.composite_logger.log_debug(" - Inapplicable line: " + str(line))
+                self.composite_logger.log_debug(" - Inapplicable line: {0}", line)
 
         return package_versions
 
@@ -248,6 +349,9 @@ class AptitudePackageManager(PackageManager):
         """ Returns true if the specific package version is installed """
 
         self.composite_logger.log_debug("\nCHECKING PACKAGE INSTALL STATUS FOR: " + str(package_name) + " (" + str(package_version) + ")")
+        installed = self.is_package_version_installed_in_snapshot(package_name, package_version)
+        if installed is not None:
+            return installed
 
         # DEFAULT METHOD
         self.composite_logger.log_debug(" - [1/2] Verifying install status with Dpkg.")
@@ -267,7 +371,7 @@ class AptitudePackageManager(PackageManager):
                     self.composite_logger.log_debug("    - Discovered to be not installed: " + str(line))
                     return False
                 else:
-                    self.composite_logger.log_debug("    - Inapplicable line: " + str(line))
+                    self.composite_logger.log_debug("    - Inapplicable line: {0}", line)
 
             self.telemetry_writer.write_event("[Installed check] Return code: 1. Unable to verify package not present on the system: " + str(output), Constants.TelemetryEventLevel.Verbose)
         elif code == 0:  # likely found
@@ -310,7 +414,7 @@ class AptitudePackageManager(PackageManager):
                 if composite_found_flag & 7 == 7:  # whenever this becomes true, the exact package version is installed
                     self.composite_logger.log_debug("    - Package, Version and Status matched. Package is detected as 'Installed'.")
                     return True
-                self.composite_logger.log_debug("    - Inapplicable line: " + str(line))
+                self.composite_logger.log_debug("    - Inapplicable line: {0}", line)
             self.composite_logger.log_debug("    - Install status check did NOT find the package installed: (composite_found_flag=" + str(composite_found_flag) + ")")
             self.telemetry_writer.write_event("Install status check did NOT find the package installed: (composite_found_flag=" + str(composite_found_flag) + ")(output=" + output + ")", Constants.TelemetryEventLevel.Verbose)
         else:  # This is not expected to execute. If it does, the details will show up in telemetry. Improve this code with that information.
@@ -329,7 +433,7 @@ class AptitudePackageManager(PackageManager):
         for line in lines:
             package_details = line.split(' ')
             if len(package_details) < 4:
-                self.composite_logger.log_debug("    - Inapplicable line: " + str(line))
+                self.composite_logger.log_debug("    - Inapplicable line: {0}", line)
             else:
                 self.composite_logger.log_debug("    - Applicable line: " + str(line))
                 discovered_package_name = package_details[0].split('/')[0]  # index out of bounds check is deliberately not being done
@@ -349,6 +453,71 @@ class AptitudePackageManager(PackageManager):
         self.composite_logger.log_debug("   - Package version specified was determined to NOT be installed.")
         return False
 
+    def get_installed_package_snapshot(self):
+        """ Returns installed package versions by package name read directly from the dpkg status database, re-reading it only if it changed since
+            (dpkg replaces it after every transaction). Falls back to querying dpkg if it cannot be read. """
+        dpkg_status_file_signature = None
+        try:
+            dpkg_status_file_stat = os.stat(self.env_layer.file_system.resolve_path(self.dpkg_status_file_path))
+            dpkg_status_file_signature = (dpkg_status_file_stat.st_ino, dpkg_status_file_stat.st_mtime, dpkg_status_file_stat.st_size)
+            if dpkg_status_file_signature == self.dpkg_status_file_failed_signature:
+                return super(AptitudePackageManager, self).get_installed_package_snapshot()     # not re-read until it changes
+            if dpkg_status_file_signature != self.dpkg_status_file_signature:
+                installed_package_versions = self.read_dpkg_status_file()
+                if len(installed_package_versions) == 0:
+                    raise Exception("No installed packages found in dpkg status file.")
+                self.installed_package_versions_snapshot = installed_package_versions
+                self.dpkg_status_file_signature = dpkg_status_file_signature
+            self.installed_package_snapshot_stale_packages = set()  # a changed status file is re-read, so there's nothing to refresh individually
+            return self.installed_package_versions_snapshot
+        except Exception as error:
+            if self.dpkg_status_file_signature is not None or self.installed_package_versions_snapshot is None:
+                self.composite_logger.log_debug(" - Unable to read dpkg status file. Installed packages will be queried. [Error={0}]".format(repr(error)))
+                self.installed_package_versions_snapshot = None     # not a query snapshot, so it is taken afresh
+            self.dpkg_status_file_signature = None
+            self.dpkg_status_file_failed_signature = dpkg_status_file_signature
+            return super(AptitudePackageManager, self).get_installed_package_snapshot()
+
+    def read_dpkg_status_file(self):
+        """ Streams the dpkg status file and returns the installed versions of each package """
+        # Sample paragraph (paragraphs are separated by blank lines, continuation lines start with whitespace)
+        # Package: mysql-server
+        # Status: install ok installed
+        # Priority: optional
+        # Architecture: all
+        # Version: 5.7.25-0ubuntu0.16.04.2
+        # Description: MySQL database server (metapackage depending on the latest version)
+        #  This is an empty package that depends on the current "best" version of
+        installed_packages = []
+        package_name = package_architecture = package_version = package_status = None
+        with self.env_layer.file_system.open(self.dpkg_status_file_path, 'rb') as file_handle:
+            for line in file_handle:
+                line = line.decode('utf-8', 'replace')  # descriptions and maintainers are not limited to the encoding of the locale
+                if line.startswith('Package: '):
+                    package_name = line[len('Package: '):].strip()
+                elif line.startswith('Architecture: '):
+                    package_architecture = line[len('Architecture: '):].strip()
+                elif line.startswith('Version: '):
+                    package_version = line[len('Version: '):].strip()
+                elif line.startswith('Status: '):
+                    package_status = line[len('Status: '):].split()
+                elif line.strip() == '':
+                    self.__add_installed_package(installed_packages, package_name, package_architecture, package_version, package_status)
+                    package_name = package_architecture = package_version = package_status = None
+            self.__add_installed_package(installed_packages, package_name, package_architecture, package_version, package_status)     # last paragraph
+
+        self.native_architecture = next((package_architecture for package_name, package_architecture, package_version in installed_packages if package_name == 'dpkg'), self.native_architecture)
+        installed_package_versions = {}
+        for package_name, package_architecture, package_version in installed_packages:
+            for package in self.get_installed_package_names(package_name, package_architecture):
+                installed_package_versions.setdefault(package, set()).add(package_version)
+        return installed_package_versions
+
+    @staticmethod
+    def __add_installed_package(installed_packages, package_name, package_architecture, package_version, package_status):
+        if package_name is not None and package_version is not None and package_status is not None and package_status[-2:] == ['ok', 'installed']:
+            installed_packages.append((package_name, package_architecture or 'all', package_version))
+
     def get_dependent_list(self, package_name):
         """Returns dependent List of the package"""
         cmd = self.single_package_dependency_resolution_template.replace('<PACKAGE-NAME>', package_name)
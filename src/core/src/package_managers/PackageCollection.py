@@ -0,0 +1,69 @@
+# Copyright 2020 Microsoft Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Requires Python 2.7+
+
+"""Indexed package collection"""
+import collections
+from core.src.bootstrap.Constants import Constants
+
+
+class PackageCollection(object):
+    """Ordered package name to version map with constant time lookup, for manipulating the parallel package and version lists used across package operations.
+       Package order is the order of first addition, and the first version added for a package is retained (same as list-based dedupe)."""
+
+    def __init__(self, packages=None, package_versions=None):
+        self.__package_versions = collections.OrderedDict()
+        if packages is not None:
+            self.extend(packages, package_versions)
+
+    def add(self, package, package_version=Constants.DEFAULT_UNSPECIFIED_VALUE):
+        """Adds the package if not already present. Returns True if it was added."""
+        if package in self.__package_versions:
+            return False
+        self.__package_versions[package] = package_version
+        return True
+
+    def extend(self, packages, package_versions=None):
+        """Adds packages from parallel package and version lists"""
+        if package_versions is None:
+            package_versions = [Constants.DEFAULT_UNSPECIFIED_VALUE] * len(packages)
+        for package, package_version in zip(packages, package_versions):
+            self.add(package, package_version)
+
+    def remove(self, package):
+        """Removes the package if present. Returns its version, or None if it was not present."""
+        return self.__package_versions.pop(package, None)
+
+    def get_version(self, package, default=None):
+        return self.__package_versions.get(package, default)
+
+    def get_packages(self):
+        return list(self.__package_versions.keys())
+
+    def get_package_versions(self):
+        return list(self.__package_versions.values())
+
+    def to_lists(self):
+        """Returns parallel package and version lists"""
+        return self.get_packages(), self.get_package_versions()
+
+    def __contains__(self, package):
+        return package in self.__package_versions
+
+    def __len__(self):
+        return len(self.__package_versions)
+
+    def __iter__(self):
+        return iter(self.__package_versions)
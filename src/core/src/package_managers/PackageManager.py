@@ -17,15 +17,18 @@
 """The is base package manager, which defines the package management relevant operations"""
 import json
 import os
+import threading
 from abc import ABCMeta, abstractmethod
 from core.src.bootstrap.Constants import Constants
+from core.src.package_managers.PackageCollection import PackageCollection
+from core.src.package_managers.ReadOnlyQueryPool import ReadOnlyQueryPool
 import time
 
 
 class PackageManager(object):
     """Base class of package manager"""
 
-    def __init__(self, env_layer, execution_config, composite_logger, telemetry_writer, status_handler):
+    def __init__(self, env_layer, execution_config, composite_logger, telemetry_writer, status_handler, package_metadata_cache_ttl_in_secs=Constants.PACKAGE_METADATA_CACHE_TTL_IN_SECONDS, repo_refresh_freshness_window_in_secs=Constants.REPO_REFRESH_FRESHNESS_WINDOW_IN_SECONDS, read_only_query_max_concurrency=Constants.MAX_CONCURRENT_READ_ONLY_QUERIES):
         self.env_layer = env_layer
         self.composite_logger = composite_logger
         self.telemetry_writer = telemetry_writer
@@ -39,6 +42,44 @@ class PackageManager(object):
         self.all_updates_cached = []
         self.all_update_versions_cached = []
 
+        # On-disk cache of discovered updates across core invocations, valid while the repo metadata and installed package state it was computed from are unchanged
+        self.package_metadata_cache_path = os.path.join(execution_config.config_folder, Constants.PACKAGE_METADATA_CACHE_FILE)
+        self.package_metadata_cache_ttl_in_secs = package_metadata_cache_ttl_in_secs
+        self.package_metadata_paths = []            # files and folders (walked) whose modification times fingerprint the package metadata - set by each package manager
+        self.package_metadata_ignored_names = []    # name prefixes within package_metadata_paths that change without affecting available updates (locks, partial downloads, etc.)
+
+        # Repo refresh policy - a successful refresh is reused across core invocations within the freshness window, unless the repo configuration changed
+        self.repo_refresh_state_file_path = os.path.join(execution_config.config_folder, Constants.REPO_REFRESH_STATE_FILE)
+        self.repo_refresh_freshness_window_in_secs = repo_refresh_freshness_window_in_secs
+        self.repo_config_paths = []                 # files and folders (walked) defining repos, changes to which require a refresh - set by each package manager
+        self.repo_refreshed_in_current_run = False
+
+        # Package install history - measured install durations (and sizes) of installed packages, for install time estimates
+        self.package_install_history_path = os.path.join(execution_config.config_folder, Constants.PACKAGE_INSTALL_HISTORY_FILE)
+        self.package_install_history = None         # package name -> measurements - loaded on first use
+        self.package_install_history_changed = False
+
+        # Installed package snapshot - installed package versions from one bulk query of the package database, refreshed for the packages in each transaction
+        self.installed_packages_query_cmd = None                      # lists all installed packages - set by each package manager (None if not supported)
+        self.installed_packages_query_cmd_template = None             # lists the installed versions of <PACKAGE-NAMES>, for refreshes
+        self.installed_package_versions_snapshot = None               # package name -> installed versions
+        self.installed_package_snapshot_stale_packages = set()        # packages in transactions since the snapshot was taken
+
+        # Output parser receiving the output of the package manager invocation in progress (on the current thread) as it is produced, if any
+        self.__invocation_state = threading.local()
+
+        # Read-only query concurrency - whether independent read-only queries (update simulations, package database queries) may run at the same time
+        self.read_only_query_max_concurrency = read_only_query_max_concurrency
+        self.concurrent_read_only_queries_supported = False     # capability - the backend allows concurrent readers - set by each package manager
+        self.read_only_queries_contend_for_lock = False         # capability - concurrent readers contend for the package manager lock, and wait for it instead of failing
+        self.security_updates_query_independent = False         # capability - get_security_updates does not use the results of get_all_updates, so both may run at once
+        self.all_updates_lock = threading.RLock()                # guards discovery of, and access to, all_updates_cached across queries
+        self.package_metadata_cache_lock = threading.RLock()
+
+        # Download prefetch - packages of upcoming installs are downloaded, without being installed, while earlier installs run
+        self.download_only_cmd_template = None      # downloads packages into <DOWNLOAD-DIR> without contending with installs for the package manager lock - set by each package manager (None if not supported)
+        self.download_prefetch_folder = None        # downloads are kept out of the package manager's cache until handed off between installs
+
         # auto OS updates
         self.image_default_patch_configuration_backup_path = os.path.join(execution_config.config_folder, Constants.IMAGE_DEFAULT_PATCH_CONFIGURATION_BACKUP_PATH)
 
@@ -55,15 +96,93 @@ class PackageManager(object):
         """Resynchronize the package index files from their sources."""
         pass
 
+    # region Repo refresh policy
+    def refresh_repo_if_stale(self, force_refresh=False):
+        """ Refreshes the repo unless the last successful refresh is within the freshness window and the repo configuration is unchanged since. force_refresh always refreshes. """
+        repo_config_fingerprint = self.get_paths_fingerprint(self.repo_config_paths)
+        if not force_refresh:
+            last_refresh_age_in_secs = self.__get_last_repo_refresh_age_in_secs(repo_config_fingerprint)
+            if last_refresh_age_in_secs is not None:
+                self.composite_logger.log("\nSkipping repo refresh as the local repo was refreshed recently. [LastRefreshAgeInSecs={0}][FreshnessWindowInSecs={1}]".format(str(int(last_refresh_age_in_secs)), str(self.repo_refresh_freshness_window_in_secs)))
+                return
+
+        force_reboot_before_refresh = self.force_reboot
+        self.refresh_repo()
+        if self.force_reboot and not force_reboot_before_refresh:
+            return  # refresh failure was deferred to a reboot, so it is not recorded as successful
+
+        self.repo_refreshed_in_current_run = True
+        self.__record_repo_refresh(repo_config_fingerprint)
+
+    def __get_last_repo_refresh_age_in_secs(self, repo_config_fingerprint):
+        """ Returns the age of the last successful repo refresh if it is still fresh, else None """
+        if self.repo_refresh_freshness_window_in_secs <= 0 or not os.path.isfile(self.repo_refresh_state_file_path):
+            return None
+
+        try:
+            repo_refresh_state = json.loads(self.env_layer.file_system.read_state_file(self.repo_refresh_state_file_path))
+            last_refresh = repo_refresh_state[self.__get_repo_refresh_state_key()]
+            last_refresh_age_in_secs = time.time() - last_refresh['lastRefreshTimeInSecondsSinceEpoch']
+            if last_refresh['repoConfigFingerprint'] != repo_config_fingerprint or not 0 <= last_refresh_age_in_secs < self.repo_refresh_freshness_window_in_secs:
+                return None
+            return last_refresh_age_in_secs
+        except Exception as error:
+            self.composite_logger.log_debug(" - No usable repo refresh state. [Error={0}]".format(repr(error)))
+            return None
+
+    def __record_repo_refresh(self, repo_config_fingerprint):
+        try:
+            repo_refresh_state = {}
+            if os.path.isfile(self.repo_refresh_state_file_path):
+                try:
+                    repo_refresh_state = json.loads(self.env_layer.file_system.read_state_file(self.repo_refresh_state_file_path))
+                except Exception:
+                    repo_refresh_state = {}
+
+            repo_refresh_state[self.__get_repo_refresh_state_key()] = {'lastRefreshTimeInSecondsSinceEpoch': time.time(), 'repoConfigFingerprint': repo_config_fingerprint}
+            self.env_layer.file_system.write_state_file(self.repo_refresh_state_file_path, json.dumps(repo_refresh_state), fsync=False)
+        except Exception as error:
+            self.composite_logger.log_debug(" - Unable to record repo refresh. [Error={0}]".format(repr(error)))
+
+    def __get_repo_refresh_state_key(self):
+        return str(self.get_package_manager_setting(Constants.PKG_MGR_SETTING_IDENTITY, type(self).__name__))
+    # endregion
+
     # region Get Available Updates
     @abstractmethod
     def invoke_package_manager_advanced(self, command, raise_on_exception=True):
         pass
 
-    def invoke_package_manager(self, command):
-        out, code = self.invoke_package_manager_advanced(command, raise_on_exception=True)
+    def invoke_package_manager(self, command, output_parser=None):
+        """Invokes the package manager. If an output parser (StreamingLineParser) is given, output is parsed as it is produced - records are then returned by its close()."""
+        previous_output_parser, self.active_output_parser = self.active_output_parser, output_parser     # invocations may nest (e.g. repo service refreshes)
+        try:
+            out, code = self.invoke_package_manager_advanced(command, raise_on_exception=True)
+        finally:
+            self.active_output_parser = previous_output_parser
         return out
 
+    @property
+    def active_output_parser(self):
+        return getattr(self.__invocation_state, 'output_parser', None)
+
+    @active_output_parser.setter
+    def active_output_parser(self, output_parser):
+        self.__invocation_state.output_parser = output_parser
+
+    def run_package_manager_command(self, command):
+        """Runs a package manager command for invoke_package_manager_advanced, streaming its output into the active output parser, if any.
+           The parser is reset on each run, so it ends up with the output of the last attempt if a command is retried."""
+        output_parser = self.active_output_parser
+        if output_parser is None:
+            return self.env_layer.run_command_output(command, False, False)
+
+        output_parser.reset()
+        code, out = self.env_layer.run_command_output(command, False, False, output_handler=output_parser.feed)
+        if not output_parser.fed and out:
+            output_parser.feed(out)     # command runners not streaming output
+        return code, out
+
     def get_available_updates(self, package_filter):
         """Returns List of all installed packages with available updates."""
         class_packages, class_versions = self.get_updates_for_classification(package_filter)
@@ -107,6 +226,193 @@ class PackageManager(object):
         pass
     # endregion
 
+    # region Package metadata cache
+    def get_updates_using_package_metadata_cache(self, update_type, discover_updates):
+        """ Returns the updates of the given type (Constants.PackageMetadataCacheUpdateType) from the package metadata cache if the package metadata is unchanged
+            since they were cached and they are within TTL. Otherwise, discovers them with discover_updates() and caches them. """
+        fingerprint = self.get_package_metadata_fingerprint()
+        packages, package_versions = self.__read_package_metadata_cache(update_type, fingerprint)
+        if packages is not None:
+            self.composite_logger.log_debug(" - Returning '{0}' updates from package metadata cache. [Count={1}]".format(str(update_type), str(len(packages))))
+            return packages, package_versions
+
+        packages, package_versions = discover_updates()
+
+        # only cache results if the package metadata did not change while they were being discovered, as they may not match either fingerprint otherwise
+        if fingerprint is not None and fingerprint == self.get_package_metadata_fingerprint():
+            with self.package_metadata_cache_lock:    # read-modify-write of entries for all update types
+                self.__write_package_metadata_cache(update_type, fingerprint, packages, package_versions)
+        return packages, package_versions
+
+    def get_package_metadata_fingerprint(self):
+        """ Returns a fingerprint of the package metadata, or None if caching is not possible. """
+        if self.package_metadata_cache_ttl_in_secs <= 0:
+            return None
+        return self.get_paths_fingerprint(self.package_metadata_paths)
+
+    def get_paths_fingerprint(self, paths):
+        """ Returns a fingerprint of the given files and folders (latest modification time and entry count of each), or None if there are none. """
+        if len(paths) == 0:
+            return None
+
+        fingerprint = [str(self.get_package_manager_setting(Constants.PKG_MGR_SETTING_IDENTITY, type(self).__name__))]
+        for path in paths:
+            if not os.path.exists(path):
+                fingerprint.append("{0}:-".format(path))
+                continue
+
+            latest_mtime, entry_count = os.path.getmtime(path), 0
+            for root, dir_names, file_names in os.walk(path):
+                dir_names[:] = [dir_name for dir_name in dir_names if not self.__is_ignored_package_metadata_name(dir_name)]
+                for name in dir_names + file_names:
+                    if self.__is_ignored_package_metadata_name(name):
+                        continue
+                    try:
+                        latest_mtime = max(latest_mtime, os.path.getmtime(os.path.join(root, name)))
+                        entry_count += 1
+                    except OSError:
+                        continue    # removed while walking
+            fingerprint.append("{0}:{1}:{2}".format(path, repr(latest_mtime), str(entry_count)))
+        return "|".join(fingerprint)
+
+    def __is_ignored_package_metadata_name(self, name):
+        for ignored_name in self.package_metadata_ignored_names:
+            if name.startswith(ignored_name):
+                return True
+        return False
+
+    def __read_package_metadata_cache(self, update_type, fingerprint):
+        """ Returns cached packages and versions if there's a valid cache entry for the fingerprint, else None, None """
+        if fingerprint is None or not os.path.isfile(self.package_metadata_cache_path):
+            return None, None
+
+        try:
+            package_metadata_cache = json.loads(self.env_layer.file_system.read_state_file(self.package_metadata_cache_path))
+            cache_age_in_secs = time.time() - package_metadata_cache['cachedTimeInSecondsSinceEpoch']
+            if package_metadata_cache['fingerprint'] != fingerprint or not 0 <= cache_age_in_secs < self.package_metadata_cache_ttl_in_secs or update_type not in package_metadata_cache['updates']:
+                self.composite_logger.log_debug(" - Package metadata cache is not valid for '{0}' updates. [CacheAgeInSecs={1}]".format(str(update_type), str(int(cache_age_in_secs))))
+                return None, None
+            cached_updates = package_metadata_cache['updates'][update_type]
+            return cached_updates['packages'], cached_updates['versions']
+        except Exception as error:
+            self.composite_logger.log_debug(" - Unable to read package metadata cache. [Error={0}]".format(repr(error)))
+            return None, None
+
+    def __write_package_metadata_cache(self, update_type, fingerprint, packages, package_versions):
+        """ Caches packages and versions for the fingerprint. Entries cached for any other fingerprint are discarded. """
+        try:
+            package_metadata_cache = None
+            if os.path.isfile(self.package_metadata_cache_path):
+                try:
+                    package_metadata_cache = json.loads(self.env_layer.file_system.read_state_file(self.package_metadata_cache_path))
+                    if package_metadata_cache['fingerprint'] != fingerprint:
+                        package_metadata_cache = None
+                except Exception:
+                    package_metadata_cache = None
+
+            if package_metadata_cache is None:
+                package_metadata_cache = {'fingerprint': fingerprint, 'cachedTimeInSecondsSinceEpoch': time.time(), 'updates': {}}
+            package_metadata_cache['updates'][update_type] = {'packages': list(packages), 'versions': list(package_versions)}
+
+            self.env_layer.file_system.write_state_file(self.package_metadata_cache_path, json.dumps(package_metadata_cache), fsync=False)
+        except Exception as error:
+            self.composite_logger.log_debug(" - Unable to write package metadata cache. [Error={0}]".format(repr(error)))
+    # endregion
+
+    # region Package install history
+    def record_package_install(self, package_name, install_duration_in_secs, package_size=Constants.UNKNOWN_PACKAGE_SIZE):
+        """ Records the measured install duration (and size, if known) of an installed package. Durations are smoothed across installs. """
+        package_install_history = self.get_package_install_history()
+        measurements = package_install_history.get(package_name)
+        if measurements is None:
+            measurements = package_install_history[package_name] = {'installDurationInSecs': round(float(install_duration_in_secs), 2), 'installCount': 0, 'packageSize': Constants.UNKNOWN_PACKAGE_SIZE}
+        else:
+            smoothing_factor = Constants.PACKAGE_INSTALL_DURATION_SMOOTHING_FACTOR
+            measurements['installDurationInSecs'] = round(smoothing_factor * install_duration_in_secs + (1 - smoothing_factor) * measurements['installDurationInSecs'], 2)
+        measurements['installCount'] += 1
+        if package_size != Constants.UNKNOWN_PACKAGE_SIZE:
+            measurements['packageSize'] = str(package_size)
+        measurements['lastInstallTimeInSecondsSinceEpoch'] = int(time.time())
+        self.package_install_history_changed = True
+
+    def get_expected_package_install_time_in_minutes(self, package_name):
+        """ Expected install time of a package (+ dependencies) - its measured install duration with headroom, or the expected maximum install time without install history """
+        measurements = self.get_package_install_history().get(package_name)
+        if measurements is None:
+            return Constants.PACKAGE_INSTALL_EXPECTED_MAX_TIME_IN_MINUTES
+        return max(Constants.PACKAGE_INSTALL_EXPECTED_MIN_TIME_IN_MINUTES, measurements['installDurationInSecs'] * Constants.PACKAGE_INSTALL_EXPECTED_TIME_SAFETY_FACTOR / 60.0)
+
+    def get_package_install_history(self):
+        """ Returns measurements by package name, loading them on first use """
+        if self.package_install_history is None:
+            self.package_install_history = {}
+            if os.path.isfile(self.package_install_history_path):
+                try:
+                    self.package_install_history = json.loads(self.env_layer.file_system.read_state_file(self.package_install_history_path))['packages']
+                except Exception as error:
+                    self.composite_logger.log_debug(" - Unable to read package install history. [Error={0}]".format(repr(error)))
+        return self.package_install_history
+
+    def save_package_install_history(self):
+        """ Persists install history recorded since the last save. The least recently installed packages are dropped beyond the maximum package count. """
+        if not self.package_install_history_changed:
+            return
+
+        package_install_history = self.package_install_history
+        if len(package_install_history) > Constants.PACKAGE_INSTALL_HISTORY_MAX_PACKAGES:
+            for package_name in sorted(package_install_history, key=lambda name: package_install_history[name]['lastInstallTimeInSecondsSinceEpoch'])[:len(package_install_history) - Constants.PACKAGE_INSTALL_HISTORY_MAX_PACKAGES]:
+                del package_install_history[package_name]
+
+        try:
+            self.env_layer.file_system.write_state_file(self.package_install_history_path, json.dumps({'packages': package_install_history}), fsync=False)
+            self.package_install_history_changed = False
+        except Exception as error:
+            self.composite_logger.log_debug(" - Unable to write package install history. [Error={0}]".format(repr(error)))
+    # endregion
+
+    # region Read-only query concurrency
+    def new_read_only_query_pool(self):
+        """ Returns a pool for independent read-only queries. Queries run concurrently only if the backend supports concurrent readers, and commands are
+            neither recorded nor emulated (which needs a deterministic command order). Readers that contend for the package manager lock would only
+            wait on each other, so their queries run one at a time on a single worker - still overlapping with the work of the caller. """
+        max_workers = 0
+        if self.concurrent_read_only_queries_supported and self.read_only_query_max_concurrency > 1 and self.env_layer.concurrent_commands_supported:
+            max_workers = 1 if self.read_only_queries_contend_for_lock else self.read_only_query_max_concurrency
+        return ReadOnlyQueryPool(max_workers, self.composite_logger)
+    # endregion
+
+    # region Download prefetch
+    def is_download_prefetch_supported(self):
+        """ Downloads are prefetched only if the backend can download without contending with installs, and commands are neither recorded nor emulated """
+        return self.download_only_cmd_template is not None and self.download_prefetch_folder is not None and self.env_layer.concurrent_commands_supported
+
+    def download_packages(self, packages, package_versions, timeout_in_secs=None):
+        """ Downloads packages into the download prefetch folder without installing them. Returns True if the download succeeded. """
+        if not os.path.exists(self.download_prefetch_folder):
+            os.makedirs(self.download_prefetch_folder)
+        cmd = self.get_install_command(self.download_only_cmd_template.replace('<DOWNLOAD-DIR>', self.download_prefetch_folder), packages, package_versions)
+        code, out = self.env_layer.run_command_output(cmd, False, False, timeout_in_secs=timeout_in_secs)
+        self.composite_logger.log_debug(" - Prefetched package downloads. [Packages={0}][Code={1}]", packages, code)
+        return code == 0
+
+    def hand_off_downloaded_packages(self):
+        """ Moves completed downloads from the download prefetch folder into the package manager's cache, where the next install finds them.
+            Returns the number of packages handed off. """
+        return 0
+
+    def discard_downloaded_packages(self):
+        """ Removes any downloads from the download prefetch folder """
+        if self.download_prefetch_folder is None or not os.path.isdir(self.download_prefetch_folder):
+            return
+        for file_name in os.listdir(self.download_prefetch_folder):
+            file_path = os.path.join(self.download_prefetch_folder, file_name)
+            try:
+                if os.path.isfile(file_path):
+                    os.remove(file_path)
+            except Exception as error:
+                self.composite_logger.log_debug(" - Unable to discard package download. [File={0}][Error={1}]".format(file_path, repr(error)))
+    # endregion
+
     def get_updates_for_inclusions(self, package_filter):
         """Get missing updates for inclusions"""
         self.composite_logger.log_debug("Checking for inclusions...")
@@ -158,17 +464,7 @@ class PackageManager(object):
     @staticmethod
     def dedupe_update_packages(packages, package_versions):
         """Remove duplicate packages and returns"""
-        deduped_packages = []
-        deduped_package_versions = []
-
-        for index, package in enumerate(packages):
-            if package in deduped_packages:
-                continue  # Already included
-
-            deduped_packages.append(package)
-            deduped_package_versions.append(package_versions[index])
-
-        return deduped_packages, deduped_package_versions
+        return PackageCollection(packages, package_versions).to_lists()
     # endregion
 
     # region Install Update
@@ -213,6 +509,7 @@ class PackageManager(object):
 
         self.composite_logger.log_debug("UPDATING PACKAGE (WITH DEPENDENCIES) USING COMMAND: " + exec_cmd)
         out, code = self.invoke_package_manager_advanced(exec_cmd, raise_on_exception=False)
+        self.mark_installed_package_snapshot_stale(package_and_dependencies)
         package_size = self.get_package_size(out)
         self.composite_logger.log_debug("\n<PackageInstallOutput>\n" + out + "\n</PackageInstallOutput>")  # wrapping multi-line for readability
 
@@ -268,6 +565,9 @@ class PackageManager(object):
                 code_path += " > Info, Package installed, zero return. (succeeded)"
 
         if not simulate:
+            if install_result == Constants.INSTALLED:
+                self.record_package_install(package_and_dependencies[0], time.time() - start_time, package_size)
+
             if install_result == Constants.FAILED:
                 error = self.telemetry_writer.write_package_info(package_and_dependencies[0], package_and_dependency_versions[0], package_size, round(time.time() - start_time, 2), install_result, code_path, exec_cmd, str(out))
             else:
@@ -277,6 +577,43 @@ class PackageManager(object):
                 self.composite_logger.log_debug('\nEXCEPTION writing package telemetry: ' + repr(error))
 
         return install_result
+
+    def install_update_and_dependencies_batch(self, package_and_dependencies_batch, package_and_dependency_versions_batch, simulate=False):
+        """Install multiple packages along with their dependencies (explicitly) in a single package manager transaction.
+           Returns install results aligned with the batch: INSTALLED if the parent package was verified to be installed, None otherwise (inconclusive)."""
+        start_time = time.time()
+        install_results = [None] * len(package_and_dependencies_batch)
+
+        all_packages = []
+        all_package_versions = []
+        for package_and_dependencies, package_and_dependency_versions in zip(package_and_dependencies_batch, package_and_dependency_versions_batch):
+            all_packages += package_and_dependencies
+            all_package_versions += package_and_dependency_versions
+        all_packages, all_package_versions = self.dedupe_update_packages(all_packages, all_package_versions)
+
+        cmd = self.single_package_upgrade_cmd if simulate is False else self.single_package_upgrade_simulation_cmd
+        exec_cmd = str(self.get_install_command(cmd, all_packages, all_package_versions))
+
+        self.composite_logger.log_debug("UPDATING PACKAGE BATCH (WITH DEPENDENCIES) USING COMMAND: " + exec_cmd)
+        out, code = self.invoke_package_manager_advanced(exec_cmd, raise_on_exception=False)
+        self.mark_installed_package_snapshot_stale(all_packages)
+        self.composite_logger.log_debug("\n<PackageInstallOutput>\n" + out + "\n</PackageInstallOutput>")  # wrapping multi-line for readability
+
+        install_duration = round((time.time() - start_time) / len(package_and_dependencies_batch), 2)   # transaction time is shared evenly by the parent packages
+        for index, (package_and_dependencies, package_and_dependency_versions) in enumerate(zip(package_and_dependencies_batch, package_and_dependency_versions_batch)):
+            if not self.is_package_version_installed(package_and_dependencies[0], package_and_dependency_versions[0]):
+                continue
+
+            install_results[index] = Constants.INSTALLED
+            if not simulate:
+                self.record_package_install(package_and_dependencies[0], install_duration)
+                code_path = "| Install > Batch transaction, package installed, return code: {0}. (succeeded)".format(str(code))
+                error = self.telemetry_writer.write_package_info(package_and_dependencies[0], package_and_dependency_versions[0], Constants.UNKNOWN_PACKAGE_SIZE, install_duration, Constants.INSTALLED, code_path, exec_cmd)
+                if error is not None:
+                    self.composite_logger.log_debug('\nEXCEPTION writing package telemetry: ' + repr(error))
+
+        self.composite_logger.log_debug(" - Batch transaction verified {0} out of {1} parent package(s) as installed. [ReturnCode={2}]".format(str(install_results.count(Constants.INSTALLED)), str(len(install_results)), str(code)))
+        return install_results
     # endregion
 
     # region Package Information
@@ -291,11 +628,61 @@ class PackageManager(object):
         """ Returns true if the specific package version is installed """
         pass
 
+    def extract_installed_package_versions(self, output):
+        """ Returns installed packages and versions from the output of an installed packages query. The rpm queries of yum and zypper are
+            formatted to output one '<package> <version>' line per package - package managers with other query output override this. """
+        # Sample output format ('package ... is not installed' lines are ignored)
+        # kernel.x86_64 3.10.0-514.el7
+        packages = []
+        package_versions = []
+        for line in output.strip().split('\n'):
+            package_details = line.split()
+            if len(package_details) == 2:
+                packages.append(package_details[0])
+                package_versions.append(package_details[1])
+        return packages, package_versions
+
     @abstractmethod
     def get_dependent_list(self, package_name):
         """Retrieve available updates. Expect an array being returned"""
         pass
 
+    def get_dependent_lists(self, packages, package_versions=None, is_attribution_required=None):
+        """Returns a map of package -> dependent list for a set of packages, resolved with a single simulation of the whole set.
+           Package managers do not attribute dependencies to the requesting package in a combined simulation, so the combined result is only split
+           when no dependency outside of the set needs attribution (by default: other pending updates) and no requested version is pinned below the latest.
+           Packages missing from the returned map need to be resolved individually (get_dependent_list) by the caller."""
+        dependent_lists = {}
+        if len(packages) == 0:
+            return dependent_lists
+
+        self.composite_logger.log_debug("\nResolving dependencies for " + str(len(packages)) + " package(s) using a single simulation...")
+        try:
+            combined_dependent_list = self.get_dependent_list(' '.join(packages))   # one solver run for the whole set
+        except Exception as error:
+            self.composite_logger.log_warning(" - Combined dependency resolution failed. Packages will be resolved individually. [Error={0}]".format(repr(error)))
+            return dependent_lists
+
+        all_packages, all_package_versions = self.get_all_updates(True)  # cached is fine
+        latest_versions = dict(zip(all_packages, all_package_versions))
+        if is_attribution_required is None:
+            is_attribution_required = lambda dependency: dependency in latest_versions
+
+        requested_packages = set(packages)
+        out_of_set_dependencies = [dependency for dependency in combined_dependent_list if dependency not in requested_packages and is_attribution_required(dependency)]
+        pinned_packages = [] if package_versions is None else [package for package, version in zip(packages, package_versions)
+                                                                if version != Constants.DEFAULT_UNSPECIFIED_VALUE and package in latest_versions and version != latest_versions[package]]
+
+        if len(out_of_set_dependencies) != 0 or len(pinned_packages) != 0:
+            self.composite_logger.log_debug(" - Packages will be resolved individually as attribution is required. [OutOfSetDependencies={0}][PinnedPackages={1}]".format(str(len(out_of_set_dependencies)), str(len(pinned_packages))))
+            return dependent_lists
+
+        # dependencies within the set get installed (at the same, latest version) in their own turn, so no explicit attribution is needed
+        self.composite_logger.log_debug(" - No dependency outside of the set requires attribution. Individual resolution is not required.")
+        for package in packages:
+            dependent_lists[package] = []
+        return dependent_lists
+
     @abstractmethod
     def get_product_name(self, package_name):
         """Retrieve package name """
@@ -307,6 +694,60 @@ class PackageManager(object):
         pass
     # endregion
 
+    # region Installed package snapshot
+    def is_package_version_installed_in_snapshot(self, package_name, package_version):
+        """ Returns true/false if the specific package version is installed as per the installed package snapshot, or None if no snapshot is available """
+        installed_package_versions = self.get_installed_package_snapshot()
+        if installed_package_versions is None:
+            return None
+
+        installed = package_version in installed_package_versions.get(package_name, ())
+        self.composite_logger.log_debug(" - Package version is {0}installed as per installed package snapshot.".format("" if installed else "NOT "))
+        return installed
+
+    def get_installed_package_snapshot(self):
+        """ Returns the installed package versions by package name, taking the snapshot if not already taken and refreshing stale packages. None if not available. """
+        if self.installed_packages_query_cmd is None:
+            return None
+
+        if self.installed_package_versions_snapshot is None:
+            self.installed_package_versions_snapshot = self.__query_installed_package_versions(self.installed_packages_query_cmd)
+            self.installed_package_snapshot_stale_packages = set()
+            if self.installed_package_versions_snapshot is not None and len(self.installed_package_versions_snapshot) == 0:
+                self.installed_package_versions_snapshot = None     # no package database returns nothing installed, so the query is not usable
+                self.installed_packages_query_cmd = None
+                self.composite_logger.log_debug(" - Installed package snapshot is not available. Package install status will be checked individually.")
+        elif len(self.installed_package_snapshot_stale_packages) != 0:
+            stale_packages = sorted(self.installed_package_snapshot_stale_packages)
+            refreshed_package_versions = self.__query_installed_package_versions(self.installed_packages_query_cmd_template.replace('<PACKAGE-NAMES>', ' '.join(stale_packages)))
+            if refreshed_package_versions is None:
+                self.installed_package_versions_snapshot = None
+                return self.get_installed_package_snapshot()     # full snapshot as a fallback
+            for package in stale_packages:
+                self.installed_package_versions_snapshot.pop(package, None)
+            self.installed_package_versions_snapshot.update(refreshed_package_versions)
+            self.installed_package_snapshot_stale_packages = set()
+
+        return self.installed_package_versions_snapshot
+
+    def mark_installed_package_snapshot_stale(self, packages):
+        """ Marks packages whose installed versions may have changed (e.g. as part of a transaction), so the snapshot refreshes them before its next use """
+        if self.installed_package_versions_snapshot is not None:
+            self.installed_package_snapshot_stale_packages.update(packages)
+
+    def __query_installed_package_versions(self, cmd):
+        code, out = self.env_layer.run_command_output(cmd, False, False)
+        packages, package_versions = self.extract_installed_package_versions(out)
+        if code != 0 and len(packages) == 0:   # a non-zero code is also returned if some of the queried packages are not installed
+            self.composite_logger.log_debug(" - Installed packages query failed. [Code={0}][Command={1}]".format(str(code), cmd))
+            return None
+
+        installed_package_versions = {}
+        for package, package_version in zip(packages, package_versions):
+            installed_package_versions.setdefault(package, set()).add(package_version)
+        return installed_package_versions
+    # endregion
+
     # region Package Manager Settings
     def get_package_manager_setting(self, setting_key, default_value='d5414abb-62f9-40e3-96e1-d579f85a79ba'):
         # type: (str, object) -> "" # type hinting to remove a warning
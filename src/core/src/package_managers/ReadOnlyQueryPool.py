@@ -0,0 +1,97 @@
+# Copyright 2020 Microsoft Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Requires Python 2.7+
+
+"""Read-only query pool"""
+import collections
+import threading
+
+
+class ReadOnlyQueryPool(object):
+    """Runs independent read-only package manager queries (e.g. update discovery) on a small pool of worker threads, so they overlap with each other
+       and with the work of the caller, such as status and telemetry persistence. With no workers, queries run inline on submission."""
+
+    def __init__(self, max_workers, composite_logger):
+        self.max_workers = max_workers
+        self.composite_logger = composite_logger
+        self.__pending_queries = collections.deque()
+        self.__condition = threading.Condition()
+        self.__workers = []
+        self.__idle_worker_count = 0
+        self.__shut_down = False
+
+    def submit(self, query, *args):
+        """Starts the query (a callable) and returns its QueryResult"""
+        query_result = ReadOnlyQueryPool.QueryResult(getattr(query, '__name__', str(query)))
+        if self.max_workers <= 0:
+            query_result.run(query, args)
+            return query_result
+
+        with self.__condition:
+            if self.__shut_down:
+                raise Exception("Read-only query submitted after pool shut down. [Query={0}]".format(query_result.name))
+            self.__pending_queries.append((query_result, query, args))
+            if self.__idle_worker_count == 0 and len(self.__workers) < self.max_workers:
+                worker = threading.Thread(target=self.__worker_loop, name="ReadOnlyQueryWorker{0}".format(str(len(self.__workers))))
+                worker.daemon = True    # never holds up termination - queries are read-only
+                self.__workers.append(worker)
+                worker.start()
+            else:
+                self.__condition.notify()
+        self.composite_logger.log_debug(" - Started read-only query. [Query={0}][Workers={1}]".format(query_result.name, str(len(self.__workers))))
+        return query_result
+
+    def shutdown(self):
+        """Lets workers exit once pending queries are done, and waits for them (e.g. so that queries of a failed attempt don't overlap with a retry)"""
+        with self.__condition:
+            self.__shut_down = True
+            self.__condition.notify_all()
+        for worker in self.__workers:
+            worker.join()
+
+    def __worker_loop(self):
+        while True:
+            with self.__condition:
+                while len(self.__pending_queries) == 0 and not self.__shut_down:
+                    self.__idle_worker_count += 1
+                    self.__condition.wait()
+                    self.__idle_worker_count -= 1
+                if len(self.__pending_queries) == 0:
+                    return
+                query_result, query, args = self.__pending_queries.popleft()
+            query_result.run(query, args)
+
+    class QueryResult(object):
+        """Result of a submitted query. result() waits for the query and returns its return value, or raises the exception it raised."""
+
+        def __init__(self, name):
+            self.name = name
+            self.__done = threading.Event()
+            self.__value = None
+            self.__error = None
+
+        def run(self, query, args):
+            try:
+                self.__value = query(*args)
+            except Exception as error:
+                self.__error = error
+            finally:
+                self.__done.set()
+
+        def result(self):
+            self.__done.wait()
+            if self.__error is not None:
+                raise self.__error
+            return self.__value
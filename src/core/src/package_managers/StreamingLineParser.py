@@ -0,0 +1,71 @@
+# Copyright 2020 Microsoft Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Requires Python 2.7+
+
+"""Streaming line parser"""
+
+
+class StreamingLineParser(object):
+    """Feeds command output, as it is produced, line by line into a generator-based line parser.
+       A line parser is a generator function taking a records list, which receives each line through 'line = (yield)' and appends parsed records to the list.
+       State across lines (e.g. section markers, or a held back line that may continue on the next one) is plain generator state. At the end of the output,
+       the line parser receives None in place of a line, to flush any held back state."""
+
+    def __init__(self, line_parser):
+        self.line_parser = line_parser
+        self.records = None
+        self.fed = False
+        self.__parser = None
+        self.__partial_line = ''
+        self.reset()
+
+    def reset(self):
+        """Discards everything parsed so far, e.g. for output of an attempt that is going to be retried"""
+        if self.__parser is not None:
+            self.__parser.close()
+        self.records = []
+        self.fed = False
+        self.__partial_line = ''
+        self.__parser = self.line_parser(self.records)
+        next(self.__parser)     # run to the first (yield)
+
+    def feed(self, text):
+        """Parses all lines completed by the text. Incomplete trailing text is held until the next feed or close."""
+        if not text:
+            return
+        self.fed = True
+        lines = (self.__partial_line + text).split('\n')
+        self.__partial_line = lines.pop()
+        for line in lines:
+            self.__parser.send(line)
+
+    def close(self):
+        """Parses any remaining text, ends the line parser and returns the parsed records"""
+        if self.__partial_line:
+            self.__parser.send(self.__partial_line)
+            self.__partial_line = ''
+        try:
+            self.__parser.send(None)
+        except StopIteration:
+            pass
+        self.__parser.close()
+        return self.records
+
+    @staticmethod
+    def parse(output, line_parser):
+        """Parses complete output with the line parser"""
+        parser = StreamingLineParser(line_parser)
+        parser.feed(output)
+        return parser.close()
@@ -17,15 +17,17 @@
 """YumPackageManager for Redhat and CentOS"""
 import json
 import re
+from core.src.package_managers.PackageCollection import PackageCollection
 from core.src.package_managers.PackageManager import PackageManager
+from core.src.package_managers.StreamingLineParser import StreamingLineParser
 from core.src.bootstrap.Constants import Constants
 
 
 class YumPackageManager(PackageManager):
     """Implementation of Redhat/CentOS package management operations"""
 
-    def __init__(self, env_layer, execution_config, composite_logger, telemetry_writer, status_handler):
-        super(YumPackageManager, self).__init__(env_layer, execution_config, composite_logger, telemetry_writer, status_handler)
+    def __init__(self, env_layer, execution_config, composite_logger, telemetry_writer, status_handler, package_metadata_cache_ttl_in_secs=Constants.PACKAGE_METADATA_CACHE_TTL_IN_SECONDS, repo_refresh_freshness_window_in_secs=Constants.REPO_REFRESH_FRESHNESS_WINDOW_IN_SECONDS, read_only_query_max_concurrency=Constants.MAX_CONCURRENT_READ_ONLY_QUERIES):
+        super(YumPackageManager, self).__init__(env_layer, execution_config, composite_logger, telemetry_writer, status_handler, package_metadata_cache_ttl_in_secs, repo_refresh_freshness_window_in_secs, read_only_query_max_concurrency)
         # Repo refresh
         # There is no command as this is a no op.
 
@@ -35,12 +37,27 @@ class YumPackageManager(PackageManager):
         self.yum_check_security = 'sudo yum -q --security check-update'
         self.single_package_check_versions = 'sudo yum list available <PACKAGE-NAME> --showduplicates'
         self.single_package_check_installed = 'sudo yum list installed <PACKAGE-NAME>'
+        self.installed_packages_query_cmd = "rpm -qa --qf '%{NAME}.%{ARCH} %|EPOCH?{%{EPOCH}:}:{}|%{VERSION}-%{RELEASE}\\n'"
+        self.installed_packages_query_cmd_template = "rpm -q --qf '%{NAME}.%{ARCH} %|EPOCH?{%{EPOCH}:}:{}|%{VERSION}-%{RELEASE}\\n' <PACKAGE-NAMES>"
         self.single_package_upgrade_simulation_cmd = 'LANG=en_US.UTF8 sudo yum install --assumeno '
 
         # Install update
         self.single_package_upgrade_cmd = 'sudo yum -y install '
         self.all_but_excluded_upgrade_cmd = 'sudo yum -y update --exclude='
 
+        # Package metadata cache - repo metadata caches (yum/dnf), installed package state (rpmdb) and repo configuration
+        self.package_metadata_paths = ['/var/cache/yum', '/var/cache/dnf', '/var/lib/rpm', '/etc/yum.repos.d']
+        self.package_metadata_ignored_names = ['__db', '.rpm.lock', 'timedhosts', 'packages', 'expired_repos.json']
+        self.repo_config_paths = ['/etc/yum.repos.d']
+
+        # Read-only query concurrency - rpm queries take no locks, and yum/dnf readers wait on the package manager lock (yum waits for it by default)
+        self.concurrent_read_only_queries_supported = True
+        self.read_only_queries_contend_for_lock = True
+        self.security_updates_query_independent = True
+
+        # Download prefetch - not supported, as 'yum --downloadonly' holds the yum lock throughout, which would hold up installs instead of overlapping with them
+        self.download_only_cmd_template = None
+
         # Package manager exit code(s)
         self.yum_exitcode_no_applicable_packages = 0
         self.yum_exitcode_ok = 1
@@ -103,14 +120,14 @@ class YumPackageManager(PackageManager):
     def invoke_package_manager_advanced(self, command, raise_on_exception=True):
         """Get missing updates using the command input"""
         self.composite_logger.log_debug('\nInvoking package manager using: ' + command)
-        code, out = self.env_layer.run_command_output(command, False, False)
+        code, out = self.run_package_manager_command(command)
 
         code, out = self.try_mitigate_issues_if_any(command, code, out)
 
         if code not in [self.yum_exitcode_ok, self.yum_exitcode_no_applicable_packages, self.yum_exitcode_updates_available]:
             self.composite_logger.log('[ERROR] Package manager was invoked using: ' + command)
             self.composite_logger.log_warning(" - Return code from package manager: " + str(code))
-            self.composite_logger.log_warning(" - Output from package manager: \n|\t" + "\n|\t".join(out.splitlines()))
+            self.composite_logger.log_warning(lambda: " - Output from package manager: " + self.composite_logger.format_output(out))
             self.telemetry_writer.write_execution_error(command, code, out)
             error_msg = 'Unexpected return code (' + str(code) + ') from package manager on command: ' + command
             self.status_handler.add_error_to_status(error_msg, Constants.PatchOperationErrorCodes.PACKAGE_MANAGER_FAILURE)
@@ -120,29 +137,32 @@ class YumPackageManager(PackageManager):
         else:  # verbose diagnostic log
             self.composite_logger.log_verbose("\n\n==[SUCCESS]===============================================================")
             self.composite_logger.log_debug(" - Return code from package manager: " + str(code))
-            self.composite_logger.log_debug(" - Output from package manager: \n|\t" + "\n|\t".join(out.splitlines()))
+            self.composite_logger.log_debug(lambda: " - Output from package manager: " + self.composite_logger.format_output(out))
             self.composite_logger.log_verbose("==========================================================================\n\n")
         return out, code
 
     # region Classification-based (incl. All) update check
     def get_all_updates(self, cached=False):
         """Get all missing updates"""
-        self.composite_logger.log_debug("\nDiscovering all packages...")
-        if cached and not len(self.all_updates_cached) == 0:
-            self.composite_logger.log_debug(" - Returning cached package data.")
-            return self.all_updates_cached, self.all_update_versions_cached  # allows for high performance reuse in areas of the code explicitly aware of the cache
+        with self.all_updates_lock:     # concurrent queries using the cached updates wait for the discovery in progress
+            self.composite_logger.log_debug("\nDiscovering all packages...")
+            if cached and not len(self.all_updates_cached) == 0:
+                self.composite_logger.log_debug(" - Returning cached package data.")
+                return self.all_updates_cached, self.all_update_versions_cached  # allows for high performance reuse in areas of the code explicitly aware of the cache
 
-        out = self.invoke_package_manager(self.yum_check)
-        self.all_updates_cached, self.all_update_versions_cached = self.extract_packages_and_versions(out)
-        self.composite_logger.log_debug("Discovered " + str(len(self.all_updates_cached)) + " package entries.")
-        return self.all_updates_cached, self.all_update_versions_cached
+            self.all_updates_cached, self.all_update_versions_cached = self.get_updates_using_package_metadata_cache(Constants.PackageMetadataCacheUpdateType.ALL, self.__discover_all_updates)
+            self.composite_logger.log_debug("Discovered " + str(len(self.all_updates_cached)) + " package entries.")
+            return self.all_updates_cached, self.all_update_versions_cached
+
+    def __discover_all_updates(self):
+        output_parser = StreamingLineParser(self.update_list_line_parser)
+        self.invoke_package_manager(self.yum_check, output_parser)
+        return self.get_packages_and_versions(output_parser.close())
 
     def get_security_updates(self):
         """Get missing security updates"""
         self.composite_logger.log("\nDiscovering 'security' packages...")
-        self.install_yum_security_prerequisite()
-        out = self.invoke_package_manager(self.yum_check_security)
-        security_packages, security_package_versions = self.extract_packages_and_versions(out)
+        security_packages, security_package_versions = self.get_updates_using_package_metadata_cache(Constants.PackageMetadataCacheUpdateType.SECURITY, self.__discover_security_updates)
 
         if len(security_packages) == 0 and 'CentOS' in str(self.env_layer.platform.linux_distribution()):   # deliberately non-terminal
             self.composite_logger.log_warning("Classification-based patching is only supported on YUM if the machine is independently configured to receive classification information.")
@@ -158,6 +178,7 @@ class YumPackageManager(PackageManager):
 
         all_packages, all_package_versions = self.get_all_updates(True)
         security_packages, security_package_versions = self.get_security_updates()
+        security_packages = PackageCollection(security_packages)
         if len(security_packages) == 0 and 'CentOS' in str(self.env_layer.platform.linux_distribution()):  # deliberately terminal - erring on the side of caution to avoid dissat in uninformed customers
             self.composite_logger.log_error("Please review patch management documentation for information on classification-based patching on YUM.")
             error_msg = "Classification-based patching is only supported on YUM if the computer is independently configured to receive classification information." \
@@ -173,58 +194,75 @@ class YumPackageManager(PackageManager):
         self.composite_logger.log("Discovered " + str(len(other_packages)) + " 'other' package entries.")
         return other_packages, other_package_versions
 
+    def __discover_security_updates(self):
+        self.install_yum_security_prerequisite()
+        output_parser = StreamingLineParser(self.update_list_line_parser)
+        self.invoke_package_manager(self.yum_check_security, output_parser)
+        return self.get_packages_and_versions(output_parser.close())
+
     def install_yum_security_prerequisite(self):
         """Not installed by default in versions prior to RHEL 7. This step is idempotent and fast, so we're not writing more complex code."""
         self.composite_logger.log_debug('Ensuring RHEL yum-plugin-security is present.')
         code, out = self.env_layer.run_command_output(self.yum_check_security_prerequisite, False, False)
-        self.composite_logger.log_debug(" - Code: " + str(code) + ", Output : \n|\t" + "\n|\t".join(out.splitlines()))
+        self.composite_logger.log_debug(lambda: " - Code: " + str(code) + ", Output : " + self.composite_logger.format_output(out))
     # endregion
 
     # region Output Parser(s)
     def extract_packages_and_versions(self, output):
         """Returns packages and versions from given output"""
-        packages, versions = self.extract_packages_and_versions_including_duplicates(output)
-        packages, versions = self.dedupe_update_packages(packages, versions)
-        return packages, versions
+        return self.get_packages_and_versions(StreamingLineParser.parse(output, self.update_list_line_parser))
+
+    def get_packages_and_versions(self, records):
+        """Returns deduped parallel package and version lists from the records of update_list_line_parser"""
+        packages, versions = self.get_packages_and_versions_including_duplicates(records)
+        return self.dedupe_update_packages(packages, versions)
 
     def extract_packages_and_versions_including_duplicates(self, output):
         """Returns packages and versions from given output"""
+        return self.get_packages_and_versions_including_duplicates(StreamingLineParser.parse(output, self.update_list_line_parser))
+
+    @staticmethod
+    def get_packages_and_versions_including_duplicates(records):
+        return [record[0] for record in records], [record[1] for record in records]
+
+    def update_list_line_parser(self, records):
+        """Line parser (see StreamingLineParser) for (package, version) records from update list output, with duplicates"""
+        # Sample output format (an entry may be wrapped on to two lines, which are treated as one)
+        # kernel.x86_64                  3.10.0-693.21.1.el7            updates
+        # libgcc.i686
+        #                                4.8.5-28.el7                   rhui-rhel-7-server-rhui-rpms
         self.composite_logger.log_debug("\nExtracting package and version data...")
-        packages = []
-        versions = []
         package_extensions = ['.x86_64', '.noarch', '.i686']
 
         def is_package(chunk):
             # Using a list comprehension to determine if chunk is a package
             return len([p for p in package_extensions if p in chunk]) == 1
 
-        lines = output.strip().split('\n')
-
-        for line_index in range(0, len(lines)):
-            line = re.split(r'\s+', lines[line_index].strip())
-            next_line = []
-
-            if line_index < len(lines) - 1:
-                next_line = re.split(r'\s+', lines[line_index + 1].strip())
-
-            # If we run into a length of 3, we'll accept it and continue
-            if len(line) == 3 and is_package(line[0]):
-                packages.append(self.get_product_name(line[0]))
-                versions.append(line[1])
-            # We will handle these two edge cases where the output is on
-            # two different lines and treat them as one line
-            elif len(line) == 1 and len(next_line) == 2 and is_package(line[0]):
-                packages.append(self.get_product_name(line[0]))
-                versions.append(next_line[0])
-                line_index += 1
-            elif len(line) == 2 and len(next_line) == 1 and is_package(line[0]):
-                packages.append(self.get_product_name(line[0]))
-                versions.append(line[1])
-                line_index += 1
-            else:
-                self.composite_logger.log_debug(" - Inapplicable line (" + str(line_index) + "): " + lines[line_index])
+        # Each line is classified when the next one is seen, for entries wrapped on to two lines
+        line_index = -1
+        raw_line = line = None
+        next_raw_line = (yield)
+        while line is not None or next_raw_line is not None:
+            next_line = re.split(r'\s+', next_raw_line.strip()) if next_raw_line is not None else []
+
+            if line is not None:
+                # If we run into a length of 3, we'll accept it and continue
+                if len(line) == 3 and is_package(line[0]):
+                    records.append((self.get_product_name(line[0]), line[1]))
+                # We will handle these two edge cases where the output is on
+                # two different lines and treat them as one line
+                elif len(line) == 1 and len(next_line) == 2 and is_package(line[0]):
+                    records.append((self.get_product_name(line[0]), next_line[0]))
+                elif len(line) == 2 and len(next_line) == 1 and is_package(line[0]):
+                    records.append((self.get_product_name(line[0]), line[1]))
+                else:
+                    self.composite_logger.log_debug(" - Inapplicable line ({0}): {1}", line_index, raw_line)
 
-        return packages, versions
+            if next_raw_line is None:
+                break
+            line_index += 1
+            raw_line, line = next_raw_line, next_line
+            next_raw_line = (yield)
     # endregion
     # endregion
 
@@ -265,6 +303,10 @@ class YumPackageManager(PackageManager):
         # Installed Packages
         # kernel.x86_64                                                                                   3.10.0-514.el7                                                                                    @anaconda/7.3
         self.composite_logger.log_debug("\nCHECKING PACKAGE INSTALL STATUS FOR: " + str(package_name) + " (" + str(package_version) + ")")
+        installed = self.is_package_version_installed_in_snapshot(package_name, package_version)
+        if installed is not None:
+            return installed
+
         cmd = self.single_package_check_installed.replace('<PACKAGE-NAME>', package_name)
         output = self.invoke_package_manager(cmd)
         packages, package_versions = self.extract_packages_and_versions_including_duplicates(output)
@@ -306,12 +348,12 @@ class YumPackageManager(PackageManager):
 
         for line in lines:
             if line.find(" will be updated") < 0 and line.find(" will be an update") < 0 and line.find(" will be installed") < 0:
-                self.composite_logger.log_debug(" - Inapplicable line: " + str(line))
+                self.composite_logger.log_debug(" - Inapplicable line: {0}", line)
                 continue
 
             updates_line = re.split(r'\s+', line.strip())
             if len(updates_line) != 7:
-                self.composite_logger.log_debug(" - Inapplicable line: " + str(line))
+                self.composite_logger.log_debug(" - Inapplicable line: {0}", line)
                 continue
 
             dependent_package_name = self.get_product_name(updates_line[2])
@@ -592,7 +634,7 @@ class YumPackageManager(PackageManager):
         """ Checking if auto update is enable_on_reboot on the machine. An enable_on_reboot service will be activated (if currently inactive) on machine reboot """
         self.composite_logger.log_debug("Checking if auto update service is set to enable on reboot...")
         code, out = self.env_layer.run_command_output(command, False, False)
-        self.composite_logger.log_debug(" - Code: " + str(code) + ", Output: \n|\t" + "\n|\t".join(out.splitlines()))
+        self.composite_logger.log_debug(lambda: " - Code: " + str(code) + ", Output: " + self.composite_logger.format_output(out))
         if len(out.strip()) > 0 and code == 0 and 'enabled' in out:
             self.composite_logger.log_debug("Auto OS update service will enable on reboot")
             return True
@@ -789,7 +831,7 @@ class YumPackageManager(PackageManager):
     def disable_auto_update_on_reboot(self, command):
         self.composite_logger.log_debug("Disabling auto update on reboot using command: " + str(command))
         code, out = self.env_layer.run_command_output(command, False, False)
-        self.composite_logger.log_debug(" - Code: " + str(code) + ", Output: \n|\t" + "\n|\t".join(out.splitlines()))
+        self.composite_logger.log_debug(lambda: " - Code: " + str(code) + ", Output: " + self.composite_logger.format_output(out))
 
         if code != 0:
             self.composite_logger.log('[ERROR] Command invoked: ' + command)
@@ -804,7 +846,7 @@ class YumPackageManager(PackageManager):
         """ Checks if the auto update service is enable_on_reboot on the VM """
         self.composite_logger.log_debug("Checking if auto update service is installed...")
         code, out = self.env_layer.run_command_output(install_check_cmd, False, False)
-        self.composite_logger.log_debug(" - Code: " + str(code) + ", Output: \n|\t" + "\n|\t".join(out.splitlines()))
+        self.composite_logger.log_debug(lambda: " - Code: " + str(code) + ", Output: " + self.composite_logger.format_output(out))
         if len(out.strip()) > 0 and code == 0:
             self.composite_logger.log_debug("Auto OS update service is installed on the machine")
             return True
@@ -821,13 +863,13 @@ class YumPackageManager(PackageManager):
             issue_mitigated = self.check_known_issues_and_attempt_fix(out)
             if issue_mitigated:
                 self.composite_logger.log_debug('\nPost mitigation, invoking package manager again using: ' + command)
-                code_after_fix_attempt, out_after_fix_attempt = self.env_layer.run_command_output(command, False, False)
+                code_after_fix_attempt, out_after_fix_attempt = self.run_package_manager_command(command)
                 return self.try_mitigate_issues_if_any(command, code_after_fix_attempt, out_after_fix_attempt)
         return code, out
 
     def check_known_issues_and_attempt_fix(self, output):
         """ Checks if issue falls into known issues and attempts to mitigate """
-        self.composite_logger.log_debug("Output from package manager containing error: \n|\t" + "\n|\t".join(output.splitlines()))
+        self.composite_logger.log_debug(lambda: "Output from package manager containing error: " + self.composite_logger.format_output(output))
         self.composite_logger.log_debug("\nChecking if this is a known error...")
         for error in self.known_errors_and_fixes:
             if error in output:
@@ -845,7 +887,7 @@ class YumPackageManager(PackageManager):
         if code != self.yum_exitcode_no_applicable_packages:
             self.composite_logger.log('[ERROR] Package manager was invoked using: ' + command)
             self.composite_logger.log_warning(" - Return code from package manager: " + str(code))
-            self.composite_logger.log_warning(" - Output from package manager: \n|\t" + "\n|\t".join(out.splitlines()))
+            self.composite_logger.log_warning(lambda: " - Output from package manager: " + self.composite_logger.format_output(out))
             self.telemetry_writer.write_execution_error(command, code, out)
             error_msg = 'Unexpected return code (' + str(code) + ') from package manager on command: ' + command
             self.status_handler.add_error_to_status(error_msg, Constants.PatchOperationErrorCodes.PACKAGE_MANAGER_FAILURE)
@@ -853,7 +895,7 @@ class YumPackageManager(PackageManager):
         else:
             self.composite_logger.log_debug("\n\n==[SUCCESS]===============================================================")
             self.composite_logger.log_debug(" - Return code from package manager: " + str(code))
-            self.composite_logger.log_debug(" - Output from package manager: \n|\t" + "\n|\t".join(out.splitlines()))
+            self.composite_logger.log_debug(lambda: " - Output from package manager: " + self.composite_logger.format_output(out))
             self.composite_logger.log_debug("==========================================================================\n\n")
             self.composite_logger.log_debug("\nClient package update complete.")
     # endregion
@@ -864,11 +906,11 @@ class YumPackageManager(PackageManager):
         # Checking using yum-utils
         self.composite_logger.log_debug("Ensuring yum-utils is present.")
         code, out = self.env_layer.run_command_output(self.yum_utils_prerequisite, False, False)  # idempotent, doesn't install if already present
-        self.composite_logger.log_debug(" - Code: " + str(code) + ", Output: \n|\t" + "\n|\t".join(out.splitlines()))
+        self.composite_logger.log_debug(lambda: " - Code: " + str(code) + ", Output: " + self.composite_logger.format_output(out))
 
         # Checking for restart for distros with -r flag such as RHEL 7+
         code, out = self.env_layer.run_command_output(self.needs_restarting_with_flag, False, False)
-        self.composite_logger.log_debug(" - Code: " + str(code) + ", Output: \n|\t" + "\n|\t".join(out.splitlines()))
+        self.composite_logger.log_debug(lambda: " - Code: " + str(code) + ", Output: " + self.composite_logger.format_output(out))
         if out.find("Reboot is required") < 0:
             self.composite_logger.log_debug(" - Reboot not detected to be required (L1).")
         else:
@@ -878,7 +920,7 @@ class YumPackageManager(PackageManager):
         # Checking for restart for distro without -r flag such as RHEL 6 and CentOS 6
         if str(self.env_layer.platform.linux_distribution()[1]).split('.')[0] == '6':
             code, out = self.env_layer.run_command_output(self.needs_restarting, False, False)
-            self.composite_logger.log_debug(" - Code: " + str(code) + ", Output: \n|\t" + "\n|\t".join(out.splitlines()))
+            self.composite_logger.log_debug(lambda: " - Code: " + str(code) + ", Output: " + self.composite_logger.format_output(out))
             if len(out.strip()) == 0 and code == 0:
                 self.composite_logger.log_debug(" - Reboot not detected to be required (L2).")
             else:
@@ -888,7 +930,7 @@ class YumPackageManager(PackageManager):
         # Double-checking using yum ps (where available)
         self.composite_logger.log_debug("Ensuring yum-plugin-ps is present.")
         code, out = self.env_layer.run_command_output(self.yum_ps_prerequisite, False, False)  # idempotent, doesn't install if already present
-        self.composite_logger.log_debug(" - Code: " + str(code) + ", Output: \n|\t" + "\n|\t".join(out.splitlines()))
+        self.composite_logger.log_debug(lambda: " - Code: " + str(code) + ", Output: " + self.composite_logger.format_output(out))
 
         output = self.invoke_package_manager(self.yum_ps)
         lines = output.strip().split('\n')
@@ -900,7 +942,7 @@ class YumPackageManager(PackageManager):
         for line in lines:
             if not process_list_flag:  # keep going until the process list starts
                 if line.find("pid") < 0 and line.find("proc") < 0 and line.find("uptime") < 0:
-                    self.composite_logger.log_debug(" - Inapplicable line: " + str(line))
+                    self.composite_logger.log_debug(" - Inapplicable line: {0}", line)
                     continue
                 else:
                     self.composite_logger.log_debug(" - Process list started: " + str(line))
@@ -909,7 +951,7 @@ class YumPackageManager(PackageManager):
 
             process_details = re.split(r'\s+', line.strip())
             if len(process_details) < 7:
-                self.composite_logger.log_debug(" - Inapplicable line: " + str(line))
+                self.composite_logger.log_debug(" - Inapplicable line: {0}", line)
                 continue
             else:
                 self.composite_logger.log_debug(" - Applicable line: " + str(line))
@@ -18,8 +18,11 @@
 import json
 import os
 import re
+import threading
 import time
+from core.src.package_managers.PackageCollection import PackageCollection
 from core.src.package_managers.PackageManager import PackageManager
+from core.src.package_managers.StreamingLineParser import StreamingLineParser
 from core.src.bootstrap.Constants import Constants
 
 
@@ -35,8 +38,8 @@ class ZypperPackageManager(PackageManager):
         AUTO_UPDATE_CONFIG_PATTERN_MATCH_TEXT = '="(true|false)"'
         INSTALLATION_STATE_IDENTIFIER_TEXT = "installation_state"
 
-    def __init__(self, env_layer, execution_config, composite_logger, telemetry_writer, status_handler):
-        super(ZypperPackageManager, self).__init__(env_layer, execution_config, composite_logger, telemetry_writer, status_handler)
+    def __init__(self, env_layer, execution_config, composite_logger, telemetry_writer, status_handler, package_metadata_cache_ttl_in_secs=Constants.PACKAGE_METADATA_CACHE_TTL_IN_SECONDS, repo_refresh_freshness_window_in_secs=Constants.REPO_REFRESH_FRESHNESS_WINDOW_IN_SECONDS, read_only_query_max_concurrency=Constants.MAX_CONCURRENT_READ_ONLY_QUERIES):
+        super(ZypperPackageManager, self).__init__(env_layer, execution_config, composite_logger, telemetry_writer, status_handler, package_metadata_cache_ttl_in_secs, repo_refresh_freshness_window_in_secs, read_only_query_max_concurrency)
         # Repo refresh
         self.repo_clean = 'sudo zypper clean -a'
         self.repo_refresh = 'sudo zypper refresh'
@@ -46,6 +49,8 @@ class ZypperPackageManager(PackageManager):
         self.zypper_check = 'sudo LANG=en_US.UTF8 zypper list-updates'
         self.zypper_check_security = 'sudo LANG=en_US.UTF8 zypper list-patches --category security'
         self.single_package_check_versions = 'LANG=en_US.UTF8 zypper search -s <PACKAGE-NAME>'
+        self.installed_packages_query_cmd = "rpm -qa --qf '%{NAME} %|EPOCH?{%{EPOCH}:}:{}|%{VERSION}-%{RELEASE}\\n'"
+        self.installed_packages_query_cmd_template = "rpm -q --qf '%{NAME} %|EPOCH?{%{EPOCH}:}:{}|%{VERSION}-%{RELEASE}\\n' <PACKAGE-NAMES>"
         self.single_package_upgrade_simulation_cmd = 'sudo LANG=en_US.UTF8 zypper --non-interactive update --dry-run '
         self.zypper_install_security_patches_simulate = 'sudo LANG=en_US.UTF8 zypper --non-interactive patch --category security --dry-run'
 
@@ -71,11 +76,27 @@ class ZypperPackageManager(PackageManager):
         # Support to check for processes requiring restart
         self.zypper_ps = "sudo zypper ps -s"
 
+        # Package metadata cache - raw and solv repo metadata, installed package state (rpmdb) and repo configuration
+        self.package_metadata_paths = ['/var/cache/zypp/raw', '/var/cache/zypp/solv', '/var/lib/rpm', '/etc/zypp/repos.d']
+        self.package_metadata_ignored_names = ['__db', '.rpm.lock']
+        self.repo_config_paths = ['/etc/zypp/repos.d', '/etc/zypp/services.d']
+
+        # Read-only query concurrency - rpm queries take no locks, and zypper readers wait on the zypp lock (see set_lock_timeout_and_backup_original).
+        # Security updates are versioned from all updates.
+        self.concurrent_read_only_queries_supported = True
+        self.read_only_queries_contend_for_lock = True
+        self.security_updates_query_independent = False
+
+        # Download prefetch - not supported, as 'zypper install --download-only' holds the zypp lock throughout, which would hold up installs instead of overlapping with them
+        self.download_only_cmd_template = None
+
         # Miscellaneous
         self.set_package_manager_setting(Constants.PKG_MGR_SETTING_IDENTITY, Constants.ZYPPER)
         self.zypper_get_process_tree_cmd = 'ps --forest -o pid,cmd -g $(ps -o sid= -p {})'
         self.package_manager_max_retries = 5
         self.zypp_lock_timeout_backup = None
+        self.zypp_lock_timeout_users = 0                    # concurrent invocations relying on ZYPP_LOCK_TIMEOUT - the first backs it up and the last restores it
+        self.zypp_lock_timeout_lock = threading.Lock()
 
         # auto OS updates
         self.current_auto_os_update_service = None
@@ -123,7 +144,7 @@ class ZypperPackageManager(PackageManager):
 
         for i in range(1, self.package_manager_max_retries + 1):
             self.set_lock_timeout_and_backup_original()
-            code, out = self.env_layer.run_command_output(command, False, False)
+            code, out = self.run_package_manager_command(command)
             self.restore_original_lock_timeout()
 
             if code not in self.zypper_success_exit_codes:  # more known return codes should be added as appropriate
@@ -201,7 +222,7 @@ class ZypperPackageManager(PackageManager):
         """Logs verbose error messages if there is an error on invoke_package_manager"""
         self.composite_logger.log('[ERROR] Package manager was invoked using: ' + command)
         self.composite_logger.log_warning(" - Return code from package manager: " + str(code))
-        self.composite_logger.log_warning(" - Output from package manager: \n|\t" + "\n|\t".join(out.splitlines()))
+        self.composite_logger.log_warning(lambda: " - Output from package manager: " + self.composite_logger.format_output(out))
         self.log_process_tree_if_exists(out)
         self.telemetry_writer.write_execution_error(command, code, out)
 
@@ -209,7 +230,7 @@ class ZypperPackageManager(PackageManager):
         """Logs verbose success messages on invoke_package_manager"""
         self.composite_logger.log_verbose("\n\n==[SUCCESS]===============================================================")
         self.composite_logger.log_debug(" - Return code from package manager: " + str(code))
-        self.composite_logger.log_debug(" - Output from package manager: \n|\t" + "\n|\t".join(out.splitlines()))
+        self.composite_logger.log_debug(lambda: " - Output from package manager: " + self.composite_logger.format_output(out))
         self.composite_logger.log_verbose("==========================================================================\n\n")
 
     def log_process_tree_if_exists(self, out):
@@ -219,18 +240,28 @@ class ZypperPackageManager(PackageManager):
             self.composite_logger.log_warning(" - Process tree for the pid in output: \n{}".format(str(process_tree)))
 
     def set_lock_timeout_and_backup_original(self):
-        """Saves the env var ZYPP_LOCK_TIMEOUT and sets it to 5"""
-        self.zypp_lock_timeout_backup = self.env_layer.get_env_var('ZYPP_LOCK_TIMEOUT')
-        self.composite_logger.log_debug("Original value of ZYPP_LOCK_TIMEOUT env var: {0}".format(str(self.zypp_lock_timeout_backup)))
-        self.env_layer.set_env_var('ZYPP_LOCK_TIMEOUT', 5)
+        """Saves the env var ZYPP_LOCK_TIMEOUT and sets it to 5. With concurrent invocations, it is saved and set only by the first."""
+        with self.zypp_lock_timeout_lock:
+            self.zypp_lock_timeout_users += 1
+            if self.zypp_lock_timeout_users > 1:
+                return
+
+            self.zypp_lock_timeout_backup = self.env_layer.get_env_var('ZYPP_LOCK_TIMEOUT')
+            self.composite_logger.log_debug("Original value of ZYPP_LOCK_TIMEOUT env var: {0}".format(str(self.zypp_lock_timeout_backup)))
+            self.env_layer.set_env_var('ZYPP_LOCK_TIMEOUT', 5)
 
     def restore_original_lock_timeout(self):
-        """Restores the original value of the env var ZYPP_LOCK_TIMEOUT, if any was saved"""
-        if self.zypp_lock_timeout_backup is None:
-            self.composite_logger.log_debug("Attempted to restore original lock timeout when none was saved")
+        """Restores the original value of the env var ZYPP_LOCK_TIMEOUT, if any was saved. With concurrent invocations, it is restored only by the last."""
+        with self.zypp_lock_timeout_lock:
+            self.zypp_lock_timeout_users = max(self.zypp_lock_timeout_users - 1, 0)
+            if self.zypp_lock_timeout_users > 0:
+                return
 
-        self.env_layer.set_env_var('ZYPP_LOCK_TIMEOUT', self.zypp_lock_timeout_backup)
-        self.zypp_lock_timeout_backup = None
+            if self.zypp_lock_timeout_backup is None:
+                self.composite_logger.log_debug("Attempted to restore original lock timeout when none was saved")
+
+            self.env_layer.set_env_var('ZYPP_LOCK_TIMEOUT', self.zypp_lock_timeout_backup)
+            self.zypp_lock_timeout_backup = None
 
     def get_process_tree_from_pid_in_output(self, message):
         """ Fetches pid from the error message by searching for the text 'pid' and returns the process tree with all details.
@@ -284,25 +315,37 @@ class ZypperPackageManager(PackageManager):
     # region Classification-based (incl. All) update check
     def get_all_updates(self, cached=False):
         """Get all missing updates"""
-        self.composite_logger.log_debug("\nDiscovering all packages...")
-        if cached and not len(self.all_updates_cached) == 0:
-            self.composite_logger.log_debug(" - Returning cached package data.")
-            return self.all_updates_cached, self.all_update_versions_cached  # allows for high performance reuse in areas of the code explicitly aware of the cache
+        with self.all_updates_lock:     # concurrent queries using the cached updates wait for the discovery in progress
+            self.composite_logger.log_debug("\nDiscovering all packages...")
+            if cached and not len(self.all_updates_cached) == 0:
+                self.composite_logger.log_debug(" - Returning cached package data.")
+                return self.all_updates_cached, self.all_update_versions_cached  # allows for high performance reuse in areas of the code explicitly aware of the cache
+
+            self.all_updates_cached, self.all_update_versions_cached = self.get_updates_using_package_metadata_cache(Constants.PackageMetadataCacheUpdateType.ALL, self.__discover_all_updates)
+            self.composite_logger.log_debug("Discovered " + str(len(self.all_updates_cached)) + " package entries.")
+            return self.all_updates_cached, self.all_update_versions_cached
 
-        out = self.invoke_package_manager(self.zypper_check)
-        self.all_updates_cached, self.all_update_versions_cached = self.extract_packages_and_versions(out)
-        self.composite_logger.log_debug("Discovered " + str(len(self.all_updates_cached)) + " package entries.")
-        return self.all_updates_cached, self.all_update_versions_cached
+    def __discover_all_updates(self):
+        output_parser = StreamingLineParser(self.update_list_line_parser)
+        self.invoke_package_manager(self.zypper_check, output_parser)
+        return self.get_packages_and_versions(output_parser.close())
 
     def get_security_updates(self):
         """Get missing security updates"""
         self.composite_logger.log_debug("\nDiscovering 'security' packages...")
+        security_packages, security_package_versions = self.get_updates_using_package_metadata_cache(Constants.PackageMetadataCacheUpdateType.SECURITY, self.__discover_security_updates)
+
+        self.composite_logger.log_debug("Discovered " + str(len(security_packages)) + " 'security' package entries.\n")
+        return security_packages, security_package_versions
+
+    def __discover_security_updates(self):
         security_packages = []
         security_package_versions = []
 
         # Get all security packages
-        out = self.invoke_package_manager(self.zypper_install_security_patches_simulate)
-        packages_from_patch_data = self.extract_packages_from_patch_data(out)
+        output_parser = StreamingLineParser(self.patch_data_line_parser)
+        self.invoke_package_manager(self.zypper_install_security_patches_simulate, output_parser)
+        packages_from_patch_data = PackageCollection(self.get_packages_from_patch_data(output_parser.close()))
 
         # Correlate and enrich with versions from all package data
         all_packages, all_package_versions = self.get_all_updates(True)
@@ -313,7 +356,6 @@ class ZypperPackageManager(PackageManager):
                 security_package_versions.append(all_package_versions[index])
                 self.composite_logger.log_debug(" - " + str(package) + " [" + str(all_package_versions[index]) + "]")
 
-        self.composite_logger.log_debug("Discovered " + str(len(security_packages)) + " 'security' package entries.\n")
         return security_packages, security_package_versions
 
     def get_other_updates(self):
@@ -323,8 +365,9 @@ class ZypperPackageManager(PackageManager):
         other_package_versions = []
 
         # Get all security packages
-        out = self.invoke_package_manager(self.zypper_install_security_patches_simulate)
-        packages_from_patch_data = self.extract_packages_from_patch_data(out)
+        output_parser = StreamingLineParser(self.patch_data_line_parser)
+        self.invoke_package_manager(self.zypper_install_security_patches_simulate, output_parser)
+        packages_from_patch_data = PackageCollection(self.get_packages_from_patch_data(output_parser.close()))
 
         # SPECIAL CONDITION IF ZYPPER UPDATE IS DETECTED - UNAVOIDABLE SECURITY UPDATE(S) WILL BE INSTALLED AND THE RUN REPEATED FOR 'OTHER".
         if self.get_package_manager_setting(Constants.PACKAGE_MGR_SETTING_REPEAT_PATCH_OPERATION, True):
@@ -349,6 +392,14 @@ class ZypperPackageManager(PackageManager):
     # region Output Parser(s)
     def extract_packages_and_versions(self, output):
         """Returns packages and versions from given output"""
+        return self.get_packages_and_versions(StreamingLineParser.parse(output, self.update_list_line_parser))
+
+    @staticmethod
+    def get_packages_and_versions(records):
+        return [record[0] for record in records], [record[1] for record in records]
+
+    def update_list_line_parser(self, records):
+        """Line parser (see StreamingLineParser) for (package, version) records from update list output"""
 
         # Sample output for the cmd 'zypper list-updates' is :
         # Loading repository data...
@@ -359,53 +410,66 @@ class ZypperPackageManager(PackageManager):
         # v | SLES12-SP2-Updates | libgoa-1_0-0       | 3.20.4-7.2      | 3.20.5-9.6        | x86_64
 
         self.composite_logger.log_debug("\nExtracting package and version data...")
-        packages = []
-        versions = []
 
-        lines = output.strip().split('\n')
-        for line in lines:
+        line = (yield)
+        while line is not None:
             line_split = line.split(' | ')
             if len(line_split) == 6 and line_split[1].strip() != 'Repository':
                 package = line_split[2].strip()
-                packages.append(package)
                 version = line_split[4].strip()
-                versions.append(version)
+                records.append((package, version))
                 self.composite_logger.log_debug(" - Applicable line: " + line + ". Package: " + package + ". Version: " + version + ".")
             else:
-                self.composite_logger.log_debug(" - Inapplicable line: " + line)
-
-        return packages, versions
+                self.composite_logger.log_debug(" - Inapplicable line: {0}", line)
+            line = (yield)
 
     def extract_packages_from_patch_data(self, output):
         """Returns packages (sometimes with version information embedded) from patch data"""
+        return self.get_packages_from_patch_data(StreamingLineParser.parse(output, self.patch_data_line_parser))
+
+    def get_packages_from_patch_data(self, records):
+        self.composite_logger.log_debug("\nExtracted " + str(len(records)) + " prospective package entries from security patch data.\n")
+        return records
+
+    def patch_data_line_parser(self, records):
+        """Line parser (see StreamingLineParser) for package records (sometimes with version information embedded) from patch data"""
         self.composite_logger.log_debug("\nExtracting package entries from security patch data...")
-        packages = []
         parser_seeing_packages_flag = False
 
-        lines = output.strip().split('\n')
-        for line in lines:
+        line = (yield)
+        while line is not None:
             if not parser_seeing_packages_flag:
                 if 'package is going to be installed' in line or 'package is going to be upgraded' in line or \
                         'packages are going to be installed:' in line or 'packages are going to be upgraded:' in line:
                     self.composite_logger.log_debug(" - Start marker line: " + line)
                     parser_seeing_packages_flag = True  # Start -- Next line contains information we need
                 else:
-                    self.composite_logger.log_debug(" - Inapplicable line: " + line)
-                continue
-
-            if not line or line.isspace():
+                    self.composite_logger.log_debug(" - Inapplicable line: {0}", line)
+            elif not line or line.isspace():
                 self.composite_logger.log_debug(" - End marker line: " + line)
-                parser_seeing_packages_flag = False
-                continue  # End -- We're past a package information block
-
-            line_parts = line.strip().split(' ')
-            self.composite_logger.log_debug(" - Package list line: " + line)
-            for line_part in line_parts:
-                packages.append(line_part)
-                self.composite_logger.log_debug("    - Package: " + line_part)
-
-        self.composite_logger.log_debug("\nExtracted " + str(len(packages)) + " prospective package entries from security patch data.\n")
-        return packages
+                parser_seeing_packages_flag = False     # End -- We're past a package information block
+            else:
+                line_parts = line.strip().split(' ')
+                self.composite_logger.log_debug(" - Package list line: " + line)
+                for line_part in line_parts:
+                    records.append(line_part)
+                    self.composite_logger.log_debug("    - Package: " + line_part)
+            line = (yield)
+
+    def dependency_simulation_line_parser(self, records):
+        """Line parser (see StreamingLineParser) for the packages on the line after each ' going to be ' marker line in single package upgrade simulation output"""
+        updates_line_expected = False
+
+        line = (yield)
+        while line is not None:
+            if updates_line_expected:
+                records.extend(re.split(r'\s+', line))
+                updates_line_expected = False
+            elif line.find(" going to be ") < 0:
+                self.composite_logger.log_debug(" - Inapplicable line: {0}", line)
+            else:
+                updates_line_expected = True
+            line = (yield)
     # endregion
     # endregion
 
@@ -425,6 +489,10 @@ class ZypperPackageManager(PackageManager):
     def is_package_version_installed(self, package_name, package_version):
         """ Returns true if the specific package version is installed """
         self.composite_logger.log_debug("\nCHECKING PACKAGE INSTALL STATUS FOR: " + str(package_name) + "(" + str(package_version) + ")")
+        installed = self.is_package_version_installed_in_snapshot(package_name, package_version)
+        if installed is not None:
+            return installed
+
         installed_package_versions = self.get_all_available_versions_of_package_ex(package_name, include_installed=True, include_available=False)
         for version in installed_package_versions:
             if version == package_version:
@@ -453,7 +521,7 @@ class ZypperPackageManager(PackageManager):
         for line in lines:
             if not packages_list_flag:  # keep going until the packages list starts
                 if not all(word in line for word in ["S", "Name", "Type", "Version", "Arch", "Repository"]):
-                    self.composite_logger.log_debug(" - Inapplicable line: " + str(line))
+                    self.composite_logger.log_debug(" - Inapplicable line: {0}", line)
                     continue
                 else:
                     self.composite_logger.log_debug(" - Package list started: " + str(line))
@@ -462,7 +530,7 @@ class ZypperPackageManager(PackageManager):
 
             package_details = line.split(' |')
             if len(package_details) != 6:
-                self.composite_logger.log_debug(" - Inapplicable line: " + str(line))
+                self.composite_logger.log_debug(" - Inapplicable line: {0}", line)
                 continue
             else:
                 self.composite_logger.log_debug(" - Applicable line: " + str(line))
@@ -514,20 +582,13 @@ class ZypperPackageManager(PackageManager):
         self.composite_logger.log_debug("\nRESOLVING DEPENDENCIES USING COMMAND:: " + str(self.single_package_upgrade_simulation_cmd + package_name))
         dependent_updates = []
 
-        output = self.invoke_package_manager(self.single_package_upgrade_simulation_cmd + package_name)
-        lines = output.strip().split('\n')
-
-        for line in lines:
-            if line.find(" going to be ") < 0:
-                self.composite_logger.log_debug(" - Inapplicable line: " + str(line))
-                continue
+        output_parser = StreamingLineParser(self.dependency_simulation_line_parser)
+        self.invoke_package_manager(self.single_package_upgrade_simulation_cmd + package_name, output_parser)
 
-            updates_line = lines[lines.index(line) + 1]
-            dependent_package_names = re.split(r'\s+', updates_line)
-            for dependent_package_name in dependent_package_names:
-                if len(dependent_package_name) != 0 and dependent_package_name != package_name:
-                    self.composite_logger.log_debug(" - Dependency detected: " + dependent_package_name)
-                    dependent_updates.append(dependent_package_name)
+        for dependent_package_name in output_parser.close():
+            if len(dependent_package_name) != 0 and dependent_package_name != package_name:
+                self.composite_logger.log_debug(" - Dependency detected: " + dependent_package_name)
+                dependent_updates.append(dependent_package_name)
 
         self.composite_logger.log_debug(str(len(dependent_updates)) + " dependent updates were found for package '" + package_name + "'.")
         return dependent_updates
@@ -765,7 +826,7 @@ class ZypperPackageManager(PackageManager):
         for line in lines:
             if not process_list_flag:  # keep going until the process list starts
                 if not all(word in line for word in ["PID", "PPID", "UID", "User", "Command", "Service"]):
-                    self.composite_logger.log_debug(" - Inapplicable line: " + str(line))
+                    self.composite_logger.log_debug(" - Inapplicable line: {0}", line)
                     continue
                 else:
                     self.composite_logger.log_debug(" - Process list started: " + str(line))
@@ -774,7 +835,7 @@ class ZypperPackageManager(PackageManager):
 
             process_details = line.split(' |')
             if len(process_details) < 6:
-                self.composite_logger.log_debug(" - Inapplicable line: " + str(line))
+                self.composite_logger.log_debug(" - Inapplicable line: {0}", line)
                 continue
             else:
                 self.composite_logger.log_debug(" - Applicable line: " + str(line))
@@ -0,0 +1,134 @@
+# Copyright 2020 Microsoft Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Requires Python 2.7+
+
+"""Diagnostic artifact store"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from core.src.bootstrap.Constants import Constants
+
+
+class DiagnosticArtifactStore(object):
+    """Keeps large diagnostic payloads (e.g. full package lists, or command output) out of telemetry. Payloads are appended as records to a local
+       gzip-compressed artifact file per activity id and operation, and only a reference to the record (its artifact file and offset) and the
+       digest of the payload are returned for telemetry. Artifact files are indexed by activity id. Records beyond the artifact file size limit
+       are dropped, and the oldest artifact files are deleted to keep the store within its size limit."""
+
+    def __init__(self, env_layer, artifacts_folder_path, max_artifact_file_size_in_bytes=Constants.DIAGNOSTIC_ARTIFACT_FILE_MAX_SIZE_IN_BYTES,
+                 max_store_size_in_bytes=Constants.DIAGNOSTIC_ARTIFACTS_MAX_SIZE_IN_BYTES):
+        self.env_layer = env_layer
+        self.artifacts_folder_path = artifacts_folder_path
+        self.index_file_path = os.path.join(artifacts_folder_path, Constants.DIAGNOSTIC_ARTIFACTS_INDEX_FILE)
+        self.max_artifact_file_size_in_bytes = max_artifact_file_size_in_bytes
+        self.max_store_size_in_bytes = max_store_size_in_bytes
+        self.__lock = threading.Lock()
+
+    def write(self, activity_id, operation, name, payload):
+        """Appends the payload to the artifact file of the activity id and operation. Returns the reference to the record (artifact file and offset
+           of the record - or None for both if it was not stored), with the digest and size of the serialized payload."""
+        serialized_payload = payload if isinstance(payload, str) else json.dumps(payload, default=str)
+        digest = hashlib.sha256(serialized_payload if isinstance(serialized_payload, bytes) else serialized_payload.encode('utf-8')).hexdigest()
+        reference = {'artifact': None, 'offset': None, 'sha256': digest, 'size': len(serialized_payload)}
+        if isinstance(payload, list):
+            reference['count'] = len(payload)
+
+        with self.__lock:
+            try:
+                artifact_file_name = self.get_artifact_file_name(activity_id, operation)
+                artifact_file_path = os.path.join(self.artifacts_folder_path, artifact_file_name)
+                is_new_artifact_file = not os.path.exists(artifact_file_path)
+                offset = 0 if is_new_artifact_file else os.path.getsize(artifact_file_path)
+                if offset >= self.max_artifact_file_size_in_bytes:
+                    return reference
+
+                if is_new_artifact_file:
+                    if not os.path.exists(self.artifacts_folder_path):
+                        os.makedirs(self.artifacts_folder_path)
+                    self.__add_to_index(activity_id, artifact_file_name)
+
+                record = json.dumps({'name': name, 'timestamp': time.strftime(Constants.UTC_DATETIME_FORMAT, time.gmtime()), 'sha256': digest, 'payload': serialized_payload})
+                with self.env_layer.file_system.open(artifact_file_path, 'ab') as file_handle:
+                    gzip_file = gzip.GzipFile(filename='', mode='wb', fileobj=file_handle)     # one gzip member per record, starting at the offset of the record
+                    try:
+                        gzip_file.write((record + '\n').encode('utf-8'))
+                    finally:
+                        gzip_file.close()
+
+                reference['artifact'] = artifact_file_name
+                reference['offset'] = offset
+
+                if is_new_artifact_file:
+                    self.__delete_oldest_artifact_files_if_store_size_limit_exceeded(artifact_file_name)
+            except Exception as error:
+                reference['error'] = repr(error)
+        return reference
+
+    def read(self, artifact_file_name, offset=None):
+        """Returns the records of an artifact file, in the order they were written - or only the record at the offset, if given"""
+        with self.env_layer.file_system.open(os.path.join(self.artifacts_folder_path, artifact_file_name), 'rb') as file_handle:
+            file_handle.seek(offset or 0)
+            with gzip.GzipFile(filename='', mode='rb', fileobj=file_handle) as gzip_file:
+                if offset is not None:
+                    return json.loads(gzip_file.readline().decode('utf-8'))
+                return [json.loads(line.decode('utf-8')) for line in gzip_file.read().splitlines() if line]
+
+    def get_artifact_file_names(self, activity_id):
+        """Returns the (still existing) artifact files of an activity id"""
+        with self.__lock:
+            return [artifact_file_name for indexed_activity_id, artifact_file_name in self.__read_index()
+                    if indexed_activity_id == activity_id and os.path.exists(os.path.join(self.artifacts_folder_path, artifact_file_name))]
+
+    @staticmethod
+    def get_artifact_file_name(activity_id, operation):
+        return "{0}.{1}.json.gz".format(re.sub('[^A-Za-z0-9_.-]', '_', str(activity_id)), re.sub('[^A-Za-z0-9_.-]', '_', str(operation)))
+
+    # region - Index
+    def __read_index(self):
+        """Index entries are [activity id, artifact file name] pairs, oldest first"""
+        if not os.path.exists(self.index_file_path):
+            return []
+        try:
+            return json.loads(self.env_layer.file_system.read_state_file(self.index_file_path))
+        except Exception:
+            return []   # an unreadable index is rebuilt from new artifact files only - older ones are no longer referenced
+
+    def __add_to_index(self, activity_id, artifact_file_name):
+        index = self.__read_index()
+        index.append([str(activity_id), artifact_file_name])
+        self.env_layer.file_system.write_state_file(self.index_file_path, json.dumps(index), fsync=False)
+
+    def __delete_oldest_artifact_files_if_store_size_limit_exceeded(self, current_artifact_file_name):
+        index = self.__read_index()
+        store_size = sum([os.path.getsize(os.path.join(self.artifacts_folder_path, artifact_file_name)) for activity_id, artifact_file_name in index
+                          if os.path.exists(os.path.join(self.artifacts_folder_path, artifact_file_name))])
+        retained_index = []
+        for activity_id, artifact_file_name in index:
+            artifact_file_path = os.path.join(self.artifacts_folder_path, artifact_file_name)
+            if store_size > self.max_store_size_in_bytes and artifact_file_name != current_artifact_file_name:
+                if os.path.exists(artifact_file_path):
+                    store_size -= os.path.getsize(artifact_file_path)
+                    os.remove(artifact_file_path)
+                continue
+            retained_index.append([activity_id, artifact_file_name])
+
+        if len(retained_index) != len(index):
+            self.env_layer.file_system.write_state_file(self.index_file_path, json.dumps(retained_index), fsync=False)
+    # endregion
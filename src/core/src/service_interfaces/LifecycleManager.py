@@ -17,14 +17,13 @@ import errno
 import json
 import os
 import shutil
-import time
 from core.src.bootstrap.Constants import Constants
 
 
 class LifecycleManager(object):
     """ Parent class for LifecycleManagers of Azure and ARC ( auto assessment ), manages lifecycle within the extension wrapper ~ """
 
-    def __init__(self, env_layer, execution_config, composite_logger, telemetry_writer, status_handler):
+    def __init__(self, env_layer, execution_config, composite_logger, telemetry_writer, status_handler, state_file_check_min_interval_in_secs=Constants.LIFECYCLE_STATE_FILE_CHECK_MIN_INTERVAL_IN_SECONDS, core_sequence_heartbeat_interval_in_secs=Constants.CORE_SEQUENCE_HEARTBEAT_INTERVAL_IN_SECONDS):
         self.env_layer = env_layer
         self.execution_config = execution_config
         self.composite_logger = composite_logger
@@ -37,6 +36,12 @@ class LifecycleManager(object):
 
         self.read_only_mode = True  # safety valve on contention with redundancy
 
+        # Lifecycle status checks (run for every package) only check handshake files periodically, and only refresh the heartbeat periodically
+        self.state_file_check_min_interval_in_secs = state_file_check_min_interval_in_secs
+        self.state_file_checks = {}     # file path -> (monotonic time of the last check, state read)
+        self.core_sequence_heartbeat_interval_in_secs = core_sequence_heartbeat_interval_in_secs
+        self.last_core_sequence_update_time = None     # monotonic time
+
     # region - State checkers
     def execution_start_check(self):
         pass
@@ -51,18 +56,30 @@ class LifecycleManager(object):
         if not os.path.exists(self.ext_state_file_path) or not os.path.isfile(self.ext_state_file_path):
             raise Exception("Extension state file not found.")
 
-        # Read (with retries for only IO Errors)
-        for i in range(0, Constants.MAX_FILE_OPERATION_RETRY_COUNT):
-            try:
-                with self.env_layer.file_system.open(self.ext_state_file_path, mode="r") as file_handle:
-                    return json.load(file_handle)['extensionSequence']
-            except Exception as error:
-                if i < Constants.MAX_FILE_OPERATION_RETRY_COUNT - 1:
-                    self.composite_logger.log_warning("Exception on extension sequence read. [Exception={0}] [RetryCount={1}]".format(repr(error), str(i)))
-                    time.sleep(i+1)
-                else:
-                    self.composite_logger.log_error("Unable to read extension state file (retries exhausted). [Exception={0}]".format(repr(error)))
-                    raise
+        try:
+            return json.loads(self.env_layer.file_system.read_state_file(self.ext_state_file_path))['extensionSequence']
+        except Exception as error:
+            self.composite_logger.log_error("Unable to read extension state file. [Exception={0}]".format(repr(error)))
+            raise
+
+    def read_state_file_at_interval(self, file_path, read_state):
+        """ Returns the state read by read_state(), calling it again at most once per minimum interval. Change detection is left to read_state_file,
+            which read_state() reads the file with - only files that changed are read again. """
+        monotonic_time = self.env_layer.datetime.monotonic()
+        if file_path in self.state_file_checks:
+            last_check_time, state = self.state_file_checks[file_path]
+            if monotonic_time - last_check_time < self.state_file_check_min_interval_in_secs:
+                return state
+
+        state = read_state()
+        self.state_file_checks[file_path] = (monotonic_time, state)
+        return state
+
+    def update_core_sequence_heartbeat(self):
+        """ Refreshes the heartbeat of the (incomplete) core sequence, if it was not updated within the heartbeat interval """
+        if self.last_core_sequence_update_time is not None and self.env_layer.datetime.monotonic() - self.last_core_sequence_update_time < self.core_sequence_heartbeat_interval_in_secs:
+            return
+        self.update_core_sequence(completed=False)
 
     def identify_and_mitigate_core_sequence_issues(self):
         """ Checks for issues with the core sequence file (file not exists, is dir, etc) and attempts to mitigate them. """
@@ -87,52 +104,47 @@ class LifecycleManager(object):
         self.composite_logger.log_debug("Reading core sequence...")
         self.identify_and_mitigate_core_sequence_issues()
 
-        # Read (with retries for only IO Errors)
-        for i in range(0, Constants.MAX_FILE_OPERATION_RETRY_COUNT):
-            try:
-                with self.env_layer.file_system.open(self.core_state_file_path, mode="r") as file_handle:
-                    core_sequence = json.load(file_handle)['coreSequence']
-
-                # The following code will only execute in the event of a bug
-                if not self.read_only_mode and os.getpid() not in core_sequence['processIds']:
-                    self.composite_logger.log_error("SERIOUS ERROR -- Core sequence was taken over in violation of sequence contract.")
-                    self.read_only_mode = True  # This should never happen, but we're switching back into read-only mode.
-                    if self.execution_config.exec_auto_assess_only:  # Yield execution precedence out of caution, if it's low pri auto-assessment
-                        return core_sequence
-
-                if self.read_only_mode:
-                    if core_sequence['completed'].lower() == 'true' or len(self.identify_running_processes(core_sequence['processIds'])) == 0:
-                        # Short-circuit for re-enable for completed non-auto-assess operations that should not run
-                        if not self.execution_config.exec_auto_assess_only and core_sequence['number'] == self.execution_config.sequence_number and core_sequence['completed'].lower() == 'true':
-                            self.composite_logger.log_debug("Not attempting to take ownership of core sequence since the sequence number as it's already done and this is the main process.")
-                            return core_sequence
-
-                        # Auto-assess over non-auto-assess is not a trivial override and is short-circuited to be evaluated in detail later
-                        if self.execution_config.exec_auto_assess_only and not core_sequence["autoAssessment"].lower() == 'true':
-                            self.composite_logger.log_debug("Auto-assessment cannot supersede the main core process trivially.")
-                            return core_sequence
-
-                        self.composite_logger.log_debug("Attempting to take ownership of core sequence.")
-                        self.read_only_mode = False
-                        self.update_core_sequence()
-                        self.read_only_mode = True
-
-                        # help re-evaluate if assertion succeeded
-                        with self.env_layer.file_system.open(self.core_state_file_path, mode="r") as file_handle:
-                            core_sequence = json.load(file_handle)['coreSequence']
-
-                    if os.getpid() in core_sequence['processIds']:
-                        self.composite_logger.log_debug("Successfully took ownership of core sequence.")
-                        self.read_only_mode = False
+        core_sequence = self.__read_core_sequence_file()
 
+        # The following code will only execute in the event of a bug
+        if not self.read_only_mode and os.getpid() not in core_sequence['processIds']:
+            self.composite_logger.log_error("SERIOUS ERROR -- Core sequence was taken over in violation of sequence contract.")
+            self.read_only_mode = True  # This should never happen, but we're switching back into read-only mode.
+            if self.execution_config.exec_auto_assess_only:  # Yield execution precedence out of caution, if it's low pri auto-assessment
                 return core_sequence
-            except Exception as error:
-                if i < Constants.MAX_FILE_OPERATION_RETRY_COUNT - 1:
-                    self.composite_logger.log_warning("Exception on core sequence read. [Exception={0}] [RetryCount={1}]".format(repr(error), str(i)))
-                    time.sleep(i + 1)
-                else:
-                    self.composite_logger.log_error("Unable to read core state file (retries exhausted). [Exception={0}]".format(repr(error)))
-                    raise
+
+        if self.read_only_mode:
+            if core_sequence['completed'].lower() == 'true' or len(self.identify_running_processes(core_sequence['processIds'])) == 0:
+                # Short-circuit for re-enable for completed non-auto-assess operations that should not run
+                if not self.execution_config.exec_auto_assess_only and core_sequence['number'] == self.execution_config.sequence_number and core_sequence['completed'].lower() == 'true':
+                    self.composite_logger.log_debug("Not attempting to take ownership of core sequence since the sequence number as it's already done and this is the main process.")
+                    return core_sequence
+
+                # Auto-assess over non-auto-assess is not a trivial override and is short-circuited to be evaluated in detail later
+                if self.execution_config.exec_auto_assess_only and not core_sequence["autoAssessment"].lower() == 'true':
+                    self.composite_logger.log_debug("Auto-assessment cannot supersede the main core process trivially.")
+                    return core_sequence
+
+                self.composite_logger.log_debug("Attempting to take ownership of core sequence.")
+                self.read_only_mode = False
+                self.update_core_sequence()
+                self.read_only_mode = True
+
+                # help re-evaluate if assertion succeeded
+                core_sequence = self.__read_core_sequence_file()
+
+            if os.getpid() in core_sequence['processIds']:
+                self.composite_logger.log_debug("Successfully took ownership of core sequence.")
+                self.read_only_mode = False
+
+        return core_sequence
+
+    def __read_core_sequence_file(self):
+        try:
+            return json.loads(self.env_layer.file_system.read_state_file(self.core_state_file_path))['coreSequence']
+        except Exception as error:
+            self.composite_logger.log_error("Unable to read core state file. [Exception={0}]".format(repr(error)))
+            raise
 
     def update_core_sequence(self, completed=False):
         if self.read_only_mode:
@@ -152,18 +164,13 @@ class LifecycleManager(object):
             self.composite_logger.log_error("Core state file path returned a directory. Attempting to reset.")
             shutil.rmtree(self.core_state_file_path)
 
-        for i in range(0, Constants.MAX_FILE_OPERATION_RETRY_COUNT):
-            try:
-                with self.env_layer.file_system.open(self.core_state_file_path, 'w+') as file_handle:
-                    file_handle.write(core_state_payload)
-            except Exception as error:
-                if i < Constants.MAX_FILE_OPERATION_RETRY_COUNT - 1:
-                    self.composite_logger.log_warning("Exception on core sequence update. [Exception={0}] [RetryCount={1}]".format(repr(error), str(i)))
-                    time.sleep(i + 1)
-                else:
-                    self.composite_logger.log_error("Unable to write to core state file (retries exhausted). [Exception={0}]".format(repr(error)))
-                    raise
+        try:
+            self.env_layer.file_system.write_state_file(self.core_state_file_path, core_state_payload)
+        except Exception as error:
+            self.composite_logger.log_error("Unable to write to core state file. [Exception={0}]".format(repr(error)))
+            raise
 
+        self.last_core_sequence_update_time = self.env_layer.datetime.monotonic()
         self.composite_logger.log_debug("Completed updating core sequence.")
     # endregion
 
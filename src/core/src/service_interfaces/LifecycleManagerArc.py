@@ -24,8 +24,8 @@ from core.src.service_interfaces.LifecycleManager import LifecycleManager
 class LifecycleManagerArc(LifecycleManager):
     """Class for managing the core code's lifecycle within the extension wrapper"""
 
-    def __init__(self, env_layer, execution_config, composite_logger, telemetry_writer, status_handler):
-        super(LifecycleManagerArc,self).__init__(env_layer,execution_config,composite_logger,telemetry_writer, status_handler)
+    def __init__(self, env_layer, execution_config, composite_logger, telemetry_writer, status_handler, state_file_check_min_interval_in_secs=Constants.LIFECYCLE_STATE_FILE_CHECK_MIN_INTERVAL_IN_SECONDS, core_sequence_heartbeat_interval_in_secs=Constants.CORE_SEQUENCE_HEARTBEAT_INTERVAL_IN_SECONDS):
+        super(LifecycleManagerArc,self).__init__(env_layer,execution_config,composite_logger,telemetry_writer, status_handler, state_file_check_min_interval_in_secs, core_sequence_heartbeat_interval_in_secs)
 
         # Handshake file paths
         self.ext_state_file_path = os.path.join(self.execution_config.config_folder, Constants.EXT_STATE_FILE)
@@ -158,24 +158,16 @@ class LifecycleManagerArc(LifecycleManager):
                              'processIds': []}
             return core_sequence
         
-        # Read (with retries for only IO Errors) - TODO: Refactor common code
-        for i in range(0, Constants.MAX_FILE_OPERATION_RETRY_COUNT):
-            try:
-                with self.env_layer.file_system.open(core_state_file_path, mode="r") as file_handle:
-                    core_sequence = json.load(file_handle)['coreSequence']
-                    return core_sequence
-            except Exception as error:
-                if i < Constants.MAX_FILE_OPERATION_RETRY_COUNT - 1:
-                    self.composite_logger.log_warning("Exception on arc core sequence read. [Exception={0}] [RetryCount={1}]".format(repr(error), str(i)))
-                    time.sleep(i + 1)
-                else:
-                    self.composite_logger.log_error("Unable to read arc core state file (retries exhausted). [Exception={0}]".format(repr(error)))
-                    raise
+        try:
+            return json.loads(self.env_layer.file_system.read_state_file(core_state_file_path))['coreSequence']
+        except Exception as error:
+            self.composite_logger.log_error("Unable to read arc core state file. [Exception={0}]".format(repr(error)))
+            raise
     
     def lifecycle_status_check(self):
         self.composite_logger.log_debug("Performing lifecycle status check...")
-        extension_sequence = self.read_extension_sequence()
-        arc_core_sequence = self.read_arc_core_sequence()
+        extension_sequence = self.read_state_file_at_interval(self.ext_state_file_path, self.read_extension_sequence)
+        arc_core_sequence = self.read_state_file_at_interval(self.arc_core_state_file_path, self.read_arc_core_sequence)
 
         if int(extension_sequence['number']) == int(self.execution_config.sequence_number):
             self.composite_logger.log_debug("Extension sequence number verified to have not changed: {0}".format(str(extension_sequence['number'])))
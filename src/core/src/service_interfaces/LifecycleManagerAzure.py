@@ -25,8 +25,8 @@ from core.src.service_interfaces.LifecycleManager import LifecycleManager
 class LifecycleManagerAzure(LifecycleManager):
     """Class for managing the core code's lifecycle within the extension wrapper"""
 
-    def __init__(self, env_layer, execution_config, composite_logger, telemetry_writer, status_handler):
-        super(LifecycleManagerAzure, self).__init__(env_layer, execution_config, composite_logger, telemetry_writer, status_handler)
+    def __init__(self, env_layer, execution_config, composite_logger, telemetry_writer, status_handler, state_file_check_min_interval_in_secs=Constants.LIFECYCLE_STATE_FILE_CHECK_MIN_INTERVAL_IN_SECONDS, core_sequence_heartbeat_interval_in_secs=Constants.CORE_SEQUENCE_HEARTBEAT_INTERVAL_IN_SECONDS):
+        super(LifecycleManagerAzure, self).__init__(env_layer, execution_config, composite_logger, telemetry_writer, status_handler, state_file_check_min_interval_in_secs, core_sequence_heartbeat_interval_in_secs)
 
         # Handshake file paths
         self.ext_state_file_path = os.path.join(self.execution_config.config_folder, Constants.EXT_STATE_FILE)
@@ -123,10 +123,10 @@ class LifecycleManagerAzure(LifecycleManager):
 
     def lifecycle_status_check(self):
         self.composite_logger.log_debug("Performing lifecycle status check...")
-        extension_sequence = self.read_extension_sequence()
+        extension_sequence = self.read_state_file_at_interval(self.ext_state_file_path, self.read_extension_sequence)
         if int(extension_sequence['number']) == int(self.execution_config.sequence_number):
             self.composite_logger.log_debug("Extension sequence number verified to have not changed: {0}".format(str(extension_sequence['number'])))
-            self.update_core_sequence(completed=False)
+            self.update_core_sequence_heartbeat()
         else:
             self.composite_logger.log_error("Extension goal state has changed. Terminating current sequence: {0}".format(self.execution_config.sequence_number))
             self.status_handler.report_sequence_number_changed_termination()        # fail everything in a sequence number change
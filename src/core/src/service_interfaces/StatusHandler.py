@@ -18,6 +18,7 @@ import json
 import os
 import re
 import shutil
+import threading
 import time
 from core.src.bootstrap.Constants import Constants
 
@@ -25,7 +26,7 @@ from core.src.bootstrap.Constants import Constants
 class StatusHandler(object):
     """Class for managing the core code's lifecycle within the extension wrapper"""
 
-    def __init__(self, env_layer, execution_config, composite_logger, telemetry_writer, vm_cloud_type):
+    def __init__(self, env_layer, execution_config, composite_logger, telemetry_writer, vm_cloud_type, write_coalescing_interval_in_secs=Constants.STATUS_FILE_WRITE_COALESCING_INTERVAL_IN_SECS):
         # Map supporting components for operation
         self.env_layer = env_layer
         self.execution_config = execution_config
@@ -34,6 +35,12 @@ class StatusHandler(object):
         self.status_file_path = self.execution_config.status_file_path
         self.__log_file_path = self.execution_config.log_file_path
         self.vm_cloud_type = vm_cloud_type
+        self.__lock = threading.RLock()     # errors are also reported by read-only queries running on worker threads (see ReadOnlyQueryPool)
+
+        # Status file write coalescing - transitioning updates within the interval are held in memory and written out together
+        self.__write_coalescing_interval_in_secs = write_coalescing_interval_in_secs
+        self.__last_status_file_write_time = None
+        self.__status_file_write_pending = False
 
         # Status components
         self.__high_level_status_message = ""
@@ -42,6 +49,8 @@ class StatusHandler(object):
         self.__installation_substatus_json = None
         self.__installation_summary_json = None
         self.__installation_packages = []
+        self.__installation_packages_map = {}   # patchId -> record in self.__installation_packages
+        self.__installation_substatus_pending = None    # (status, code) of an installation substatus update not yet composed
         self.__installation_errors = []
         self.__installation_total_error_count = 0  # All errors during install, includes errors not in error objects due to size limit
         self.__maintenance_window_exceeded = False
@@ -51,6 +60,8 @@ class StatusHandler(object):
         self.__assessment_substatus_json = None
         self.__assessment_summary_json = None
         self.__assessment_packages = []
+        self.__assessment_packages_map = {}     # patchId -> record in self.__assessment_packages
+        self.__assessment_substatus_pending = None      # (status, code) of an assessment substatus update not yet composed
         self.__assessment_errors = []
         self.__assessment_total_error_count = 0  # All errors during assess, includes errors not in error objects due to size limit
 
@@ -96,36 +107,36 @@ class StatusHandler(object):
     # region - Package Data
     def reset_assessment_data(self):
         """ Externally available method to wipe out any assessment package records in memory. """
-        self.__assessment_substatus_json = None
-        self.__assessment_summary_json = None
-        self.__assessment_packages = []
-        self.__assessment_errors = []
-        self.__assessment_total_error_count = 0
+        with self.__lock:
+            self.__assessment_substatus_json = None
+            self.__assessment_summary_json = None
+            self.__assessment_packages = []
+            self.__assessment_packages_map = {}
+            self.__assessment_substatus_pending = None
+            self.__assessment_errors = []
+            self.__assessment_total_error_count = 0
 
     def set_package_assessment_status(self, package_names, package_versions, classification="Other", status="Available"):
         """ Externally available method to set assessment status for one or more packages of the **SAME classification and status** """
-        self.composite_logger.log_debug("Setting package assessment status in bulk. [Count={0}]".format(str(len(package_names))))
-        for package_name, package_version in zip(package_names, package_versions):
-            patch_already_saved = False
-            patch_id = self.__get_patch_id(package_name, package_version)
-            for i in range(0, len(self.__assessment_packages)):
-                if patch_id == self.__assessment_packages[i]['patchId']:
-                    patch_already_saved = True
-                    self.__assessment_packages[i]['classifications'] = [classification]
-                    # self.__assessment_packages[i]['patchState'] = status
-
-            if patch_already_saved is False:
-                record = {
-                    "patchId": str(patch_id),
-                    "name": str(package_name),
-                    "version": str(package_version),
-                    "classifications": [classification]
-                    # "patchState": str(status) # Allows for capturing 'Installed' packages in addition to 'Available', when commented out, if spec changes
-                }
-                self.__assessment_packages.append(record)
-
-        self.__assessment_packages = self.sort_packages_by_classification_and_state(self.__assessment_packages)
-        self.set_assessment_substatus_json()
+        with self.__lock:
+            self.composite_logger.log_debug("Setting package assessment status in bulk. [Count={0}]".format(str(len(package_names))))
+            for package_name, package_version in zip(package_names, package_versions):
+                patch_id = self.__get_patch_id(package_name, package_version)
+                if patch_id in self.__assessment_packages_map:
+                    self.__assessment_packages_map[patch_id]['classifications'] = [classification]
+                    # self.__assessment_packages_map[patch_id]['patchState'] = status
+                else:
+                    record = {
+                        "patchId": str(patch_id),
+                        "name": str(package_name),
+                        "version": str(package_version),
+                        "classifications": [classification]
+                        # "patchState": str(status) # Allows for capturing 'Installed' packages in addition to 'Available', when commented out, if spec changes
+                    }
+                    self.__assessment_packages.append(record)
+                    self.__assessment_packages_map[record['patchId']] = record
+
+            self.set_assessment_substatus_json()
 
     def sort_packages_by_classification_and_state(self, packages_list):
         """ Sorts a list of packages (usually either self.__assessment_packages or self.__installation_packages) by classification and patchState properties.
@@ -155,35 +166,32 @@ class StatusHandler(object):
 
     def set_package_install_status(self, package_names, package_versions, status="Pending", classification=None):
         """ Externally available method to set installation status for one or more packages of the **SAME classification and status** """
-        self.composite_logger.log_debug("Setting package installation status in bulk. [Count={0}]".format(str(len(package_names))))
+        with self.__lock:
+            self.composite_logger.log_debug("Setting package installation status in bulk. [Count={0}]".format(str(len(package_names))))
 
-        package_names, package_versions = self.validate_packages_being_installed(package_names, package_versions)
+            package_names, package_versions = self.validate_packages_being_installed(package_names, package_versions)
 
-        for package_name, package_version in zip(package_names, package_versions):
-            self.composite_logger.log_debug("Logging progress [Package: " + package_name + "; Status: " + status + "]")
-            patch_already_saved = False
-            patch_id = self.__get_patch_id(package_name, package_version)
-            for i in range(0, len(self.__installation_packages)):
-                if patch_id == self.__installation_packages[i]['patchId']:
-                    patch_already_saved = True
+            for package_name, package_version in zip(package_names, package_versions):
+                self.composite_logger.log_debug("Logging progress [Package: " + package_name + "; Status: " + status + "]")
+                patch_id = self.__get_patch_id(package_name, package_version)
+                if patch_id in self.__installation_packages_map:
                     if classification is not None:
-                        self.__installation_packages[i]['classifications'] = [classification]
-                    self.__installation_packages[i]['patchInstallationState'] = status
-
-            if patch_already_saved is False:
-                if classification is None:
-                    classification = Constants.PackageClassification.OTHER
-                record = {
-                    "patchId": str(patch_id),
-                    "name": str(package_name),
-                    "version": str(package_version),
-                    "classifications": [classification],
-                    "patchInstallationState": str(status)
-                }
-                self.__installation_packages.append(record)
-
-        self.__installation_packages = self.sort_packages_by_classification_and_state(self.__installation_packages)
-        self.set_installation_substatus_json()
+                        self.__installation_packages_map[patch_id]['classifications'] = [classification]
+                    self.__installation_packages_map[patch_id]['patchInstallationState'] = status
+                else:
+                    if classification is None:
+                        classification = Constants.PackageClassification.OTHER
+                    record = {
+                        "patchId": str(patch_id),
+                        "name": str(package_name),
+                        "version": str(package_version),
+                        "classifications": [classification],
+                        "patchInstallationState": str(status)
+                    }
+                    self.__installation_packages.append(record)
+                    self.__installation_packages_map[record['patchId']] = record
+
+            self.set_installation_substatus_json()
 
     @staticmethod
     def validate_packages_being_installed(package_names, package_versions):
@@ -198,28 +206,32 @@ class StatusHandler(object):
 
     def set_package_install_status_classification(self, package_names, package_versions, classification=None):
         """ Externally available method to set classification for one or more packages being installed """
-        if classification is None:
-            self.composite_logger.log_debug("Classification not provided for the set of packages being installed. [Package Count={0}]".format(str(len(package_names))))
-            return
+        with self.__lock:
+            if classification is None:
+                self.composite_logger.log_debug("Classification not provided for the set of packages being installed. [Package Count={0}]".format(str(len(package_names))))
+                return
 
-        self.validate_packages_being_installed(package_names, package_versions)
+            self.validate_packages_being_installed(package_names, package_versions)
 
-        self.composite_logger.log_debug("Setting package installation classification in bulk. [Count={0}]".format(str(len(package_names))))
-        for package_name, package_version in zip(package_names, package_versions):
-            self.composite_logger.log_debug("Logging progress [Package: " + package_name + "; Package Version: " + package_version + "]")
-            patch_id = self.__get_patch_id(package_name, package_version)
-            for i in range(0, len(self.__installation_packages)):
-                if patch_id == self.__installation_packages[i]['patchId']:
+            self.composite_logger.log_debug("Setting package installation classification in bulk. [Count={0}]".format(str(len(package_names))))
+            for package_name, package_version in zip(package_names, package_versions):
+                self.composite_logger.log_debug("Logging progress [Package: " + package_name + "; Package Version: " + package_version + "]")
+                patch_id = self.__get_patch_id(package_name, package_version)
+                if patch_id in self.__installation_packages_map:
                     self.composite_logger.log_debug("Setting classification for package: [Package={0}] [Classification={1}]".format(str(package_name), str(classification)))
-                    self.__installation_packages[i]['classifications'] = [classification]
+                    self.__installation_packages_map[patch_id]['classifications'] = [classification]
 
-        self.__installation_packages = self.sort_packages_by_classification_and_state(self.__installation_packages)
-        self.set_installation_substatus_json()
+            self.set_installation_substatus_json()
 
     def __get_patch_id(self, package_name, package_version):
         """ Returns normalized patch id """
         return "{0}_{1}_{2}".format(str(package_name), str(package_version), self.__os_name_and_version)
 
+    @staticmethod
+    def __get_packages_map(packages):
+        """ Returns a patchId -> record index over the given package records. Records are shared, not copied. """
+        return dict((package['patchId'], package) for package in packages)
+
     def get_os_name_and_version(self):
         try:
             if self.env_layer.platform.system() != "Linux":
@@ -238,22 +250,23 @@ class StatusHandler(object):
 
     def set_installation_reboot_status(self, new_reboot_status):
         """ Valid reboot statuses: NotNeeded, Required, Started, Failed, Completed """
-        if new_reboot_status not in [Constants.RebootStatus.NOT_NEEDED, Constants.RebootStatus.REQUIRED, Constants.RebootStatus.STARTED, Constants.RebootStatus.FAILED, Constants.RebootStatus.COMPLETED]:
-            raise "Invalid reboot status specified. [Status={0}]".format(str(new_reboot_status))
-
-        # State transition validation
-        if (new_reboot_status == Constants.RebootStatus.NOT_NEEDED and self.__installation_reboot_status not in [Constants.RebootStatus.NOT_NEEDED])\
-                or (new_reboot_status == Constants.RebootStatus.REQUIRED and self.__installation_reboot_status not in [Constants.RebootStatus.NOT_NEEDED, Constants.RebootStatus.REQUIRED, Constants.RebootStatus.COMPLETED])\
-                or (new_reboot_status == Constants.RebootStatus.STARTED and self.__installation_reboot_status not in [Constants.RebootStatus.NOT_NEEDED, Constants.RebootStatus.REQUIRED, Constants.RebootStatus.STARTED])\
-                or (new_reboot_status == Constants.RebootStatus.FAILED and self.__installation_reboot_status not in [Constants.RebootStatus.STARTED, Constants.RebootStatus.FAILED])\
-                or (new_reboot_status == Constants.RebootStatus.COMPLETED and self.__installation_reboot_status not in [Constants.RebootStatus.STARTED, Constants.RebootStatus.COMPLETED]):
-            self.composite_logger.log_error("Invalid reboot status transition attempted. [CurrentRebootStatus={0}] [NewRebootStatus={1}]".format(self.__installation_reboot_status, str(new_reboot_status)))
-            return
+        with self.__lock:
+            if new_reboot_status not in [Constants.RebootStatus.NOT_NEEDED, Constants.RebootStatus.REQUIRED, Constants.RebootStatus.STARTED, Constants.RebootStatus.FAILED, Constants.RebootStatus.COMPLETED]:
+                raise "Invalid reboot status specified. [Status={0}]".format(str(new_reboot_status))
+
+            # State transition validation
+            if (new_reboot_status == Constants.RebootStatus.NOT_NEEDED and self.__installation_reboot_status not in [Constants.RebootStatus.NOT_NEEDED])\
+                    or (new_reboot_status == Constants.RebootStatus.REQUIRED and self.__installation_reboot_status not in [Constants.RebootStatus.NOT_NEEDED, Constants.RebootStatus.REQUIRED, Constants.RebootStatus.COMPLETED])\
+                    or (new_reboot_status == Constants.RebootStatus.STARTED and self.__installation_reboot_status not in [Constants.RebootStatus.NOT_NEEDED, Constants.RebootStatus.REQUIRED, Constants.RebootStatus.STARTED])\
+                    or (new_reboot_status == Constants.RebootStatus.FAILED and self.__installation_reboot_status not in [Constants.RebootStatus.STARTED, Constants.RebootStatus.FAILED])\
+                    or (new_reboot_status == Constants.RebootStatus.COMPLETED and self.__installation_reboot_status not in [Constants.RebootStatus.STARTED, Constants.RebootStatus.COMPLETED]):
+                self.composite_logger.log_error("Invalid reboot status transition attempted. [CurrentRebootStatus={0}] [NewRebootStatus={1}]".format(self.__installation_reboot_status, str(new_reboot_status)))
+                return
 
-        # Persisting new reboot status (with machine state incorporation)
-        self.composite_logger.log_debug("Setting new installation reboot status. [NewRebootStatus={0}] [CurrentRebootStatus={1}]".format(str(new_reboot_status), self.__installation_reboot_status))
-        self.__installation_reboot_status = new_reboot_status
-        self.set_installation_substatus_json()
+            # Persisting new reboot status (with machine state incorporation)
+            self.composite_logger.log_debug("Setting new installation reboot status. [NewRebootStatus={0}] [CurrentRebootStatus={1}]".format(str(new_reboot_status), self.__installation_reboot_status))
+            self.__installation_reboot_status = new_reboot_status
+            self.set_installation_substatus_json(force_write=True)
 
     def __refresh_installation_reboot_status(self):
         """ Discovers if the system needs a reboot. Never allows going back to NotNeeded (deliberate). ONLY called internally. """
@@ -266,50 +279,64 @@ class StatusHandler(object):
                 self.__installation_reboot_status = Constants.RebootStatus.REQUIRED
 
     def set_reboot_pending(self, is_reboot_pending):
-        log_message = "Setting reboot pending status. [RebootPendingStatus={0}]".format(str(is_reboot_pending))
-        self.composite_logger.log_debug(log_message)
-        self.is_reboot_pending = is_reboot_pending
+        with self.__lock:
+            log_message = "Setting reboot pending status. [RebootPendingStatus={0}]".format(str(is_reboot_pending))
+            self.composite_logger.log_debug(log_message)
+            self.is_reboot_pending = is_reboot_pending
     # endregion
 
     # region - Terminal state management
     def report_sequence_number_changed_termination(self):
         """ Based on the current operation, adds an error status and sets the substatus to error """
-        current_operation = self.execution_config.operation.lower()
-        error_code = Constants.PatchOperationErrorCodes.NEWER_OPERATION_SUPERSEDED
-        message = "Execution was stopped due to a newer operation taking precedence."
-
-        if current_operation == Constants.ASSESSMENT.lower() or self.execution_config.exec_auto_assess_only:
-            self.add_error_to_status(message, error_code, current_operation_override_for_error=Constants.ASSESSMENT)
-            self.set_assessment_substatus_json(status=Constants.STATUS_ERROR)
-        elif current_operation == Constants.CONFIGURE_PATCHING.lower() or current_operation == Constants.CONFIGURE_PATCHING_AUTO_ASSESSMENT.lower():
-            self.add_error_to_status(message, error_code, current_operation_override_for_error=Constants.CONFIGURE_PATCHING)
-            self.add_error_to_status(message, error_code, current_operation_override_for_error=Constants.CONFIGURE_PATCHING_AUTO_ASSESSMENT)
-            self.set_configure_patching_substatus_json(status=Constants.STATUS_ERROR)
-        elif current_operation == Constants.INSTALLATION.lower():
-            self.add_error_to_status(message, error_code, current_operation_override_for_error=Constants.INSTALLATION)
-            self.set_installation_substatus_json(status=Constants.STATUS_ERROR)
+        with self.__lock:
+            current_operation = self.execution_config.operation.lower()
+            error_code = Constants.PatchOperationErrorCodes.NEWER_OPERATION_SUPERSEDED
+            message = "Execution was stopped due to a newer operation taking precedence."
+
+            if current_operation == Constants.ASSESSMENT.lower() or self.execution_config.exec_auto_assess_only:
+                self.add_error_to_status(message, error_code, current_operation_override_for_error=Constants.ASSESSMENT)
+                self.set_assessment_substatus_json(status=Constants.STATUS_ERROR)
+            elif current_operation == Constants.CONFIGURE_PATCHING.lower() or current_operation == Constants.CONFIGURE_PATCHING_AUTO_ASSESSMENT.lower():
+                self.add_error_to_status(message, error_code, current_operation_override_for_error=Constants.CONFIGURE_PATCHING)
+                self.add_error_to_status(message, error_code, current_operation_override_for_error=Constants.CONFIGURE_PATCHING_AUTO_ASSESSMENT)
+                self.set_configure_patching_substatus_json(status=Constants.STATUS_ERROR)
+            elif current_operation == Constants.INSTALLATION.lower():
+                self.add_error_to_status(message, error_code, current_operation_override_for_error=Constants.INSTALLATION)
+                self.set_installation_substatus_json(status=Constants.STATUS_ERROR)
     # endregion - Terminal state management
 
     # region - Substatus generation
     def set_maintenance_window_exceeded(self, maintenance_windows_exceeded):
-        self.__maintenance_window_exceeded = maintenance_windows_exceeded
-        self.set_installation_substatus_json()
-
-    def set_assessment_substatus_json(self, status=Constants.STATUS_TRANSITIONING, code=0):
-        """ Prepare the assessment substatus json including the message containing assessment summary """
-        self.composite_logger.log_debug("Setting assessment substatus. [Substatus={0}]".format(str(status)))
+        with self.__lock:
+            self.__maintenance_window_exceeded = maintenance_windows_exceeded
+            self.set_installation_substatus_json()
+
+    def set_assessment_substatus_json(self, status=Constants.STATUS_TRANSITIONING, code=0, force_write=False):
+        """ Prepare the assessment substatus json including the message containing assessment summary.
+            Composition is deferred to the next status file write, so bursts of updates are only sorted and serialized once. """
+        with self.__lock:
+            self.composite_logger.log_debug("Setting assessment substatus. [Substatus={0}]".format(str(status)))
+            self.__assessment_substatus_pending = (status, code)
+
+            # Update status on disk
+            self.__write_status_file(force_write=force_write or not self.__is_transitioning(status))
+
+    def __compose_assessment_substatus_json(self):
+        """ Called by: __write_status_file. Composes a pending assessment substatus update from in-memory data. """
+        if self.__assessment_substatus_pending is None:
+            return
+        status, code = self.__assessment_substatus_pending
+        self.__assessment_substatus_pending = None
 
         # Wrap patches into assessment summary
+        self.__assessment_packages = self.sort_packages_by_classification_and_state(self.__assessment_packages)
         self.__assessment_summary_json = self.__new_assessment_summary_json(self.__assessment_packages, status, code)
 
         # Wrap assessment summary into assessment substatus
         self.__assessment_substatus_json = self.__new_substatus_json_for_operation(Constants.PATCH_ASSESSMENT_SUMMARY, status, code, json.dumps(self.__assessment_summary_json))
 
-        # Update status on disk
-        self.__write_status_file()
-
     def __new_assessment_summary_json(self, assessment_packages_json, status, code):
-        """ Called by: set_assessment_substatus_json
+        """ Called by: __compose_assessment_substatus_json
             Purpose: This composes the message inside the patch assessment summary substatus:
                 Root --> Status --> Substatus [name: "PatchAssessmentSummary"] --> FormattedMessage --> **Message** """
 
@@ -344,21 +371,35 @@ class StatusHandler(object):
             substatus_message["patchAssessmentStatusString"] = status
         return substatus_message
 
-    def set_installation_substatus_json(self, status=Constants.STATUS_TRANSITIONING, code=0):
-        """ Prepare the deployment substatus json including the message containing deployment summary """
-        self.composite_logger.log_debug("Setting installation substatus. [Substatus={0}]".format(str(status)))
+    def set_installation_substatus_json(self, status=Constants.STATUS_TRANSITIONING, code=0, force_write=False):
+        """ Prepare the deployment substatus json including the message containing deployment summary.
+            Composition is deferred to the next status file write, so bursts of updates are only sorted and serialized once. """
+        with self.__lock:
+            self.composite_logger.log_debug("Setting installation substatus. [Substatus={0}]".format(str(status)))
+            self.__installation_substatus_pending = (status, code)
+
+            # Reboot status refresh (kept eager, as the reboot status is read back by other components)
+            self.__refresh_installation_reboot_status()
+
+            # Update status on disk
+            self.__write_status_file(force_write=force_write or not self.__is_transitioning(status))
+
+    def __compose_installation_substatus_json(self):
+        """ Called by: __write_status_file. Composes a pending installation substatus update from in-memory data. """
+        if self.__installation_substatus_pending is None:
+            return
+        status, code = self.__installation_substatus_pending
+        self.__installation_substatus_pending = None
 
         # Wrap patches into installation summary
+        self.__installation_packages = self.sort_packages_by_classification_and_state(self.__installation_packages)
         self.__installation_summary_json = self.__new_installation_summary_json(self.__installation_packages)
 
         # Wrap deployment summary into installation substatus
         self.__installation_substatus_json = self.__new_substatus_json_for_operation(Constants.PATCH_INSTALLATION_SUMMARY, status, code, json.dumps(self.__installation_summary_json))
 
-        # Update status on disk
-        self.__write_status_file()
-
     def __new_installation_summary_json(self, installation_packages_json):
-        """ Called by: set_installation_substatus_json
+        """ Called by: __compose_installation_substatus_json
             Purpose: This composes the message inside the patch installation summary substatus:
                 Root --> Status --> Substatus [name: "PatchInstallationSummary"] --> FormattedMessage --> **Message** """
 
@@ -383,9 +424,6 @@ class StatusHandler(object):
             else:
                 self.composite_logger.log_error("Unknown patch state recorded: {0}".format(str(patch_installation_state)))
 
-        # Reboot status refresh
-        self.__refresh_installation_reboot_status()
-
         # Compose substatus message
         return {
             "installationActivityId": str(self.execution_config.activity_id),
@@ -410,14 +448,15 @@ class StatusHandler(object):
 
         self.composite_logger.log_debug("Setting patch metadata for healthstore substatus. [Substatus={0}] [Report to HealthStore={1}]".format(str(status), str(report_to_healthstore)))
 
-        # Wrap patch metadata into healthstore summary
-        self.__metadata_for_healthstore_summary_json = self.__new_patch_metadata_for_healthstore_json(patch_version, report_to_healthstore)
+        with self.__lock:
+            # Wrap patch metadata into healthstore summary
+            self.__metadata_for_healthstore_summary_json = self.__new_patch_metadata_for_healthstore_json(patch_version, report_to_healthstore)
 
-        # Wrap healthstore summary into healthstore substatus
-        self.__metadata_for_healthstore_substatus_json = self.__new_substatus_json_for_operation(Constants.PATCH_METADATA_FOR_HEALTHSTORE, status, code, json.dumps(self.__metadata_for_healthstore_summary_json))
+            # Wrap healthstore summary into healthstore substatus
+            self.__metadata_for_healthstore_substatus_json = self.__new_substatus_json_for_operation(Constants.PATCH_METADATA_FOR_HEALTHSTORE, status, code, json.dumps(self.__metadata_for_healthstore_summary_json))
 
-        # Update status on disk
-        self.__write_status_file()
+            # Update status on disk
+            self.__write_status_file(force_write=True)
 
         # wait period required in cases where we need to ensure HealthStore reads the status from GA
         if wait_after_update:
@@ -438,19 +477,20 @@ class StatusHandler(object):
                                               automatic_os_patch_state=Constants.AutomaticOSPatchStates.UNKNOWN,
                                               auto_assessment_state=Constants.AutoAssessmentStates.UNKNOWN):
         """ Prepare the configure patching substatus json including the message containing configure patching summary """
-        if self.execution_config.exec_auto_assess_only:
-            raise Exception("Auto-assessment mode. Unexpected attempt to update configure patching status.")
+        with self.__lock:
+            if self.execution_config.exec_auto_assess_only:
+                raise Exception("Auto-assessment mode. Unexpected attempt to update configure patching status.")
 
-        self.composite_logger.log_debug("Setting configure patching substatus. [Substatus={0}]".format(str(status)))
+            self.composite_logger.log_debug("Setting configure patching substatus. [Substatus={0}]".format(str(status)))
 
-        # Wrap default automatic OS patch state on the machine, at the time of this request, into configure patching summary
-        self.__configure_patching_summary_json = self.__new_configure_patching_summary_json(automatic_os_patch_state, auto_assessment_state, status, code)
+            # Wrap default automatic OS patch state on the machine, at the time of this request, into configure patching summary
+            self.__configure_patching_summary_json = self.__new_configure_patching_summary_json(automatic_os_patch_state, auto_assessment_state, status, code)
 
-        # Wrap configure patching summary into configure patching substatus
-        self.__configure_patching_substatus_json = self.__new_substatus_json_for_operation(Constants.CONFIGURE_PATCHING_SUMMARY, status, code, json.dumps(self.__configure_patching_summary_json))
+            # Wrap configure patching summary into configure patching substatus
+            self.__configure_patching_substatus_json = self.__new_substatus_json_for_operation(Constants.CONFIGURE_PATCHING_SUMMARY, status, code, json.dumps(self.__configure_patching_summary_json))
 
-        # Update status on disk
-        self.__write_status_file()
+            # Update status on disk
+            self.__write_status_file(force_write=True)
 
     def __new_configure_patching_summary_json(self, automatic_os_patch_state, auto_assessment_state, status, code):
         """ Called by: set_configure_patching_substatus_json
@@ -474,6 +514,10 @@ class StatusHandler(object):
             substatus_message["configurePatchStatusString"] = status
         return substatus_message
 
+    @staticmethod
+    def __is_transitioning(status):
+        return str(status).lower() == Constants.STATUS_TRANSITIONING.lower()
+
     @staticmethod
     def __new_substatus_json_for_operation(operation_name, status="Transitioning", code=0, message=json.dumps("{}")):
         """ Generic substatus for assessment, installation, configurepatching and healthstore metadata """
@@ -490,7 +534,7 @@ class StatusHandler(object):
 
     # region - Status generation
     def __reset_status_file(self):
-        self.env_layer.file_system.write_with_retry(self.status_file_path, '[{0}]'.format(json.dumps(self.__new_basic_status_json())), mode='w+')
+        self.env_layer.file_system.write_state_file(self.status_file_path, '[{0}]'.format(json.dumps(self.__new_basic_status_json())))
 
     def __new_basic_status_json(self):
         return {
@@ -524,104 +568,119 @@ class StatusHandler(object):
         :param initial_load: If no status file exists AND initial_load is true, a default initial status file is created.
         :return: None
         """
+        with self.__lock:
+
+            # Persist any coalesced updates before they are superseded by what is on disk
+            if not initial_load:
+                self.flush_status_file()
+
+            # Initializing records safely
+            self.__installation_substatus_json = None
+            self.__installation_summary_json = None
+            self.__installation_packages = []
+            self.__installation_packages_map = {}
+            self.__installation_substatus_pending = None
+            self.__installation_errors = []
+
+            self.__assessment_substatus_json = None
+            self.__assessment_summary_json = None
+            self.__assessment_packages = []
+            self.__assessment_packages_map = {}
+            self.__assessment_substatus_pending = None
+            self.__assessment_errors = []
+
+            self.__metadata_for_healthstore_substatus_json = None
+            self.__metadata_for_healthstore_summary_json = None
+
+            self.__configure_patching_substatus_json = None
+            self.__configure_patching_summary_json = None
+            self.__configure_patching_errors = []
+            self.__configure_patching_auto_assessment_errors = []
+
+            self.composite_logger.log_debug("Loading status file components [InitialLoad={0}].".format(str(initial_load)))
+
+            # Verify the status file exists - if not, reset status file
+            if not os.path.exists(self.status_file_path) and initial_load:
+                self.composite_logger.log_warning("Status file not found at initial load. Resetting status file to defaults.")
+                self.__reset_status_file()
+                return
 
-        # Initializing records safely
-        self.__installation_substatus_json = None
-        self.__installation_summary_json = None
-        self.__installation_packages = []
-        self.__installation_errors = []
-
-        self.__assessment_substatus_json = None
-        self.__assessment_summary_json = None
-        self.__assessment_packages = []
-        self.__assessment_errors = []
-
-        self.__metadata_for_healthstore_substatus_json = None
-        self.__metadata_for_healthstore_summary_json = None
-
-        self.__configure_patching_substatus_json = None
-        self.__configure_patching_summary_json = None
-        self.__configure_patching_errors = []
-        self.__configure_patching_auto_assessment_errors = []
-
-        self.composite_logger.log_debug("Loading status file components [InitialLoad={0}].".format(str(initial_load)))
-
-        # Verify the status file exists - if not, reset status file
-        if not os.path.exists(self.status_file_path) and initial_load:
-            self.composite_logger.log_warning("Status file not found at initial load. Resetting status file to defaults.")
-            self.__reset_status_file()
-            return
-
-        # Read the status file - raise exception on persistent failure
-        for i in range(0, Constants.MAX_FILE_OPERATION_RETRY_COUNT):
+            # Read the status file - raise exception on failure
             try:
-                with self.env_layer.file_system.open(self.status_file_path, 'r') as file_handle:
-                    status_file_data_raw = json.load(file_handle)[0]    # structure is array of 1
+                status_file_data_raw = json.loads(self.env_layer.file_system.read_state_file(self.status_file_path))[0]    # structure is array of 1
             except Exception as error:
-                if i < Constants.MAX_FILE_OPERATION_RETRY_COUNT - 1:
-                    time.sleep(i + 1)
-                else:
-                    self.composite_logger.log_error("Unable to read status file (retries exhausted). Error: {0}.".format(repr(error)))
-                    raise
+                self.composite_logger.log_error("Unable to read status file. Error: {0}.".format(repr(error)))
+                raise
 
-        # Load status data and sanity check structure - raise exception if data loss risk is detected on corrupt data
-        try:
-            status_file_data = status_file_data_raw
-            if 'status' not in status_file_data or 'substatus' not in status_file_data['status']:
-                self.composite_logger.log_error("Malformed status file. Resetting status file for safety.")
-                self.__reset_status_file()
-                return
-        except Exception as error:
-            self.composite_logger.log_error("Unable to load status file json. Error: {0}; Data: {1}".format(repr(error), str(status_file_data_raw)))
-            raise
-
-        # Load portions of data that need to be built on for next write - raise exception if corrupt data is encountered
-        # todo: refactor
-        self.__high_level_status_message = status_file_data['status']['formattedMessage']['message']
-        for i in range(0, len(status_file_data['status']['substatus'])):
-            name = status_file_data['status']['substatus'][i]['name']
-            if name == Constants.PATCH_INSTALLATION_SUMMARY:     # if it exists, it must be to spec, or an exception will get thrown
-                if self.execution_config.exec_auto_assess_only:
-                    self.__installation_substatus_json = status_file_data['status']['substatus'][i]
-                else:
-                    message = status_file_data['status']['substatus'][i]['formattedMessage']['message']
-                    self.__installation_summary_json = json.loads(message)
-                    self.__installation_packages = self.__installation_summary_json['patches']
-                    self.__maintenance_window_exceeded = bool(self.__installation_summary_json['maintenanceWindowExceeded'])
-                    self.__installation_reboot_status = self.__installation_summary_json['rebootStatus']
-                    errors = self.__installation_summary_json['errors']
-                    if errors is not None and errors['details'] is not None:
-                        self.__installation_errors = errors['details']
-                        self.__installation_total_error_count = self.__get_total_error_count_from_prev_status(errors['message'])
-            if name == Constants.PATCH_ASSESSMENT_SUMMARY:     # if it exists, it must be to spec, or an exception will get thrown
-                message = status_file_data['status']['substatus'][i]['formattedMessage']['message']
-                self.__assessment_summary_json = json.loads(message)
-                self.__assessment_packages = self.__assessment_summary_json['patches']
-                errors = self.__assessment_summary_json['errors']
-                if errors is not None and errors['details'] is not None:
-                    self.__assessment_errors = errors['details']
-                    self.__assessment_total_error_count = self.__get_total_error_count_from_prev_status(errors['message'])
-            if name == Constants.PATCH_METADATA_FOR_HEALTHSTORE:     # if it exists, it must be to spec, or an exception will get thrown
-                if self.execution_config.exec_auto_assess_only:
-                    self.__metadata_for_healthstore_substatus_json = status_file_data['status']['substatus'][i]
-                else:
-                    message = status_file_data['status']['substatus'][i]['formattedMessage']['message']
-                    self.__metadata_for_healthstore_summary_json = json.loads(message)
-            if name == Constants.CONFIGURE_PATCHING_SUMMARY:     # if it exists, it must be to spec, or an exception will get thrown
-                if self.execution_config.exec_auto_assess_only:
-                    self.__configure_patching_substatus_json = status_file_data['status']['substatus'][i]
-                else:
+            # Load status data and sanity check structure - raise exception if data loss risk is detected on corrupt data
+            try:
+                status_file_data = status_file_data_raw
+                if 'status' not in status_file_data or 'substatus' not in status_file_data['status']:
+                    self.composite_logger.log_error("Malformed status file. Resetting status file for safety.")
+                    self.__reset_status_file()
+                    return
+            except Exception as error:
+                self.composite_logger.log_error("Unable to load status file json. Error: {0}; Data: {1}".format(repr(error), str(status_file_data_raw)))
+                raise
+
+            # Load portions of data that need to be built on for next write - raise exception if corrupt data is encountered
+            # todo: refactor
+            self.__high_level_status_message = status_file_data['status']['formattedMessage']['message']
+            for i in range(0, len(status_file_data['status']['substatus'])):
+                name = status_file_data['status']['substatus'][i]['name']
+                if name == Constants.PATCH_INSTALLATION_SUMMARY:     # if it exists, it must be to spec, or an exception will get thrown
+                    if self.execution_config.exec_auto_assess_only:
+                        self.__installation_substatus_json = status_file_data['status']['substatus'][i]
+                    else:
+                        message = status_file_data['status']['substatus'][i]['formattedMessage']['message']
+                        self.__installation_summary_json = json.loads(message)
+                        self.__installation_packages = self.__installation_summary_json['patches']
+                        self.__installation_packages_map = self.__get_packages_map(self.__installation_packages)
+                        self.__maintenance_window_exceeded = bool(self.__installation_summary_json['maintenanceWindowExceeded'])
+                        self.__installation_reboot_status = self.__installation_summary_json['rebootStatus']
+                        errors = self.__installation_summary_json['errors']
+                        if errors is not None and errors['details'] is not None:
+                            self.__installation_errors = errors['details']
+                            self.__installation_total_error_count = self.__get_total_error_count_from_prev_status(errors['message'])
+                if name == Constants.PATCH_ASSESSMENT_SUMMARY:     # if it exists, it must be to spec, or an exception will get thrown
                     message = status_file_data['status']['substatus'][i]['formattedMessage']['message']
-                    self.__configure_patching_summary_json = json.loads(message)
-                    errors = self.__configure_patching_summary_json['errors']
+                    self.__assessment_summary_json = json.loads(message)
+                    self.__assessment_packages = self.__assessment_summary_json['patches']
+                    self.__assessment_packages_map = self.__get_packages_map(self.__assessment_packages)
+                    errors = self.__assessment_summary_json['errors']
                     if errors is not None and errors['details'] is not None:
-                        self.__configure_patching_errors = errors['details']
-                        self.__configure_patching_top_level_error_count = self.__get_total_error_count_from_prev_status(errors['message'])
-
-    def __write_status_file(self):
+                        self.__assessment_errors = errors['details']
+                        self.__assessment_total_error_count = self.__get_total_error_count_from_prev_status(errors['message'])
+                if name == Constants.PATCH_METADATA_FOR_HEALTHSTORE:     # if it exists, it must be to spec, or an exception will get thrown
+                    if self.execution_config.exec_auto_assess_only:
+                        self.__metadata_for_healthstore_substatus_json = status_file_data['status']['substatus'][i]
+                    else:
+                        message = status_file_data['status']['substatus'][i]['formattedMessage']['message']
+                        self.__metadata_for_healthstore_summary_json = json.loads(message)
+                if name == Constants.CONFIGURE_PATCHING_SUMMARY:     # if it exists, it must be to spec, or an exception will get thrown
+                    if self.execution_config.exec_auto_assess_only:
+                        self.__configure_patching_substatus_json = status_file_data['status']['substatus'][i]
+                    else:
+                        message = status_file_data['status']['substatus'][i]['formattedMessage']['message']
+                        self.__configure_patching_summary_json = json.loads(message)
+                        errors = self.__configure_patching_summary_json['errors']
+                        if errors is not None and errors['details'] is not None:
+                            self.__configure_patching_errors = errors['details']
+                            self.__configure_patching_top_level_error_count = self.__get_total_error_count_from_prev_status(errors['message'])
+
+    def flush_status_file(self):
+        """ Externally available method to write out any status updates held back by write coalescing. Called at operation boundaries and on exit. """
+        with self.__lock:
+            if self.__status_file_write_pending:
+                self.__write_status_file(force_write=True)
+
+    def __write_status_file(self, force_write=False):
         """ Composes and writes the status file from **already up-to-date** in-memory data.
             This is usually the final call to compose and persist after an in-memory data update in a specialized method.
 
+            Transitioning updates arriving within the coalescing interval of the last write are only marked as pending, and go out
+            with the next write. Terminal states, reboot and healthstore updates, operation changes and exit always write through.
+
             Pseudo-composition (including steps prior):
             [__new_basic_status_json()]
                 assessment_substatus_json == set_assessment_substatus_json()
@@ -655,6 +714,15 @@ class StatusHandler(object):
 
         :return: None
         """
+        current_time = time.time()
+        if not force_write and self.__last_status_file_write_time is not None \
+                and 0 <= current_time - self.__last_status_file_write_time < self.__write_coalescing_interval_in_secs:
+            self.__status_file_write_pending = True
+            return
+
+        self.__compose_assessment_substatus_json()
+        self.__compose_installation_substatus_json()
+
         status_file_payload = self.__new_basic_status_json()
         status_file_payload['status']['formattedMessage']['message'] = str(self.__high_level_status_message)
 
@@ -670,14 +738,18 @@ class StatusHandler(object):
             self.composite_logger.log_error("Core state file path returned a directory. Attempting to reset.")
             shutil.rmtree(self.status_file_path)
 
-        self.env_layer.file_system.write_with_retry_using_temp_file(self.status_file_path, '[{0}]'.format(json.dumps(status_file_payload)), mode='w+')
+        self.env_layer.file_system.write_state_file(self.status_file_path, '[{0}]'.format(json.dumps(status_file_payload)))
+        self.__last_status_file_write_time = current_time
+        self.__status_file_write_pending = False
     # endregion
 
     # region - Error objects
     def set_current_operation(self, operation):
-        if self.execution_config.exec_auto_assess_only and operation != Constants.ASSESSMENT:
-            raise Exception("Status reporting for a non-assessment operation was attempted when executing in auto-assessment mode. [Operation={0}]".format(str(operation)))
-        self.__current_operation = operation
+        with self.__lock:
+            if self.execution_config.exec_auto_assess_only and operation != Constants.ASSESSMENT:
+                raise Exception("Status reporting for a non-assessment operation was attempted when executing in auto-assessment mode. [Operation={0}]".format(str(operation)))
+            self.flush_status_file()
+            self.__current_operation = operation
 
     def get_current_operation(self):
         return self.__current_operation
@@ -691,54 +763,59 @@ class StatusHandler(object):
 
     def add_error_to_status(self, message, error_code=Constants.PatchOperationErrorCodes.DEFAULT_ERROR, current_operation_override_for_error=Constants.DEFAULT_UNSPECIFIED_VALUE):
         """ Add error to the respective error objects """
-        if not message or Constants.ERROR_ADDED_TO_STATUS in message:
-            return
-
-        formatted_message = self.__ensure_error_message_restriction_compliance(message)
-        # Compose error detail
-        error_detail = {
-            "code": str(error_code),
-            "message": str(formatted_message)
-        }
+        with self.__lock:
+            if not message or Constants.ERROR_ADDED_TO_STATUS in message:
+                return
 
-        # determine if a current operation override has been requested
-        current_operation = self.__current_operation if current_operation_override_for_error == Constants.DEFAULT_UNSPECIFIED_VALUE else current_operation_override_for_error
+            formatted_message = self.__ensure_error_message_restriction_compliance(message)
+            # Compose error detail
+            error_detail = {
+                "code": str(error_code),
+                "message": str(formatted_message)
+            }
 
-        if current_operation == Constants.ASSESSMENT:
-            if self.__try_add_error(self.__assessment_errors, error_detail):
-                self.__assessment_total_error_count += 1
-                # retain previously set status and code for assessment substatus
-                if self.__assessment_substatus_json is not None:
-                    self.set_assessment_substatus_json(status=self.__assessment_substatus_json["status"], code=self.__assessment_substatus_json["code"])
+            # determine if a current operation override has been requested
+            current_operation = self.__current_operation if current_operation_override_for_error == Constants.DEFAULT_UNSPECIFIED_VALUE else current_operation_override_for_error
+
+            if current_operation == Constants.ASSESSMENT:
+                if self.__try_add_error(self.__assessment_errors, error_detail):
+                    self.__assessment_total_error_count += 1
+                    # retain previously set status and code for assessment substatus
+                    if self.__assessment_substatus_pending is not None:
+                        self.set_assessment_substatus_json(status=self.__assessment_substatus_pending[0], code=self.__assessment_substatus_pending[1])
+                    elif self.__assessment_substatus_json is not None:
+                        self.set_assessment_substatus_json(status=self.__assessment_substatus_json["status"], code=self.__assessment_substatus_json["code"])
+                    else:
+                        self.set_assessment_substatus_json()
+            elif current_operation == Constants.INSTALLATION:
+                if self.__try_add_error(self.__installation_errors, error_detail):
+                    self.__installation_total_error_count += 1
+                    # retain previously set status and code for installation substatus
+                    if self.__installation_substatus_pending is not None:
+                        self.set_installation_substatus_json(status=self.__installation_substatus_pending[0], code=self.__installation_substatus_pending[1])
+                    elif self.__installation_substatus_json is not None:
+                        self.set_installation_substatus_json(status=self.__installation_substatus_json["status"], code=self.__installation_substatus_json["code"])
+                    else:
+                        self.set_installation_substatus_json()
+            elif current_operation == Constants.CONFIGURE_PATCHING or current_operation == Constants.CONFIGURE_PATCHING_AUTO_ASSESSMENT:
+                if current_operation == Constants.CONFIGURE_PATCHING_AUTO_ASSESSMENT:
+                    if self.__try_add_error(self.__configure_patching_auto_assessment_errors, error_detail):
+                        self.__configure_patching_auto_assessment_error_count += 1
                 else:
-                    self.set_assessment_substatus_json()
-        elif current_operation == Constants.INSTALLATION:
-            if self.__try_add_error(self.__installation_errors, error_detail):
-                self.__installation_total_error_count += 1
-                # retain previously set status and code for installation substatus
-                if self.__installation_substatus_json is not None:
-                    self.set_installation_substatus_json(status=self.__installation_substatus_json["status"], code=self.__installation_substatus_json["code"])
+                    if self.__try_add_error(self.__configure_patching_errors, error_detail):
+                        self.__configure_patching_top_level_error_count += 1
+
+                # retain previously set status, code, patchMode and M for configure patching substatus
+                if self.__configure_patching_substatus_json is not None:
+                    automatic_os_patch_state = json.loads(self.__configure_patching_substatus_json["formattedMessage"]["message"])["automaticOSPatchState"]
+                    auto_assessment_status = self.__json_try_get_key_value(self.__configure_patching_substatus_json["formattedMessage"]["message"],"autoAssessmentStatus","{}")
+                    auto_assessment_state = self.__json_try_get_key_value(json.dumps(auto_assessment_status), "autoAssessmentState", Constants.AutoAssessmentStates.UNKNOWN)
+                    self.set_configure_patching_substatus_json(status=self.__configure_patching_substatus_json["status"], code=self.__configure_patching_substatus_json["code"],
+                                                               automatic_os_patch_state=automatic_os_patch_state, auto_assessment_state=auto_assessment_state)
                 else:
-                    self.set_installation_substatus_json()
-        elif current_operation == Constants.CONFIGURE_PATCHING or current_operation == Constants.CONFIGURE_PATCHING_AUTO_ASSESSMENT:
-            if current_operation == Constants.CONFIGURE_PATCHING_AUTO_ASSESSMENT:
-                if self.__try_add_error(self.__configure_patching_auto_assessment_errors, error_detail):
-                    self.__configure_patching_auto_assessment_error_count += 1
-            else:
-                if self.__try_add_error(self.__configure_patching_errors, error_detail):
-                    self.__configure_patching_top_level_error_count += 1
-
-            # retain previously set status, code, patchMode and M for configure patching substatus
-            if self.__configure_patching_substatus_json is not None:
-                automatic_os_patch_state = json.loads(self.__configure_patching_substatus_json["formattedMessage"]["message"])["automaticOSPatchState"]
-                auto_assessment_status = self.__json_try_get_key_value(self.__configure_patching_substatus_json["formattedMessage"]["message"],"autoAssessmentStatus","{}")
-                auto_assessment_state = self.__json_try_get_key_value(json.dumps(auto_assessment_status), "autoAssessmentState", Constants.AutoAssessmentStates.UNKNOWN)
-                self.set_configure_patching_substatus_json(status=self.__configure_patching_substatus_json["status"], code=self.__configure_patching_substatus_json["code"],
-                                                           automatic_os_patch_state=automatic_os_patch_state, auto_assessment_state=auto_assessment_state)
+                    self.set_configure_patching_substatus_json()
             else:
-                self.set_configure_patching_substatus_json()
-        else:
-            return
+                return
 
     def __ensure_error_message_restriction_compliance(self, full_message):
         """ Removes line breaks, tabs and restricts message to a character limit """
@@ -13,6 +13,7 @@
 # limitations under the License.
 #
 # Requires Python 2.7+
+import collections
 import datetime
 import errno
 import json
@@ -20,30 +21,58 @@ import os
 import re
 import shutil
 import tempfile
+import threading
 import time
 
 from core.src.bootstrap.Constants import Constants
+from core.src.service_interfaces.DiagnosticArtifactStore import DiagnosticArtifactStore
 
 
 class TelemetryWriter(object):
     """Class for writing telemetry data to data transports"""
 
-    def __init__(self, env_layer, composite_logger, events_folder_path, telemetry_supported):
+    def __init__(self, env_layer, composite_logger, events_folder_path, telemetry_supported, events_writer_thread_enabled=False, diagnostic_artifacts_folder_path=None):
         self.env_layer = env_layer
         self.composite_logger = composite_logger
         self.__operation_id = str(datetime.datetime.utcnow())
         self.__task_name_watermark = "." + str(datetime.datetime.utcnow().hour) + "." + str(datetime.datetime.utcnow().minute) + "." + str(datetime.datetime.utcnow().second) + "." + str(os.getpid())
         self.__task_name = Constants.TelemetryTaskName.STARTUP + self.__task_name_watermark
+        self.__operation = Constants.TelemetryTaskName.STARTUP
         self.events_folder_path = None
         self.__telemetry_event_counter = 1  # will be added at the end of each event sent to telemetry to assist in tracing and identifying event/message loss in telemetry
         self.start_time_for_event_count_throttle_check = datetime.datetime.utcnow()
         self.event_count = 1
 
+        # Events are buffered in memory and persisted in one event file per flush
+        self.__event_buffer = []
+        self.__event_buffer_size = 0    # serialized size of the buffered events
+        self.__last_flush_time = time.time()
+        self.__events_dir_size = None   # tracked incrementally after the first scan, re-scanned only when close to the limit
+
+        # Events writer thread - when enabled, events are handed over through a bounded queue and persisted (and throttled) off the calling thread
+        self.__event_queue = collections.deque()
+        self.__event_queue_condition = threading.Condition()
+        self.__flush_requested_count = 0
+        self.__flush_completed_count = 0
+        self.__events_writer_stop_requested = False
+        self.__events_writer_thread = None
+        self.events_dropped_count = 0       # events not written as the queue was full
+        self.events_coalesced_count = 0     # repeats of the last queued event, folded into it as the queue was full
+
+        # Large diagnostic payloads are kept in local artifacts (per activity id and operation), and only referenced in events
+        self.diagnostic_artifacts_folder_path = diagnostic_artifacts_folder_path
+        self.diagnostic_artifact_store = DiagnosticArtifactStore(env_layer, diagnostic_artifacts_folder_path) if diagnostic_artifacts_folder_path is not None else None
+
         if self.__get_events_folder_path_exists(events_folder_path):
             self.events_folder_path = events_folder_path
 
         self.__is_telemetry_supported = telemetry_supported and self.events_folder_path is not None
 
+        if events_writer_thread_enabled and self.__is_telemetry_supported:
+            self.__events_writer_thread = threading.Thread(target=self.__events_writer_loop, name="TelemetryEventsWriter")
+            self.__events_writer_thread.daemon = True
+            self.__events_writer_thread.start()
+
         self.write_event('Started Linux patch core operation.', Constants.TelemetryEventLevel.Informational)
         self.write_machine_config_info()
 
@@ -56,21 +85,19 @@ class TelemetryWriter(object):
         return self.write_event(payload_json, Constants.TelemetryEventLevel.Informational)
 
     def write_package_info(self, package_name, package_ver, package_size, install_dur, install_result, code_path, install_cmd, output=''):
-        # Package information compiled after the package is attempted to be installed
-        max_output_length = 1024
-
-        # primary payload
+        # Package information compiled after the package is attempted to be installed - long output is only referenced, for specific troubleshooting
         message = {'package_name': str(package_name), 'package_version': str(package_ver),
                    'package_size': str(package_size), 'install_duration': str(install_dur),
                    'install_result': str(install_result), 'code_path': code_path,
-                   'install_cmd': str(install_cmd), 'output': str(output)[0:max_output_length]}
+                   'install_cmd': str(install_cmd), 'output': self.__get_output_for_event("Package install output", output)}
         self.write_event(message, Constants.TelemetryEventLevel.Informational)
 
-        # additional message payloads for output continuation only if we need it for specific troubleshooting
-        if len(output) > max_output_length:
-            for i in range(1, int(len(output)/max_output_length) + 1):
-                message = {'install_cmd': str(install_cmd), 'output_continuation': str(output)[(max_output_length*i):(max_output_length*(i+1))]}
-                self.write_event(message, Constants.TelemetryEventLevel.Informational)
+    def write_diagnostic_artifact(self, name, payload, event_level=Constants.TelemetryEventLevel.Verbose):
+        # Large diagnostic payload (e.g. a full package list) - kept in the diagnostic artifact store, with only a reference to it and its digest in the event
+        if self.diagnostic_artifact_store is None:
+            return self.write_event("{0}: {1}".format(name, self.composite_logger.format_list(payload) if isinstance(payload, list) else str(payload)), event_level)
+        reference = self.diagnostic_artifact_store.write(self.__operation_id, self.__operation, name, payload)
+        return self.write_event("{0}: {1}".format(name, json.dumps(reference, sort_keys=True)), event_level)
 
     # Composed payload
     def write_machine_config_info(self):
@@ -89,11 +116,20 @@ class TelemetryWriter(object):
         error_payload = {
             'cmd': str(cmd),
             'code': str(code),
-            'output': str(output)
+            'output': self.__get_output_for_event("Execution error output", output)
         }
         return self.write_event(error_payload, Constants.TelemetryEventLevel.Error)
     # endregion
 
+    def __get_output_for_event(self, name, output):
+        """ Short output is sent as is. Longer output is replaced by a reference to it in the diagnostic artifact store (or truncated, without a store). """
+        output = str(output)
+        if len(output) <= Constants.DIAGNOSTIC_ARTIFACT_TELEMETRY_OUTPUT_MAX_LENGTH:
+            return output
+        if self.diagnostic_artifact_store is None:
+            return output[0:Constants.DIAGNOSTIC_ARTIFACT_TELEMETRY_OUTPUT_MAX_LENGTH]
+        return self.diagnostic_artifact_store.write(self.__operation_id, self.__operation, name, output)
+
     # region Machine config retrieval methods
     def get_machine_processor(self):
         """Retrieve machine processor info"""
@@ -159,36 +195,175 @@ class TelemetryWriter(object):
             raise
 
     def write_event(self, message, event_level=Constants.TelemetryEventLevel.Informational, task_name=Constants.TelemetryTaskName.UNKNOWN, is_event_file_throttling_needed=True):
-        """ Creates and writes event to event file after validating none of the telemetry size restrictions are breached
+        """ Creates an event after validating none of the telemetry size restrictions are breached, and adds it to the event buffer (via the events writer queue, if enabled).
+        The buffer is written out to an event file when it is large enough, when the flush interval has elapsed, for errors, and at exit (close).
         NOTE: is_event_file_throttling_needed is used to determine if event file throttling is required and as such should always be True.
         The only scenario where this is False is when throttling is taking place and we write to telemetry about it. i.e. only from within __throttle_telemetry_writes_if_required()"""
         try:
             if not self.is_telemetry_supported() or not Constants.TELEMETRY_ENABLED_AT_EXTENSION:
                 return
 
-            # ensure file throttle limit is reached
-            self.__throttle_telemetry_writes_if_required(is_event_file_throttling_needed)
-
-            self.__delete_older_events_if_dir_size_limit_not_met()
+            is_on_events_writer_thread = self.__events_writer_thread is not None and threading.current_thread() is self.__events_writer_thread
+            if self.__events_writer_thread is None:
+                # ensure file throttle limit is reached
+                self.__throttle_telemetry_writes_if_required(is_event_file_throttling_needed)
 
             event = self.__new_event_json(event_level, message, task_name)
             if len(json.dumps(event)) > Constants.TELEMETRY_EVENT_SIZE_LIMIT_IN_CHARS:
                 self.composite_logger.log_telemetry_module_error("Cannot send data to telemetry as it exceeded the acceptable data size. [Data not sent={0}]".format(json.dumps(message)))
+                return
+            self.__telemetry_event_counter += 1
+
+            if self.__events_writer_thread is not None and not is_on_events_writer_thread:
+                self.__enqueue_event(event)
             else:
-                file_path, all_events = self.__get_file_and_content_to_write(self.events_folder_path, event)
-                self.__write_event_using_temp_file(file_path, all_events)
+                self.__write_event_to_buffer(event)
 
         except Exception as e:
             self.composite_logger.log_telemetry_module_error("Error occurred while writing telemetry events. [Error={0}]".format(repr(e)))
             raise Exception("Internal reporting error. Execution could not complete.")
 
+    def __write_event_to_buffer(self, event):
+        """ Adds an event to the event buffer, and writes the buffer out if any of the flush conditions are met """
+        event_size = len(json.dumps(event))
+
+        # an event file cannot grow past the file size limit, so make room first if required
+        if self.__event_buffer_size + event_size >= Constants.TELEMETRY_EVENT_FILE_SIZE_LIMIT_IN_CHARS:
+            self.__flush_event_buffer()
+
+        self.__event_buffer.append(event)
+        self.__event_buffer_size += event_size + 2  # list separator
+        self.event_count += 1
+
+        if event["EventLevel"] in [Constants.TelemetryEventLevel.Error, Constants.TelemetryEventLevel.Critical] \
+                or self.__event_buffer_size >= Constants.TELEMETRY_BUFFER_MAX_SIZE_IN_CHARS or self.__is_flush_interval_elapsed():
+            self.__flush_event_buffer()
+
+    def __is_flush_interval_elapsed(self):
+        return not 0 <= time.time() - self.__last_flush_time < Constants.TELEMETRY_BUFFER_FLUSH_INTERVAL_IN_SECONDS
+
+    def flush_events(self):
+        """ Externally available method to write out all buffered events. With the events writer thread, waits (bounded) for queued events to be written out. """
+        try:
+            if not self.is_telemetry_supported() or not Constants.TELEMETRY_ENABLED_AT_EXTENSION:
+                return
+
+            if self.__events_writer_thread is None:
+                self.__flush_event_buffer()
+                return
+
+            with self.__event_queue_condition:
+                self.__flush_requested_count += 1
+                flush_requested_count = self.__flush_requested_count
+                self.__event_queue_condition.notify_all()
+
+                wait_end_time = time.time() + Constants.TELEMETRY_EVENTS_DRAIN_TIMEOUT_IN_SECONDS
+                while self.__flush_completed_count < flush_requested_count and self.__events_writer_thread.is_alive():
+                    time_to_wait_in_secs = wait_end_time - time.time()
+                    if time_to_wait_in_secs <= 0:
+                        self.composite_logger.log_telemetry_module_error("Timed out waiting for telemetry events to be written. [QueuedEvents={0}]".format(str(len(self.__event_queue))))
+                        break
+                    self.__event_queue_condition.wait(time_to_wait_in_secs)
+
+        except Exception as e:
+            self.composite_logger.log_telemetry_module_error("Error occurred while flushing telemetry events. [Error={0}]".format(repr(e)))
+            raise Exception("Internal reporting error. Execution could not complete.")
+
+    def close(self):
+        """ Externally available method to drain and write out all remaining events, and stop the events writer thread. Called on exit. """
+        self.flush_events()
+
+        if self.events_dropped_count > 0 or self.events_coalesced_count > 0:
+            events_lost_msg = "Telemetry events were not written individually as the event queue was full. [Dropped={0}] [Coalesced={1}]".format(str(self.events_dropped_count), str(self.events_coalesced_count))
+            self.composite_logger.log_telemetry_module(events_lost_msg)
+            self.write_event(events_lost_msg, Constants.TelemetryEventLevel.Warning)
+            self.flush_events()
+
+        if self.__events_writer_thread is not None:
+            with self.__event_queue_condition:
+                self.__events_writer_stop_requested = True
+                self.__event_queue_condition.notify_all()
+            self.__events_writer_thread.join(Constants.TELEMETRY_EVENTS_DRAIN_TIMEOUT_IN_SECONDS)
+            self.__events_writer_thread = None
+
+    # region Events writer thread
+    def __enqueue_event(self, event):
+        """ Hands an event over to the events writer thread. Never blocks on the writer: if the queue is full, a repeat of the last queued event is coalesced into it,
+            errors displace the oldest queued event, and anything else is dropped. """
+        with self.__event_queue_condition:
+            if len(self.__event_queue) >= Constants.TELEMETRY_EVENT_QUEUE_MAX_SIZE:
+                if self.__is_repeat_event(self.__event_queue[-1], event):
+                    self.events_coalesced_count += 1
+                    return
+                if event["EventLevel"] not in [Constants.TelemetryEventLevel.Error, Constants.TelemetryEventLevel.Critical]:
+                    self.events_dropped_count += 1
+                    return
+                self.__event_queue.popleft()
+                self.events_dropped_count += 1
+
+            self.__event_queue.append(event)
+            self.__event_queue_condition.notify_all()
+
+    @staticmethod
+    def __is_repeat_event(queued_event, event):
+        """ Events are repeats if they only differ in timestamp and telemetry event counter """
+        return queued_event["EventLevel"] == event["EventLevel"] and queued_event["TaskName"] == event["TaskName"] \
+            and queued_event["Message"].rsplit(" [TC=", 1)[0] == event["Message"].rsplit(" [TC=", 1)[0]
+
+    def __events_writer_loop(self):
+        """ Events writer thread. Persists queued events, and is the only place event file throttling waits happen when the thread is enabled. """
+        while True:
+            with self.__event_queue_condition:
+                if len(self.__event_queue) == 0 and self.__flush_completed_count == self.__flush_requested_count and not self.__events_writer_stop_requested:
+                    self.__event_queue_condition.wait(Constants.TELEMETRY_BUFFER_FLUSH_INTERVAL_IN_SECONDS)
+                events = list(self.__event_queue)
+                self.__event_queue.clear()
+                flush_requested_count = self.__flush_requested_count
+                stop_requested = self.__events_writer_stop_requested
+
+            try:
+                for event in events:
+                    self.__throttle_telemetry_writes_if_required()
+                    self.__write_event_to_buffer(event)
+
+                if flush_requested_count != self.__flush_completed_count or stop_requested or self.__is_flush_interval_elapsed():
+                    self.__flush_event_buffer()
+            except Exception as e:
+                self.composite_logger.log_telemetry_module_error("Error occurred in the telemetry events writer. [Error={0}]".format(repr(e)))
+
+            with self.__event_queue_condition:
+                self.__flush_completed_count = flush_requested_count
+                self.__event_queue_condition.notify_all()
+                if stop_requested and len(self.__event_queue) == 0:
+                    return
+    # endregion
+
+    def __flush_event_buffer(self):
+        """ Writes all buffered events to a single event file """
+        self.__last_flush_time = time.time()
+        if len(self.__event_buffer) == 0:
+            return
+
+        events, self.__event_buffer, self.__event_buffer_size = self.__event_buffer, [], 0
+        self.__delete_older_events_if_dir_size_limit_not_met()
+        file_path, all_events = self.__get_file_and_content_to_write(self.events_folder_path, events)
+        self.__write_event_using_temp_file(file_path, all_events)
+
     def __delete_older_events_if_dir_size_limit_not_met(self):
         """ Delete older events until the at least one new event file can be added as per the size restrictions """
         try:
-            if self.__get_events_dir_size() < Constants.TELEMETRY_DIR_SIZE_LIMIT_IN_CHARS - Constants.TELEMETRY_EVENT_FILE_SIZE_LIMIT_IN_CHARS:
+            if self.__events_dir_size is None:
+                self.__events_dir_size = self.__get_events_dir_size()
+
+            if self.__events_dir_size < Constants.TELEMETRY_DIR_SIZE_LIMIT_IN_CHARS - Constants.TELEMETRY_EVENT_FILE_SIZE_LIMIT_IN_CHARS:
                 # Not deleting any existing event files as the event directory does not exceed max limit. At least one new event file can be added. Not printing this statement as it will add repetitive logs
                 return
 
+            # The tracked size does not account for event files consumed (deleted) by the agent, so confirm against the actual size
+            self.__events_dir_size = self.__get_events_dir_size()
+            if self.__events_dir_size < Constants.TELEMETRY_DIR_SIZE_LIMIT_IN_CHARS - Constants.TELEMETRY_EVENT_FILE_SIZE_LIMIT_IN_CHARS:
+                return
+
             self.composite_logger.log_telemetry_module("Events directory size exceeds maximum limit. Deleting older event files until at least one new event file can be added.")
             event_files = [os.path.join(self.events_folder_path, event_file) for event_file in os.listdir(self.events_folder_path) if (event_file.lower().endswith(".json"))]
             event_files.sort(key=os.path.getmtime, reverse=True)
@@ -205,7 +380,8 @@ class TelemetryWriter(object):
                 except Exception as e:
                     self.composite_logger.log_telemetry_module_error("Error deleting event file. [File={0}] [Exception={1}]".format(repr(event_file), repr(e)))
 
-            if self.__get_events_dir_size() >= Constants.TELEMETRY_DIR_SIZE_LIMIT_IN_CHARS:
+            self.__events_dir_size = self.__get_events_dir_size()
+            if self.__events_dir_size >= Constants.TELEMETRY_DIR_SIZE_LIMIT_IN_CHARS:
                 self.composite_logger.log_telemetry_module_error("Older event files were not deleted. Current event will not be sent to telemetry as events directory size exceeds maximum limit")
                 raise
 
@@ -213,8 +389,8 @@ class TelemetryWriter(object):
             self.composite_logger.log_telemetry_module_error("Error occurred while deleting older telemetry events. [Error={0}]".format(repr(e)))
             raise
 
-    def __get_file_and_content_to_write(self, folder_path, data):
-        """ Identifies the file where the event is to be written. Can be an existing event file or a new one depending upon the size restrictions. If event is to be written to an existing file, fetches retains it's content """
+    def __get_file_and_content_to_write(self, folder_path, events):
+        """ Identifies the file where the events are to be written. Usually a new one, but can be an existing event file (with the same timestamp) depending upon the size restrictions. If events are to be written to an existing file, fetches retains it's content """
         try:
             file_path = self.__get_event_file_path(folder_path)
             all_events = []
@@ -226,7 +402,8 @@ class TelemetryWriter(object):
                     file_path = self.__get_event_file_path(folder_path)
                 else:
                     all_events = self.__fetch_events_from_previous_file(file_path)  # fetches existing content within the file
-            all_events.append(data)
+                    self.__events_dir_size -= file_size     # the file is rewritten, with its content, below
+            all_events.extend(events)
             return file_path, all_events
         except Exception as e:
             self.composite_logger.log_telemetry_module_error("Error occurred while fetching event file to write the event to. [Error={0}]")
@@ -270,9 +447,9 @@ class TelemetryWriter(object):
             with tempfile.NamedTemporaryFile(mode, dir=os.path.dirname(file_path), delete=False) as tf:
                 json.dump(all_events, tf, default=all_events.__str__())
                 tempname = tf.name
+                file_size = tf.tell()
             shutil.move(tempname, file_path)
-            self.__telemetry_event_counter += 1
-            self.event_count += 1
+            self.__events_dir_size += file_size
         except Exception as error:
             self.composite_logger.log_telemetry_module_error("Unable to write to telemetry. [Event File={0}] [Error={1}].".format(str(file_path), repr(error)))
             raise
@@ -322,6 +499,7 @@ class TelemetryWriter(object):
     def set_task_name(self, task_name):
         # sets a disambiguating task name and watermark (timestamp and process id)
         self.__task_name = task_name + self.__task_name_watermark
+        self.__operation = task_name
 
     def is_telemetry_supported(self):
         """ Verifies if telemetry is available. Stops execution if not available. """
@@ -80,6 +80,113 @@ class TestAptitudePackageManager(unittest.TestCase):
         self.assertEqual(package_versions[1], '4.3-14ubuntu1.2')
         self.assertEqual(package_versions[2], '4.3-14ubuntu1')
 
+    def test_get_all_updates_with_package_metadata_cache(self):
+        package_manager = self.container.get('package_manager')
+        package_metadata_file = os.path.join(self.runtime.execution_config.config_folder, "test_package_metadata")
+        self.runtime.write_to_file(package_metadata_file, "metadata")
+        package_manager.package_metadata_cache_ttl_in_secs = 60
+        package_manager.package_metadata_paths = [package_metadata_file]
+        if os.path.exists(package_manager.package_metadata_cache_path):
+            os.remove(package_manager.package_metadata_cache_path)
+
+        commands_run = []
+        backup_run_command_output = self.runtime.env_layer.run_command_output
+
+        def run_command_output(cmd, no_output=False, chk_err=True, timeout_in_secs=None, output_handler=None):
+            commands_run.append(cmd)
+            return backup_run_command_output(cmd, no_output, chk_err, timeout_in_secs, output_handler)
+        self.runtime.env_layer.run_command_output = run_command_output
+
+        # first discovery populates the cache, second is served from it
+        available_updates, package_versions = package_manager.get_all_updates()
+        self.assertEqual(len(commands_run), 1)
+        self.assertTrue(os.path.exists(package_manager.package_metadata_cache_path))
+        cached_updates, cached_package_versions = package_manager.get_all_updates()
+        self.assertEqual(len(commands_run), 1)
+        self.assertEqual(cached_updates, available_updates)
+        self.assertEqual(cached_package_versions, package_versions)
+
+        # changed package metadata invalidates the cache
+        os.utime(package_metadata_file, (os.path.getatime(package_metadata_file), os.path.getmtime(package_metadata_file) + 10))
+        package_manager.get_all_updates()
+        self.assertEqual(len(commands_run), 2)
+
+        # expired entries are not used
+        package_manager.package_metadata_cache_ttl_in_secs = 0.000001
+        package_manager.get_all_updates()
+        self.assertEqual(len(commands_run), 3)
+
+        self.runtime.env_layer.run_command_output = backup_run_command_output
+
+    def test_refresh_repo_if_stale(self):
+        package_manager = self.container.get('package_manager')
+        repo_config_file = os.path.join(self.runtime.execution_config.config_folder, "test_sources.list")
+        self.runtime.write_to_file(repo_config_file, "deb http://archive.ubuntu.com/ubuntu/ bionic main")
+        package_manager.repo_refresh_freshness_window_in_secs = 60
+        package_manager.repo_config_paths = [repo_config_file]
+        if os.path.exists(package_manager.repo_refresh_state_file_path):
+            os.remove(package_manager.repo_refresh_state_file_path)
+
+        refresh_count = [0]
+        backup_refresh_repo = package_manager.refresh_repo
+
+        def refresh_repo():
+            refresh_count[0] += 1
+            backup_refresh_repo()
+        package_manager.refresh_repo = refresh_repo
+
+        # refreshed once within the freshness window
+        package_manager.refresh_repo_if_stale()
+        package_manager.refresh_repo_if_stale()
+        self.assertEqual(refresh_count[0], 1)
+        self.assertTrue(package_manager.repo_refreshed_in_current_run)
+
+        # forced refresh is always performed
+        package_manager.refresh_repo_if_stale(force_refresh=True)
+        self.assertEqual(refresh_count[0], 2)
+
+        # changes to repo configuration require a refresh
+        os.utime(repo_config_file, (os.path.getatime(repo_config_file), os.path.getmtime(repo_config_file) + 10))
+        package_manager.refresh_repo_if_stale()
+        self.assertEqual(refresh_count[0], 3)
+        package_manager.refresh_repo_if_stale()
+        self.assertEqual(refresh_count[0], 3)
+
+        # refreshes outside the freshness window are not reused
+        package_manager.repo_refresh_freshness_window_in_secs = 0.000001
+        package_manager.refresh_repo_if_stale()
+        self.assertEqual(refresh_count[0], 4)
+
+    def test_security_classification_from_single_simulation(self):
+        package_manager = self.container.get('package_manager')
+        commands_run = []
+
+        def invoke_package_manager(command, output_parser=None):
+            commands_run.append(command)
+            output = "Inst python-samba [2:4.4.5+dfsg-2ubuntu5.2] (2:4.4.5+dfsg-2ubuntu5.4 Ubuntu:16.10/yakkety-updates, Ubuntu:16.10/yakkety-security [amd64]) []\n" + \
+                     "Inst coreutils [8.25-2ubuntu2] (8.25-2ubuntu3~16.10 Ubuntu:16.10/yakkety-updates [amd64])\n" + \
+                     "Inst libssl1.0.0 [1.0.2g-1ubuntu4.15] (1.0.2g-1ubuntu4.16 Debian-Security:10/oldstable [amd64])\n" + \
+                     "The following packages could receive security updates with UA Infra: ESM service enabled:\n" + \
+                     "  libgcc5 libstdc++6\n" + \
+                     "Learn more about UA Infra: ESM service at https://ubuntu.com/esm\n"
+            if output_parser is not None:
+                output_parser.feed(output)
+            return output
+        package_manager.invoke_package_manager = invoke_package_manager
+
+        all_packages, all_package_versions = package_manager.get_all_updates()
+        security_packages, security_package_versions = package_manager.get_security_updates()
+        self.assertEqual(len(commands_run), 1)
+        self.assertEqual(all_packages, ["python-samba", "coreutils", "libssl1.0.0", "libgcc5", "libstdc++6"])
+        self.assertEqual(security_packages, ["python-samba", "libssl1.0.0", "libgcc5", "libstdc++6"])
+        self.assertEqual(security_package_versions, ["2:4.4.5+dfsg-2ubuntu5.4", "1.0.2g-1ubuntu4.16", Constants.UA_ESM_REQUIRED, Constants.UA_ESM_REQUIRED])
+
+        # classification is consumed, so a later check simulates afresh
+        other_packages, other_package_versions = package_manager.get_other_updates()
+        self.assertEqual(len(commands_run), 2)
+        self.assertEqual(other_packages, ["coreutils"])
+        self.assertEqual(other_package_versions, ["8.25-2ubuntu3~16.10"])
+
     def test_install_package_success(self):
         self.runtime.set_legacy_test_type('SuccessInstallPath')
 
@@ -99,6 +206,88 @@ class TestAptitudePackageManager(unittest.TestCase):
         self.assertEqual(package_manager.is_package_version_installed('mysql-server', '5.7.25-0ubuntu0.16.04.2'), True)
         self.assertEqual(package_manager.is_package_version_installed('mysql-client', '5.7.25-0ubuntu0.16.04.2'), False)
 
+    def test_is_installed_check_with_installed_package_snapshot(self):
+        package_manager = self.container.get('package_manager')
+        commands_run = []
+        installed_packages = {'mysql-server': 'amd64 5.7.25-0ubuntu0.16.04.2 install ok installed', 'mysql-client': 'amd64 5.7.25-0ubuntu0.16.04.2 deinstall ok config-files',
+                              'bash': 'amd64 4.3-14ubuntu1.2 install ok installed', 'dpkg': 'amd64 1.18.4ubuntu1.6 install ok installed', 'libc6:i386': 'i386 2.23-0ubuntu11 install ok installed'}
+
+        def run_command_output(cmd, no_output=False, chk_err=True):
+            commands_run.append(cmd)
+            queried_packages = cmd.split("\\n'")[1].split()
+            if len(queried_packages) == 0:
+                queried_packages = list(installed_packages.keys())
+            return 0, "\n".join([package.split(':')[0] + " " + installed_packages[package] for package in queried_packages])
+        self.runtime.env_layer.run_command_output = run_command_output
+
+        # answered from a single snapshot query
+        self.assertEqual(package_manager.is_package_version_installed('mysql-server', '5.7.25-0ubuntu0.16.04.2'), True)
+        self.assertEqual(package_manager.is_package_version_installed('mysql-client', '5.7.25-0ubuntu0.16.04.2'), False)
+        self.assertEqual(package_manager.is_package_version_installed('bash', '4.3-14ubuntu1.3'), False)
+        self.assertEqual(package_manager.is_package_version_installed('libc6:i386', '2.23-0ubuntu11'), True)     # foreign architecture
+        self.assertEqual(commands_run, [package_manager.installed_packages_query_cmd])
+
+        # only packages in a transaction are refreshed
+        installed_packages['bash'] = 'amd64 4.3-14ubuntu1.3 install ok installed'
+        package_manager.mark_installed_package_snapshot_stale(['bash'])
+        self.assertEqual(package_manager.is_package_version_installed('bash', '4.3-14ubuntu1.3'), True)
+        self.assertEqual(package_manager.is_package_version_installed('mysql-server', '5.7.25-0ubuntu0.16.04.2'), True)
+        self.assertEqual(commands_run[1:], [package_manager.installed_packages_query_cmd_template.replace('<PACKAGE-NAMES>', 'bash')])
+
+    def test_is_installed_check_with_dpkg_status_file(self):
+        package_manager = self.container.get('package_manager')
+        dpkg_status = "Package: mysql-server\nStatus: install ok installed\nPriority: optional\nVersion: 5.7.25-0ubuntu0.16.04.2\n" + \
+                      "Description: MySQL database server\n This is an empty package\n\n" + \
+                      "Package: mysql-client\nStatus: deinstall ok config-files\nVersion: 5.7.25-0ubuntu0.16.04.2\n\n" + \
+                      "Package: libc6\nStatus: install ok installed\nArchitecture: amd64\nMulti-Arch: same\nVersion: 2.23-0ubuntu11\n\n" + \
+                      "Package: libc6\nStatus: hold ok installed\nArchitecture: i386\nMulti-Arch: same\nVersion: 2.23-0ubuntu10\n\n" + \
+                      "Package: dpkg\nStatus: install ok installed\nMaintainer: Ubuntu Developers <ubuntu-devel-discuss@lists.ubuntu.com>\nArchitecture: amd64\nVersion: 1.18.4ubuntu1.6\n" + \
+                      "Description: Debian package management system\n Maintenu par l'\u00e9quipe Debian\n"
+        with open(package_manager.dpkg_status_file_path, 'wb') as file_handle:
+            file_handle.write(dpkg_status.encode('utf-8'))
+
+        commands_run = []
+        files_read = []
+        backup_open = self.runtime.env_layer.file_system.open
+
+        def run_command_output(cmd, no_output=False, chk_err=True):
+            commands_run.append(cmd)
+            return 0, ""
+
+        def mock_open(file_path, mode, raise_if_not_found=True):
+            files_read.append(file_path)
+            return backup_open(file_path, mode, raise_if_not_found)
+        self.runtime.env_layer.run_command_output = run_command_output
+        self.runtime.env_layer.file_system.open = mock_open
+
+        # read once, without any commands
+        self.assertEqual(package_manager.is_package_version_installed('mysql-server', '5.7.25-0ubuntu0.16.04.2'), True)
+        self.assertEqual(package_manager.is_package_version_installed('mysql-client', '5.7.25-0ubuntu0.16.04.2'), False)
+        self.assertEqual(package_manager.is_package_version_installed_in_snapshot('libc6', '2.23-0ubuntu11'), True)
+        self.assertEqual(package_manager.is_package_version_installed_in_snapshot('libc6', '2.23-0ubuntu10'), False)
+        self.assertEqual(package_manager.is_package_version_installed('libc6:i386', '2.23-0ubuntu10'), True)     # foreign architecture
+        self.assertEqual(commands_run, [])
+        self.assertEqual(files_read, [package_manager.dpkg_status_file_path])
+
+        # re-read when changed
+        with open(package_manager.dpkg_status_file_path, 'wb') as file_handle:
+            file_handle.write(dpkg_status.replace("deinstall ok config-files", "install ok installed").encode('utf-8'))
+        self.assertEqual(package_manager.is_package_version_installed('mysql-client', '5.7.25-0ubuntu0.16.04.2'), True)
+        self.assertEqual(len(files_read), 2)
+
+        # not re-read while it cannot be read
+        self.runtime.write_to_file(package_manager.dpkg_status_file_path, "Package: mysql-server\nStatus: install ok installed\nVersion: 5.7.25-0ubuntu0.16.04.2")
+        def mock_open_unreadable(file_path, mode, raise_if_not_found=True):
+            files_read.append(file_path)
+            raise Exception("Unable to read file")
+        self.runtime.env_layer.file_system.open = mock_open_unreadable
+        self.assertEqual(package_manager.is_package_version_installed_in_snapshot('mysql-server', '5.7.25-0ubuntu0.16.04.2'), None)
+        self.assertEqual(package_manager.is_package_version_installed_in_snapshot('mysql-server', '5.7.25-0ubuntu0.16.04.2'), None)
+        self.assertEqual(len(files_read), 3)
+        self.assertEqual(len(commands_run), 1)     # queried instead
+
+        self.runtime.env_layer.file_system.open = backup_open
+
     def test_install_package_failure(self):
         self.runtime.set_legacy_test_type('FailInstallPath')
 
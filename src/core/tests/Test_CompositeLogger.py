@@ -0,0 +1,87 @@
+# Copyright 2020 Microsoft Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Requires Python 2.7+
+
+import os
+import shutil
+import tempfile
+import unittest
+from core.src.bootstrap.Constants import Constants
+from core.src.bootstrap.EnvLayer import EnvLayer
+from core.src.local_loggers.CompositeLogger import CompositeLogger
+from core.src.local_loggers.FileLogger import FileLogger
+
+
+class TestCompositeLogger(unittest.TestCase):
+    def setUp(self):
+        self.test_folder = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.test_folder, "1.core.log")
+        env_layer = EnvLayer(real_record_path=os.path.join(self.test_folder, "1.core.rec"))
+        self.file_logger = FileLogger(env_layer, self.log_file)
+        self.composite_logger = CompositeLogger(env_layer, self.file_logger, current_env=Constants.PROD)
+
+    def tearDown(self):
+        self.file_logger.close()
+        shutil.rmtree(self.test_folder)
+
+    def read_log_file(self):
+        self.file_logger.flush()
+        with open(self.log_file, 'r') as file_handle:
+            return file_handle.read()
+
+    def test_lazy_messages(self):
+        self.composite_logger.log_debug("Formatted [Value={0}][Code={1}]", "test", 5)
+        self.composite_logger.log_warning(lambda: "Constructed")
+        self.composite_logger.log("Formatted [Value={0}]", "info")
+        self.composite_logger.log("Formatted [Value={0}]", "error", message_type=Constants.TelemetryEventLevel.Error)
+        log = self.read_log_file()
+        self.assertTrue("DEBUG: Formatted [Value=test][Code=5]" in log)
+        self.assertTrue("> Formatted [Value=info]" in log)
+        self.assertTrue("> Formatted [Value=error]" in log)
+        self.assertTrue("WARNING:Constructed" in log)
+
+    def test_verbosity(self):
+        constructed_messages = []
+
+        def construct_message():
+            constructed_messages.append(True)
+            return "Suppressed"
+
+        self.composite_logger.verbosity = Constants.LogVerbosity.INFO
+        self.assertFalse(self.composite_logger.is_enabled(Constants.LogVerbosity.DEBUG))
+        self.composite_logger.log_debug(construct_message)
+        self.composite_logger.log_verbose(construct_message)
+        self.composite_logger.log("Logged")
+        self.composite_logger.log(construct_message, message_type=Constants.TelemetryEventLevel.Verbose)
+        self.composite_logger.log_error("Logged error")
+        self.assertEqual(len(constructed_messages), 0)
+        log = self.read_log_file()
+        self.assertTrue("Suppressed" not in log)
+        self.assertTrue("> Logged" in log)
+        self.assertTrue("ERROR:Logged error" in log)
+
+    def test_format_output_and_list(self):
+        self.assertEqual(CompositeLogger.format_output("a\nb"), "\n|\ta\n|\tb")
+        output = CompositeLogger.format_output("\n".join([str(i) for i in range(Constants.LOG_OUTPUT_MAX_LINE_COUNT + 100)]))
+        self.assertEqual(len(output.splitlines()), Constants.LOG_OUTPUT_MAX_LINE_COUNT + 2)
+        self.assertTrue("<100 lines omitted>" in output)
+        self.assertTrue(output.endswith("|\t" + str(Constants.LOG_OUTPUT_MAX_LINE_COUNT + 99)))
+
+        self.assertEqual(CompositeLogger.format_list(["a", "b"]), "['a', 'b']")
+        self.assertTrue(CompositeLogger.format_list(list(range(Constants.LOG_LIST_MAX_ITEM_COUNT + 5))).endswith("<and 5 more>"))
+
+
+if __name__ == '__main__':
+    unittest.main()
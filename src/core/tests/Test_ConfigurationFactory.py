@@ -14,6 +14,7 @@
 #
 # Requires Python 2.7+
 
+import os
 import unittest
 from core.src.bootstrap.Bootstrapper import Bootstrapper
 from core.src.bootstrap.Constants import Constants
@@ -59,6 +60,27 @@ class TestConfigurationFactory(unittest.TestCase):
         self.assertEqual(config['package_manager_name'], Constants.APT)
         self.assertEqual(config['config_env'], Constants.DEV)
 
+    def test_log_verbosity_setting(self):
+        bootstrapper = Bootstrapper(self.argument_composer, capture_stdout=False)
+        config_factory = bootstrapper.configuration_factory
+        self.assertEqual(config_factory.get_bootstrap_configuration(Constants.PROD)['composite_logger']['component_kwargs']['verbosity'], Constants.DEFAULT_LOG_VERBOSITY)
+        self.assertEqual(config_factory.get_bootstrap_configuration(Constants.TEST)['composite_logger']['component_kwargs']['verbosity'], Constants.LogVerbosity.VERBOSE)
+
+        os.environ[Constants.LPE_LOG_VERBOSITY_VARIABLE] = "info"
+        try:
+            bootstrapper = Bootstrapper(self.argument_composer, capture_stdout=False)
+        finally:
+            del os.environ[Constants.LPE_LOG_VERBOSITY_VARIABLE]
+        config_factory = bootstrapper.configuration_factory
+        self.assertEqual(config_factory.get_bootstrap_configuration(Constants.PROD)['composite_logger']['component_kwargs']['verbosity'], Constants.LogVerbosity.INFO)
+        self.assertEqual(config_factory.get_bootstrap_configuration(Constants.TEST)['composite_logger']['component_kwargs']['verbosity'], Constants.LogVerbosity.INFO)
+
+        os.environ[Constants.LPE_LOG_VERBOSITY_VARIABLE] = "unknown"
+        try:
+            self.assertTrue(Bootstrapper.get_log_verbosity() is None)
+        finally:
+            del os.environ[Constants.LPE_LOG_VERBOSITY_VARIABLE]
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,79 @@
+# Copyright 2020 Microsoft Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Requires Python 2.7+
+
+import os
+import shutil
+import tempfile
+import unittest
+from core.src.bootstrap.EnvLayer import EnvLayer
+from core.src.service_interfaces.DiagnosticArtifactStore import DiagnosticArtifactStore
+
+
+class TestDiagnosticArtifactStore(unittest.TestCase):
+    def setUp(self):
+        self.test_folder = tempfile.mkdtemp()
+        self.artifacts_folder = os.path.join(self.test_folder, "diagnostics")
+        self.env_layer = EnvLayer(real_record_path=os.path.join(self.test_folder, "1.core.rec"))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_folder)
+
+    def test_write_and_read(self):
+        store = DiagnosticArtifactStore(self.env_layer, self.artifacts_folder)
+        packages = ["package{0}".format(str(i)) for i in range(0, 1000)]
+
+        first_reference = store.write("activity1", "Core.Exec", "Initial package list", packages)
+        second_reference = store.write("activity1", "Core.Exec", "Package install output", "output")
+        self.assertEqual(first_reference['artifact'], "activity1.Core.Exec.json.gz")
+        self.assertEqual(first_reference['offset'], 0)
+        self.assertEqual(first_reference['count'], 1000)
+        self.assertEqual(second_reference['artifact'], first_reference['artifact'])
+        self.assertTrue(second_reference['offset'] > 0)
+        self.assertTrue(os.path.getsize(os.path.join(self.artifacts_folder, first_reference['artifact'])) < first_reference['size'])    # compressed
+
+        # records read back in full, or by offset
+        records = store.read(first_reference['artifact'])
+        self.assertEqual([record['name'] for record in records], ["Initial package list", "Package install output"])
+        self.assertEqual(records[0]['sha256'], first_reference['sha256'])
+        record = store.read(second_reference['artifact'], second_reference['offset'])
+        self.assertEqual(record['payload'], "output")
+
+        # indexed by activity id
+        third_reference = store.write("activity2", "Core.AutoAssessment", "Full assessment", packages)
+        self.assertEqual(third_reference['sha256'], first_reference['sha256'])
+        self.assertEqual(store.get_artifact_file_names("activity1"), ["activity1.Core.Exec.json.gz"])
+        self.assertEqual(store.get_artifact_file_names("activity2"), ["activity2.Core.AutoAssessment.json.gz"])
+
+    def test_size_limits(self):
+        store = DiagnosticArtifactStore(self.env_layer, self.artifacts_folder, max_artifact_file_size_in_bytes=1, max_store_size_in_bytes=1)
+        payload = os.urandom(1024).hex() if hasattr(bytes, 'hex') else os.urandom(1024).encode('hex')    # not compressible
+
+        # records beyond the artifact file size limit are dropped, but still digested
+        self.assertEqual(store.write("activity1", "Core.Exec", "output", payload)['offset'], 0)
+        reference = store.write("activity1", "Core.Exec", "output", payload)
+        self.assertEqual(reference['artifact'], None)
+        self.assertEqual(len(reference['sha256']), 64)
+        self.assertEqual(len(store.read("activity1.Core.Exec.json.gz")), 1)
+
+        # the oldest artifact files are deleted beyond the store size limit
+        store.write("activity2", "Core.Exec", "output", payload)
+        self.assertEqual(store.get_artifact_file_names("activity1"), [])
+        self.assertFalse(os.path.exists(os.path.join(self.artifacts_folder, "activity1.Core.Exec.json.gz")))
+        self.assertEqual(store.get_artifact_file_names("activity2"), ["activity2.Core.Exec.json.gz"])
+
+
+if __name__ == '__main__':
+    unittest.main()
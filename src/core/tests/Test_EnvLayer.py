@@ -0,0 +1,156 @@
+# Copyright 2020 Microsoft Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Requires Python 2.7+
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from core.src.bootstrap.Constants import Constants
+from core.src.bootstrap.EnvLayer import EnvLayer
+
+
+class TestEnvLayer(unittest.TestCase):
+    def setUp(self):
+        self.command_runner = EnvLayer.CommandRunner()
+
+    def tearDown(self):
+        pass
+
+    def test_command_runner_argv_and_env(self):
+        argv, env = self.command_runner.get_argv_and_env("LANG=en_US.UTF8 sudo apt-get -s dist-upgrade")
+        self.assertEqual(argv, ["sudo", "apt-get", "-s", "dist-upgrade"])
+        self.assertEqual(env["LANG"], "en_US.UTF8")
+
+        argv, env = self.command_runner.get_argv_and_env("sudo yum list installed")
+        self.assertEqual(argv, ["sudo", "yum", "list", "installed"])
+        self.assertTrue(env is None)
+
+        # shell needed
+        for cmd in ["cat /proc/cpuinfo | grep name", "sudo yum --disablerepo='*' check-update", "echo $HOME", "a && b", "ls > out", "LANG=C"]:
+            self.assertEqual(self.command_runner.get_argv_and_env(cmd), (None, None))
+
+        self.assertEqual(self.command_runner.get_command_type("LANG=en_US.UTF8 sudo -E apt-get -s dist-upgrade"), "apt-get")
+        self.assertEqual(self.command_runner.get_command_type("/usr/bin/dpkg-query -W"), "dpkg-query")
+
+    def test_command_runner_run(self):
+        code, output = self.command_runner.run("echo test")
+        self.assertEqual(code, 0)
+        self.assertEqual(output.strip(), b"test")
+
+        code, output = self.command_runner.run("echo test | tr a-z A-Z")
+        self.assertEqual(code, 0)
+        self.assertEqual(output.strip(), b"TEST")
+
+        code, output = self.command_runner.run("exit 3")
+        self.assertEqual(code, 3)
+
+        code, output = self.command_runner.run("command-that-does-not-exist-1a2b3c")
+        self.assertEqual(code, 127)     # reported by the shell, same as before
+
+        code, output = self.command_runner.run("echo test", no_output=True)
+        self.assertEqual(code, 0)
+        self.assertTrue(output is None)
+
+        timings = self.command_runner.get_timings()
+        self.assertEqual(timings["echo"]["count"], 3)
+        self.assertEqual(timings["echo"]["timeout_count"], 0)
+
+    def test_command_runner_bounded_output(self):
+        self.command_runner.max_output_size_in_bytes = 100
+        code, output = self.command_runner.run("seq 1 1000")
+        self.assertEqual(code, 0)
+        self.assertTrue(output.startswith(b"1\n2\n3\n"))
+        self.assertTrue(output.endswith(b"998\n999\n1000\n"))
+        self.assertTrue(b"bytes of output truncated" in output)
+        self.assertTrue(len(output) < 200)
+
+    def test_command_runner_timeout(self):
+        code, output = self.command_runner.run("sleep 10; echo done", timeout_in_secs=1)
+        self.assertEqual(code, Constants.EnvLayer.COMMAND_TIMEOUT_EXIT_CODE)
+        self.assertTrue(b"done" not in output)
+        self.assertTrue(b"timed out" in output)
+        self.assertEqual(self.command_runner.get_timings()["sleep"]["timeout_count"], 1)
+
+    def test_state_file_store(self):
+        file_system = EnvLayer.FileSystem(recorder_enabled=False, emulator_enabled=False)
+        test_folder = tempfile.mkdtemp()
+        state_file_path = os.path.join(test_folder, "State.json")
+        try:
+            # atomic write, skipped if unchanged
+            self.assertTrue(file_system.write_state_file(state_file_path, '{"number": 1}'))
+            self.assertFalse(file_system.write_state_file(state_file_path, '{"number": 1}', fsync=False))
+            self.assertTrue(file_system.write_state_file(state_file_path, '{"number": 2}', fsync=False))
+            self.assertEqual(os.listdir(test_folder), ["State.json"])
+
+            # unchanged content is written again if the file was changed by someone else
+            with open(state_file_path, 'w') as file_handle:
+                file_handle.write('{"number": 3}')
+            os.utime(state_file_path, (0, 0))
+            self.assertTrue(file_system.write_state_file(state_file_path, '{"number": 2}'))
+
+            # cached read, until the file changes
+            self.assertEqual(file_system.read_state_file(state_file_path), '{"number": 2}')
+            backup_open = file_system.open
+            file_system.open = None
+            self.assertEqual(file_system.read_state_file(state_file_path), '{"number": 2}')
+            file_system.open = backup_open
+            file_system.write_state_file(state_file_path, '{"number": 4}')
+            self.assertEqual(file_system.read_state_file(state_file_path), '{"number": 4}')
+
+            # replaced without os.replace (Python 2), where os.rename does not replace existing files (Windows)
+            backup_os_replace = getattr(os, 'replace', None)
+            backup_os_name = os.name
+            try:
+                if backup_os_replace is not None:
+                    del os.replace
+                os.name = 'nt'
+                self.assertTrue(file_system.write_state_file(state_file_path, '{"number": 5}'))
+            finally:
+                if backup_os_replace is not None:
+                    os.replace = backup_os_replace
+                os.name = backup_os_name
+            self.assertEqual(file_system.read_state_file(state_file_path), '{"number": 5}')
+            self.assertEqual(os.listdir(test_folder), ["State.json"])
+        finally:
+            shutil.rmtree(test_folder)
+
+    def test_record_and_replay(self):
+        test_folder = tempfile.mkdtemp()
+        real_record_path = os.path.join(test_folder, "1.core.rec")
+        try:
+            recorder = EnvLayer(real_record_path=real_record_path, recorder_enabled=True)
+            self.assertEqual(recorder.run_command_output("echo first")[1], "first\n")
+            self.assertEqual(recorder.run_command_output("echo second; sleep 1")[1], "second\n")
+            recorder.run_command_output("echo third")
+
+            # fast replay, without recorded delays
+            start_time = time.time()
+            emulator = EnvLayer(real_record_path=real_record_path, emulator_enabled=True, emulator_replay_delay_enabled=False)
+            self.assertEqual(emulator.run_command_output("not run"), (0, "first\n"))
+            self.assertEqual(emulator.run_command_output("not run"), (0, "second\n"))
+            self.assertTrue(time.time() - start_time < 1)
+
+            # replay resumes where it left off after a restart
+            emulator = EnvLayer(real_record_path=real_record_path, emulator_enabled=True, emulator_replay_delay_enabled=False)
+            self.assertEqual(emulator.run_command_output("not run"), (0, "third\n"))
+            self.assertRaises(Exception, emulator.run_command_output, "not run")
+        finally:
+            shutil.rmtree(test_folder)
+
+
+if __name__ == '__main__':
+    unittest.main()
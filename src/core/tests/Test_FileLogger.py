@@ -0,0 +1,84 @@
+# Copyright 2020 Microsoft Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Requires Python 2.7+
+
+import os
+import shutil
+import tempfile
+import unittest
+from core.src.bootstrap.EnvLayer import EnvLayer
+from core.src.local_loggers.FileLogger import FileLogger
+
+
+class TestFileLogger(unittest.TestCase):
+    def setUp(self):
+        self.test_folder = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.test_folder, "1.core.log")
+        self.env_layer = EnvLayer(real_record_path=os.path.join(self.test_folder, "1.core.rec"))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_folder)
+
+    def read_log_file(self, log_file=None):
+        with open(log_file or self.log_file, 'r') as file_handle:
+            return file_handle.read()
+
+    def test_buffered_write(self):
+        file_logger = FileLogger(self.env_layer, self.log_file, buffer_size_in_bytes=100, flush_interval_in_secs=0)
+
+        # buffered until the buffer fills up
+        file_logger.write("\nfirst")
+        self.assertEqual(self.read_log_file(), "")
+        file_logger.write("\n" + "x" * 100)
+        self.assertTrue(self.read_log_file().startswith("\nfirst\nxxx"))
+
+        # written out right away on flush (e.g. errors)
+        file_logger.write("\nERROR:second", flush=True)
+        self.assertTrue(self.read_log_file().endswith("\nERROR:second"))
+
+        # written out on close
+        file_logger.write("\nthird")
+        file_logger.close(message_at_close="\n<closed>")
+        self.assertTrue(self.read_log_file().endswith("\nthird\n<closed>"))
+
+    def test_rotation(self):
+        with open(self.log_file, 'w') as file_handle:
+            file_handle.write("a" * 200)
+
+        # rotated on open, if beyond the maximum size
+        file_logger = FileLogger(self.env_layer, self.log_file, buffer_size_in_bytes=0, max_log_file_size_in_bytes=100, max_rotated_log_file_count=2)
+        self.assertEqual(self.read_log_file(self.log_file + ".1"), "a" * 200)
+        self.assertEqual(self.read_log_file(), "")
+
+        # and when a write would grow it beyond the maximum size
+        file_logger.write("b" * 60)
+        file_logger.write("c" * 60)
+        file_logger.write("d" * 60)
+        file_logger.close(message_at_close=None)
+        self.assertEqual(self.read_log_file(), "d" * 60)
+        self.assertEqual(self.read_log_file(self.log_file + ".1"), "c" * 60)
+        self.assertEqual(self.read_log_file(self.log_file + ".2"), "b" * 60)
+        self.assertFalse(os.path.exists(self.log_file + ".3"))
+
+    def test_timestamp(self):
+        file_logger = FileLogger(self.env_layer, self.log_file)
+        timestamp = file_logger.get_timestamp()
+        self.assertEqual(len(timestamp), len("2020-01-01T00:00:00Z"))
+        self.assertTrue(timestamp.endswith("Z"))
+        file_logger.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,8 +14,10 @@
 #
 # Requires Python 2.7+
 
+import datetime
 import os
 import unittest
+from core.src.bootstrap.Constants import Constants
 from core.tests.library.ArgumentComposer import ArgumentComposer
 from core.tests.library.RuntimeCompositor import RuntimeCompositor
 
@@ -41,6 +43,56 @@ class TestLifecycleManagerAzure(unittest.TestCase):
         new_core_sequence_json = self.lifecycle_manager.read_core_sequence()
         self.assertNotEqual(old_core_sequence_json["completed"], new_core_sequence_json["completed"])
 
+    def test_lifecycle_status_check_reads_changed_files_only(self):
+        extension_sequence_reads = []
+        ext_state_file_reads = []
+        core_sequence_updates = []
+        backup_read_extension_sequence = self.lifecycle_manager.read_extension_sequence
+        backup_open = self.runtime.env_layer.file_system.open
+        backup_update_core_sequence = self.lifecycle_manager.update_core_sequence
+
+        def mock_read_extension_sequence():
+            extension_sequence_reads.append(True)
+            return backup_read_extension_sequence()
+
+        def mock_open(file_path, *args, **kwargs):
+            if os.path.basename(file_path) == Constants.EXT_STATE_FILE:
+                ext_state_file_reads.append(True)
+            return backup_open(file_path, *args, **kwargs)
+
+        def mock_update_core_sequence(completed=False):
+            core_sequence_updates.append(completed)
+            return backup_update_core_sequence(completed)
+
+        self.lifecycle_manager.read_extension_sequence = mock_read_extension_sequence
+        self.runtime.env_layer.file_system.open = mock_open
+        self.lifecycle_manager.update_core_sequence = mock_update_core_sequence
+
+        # within the minimum interval and heartbeat interval, nothing is read or written again by the core sequence owner
+        self.lifecycle_manager.read_only_mode = False
+        self.lifecycle_manager.state_file_check_min_interval_in_secs = 3600
+        self.lifecycle_manager.core_sequence_heartbeat_interval_in_secs = 3600
+        for i in range(0, 5):
+            self.lifecycle_manager.lifecycle_status_check()
+        self.assertEqual(len(extension_sequence_reads), 1)
+        self.assertEqual(core_sequence_updates, [False])
+
+        # past the minimum interval, files are checked again - but unchanged files are not read again
+        ext_state_file_read_count = len(ext_state_file_reads)
+        self.lifecycle_manager.state_file_check_min_interval_in_secs = 0
+        self.lifecycle_manager.lifecycle_status_check()
+        self.assertEqual(len(extension_sequence_reads), 2)
+        self.assertEqual(len(ext_state_file_reads), ext_state_file_read_count)
+
+        # changed files are
+        self.runtime.write_ext_state_file(self.lifecycle_manager.ext_state_file_path, "2", datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ"), self.runtime.execution_config.operation)
+        os.utime(self.lifecycle_manager.ext_state_file_path, (0, 0))
+        with self.assertRaises(SystemExit):
+            self.lifecycle_manager.lifecycle_status_check()
+        self.assertEqual(len(ext_state_file_reads), ext_state_file_read_count + 1)
+        self.assertEqual(core_sequence_updates, [False, True])
+        self.runtime.env_layer.file_system.open = backup_open
+
     def test_read_extension_sequence_fail(self):
         old_ext_state_file_path = self.lifecycle_manager.ext_state_file_path
 
@@ -65,17 +117,17 @@ class TestLifecycleManagerAzure(unittest.TestCase):
         self.runtime.env_layer.file_system.open = self.mock_file_open_throw_exception
         core_sequence_json = self.assertRaises(Exception, self.lifecycle_manager.read_core_sequence)
         self.assertEqual(core_sequence_json, None)
-        # Unable to write to core state file (retries exhausted)
+        # Unable to write to core state file
 
-        # json throws exception, but in a different area to test retries exhausted
+        # json throws exception, but in a different area
         import json
-        backup_json_load = json.load
-        json.load = None
+        backup_json_loads = json.loads
+        json.loads = None
         self.runtime.env_layer.file_system.open = backup_open
         core_sequence_json = self.assertRaises(Exception, self.lifecycle_manager.read_core_sequence)
         self.assertEqual(core_sequence_json, None)
-        json.load = backup_json_load
-        # Unable to read core state file (retries exhausted).
+        json.loads = backup_json_loads
+        # Unable to read core state file.
 
     def test_read_core_sequence_success(self):
         old_core_state_file_path = self.lifecycle_manager.core_state_file_path
@@ -69,6 +69,16 @@ class TestMaintenanceWindow(unittest.TestCase):
         argument_composer.maximum_duration = "PT1H"
         runtime = RuntimeCompositor(argument_composer.get_composed_arguments(), True)
         self.assertEqual(runtime.maintenance_window.is_package_install_time_available(), True)
+        self.assertEqual(runtime.maintenance_window.is_package_install_time_available(expected_install_time_in_minutes=10), False)  # 21 min remaining vs. 15 + 10 min cutoff
+
+        # scheduling probes do not warn about running out of time
+        warnings = []
+        runtime.maintenance_window.composite_logger.log_warning = lambda message, *args: warnings.append(message)
+        self.assertTrue(runtime.maintenance_window.has_time_for_package_install(21, expected_install_time_in_minutes=5))
+        self.assertFalse(runtime.maintenance_window.has_time_for_package_install(21, expected_install_time_in_minutes=10))
+        self.assertEqual(warnings, [])
+        self.assertFalse(runtime.maintenance_window.is_package_install_time_available(21, expected_install_time_in_minutes=10))
+        self.assertEqual(len(warnings), 1)
         runtime.stop()
 
     def test_check_available_time_after_duration_complete(self):
@@ -79,5 +89,34 @@ class TestMaintenanceWindow(unittest.TestCase):
         self.assertEqual(runtime.maintenance_window.is_package_install_time_available(), False)
         runtime.stop()
 
+    def test_remaining_time_tracked_on_monotonic_clock(self):
+        argument_composer = ArgumentComposer()
+        argument_composer.start_time = (datetime.datetime.utcnow() - datetime.timedelta(minutes=20)).strftime("%Y-%m-%dT%H:%M:%S.9999Z")
+        argument_composer.maximum_duration = "PT1H"
+        runtime = RuntimeCompositor(argument_composer.get_composed_arguments(), True)
+
+        remaining_time = runtime.maintenance_window.get_remaining_time_in_minutes()
+        self.assertTrue(39 < remaining_time <= 40)
+
+        # elapsed time is measured on the monotonic clock from the first wall clock reading
+        monotonic_time, elapsed_time_in_minutes = runtime.maintenance_window.monotonic_clock_anchor
+        runtime.maintenance_window.monotonic_clock_anchor = (monotonic_time - 300, elapsed_time_in_minutes)
+        remaining_time = runtime.maintenance_window.get_remaining_time_in_minutes()
+        self.assertTrue(34 < remaining_time <= 35)
+        self.assertFalse(runtime.maintenance_window.is_package_install_time_available(remaining_time, expected_install_time_in_minutes=25))
+        self.assertEqual(runtime.maintenance_window.monotonic_clock_anchor[0], monotonic_time - 300)    # no further wall clock readings
+
+        # an explicit current time is used as is
+        current_time = runtime.maintenance_window.standard_start_time + datetime.timedelta(minutes=50)
+        self.assertEqual(int(runtime.maintenance_window.get_remaining_time_in_minutes(current_time)), 10)
+        runtime.stop()
+
+    def test_invalid_window_reported_on_use(self):
+        argument_composer = ArgumentComposer()
+        argument_composer.start_time = "2017-02-15 18:15:12"
+        runtime = RuntimeCompositor(argument_composer.get_composed_arguments(), True)
+        self.assertRaises(ValueError, runtime.maintenance_window.get_remaining_time_in_minutes)
+        runtime.stop()
+
 if __name__ == '__main__':
     unittest.main()
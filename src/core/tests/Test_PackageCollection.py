@@ -0,0 +1,50 @@
+# Copyright 2020 Microsoft Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Requires Python 2.7+
+
+import unittest
+from core.src.bootstrap.Constants import Constants
+from core.src.package_managers.PackageCollection import PackageCollection
+
+
+class TestPackageCollection(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_order_and_first_version_retained(self):
+        package_collection = PackageCollection(["python-samba", "samba-libs", "python-samba", "bash"], ["2", "3", "1", "4"])
+        self.assertEqual(len(package_collection), 3)
+        self.assertEqual(package_collection.get_packages(), ["python-samba", "samba-libs", "bash"])
+        self.assertEqual(package_collection.get_package_versions(), ["2", "3", "4"])
+        self.assertFalse(package_collection.add("samba-libs", "5"))
+        self.assertTrue(package_collection.add("zlib1g"))
+        self.assertEqual(package_collection.get_version("zlib1g"), Constants.DEFAULT_UNSPECIFIED_VALUE)
+
+    def test_lookup_and_removal(self):
+        package_collection = PackageCollection(["python-samba", "samba-libs", "bash"])
+        self.assertTrue("samba-libs" in package_collection)
+        self.assertEqual(package_collection.remove("samba-libs"), Constants.DEFAULT_UNSPECIFIED_VALUE)
+        self.assertFalse("samba-libs" in package_collection)
+        self.assertEqual(package_collection.remove("samba-libs"), None)
+        self.assertEqual(package_collection.get_version("samba-libs", "default"), "default")
+        self.assertEqual(list(package_collection), ["python-samba", "bash"])
+        self.assertEqual(package_collection.to_lists(), (["python-samba", "bash"], [Constants.DEFAULT_UNSPECIFIED_VALUE] * 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -15,6 +15,7 @@
 # Requires Python 2.7+
 
 import datetime
+import fnmatch
 import unittest
 from core.tests.library.ArgumentComposer import ArgumentComposer
 from core.tests.library.RuntimeCompositor import RuntimeCompositor
@@ -146,5 +147,28 @@ class TestPackageFilter(unittest.TestCase):
         runtime.stop()
 
 
+    def test_compiled_matching_same_as_fnmatch(self):
+        argument_composer = ArgumentComposer()
+        argument_composer.classifications_to_include = []
+        argument_composer.patches_to_include = ["ssh", "ssh*", "kernel-?.*", "lib[cs]*", "*-dev", "python.i686", "bash=4.3*", "bash=5*"]
+        argument_composer.patches_to_exclude = []
+        runtime = RuntimeCompositor(argument_composer.get_composed_arguments(), True)
+        package_filter = runtime.package_filter
+
+        packages = ["ssh", "ssh.x86_64", "openssh", "kernel-4.x86_64", "kernel-44", "libc6", "libssl", "libz", "zlib-dev", "python.i686", "python.x86_64", "bash", "bash.noarch"]
+        for package in packages:
+            expected = [index for index, mask in enumerate(package_filter.installation_included_packages)
+                        if fnmatch.fnmatch(package, mask) or fnmatch.fnmatch(package_filter.get_product_name_without_arch(package), mask)]
+            self.assertEqual(package_filter.get_mask_matcher(package_filter.installation_included_packages).get_matching_mask_indices(package), expected)
+            self.assertEqual(package_filter.get_mask_matcher(package_filter.installation_included_packages).get_matching_mask_indices(package), expected)    # memoized
+
+        self.assertEqual(package_filter.check_for_inclusion("bash", "4.3-14ubuntu1"), True)
+        self.assertEqual(package_filter.check_for_inclusion("bash", "5.0-6ubuntu1"), True)     # second mask for the same package
+        self.assertEqual(package_filter.check_for_inclusion("bash.noarch", "4.4-1"), False)
+        self.assertEqual(package_filter.check_for_inclusion("kernel-4.x86_64"), True)
+        self.assertEqual(package_filter.check_for_inclusion("kernel-44"), False)
+        runtime.stop()
+
+
 if __name__ == '__main__':
     unittest.main()
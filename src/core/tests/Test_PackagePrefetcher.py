@@ -0,0 +1,110 @@
+# Copyright 2020 Microsoft Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Requires Python 2.7+
+
+import datetime
+import os
+import threading
+import unittest
+from core.src.bootstrap.Constants import Constants
+from core.src.core_logic.PackagePrefetcher import PackagePrefetcher
+from core.tests.library.ArgumentComposer import ArgumentComposer
+from core.tests.library.RuntimeCompositor import RuntimeCompositor
+
+
+class TestPackagePrefetcher(unittest.TestCase):
+    def setUp(self):
+        self.download_cmds = []
+
+    def tearDown(self):
+        self.runtime.stop()
+
+    def __set_up_runtime(self, elapsed_minutes):
+        argument_composer = ArgumentComposer()
+        argument_composer.maximum_duration = 'PT1H'
+        argument_composer.start_time = (datetime.datetime.utcnow() - datetime.timedelta(minutes=elapsed_minutes)).strftime("%Y-%m-%dT%H:%M:%S.9999Z")
+        self.runtime = RuntimeCompositor(argument_composer.get_composed_arguments(), True, Constants.APT)
+        self.runtime.env_layer.run_command_output = self.mock_run_command_output
+        os.makedirs(self.runtime.package_manager.package_archive_folder)
+
+    def mock_run_command_output(self, cmd, no_output=False, chk_err=False, timeout_in_secs=None, output_handler=None):
+        if cmd.find(" -s install ") > -1:
+            return 0, "Inst git [1:2.17.1-1ubuntu0.5] (1:2.17.1-1ubuntu0.7 Ubuntu:18.04/bionic-updates [amd64])\n" + \
+                      "Inst git-man [1:2.17.1-1ubuntu0.5] (1:2.17.1-1ubuntu0.7 Ubuntu:18.04/bionic-updates [all])\n" + \
+                      "Inst liberror-perl [0.17025-1] (0.17025-2 Ubuntu:18.04/bionic-updates [all])\n"
+        self.download_cmds.append((cmd, timeout_in_secs))
+        for package_identifier in cmd.split(' download ')[1].split():
+            with open(os.path.join(self.runtime.package_manager.download_prefetch_folder, package_identifier.replace('=', '_') + '_amd64.deb'), 'w') as file_handle:
+                file_handle.write('archive')
+        return 0, ''
+
+    @staticmethod
+    def wait_for(condition):
+        for i in range(0, 100):
+            if condition():
+                return
+            threading.Event().wait(0.05)    # time.sleep is mocked out by the runtime
+
+    def test_downloads_handed_off_ahead_of_install(self):
+        self.__set_up_runtime(elapsed_minutes=10)
+        package_prefetcher = PackagePrefetcher(self.runtime.package_manager, self.runtime.maintenance_window, self.runtime.composite_logger, 10)
+        self.assertTrue(package_prefetcher.enabled)
+
+        package_prefetcher.request(['git-man', 'liberror-perl'], ['1:2.17.1-1ubuntu0.7', Constants.DEFAULT_UNSPECIFIED_VALUE])
+        package_prefetcher.request(['git-man'], ['1:2.17.1-1ubuntu0.7'])     # already requested
+        package_prefetcher.request(['sudo'], ['1.8.21p2-3ubuntu1.4'])
+        self.wait_for(lambda: not package_prefetcher.is_active())
+        self.assertEqual(package_prefetcher.downloaded_count, 2)
+
+        self.assertEqual(len(self.download_cmds), 2)
+        self.assertTrue(self.download_cmds[0][0].endswith("apt-get -q download git-man=1:2.17.1-1ubuntu0.7  liberror-perl"))
+        self.assertTrue(0 < self.download_cmds[0][1] <= (50 - 20) * 60)    # downloads never run past the maintenance window cutoff
+
+        package_prefetcher.hand_off()
+        self.assertEqual(package_prefetcher.handed_off_count, 3)
+        self.assertEqual(sorted(os.listdir(self.runtime.package_manager.package_archive_folder)), ['git-man_1:2.17.1-1ubuntu0.7_amd64.deb', 'liberror-perl_amd64.deb', 'sudo_1.8.21p2-3ubuntu1.4_amd64.deb'])
+        self.assertEqual(os.listdir(self.runtime.package_manager.download_prefetch_folder), [])
+        package_prefetcher.stop()
+
+    def test_dependencies_resolved_on_worker(self):
+        self.__set_up_runtime(elapsed_minutes=10)
+        package_prefetcher = PackagePrefetcher(self.runtime.package_manager, self.runtime.maintenance_window, self.runtime.composite_logger, 10)
+        package_prefetcher.request(['git'], ['1:2.17.1-1ubuntu0.7'], lambda dependent_list: ([dependency for dependency in dependent_list if dependency != 'liberror-perl'], ['1:2.17.1-1ubuntu0.7']))
+        self.wait_for(lambda: not package_prefetcher.is_active())
+        package_prefetcher.stop()
+
+        self.assertEqual(package_prefetcher.downloaded_count, 1)
+        self.assertTrue(self.download_cmds[0][0].endswith("apt-get -q download git=1:2.17.1-1ubuntu0.7 git-man=1:2.17.1-1ubuntu0.7"))
+        self.assertEqual(package_prefetcher.get_resolved_dependent_list('git'), ['git-man', 'liberror-perl'])     # for reuse by the install
+        self.assertTrue(package_prefetcher.get_resolved_dependent_list('sudo') is None)
+
+    def test_no_downloads_past_maintenance_window_cutoff(self):
+        self.__set_up_runtime(elapsed_minutes=45)
+        package_prefetcher = PackagePrefetcher(self.runtime.package_manager, self.runtime.maintenance_window, self.runtime.composite_logger, 10)
+        package_prefetcher.request(['git-man'], ['1:2.17.1-1ubuntu0.7'])
+        package_prefetcher.request(['sudo'], ['1.8.21p2-3ubuntu1.4'])
+        self.wait_for(lambda: not package_prefetcher.is_active())
+        package_prefetcher.stop()
+        self.assertEqual(self.download_cmds, [])
+        self.assertEqual(package_prefetcher.downloaded_count, 0)
+
+    def test_prefetch_disabled_for_dev_and_simulation(self):
+        self.__set_up_runtime(elapsed_minutes=10)
+        self.assertEqual(self.runtime.patch_installer.package_prefetch_count, 0)
+        self.assertFalse(PackagePrefetcher(self.runtime.package_manager, self.runtime.maintenance_window, self.runtime.composite_logger, 0).enabled)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -16,6 +16,7 @@
 import datetime
 import json
 import os
+import threading
 import unittest
 
 from core.src.bootstrap.Constants import Constants
@@ -55,6 +56,40 @@ class TestPatchAssessor(unittest.TestCase):
             file_contents = json.loads(file_handle.read())
             self.assertTrue('Unexpected return code (100) from package manager on command: LANG=en_US.UTF8 sudo apt-get -s dist-upgrade' in str(file_contents))
 
+    def test_assessment_with_concurrent_read_only_queries(self):
+        self.runtime.stop()
+        self.runtime = runtime = RuntimeCompositor(ArgumentComposer().get_composed_arguments(), True, Constants.YUM)    # stopped on tearDown
+        package_manager = runtime.package_manager
+        package_manager.read_only_query_max_concurrency = 2
+        self.assertTrue(package_manager.security_updates_query_independent)
+
+        query_threads = []
+        backup_get_all_updates = package_manager.get_all_updates
+        backup_get_security_updates = package_manager.get_security_updates
+
+        def get_all_updates(cached=False):
+            query_threads.append(("All", threading.current_thread().name))
+            return backup_get_all_updates(cached)
+
+        def get_security_updates():
+            query_threads.append(("Security", threading.current_thread().name))
+            return backup_get_security_updates()
+        package_manager.get_all_updates = get_all_updates
+        package_manager.get_security_updates = get_security_updates
+
+        self.assertTrue(runtime.patch_assessor.start_assessment())
+        self.assertEqual(sorted([query for query, thread_name in query_threads]), ["All", "Security"])
+        self.assertTrue(all(thread_name.startswith("ReadOnlyQueryWorker") for query, thread_name in query_threads))
+        self.assertTrue(package_manager.read_only_queries_contend_for_lock)
+        self.assertEqual(len(set(thread_name for query, thread_name in query_threads)), 1)     # yum readers wait on each other for the yum lock, so they share a worker
+
+        with runtime.env_layer.file_system.open(runtime.execution_config.status_file_path, 'r') as file_handle:
+            substatus_file_data = json.load(file_handle)[0]["status"]["substatus"][0]
+        self.assertEqual(substatus_file_data["status"].lower(), Constants.STATUS_SUCCESS.lower())
+        patches = json.loads(substatus_file_data["formattedMessage"]["message"])["patches"]
+        self.assertTrue(len(patches) > 0)
+        self.assertTrue(any("Security" in patch["classifications"] for patch in patches))
+
     def test_assessment_telemetry_fail(self):
         backup_telemetry_writer = self.runtime.telemetry_writer
         telemetry_writer = TelemetryWriter(self.runtime.env_layer, self.runtime.composite_logger, events_folder_path=None, telemetry_supported=False)
@@ -98,9 +133,14 @@ class TestPatchAssessor(unittest.TestCase):
         self.runtime.patch_assessor.write_assessment_state()
         self.assertTrue(self.runtime.patch_assessor.read_assessment_state() is not None)
 
-        # Opening file throws exception
+        # Unchanged file is not read again
         backup_open = self.runtime.patch_assessor.env_layer.file_system.open
         self.runtime.patch_assessor.env_layer.file_system.open = lambda: self.raise_ex()
+        self.assertTrue(self.runtime.patch_assessor.read_assessment_state() is not None)
+
+        # Opening file throws exception
+        os.utime(self.runtime.patch_assessor.assessment_state_file_path, (0, 0))
+        self.runtime.patch_assessor.env_layer.file_system.open = lambda: self.raise_ex()
         self.assertRaises(Exception, self.runtime.patch_assessor.read_assessment_state)
         self.assertRaises(Exception, self.runtime.patch_assessor.write_assessment_state)
         self.runtime.patch_assessor.env_layer.file_system.open = backup_open
@@ -18,8 +18,10 @@ import datetime
 import json
 import unittest
 from core.src.bootstrap.Constants import Constants
+from core.src.core_logic.PackagePrefetcher import PackagePrefetcher
 from core.tests.library.ArgumentComposer import ArgumentComposer
 from core.tests.library.RuntimeCompositor import RuntimeCompositor
+from core.tests.library.SyntheticEnvLayerExtensions import SyntheticEnvLayerExtensions
 
 
 class TestPatchInstaller(unittest.TestCase):
@@ -157,6 +159,135 @@ class TestPatchInstaller(unittest.TestCase):
         self.assertFalse(maintenance_window_exceeded)
         runtime.stop()
 
+    def test_get_excluded_updates_with_dependency_exclusion(self):
+        argument_composer = ArgumentComposer()
+        argument_composer.patches_to_exclude = ["selinux-policy-targeted.noarch"]
+        runtime = RuntimeCompositor(argument_composer.get_composed_arguments(), True, Constants.YUM)
+        runtime.set_legacy_test_type('HappyPath')
+        packages = ["selinux-policy.noarch", "selinux-policy-targeted.noarch"]
+        package_versions = ["3.13.1-102.el7_3.16", "3.13.1-102.el7_3.16"]
+
+        # selinux-policy-targeted is excluded directly, and selinux-policy through its dependency on it
+        excluded_packages, excluded_package_versions = runtime.patch_installer.get_excluded_updates(runtime.package_manager, packages, package_versions)
+        self.assertEqual(2, len(excluded_packages))
+        self.assertTrue("selinux-policy.noarch" in excluded_packages)
+        self.assertTrue("selinux-policy-targeted.noarch" in excluded_packages)
+        runtime.stop()
+
+    def test_get_excluded_updates_without_dependency_exclusion(self):
+        argument_composer = ArgumentComposer()
+        argument_composer.patches_to_exclude = ["kernel*"]
+        runtime = RuntimeCompositor(argument_composer.get_composed_arguments(), True, Constants.YUM)
+        runtime.set_legacy_test_type('HappyPath')
+        packages = ["selinux-policy.noarch", "selinux-policy-targeted.noarch"]
+        package_versions = ["3.13.1-102.el7_3.16", "3.13.1-102.el7_3.16"]
+
+        # the combined simulation pulls in nothing that is excluded, so no per-package resolution is needed
+        resolved_packages = []
+        backup_get_dependent_list = runtime.package_manager.get_dependent_list
+        runtime.package_manager.get_dependent_list = lambda package_name: resolved_packages.append(package_name) or backup_get_dependent_list(package_name)
+        excluded_packages, excluded_package_versions = runtime.patch_installer.get_excluded_updates(runtime.package_manager, packages, package_versions)
+        self.assertEqual(0, len(excluded_packages))
+        self.assertEqual(["selinux-policy.noarch selinux-policy-targeted.noarch"], resolved_packages)
+        runtime.stop()
+
+    def test_install_batch_bisection(self):
+        argument_composer = ArgumentComposer()
+        runtime = RuntimeCompositor(argument_composer.get_composed_arguments(), True, Constants.YUM)
+        runtime.set_legacy_test_type('SuccessInstallPath')
+
+        # packages in a transaction only get installed if no package in it fails
+        batch_transactions = []
+        single_installs = []
+
+        def mock_install_update_and_dependencies_batch(package_and_dependencies_batch, package_and_dependency_versions_batch, simulate=False):
+            batch_transactions.append([package_and_dependencies[0] for package_and_dependencies in package_and_dependencies_batch])
+            transaction_failed = any(package_and_dependencies[0] == "bad-package" for package_and_dependencies in package_and_dependencies_batch)
+            return [None if transaction_failed else Constants.INSTALLED] * len(package_and_dependencies_batch)
+
+        def mock_install_update_and_dependencies(package_and_dependencies, package_and_dependency_versions, simulate=False):
+            single_installs.append(package_and_dependencies[0])
+            return Constants.FAILED if package_and_dependencies[0] == "bad-package" else Constants.INSTALLED
+
+        runtime.package_manager.install_update_and_dependencies_batch = mock_install_update_and_dependencies_batch
+        runtime.package_manager.install_update_and_dependencies = mock_install_update_and_dependencies
+
+        batch = [["a"], ["b"], ["bad-package"], ["d"]]
+        batch_versions = [["1"], ["1"], ["1"], ["1"]]
+        install_results = runtime.patch_installer.install_batch(runtime.package_manager, batch, batch_versions)
+
+        self.assertEqual([Constants.INSTALLED, Constants.INSTALLED, Constants.FAILED, Constants.INSTALLED], install_results)
+        self.assertEqual([["a", "b", "bad-package", "d"], ["a", "b"], ["bad-package", "d"]], batch_transactions)
+        self.assertEqual(["bad-package"] * Constants.MAX_INSTALLATION_RETRY_COUNT + ["d"], single_installs)
+
+        # simulated transactions verify nothing, so packages are simulated individually - without batch transactions
+        del batch_transactions[:]
+        del single_installs[:]
+        install_results = runtime.patch_installer.install_batch(runtime.package_manager, batch, batch_versions, simulate=True)
+        self.assertEqual([Constants.INSTALLED, Constants.INSTALLED, Constants.FAILED, Constants.INSTALLED], install_results)
+        self.assertEqual(0, len(batch_transactions))
+        self.assertEqual(["a", "b"] + ["bad-package"] * Constants.MAX_INSTALLATION_RETRY_COUNT + ["d"], single_installs)
+        runtime.stop()
+
+    def test_prefetch_with_dependencies_resolved_on_worker(self):
+        argument_composer = ArgumentComposer()
+        argument_composer.classifications_to_include = [Constants.PackageClassification.SECURITY]
+        runtime = RuntimeCompositor(argument_composer.get_composed_arguments(), True, Constants.APT)
+        synthetic_env_layer_extensions = SyntheticEnvLayerExtensions(Constants.APT, 15)
+        runtime.env_layer.run_command_output = synthetic_env_layer_extensions.run_command_output
+        runtime.patch_installer.package_prefetch_count = 2
+
+        # as when other pending updates need attribution - dependencies of the security updates are not resolved in a single simulation
+        runtime.package_manager.get_dependent_lists = lambda packages, package_versions=None, is_attribution_required=None: {}
+        security_packages = sorted(synthetic_env_layer_extensions.security_packages)
+
+        prefetch_requests = []
+        backup_request = PackagePrefetcher.request
+
+        def request(package_prefetcher, package_and_dependencies, package_and_dependency_versions, dependency_filter=None):
+            prefetch_requests.append((package_and_dependencies, dependency_filter))
+
+        PackagePrefetcher.request = request
+        try:
+            runtime.patch_installer.install_updates(runtime.maintenance_window, runtime.package_manager)
+        finally:
+            PackagePrefetcher.request = backup_request
+
+        self.assertEqual([security_packages[1:2], security_packages[2:3], security_packages[2:3]], [request[0] for request in prefetch_requests])
+        self.assertTrue(all(request[1] is not None for request in prefetch_requests))
+        other_package = synthetic_env_layer_extensions.packages[1]
+        self.assertEqual(([other_package, security_packages[0]], [Constants.DEFAULT_UNSPECIFIED_VALUE, synthetic_env_layer_extensions.available_versions[security_packages[0]]]),
+                         prefetch_requests[0][1](["not-an-update", other_package, security_packages[0]]))     # pending updates are downloaded along, at their requested versions
+        self.assertEqual([], synthetic_env_layer_extensions.get_pending_packages(security_packages))
+        runtime.stop()
+
+    def test_install_schedule_from_install_history(self):
+        argument_composer = ArgumentComposer()
+        runtime = RuntimeCompositor(argument_composer.get_composed_arguments(), True, Constants.APT)
+        package_manager = runtime.package_manager
+
+        package_manager.record_package_install("slow-package", 180, "1.2 MB")
+        package_manager.record_package_install("fast-package", 10)
+        package_manager.record_package_install("fast-package", 30)     # smoothed
+        package_manager.save_package_install_history()
+
+        package_manager.package_install_history = None     # as in the next invocation
+        self.assertEqual(package_manager.get_expected_package_install_time_in_minutes("slow-package"), 9)
+        self.assertEqual(package_manager.get_expected_package_install_time_in_minutes("fast-package"), Constants.PACKAGE_INSTALL_EXPECTED_MIN_TIME_IN_MINUTES)
+        self.assertEqual(package_manager.get_expected_package_install_time_in_minutes("new-package"), Constants.PACKAGE_INSTALL_EXPECTED_MAX_TIME_IN_MINUTES)
+        self.assertEqual(package_manager.get_package_install_history()["fast-package"]["installDurationInSecs"], 20)
+        self.assertEqual(package_manager.get_package_install_history()["slow-package"]["packageSize"], "1.2 MB")
+
+        # security first, then shortest expected install time first
+        packages, package_versions = runtime.patch_installer.get_scheduled_install_order(package_manager, ["slow-package", "new-package", "fast-package", "security-package"], ["1", "2", "3", "4"], ["security-package"])
+        self.assertEqual(packages, ["security-package", "fast-package", "new-package", "slow-package"])
+        self.assertEqual(package_versions, ["4", "3", "2", "1"])
+
+        # packages that don't fit in the time left are skipped while shorter ones still do
+        self.assertTrue(runtime.maintenance_window.is_package_install_time_available(Constants.REBOOT_BUFFER_IN_MINUTES + 2, expected_install_time_in_minutes=package_manager.get_expected_package_install_time_in_minutes("fast-package")))
+        self.assertFalse(runtime.maintenance_window.is_package_install_time_available(Constants.REBOOT_BUFFER_IN_MINUTES + 2, expected_install_time_in_minutes=package_manager.get_expected_package_install_time_in_minutes("new-package")))
+        runtime.stop()
+
     def test_healthstore_writes(self):
         self.healthstore_writes_helper("HealthStoreId", None, expected_patch_version="HealthStoreId")
         self.healthstore_writes_helper("HealthStoreId", "MaintenanceRunId", expected_patch_version="HealthStoreId")
@@ -0,0 +1,61 @@
+# Copyright 2020 Microsoft Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Requires Python 2.7+
+
+import os
+import shutil
+import tempfile
+import unittest
+from core.src.bootstrap.RecordStore import RecordStore
+
+
+class TestRecordStore(unittest.TestCase):
+    def setUp(self):
+        self.test_folder = tempfile.mkdtemp()
+        self.record_path = os.path.join(self.test_folder, "1.core.rec")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_folder)
+
+    def test_append_and_read(self):
+        record_store = RecordStore(self.record_path)
+        record_store.open_writer()
+        for i in range(0, 100):
+            self.assertEqual(record_store.append({"operation": "RUN_CMD_OUT", "code": i, "output": "output{0}\n".format(str(i)) * 100}), i)
+        record_store.close()
+        self.assertTrue(os.path.getsize(self.record_path) < 100 * 900)    # compressed
+        self.assertEqual(os.path.getsize(record_store.index_path), 100 * RecordStore.OFFSET_SIZE)
+
+        # read by record number, in any order
+        record_store = RecordStore(self.record_path)
+        record_store.open_reader()
+        self.assertEqual(record_store.get_record_count(), 100)
+        self.assertEqual(record_store.read(99)["code"], 99)
+        self.assertEqual(record_store.read(42)["output"], "output42\n" * 100)
+        self.assertRaises(Exception, record_store.read, 100)
+
+        # replay position is persisted as records are read
+        self.assertEqual(record_store.read_next()["code"], 0)
+        self.assertEqual(record_store.read_next()["code"], 1)
+        record_store.close()
+        record_store = RecordStore(self.record_path)
+        record_store.open_reader()
+        self.assertEqual(record_store.get_pointer(), 2)
+        self.assertEqual(record_store.read_next()["code"], 2)
+        record_store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+# Copyright 2020 Microsoft Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Requires Python 2.7+
+
+import unittest
+from core.src.bootstrap.Constants import Constants
+from core.tests.benchmarks.RuntimeBenchmark import RuntimeBenchmark
+
+
+class TestRuntimeBenchmark(unittest.TestCase):
+    def test_benchmark_scenarios(self):
+        results = RuntimeBenchmark(package_counts=[10], measure_memory=False).run()
+        self.assertEqual(len(results['scenarios']), 6)
+
+        for scenario in results['scenarios']:
+            self.assertTrue(all(status == Constants.STATUS_SUCCESS.lower() for status in scenario['substatus'].values()))
+            self.assertTrue(scenario['subprocess_invocations'] > 0)
+            self.assertTrue(scenario['status_file_writes'] > 0)
+            self.assertTrue(scenario['telemetry_events'] > 0)
+            if scenario['operation'] == Constants.INSTALLATION:
+                self.assertTrue(Constants.PATCH_INSTALLATION_SUMMARY in scenario['substatus'])
+                self.assertEqual(scenario['pending_package_count'], 0)
+            else:
+                self.assertEqual(scenario['pending_package_count'], 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
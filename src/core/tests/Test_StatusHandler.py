@@ -15,6 +15,8 @@
 # Requires Python 2.7+
 import datetime
 import json
+import os
+import threading
 import unittest
 from core.src.bootstrap.Constants import Constants
 from core.src.service_interfaces.StatusHandler import StatusHandler
@@ -198,6 +200,31 @@ class TestStatusHandler(unittest.TestCase):
         self.assertEqual(json.loads(substatus_file_data["formattedMessage"]["message"])["errors"]["code"], 1)
         self.assertEqual(len(json.loads(substatus_file_data["formattedMessage"]["message"])["errors"]["details"]), 1)
 
+    def test_add_error_from_worker_thread(self):
+        # read-only queries report errors from worker threads, while the caller updates status
+        self.runtime.status_handler.set_current_operation(Constants.ASSESSMENT)
+        worker_errors = []
+
+        def add_errors():
+            try:
+                for i in range(0, 200):
+                    self.runtime.status_handler.add_error_to_status("exception" + str(i), Constants.PatchOperationErrorCodes.DEFAULT_ERROR)
+            except Exception as error:
+                worker_errors.append(error)
+
+        worker = threading.Thread(target=add_errors)
+        worker.start()
+        for i in range(0, 200):
+            self.runtime.status_handler.set_package_assessment_status(["package" + str(i)], ["1.0." + str(i)])
+        worker.join()
+
+        self.assertEqual(worker_errors, [])
+        with self.runtime.env_layer.file_system.open(self.runtime.execution_config.status_file_path, 'r') as file_handle:
+            substatus_file_data = json.load(file_handle)[0]["status"]["substatus"][0]
+        message = json.loads(substatus_file_data["formattedMessage"]["message"])
+        self.assertEqual(len(message["patches"]), 200)
+        self.assertEqual(len(message["errors"]["details"]), 5)
+
     def test_add_duplicate_error(self):
         # Setting operation to assessment to add all errors under assessment substatus
         self.runtime.status_handler.set_current_operation(Constants.ASSESSMENT)
@@ -235,20 +262,26 @@ class TestStatusHandler(unittest.TestCase):
     def test_add_error_fail(self):
         self.runtime.status_handler.set_current_operation(Constants.ASSESSMENT)
 
-        import tempfile
-        tempfile_backup = tempfile.NamedTemporaryFile
-        tempfile.NamedTemporaryFile = None
+        rename_backup = os.rename
+        replace_backup = getattr(os, 'replace', None)     # Python 3.3+
+        os.rename = None
+        if replace_backup is not None:
+            os.replace = None
 
-        # Error within retries for writing temporary file
+        # Error on replacing the status file with the temporary file
         error_raised = False
         try:
             self.runtime.status_handler.add_error_to_status("test")
         except Exception as error:
             error_raised = True
-            self.assertTrue("retries exhausted" in str(error))
+        finally:
+            os.rename = rename_backup
+            if replace_backup is not None:
+                os.replace = replace_backup
 
         self.assertTrue(error_raised)
-        tempfile.NamedTemporaryFile = tempfile_backup
+        status_folder = os.path.dirname(self.runtime.execution_config.status_file_path)
+        self.assertEqual([file_name for file_name in os.listdir(status_folder) if file_name.endswith('.tmp')], [])
 
     def test_status_file_initial_load(self):
         # for non autopatching request, with Reboot started
@@ -358,6 +391,53 @@ class TestStatusHandler(unittest.TestCase):
         self.assertRaises(Exception,
                           lambda: self.runtime.status_handler.set_current_operation(Constants.INSTALLATION))
 
+    def test_status_file_write_coalescing(self):
+        status_handler = StatusHandler(self.runtime.env_layer, self.runtime.execution_config, self.runtime.composite_logger, self.runtime.telemetry_writer, self.runtime.vm_cloud_type, write_coalescing_interval_in_secs=3600)
+        status_handler.set_current_operation(Constants.INSTALLATION)
+        packages, package_versions = self.runtime.package_manager.get_all_updates()
+
+        # first update is written through, subsequent transitioning updates within the interval are held back
+        status_handler.set_package_install_status(packages, package_versions, Constants.PENDING)
+        status_handler.set_package_install_status(packages[0], package_versions[0], Constants.INSTALLED)
+        status_handler.set_package_install_status(packages[1], package_versions[1], Constants.FAILED)
+        installation_summary = self.__get_installation_summary_from_status_file()
+        self.assertEqual(installation_summary["pendingPatchCount"], 3)
+        self.assertEqual(installation_summary["installedPatchCount"], 0)
+
+        # flushing writes out all held back updates, sorted
+        status_handler.flush_status_file()
+        installation_summary = self.__get_installation_summary_from_status_file()
+        self.assertEqual(len(installation_summary["patches"]), 3)
+        self.assertEqual(installation_summary["pendingPatchCount"], 1)
+        self.assertEqual(installation_summary["installedPatchCount"], 1)
+        self.assertEqual(installation_summary["failedPatchCount"], 1)
+        self.assertEqual(installation_summary["patches"][0]["patchInstallationState"], Constants.FAILED)
+
+        # operation boundaries flush held back updates, including errors
+        status_handler.set_package_install_status(packages[2], package_versions[2], Constants.INSTALLED)
+        status_handler.add_error_to_status("Test error", Constants.PatchOperationErrorCodes.DEFAULT_ERROR)
+        self.assertEqual(self.__get_installation_summary_from_status_file()["installedPatchCount"], 1)
+        status_handler.set_current_operation(Constants.ASSESSMENT)
+        installation_summary = self.__get_installation_summary_from_status_file()
+        self.assertEqual(installation_summary["installedPatchCount"], 2)
+        self.assertEqual(installation_summary["errors"]["details"][0]["message"], "Test error")
+
+        # terminal states are always written through
+        status_handler.set_maintenance_window_exceeded(True)
+        self.assertFalse(self.__get_installation_summary_from_status_file()["maintenanceWindowExceeded"])
+        status_handler.set_installation_substatus_json(status=Constants.STATUS_SUCCESS)
+        self.assertTrue(self.__get_installation_summary_from_status_file()["maintenanceWindowExceeded"])
+        with self.runtime.env_layer.file_system.open(self.runtime.execution_config.status_file_path, 'r') as file_handle:
+            self.assertEqual(json.load(file_handle)[0]["status"]["substatus"][0]["status"], Constants.STATUS_SUCCESS.lower())
+
+    def __get_installation_summary_from_status_file(self):
+        with self.runtime.env_layer.file_system.open(self.runtime.execution_config.status_file_path, 'r') as file_handle:
+            substatus_file_data = json.load(file_handle)[0]["status"]["substatus"]
+        for substatus in substatus_file_data:
+            if substatus["name"] == Constants.PATCH_INSTALLATION_SUMMARY:
+                return json.loads(substatus["formattedMessage"]["message"])
+        return None
+
     def test_sort_packages_by_classification_and_state(self):
         with self.runtime.env_layer.file_system.open("../../extension/tests/helpers/PatchOrderAssessmentSummary.json", 'r') as file_handle:
             assessment_patches = json.load(file_handle)["patches"]
@@ -17,9 +17,11 @@ import datetime
 import json
 import os
 import re
+import threading
 import time
 import unittest
 from core.src.bootstrap.Constants import Constants
+from core.src.service_interfaces.TelemetryWriter import TelemetryWriter
 from core.tests.library.ArgumentComposer import ArgumentComposer
 from core.tests.library.RuntimeCompositor import RuntimeCompositor
 
@@ -209,6 +211,123 @@ class TestTelemetryWriter(unittest.TestCase):
 
         Constants.TELEMETRY_MAX_EVENT_COUNT_THROTTLE = event_count_max_throttle_backup
 
+    def test_write_event_buffered_until_flush(self):
+        self.runtime.telemetry_writer.flush_events()
+
+        # informational events are held in the buffer
+        self.runtime.telemetry_writer.write_event("testing telemetry write to file", Constants.TelemetryEventLevel.Informational, "Buffered Task")
+        self.runtime.telemetry_writer.write_event("testing telemetry write to file", Constants.TelemetryEventLevel.Verbose, "Buffered Task2")
+        self.assertEqual(self.__get_event_files_by_task_name(["Buffered Task", "Buffered Task2"]), [])
+
+        # flushing writes all buffered events to one event file
+        self.runtime.telemetry_writer.flush_events()
+        event_files = self.__get_event_files_by_task_name(["Buffered Task", "Buffered Task2"])
+        self.assertEqual(len(event_files), 1)
+        self.assertEqual(event_files[0][1], ["Buffered Task", "Buffered Task2"])
+
+        # errors are written out immediately, along with anything buffered before them
+        self.runtime.telemetry_writer.write_event("testing telemetry write to file", Constants.TelemetryEventLevel.Informational, "Buffered Task3")
+        self.runtime.telemetry_writer.write_event("testing telemetry write to file", Constants.TelemetryEventLevel.Error, "Buffered Task4")
+        event_files = self.__get_event_files_by_task_name(["Buffered Task3", "Buffered Task4"])
+        self.assertEqual(len(event_files), 1)
+        self.assertEqual(event_files[0][1], ["Buffered Task3", "Buffered Task4"])
+
+    def test_write_event_buffer_size_flush(self):
+        buffer_max_size_backup = Constants.TELEMETRY_BUFFER_MAX_SIZE_IN_CHARS
+        self.runtime.telemetry_writer.flush_events()
+        Constants.TELEMETRY_BUFFER_MAX_SIZE_IN_CHARS = 1000
+
+        message = "a" * 400
+        self.runtime.telemetry_writer.write_event(message, Constants.TelemetryEventLevel.Informational, "Buffer Size Task")
+        self.assertEqual(self.__get_event_files_by_task_name(["Buffer Size Task", "Buffer Size Task2"]), [])
+        self.runtime.telemetry_writer.write_event(message, Constants.TelemetryEventLevel.Informational, "Buffer Size Task2")
+        self.assertEqual(len(self.__get_event_files_by_task_name(["Buffer Size Task", "Buffer Size Task2"])), 1)
+
+        Constants.TELEMETRY_BUFFER_MAX_SIZE_IN_CHARS = buffer_max_size_backup
+
+    def test_events_writer_thread_throttling_does_not_block(self):
+        event_count_max_throttle_backup = Constants.TELEMETRY_MAX_EVENT_COUNT_THROTTLE
+        event_queue_max_size_backup = Constants.TELEMETRY_EVENT_QUEUE_MAX_SIZE
+        Constants.TELEMETRY_MAX_EVENT_COUNT_THROTTLE = 3
+        Constants.TELEMETRY_EVENT_QUEUE_MAX_SIZE = 2
+
+        # the event count throttle wait is held until released, and has to happen on the events writer thread
+        throttle_wait_started = threading.Event()
+        throttle_wait_released = threading.Event()
+        throttle_wait_threads = []
+
+        def mock_throttle_wait(secs):
+            throttle_wait_threads.append(threading.current_thread())
+            throttle_wait_started.set()
+            throttle_wait_released.wait(10)
+
+        time_sleep_backup = time.sleep
+        time.sleep = mock_throttle_wait
+
+        telemetry_writer = TelemetryWriter(self.runtime.env_layer, self.runtime.composite_logger, self.runtime.telemetry_writer.events_folder_path, True, events_writer_thread_enabled=True)
+        self.assertTrue(throttle_wait_started.wait(10))     # the startup events reach the throttle limit
+        self.assertTrue(threading.current_thread() not in throttle_wait_threads)
+
+        # with the writer held up, a full queue never blocks the caller
+        telemetry_writer.write_event("testing telemetry write to file", Constants.TelemetryEventLevel.Informational, "Queued Task")
+        telemetry_writer.write_event("testing telemetry write to file", Constants.TelemetryEventLevel.Informational, "Queued Task2")
+        telemetry_writer.write_event("testing telemetry write to file", Constants.TelemetryEventLevel.Informational, "Queued Task2")
+        telemetry_writer.write_event("testing telemetry write to file", Constants.TelemetryEventLevel.Informational, "Queued Task3")
+        telemetry_writer.write_event("testing telemetry write to file", Constants.TelemetryEventLevel.Error, "Queued Task4")
+        self.assertEqual(telemetry_writer.events_coalesced_count, 1)
+        self.assertEqual(telemetry_writer.events_dropped_count, 2)   # Queued Task3 is dropped, and Queued Task is displaced by the error
+
+        # closing drains the queue once the writer is free
+        throttle_wait_released.set()
+        telemetry_writer.close()
+        found_task_names = [task_name for event_file in self.__get_event_files_by_task_name(["Queued Task", "Queued Task2", "Queued Task3", "Queued Task4"]) for task_name in event_file[1]]
+        self.assertEqual(sorted(found_task_names), ["Queued Task2", "Queued Task4"])
+
+        time.sleep = time_sleep_backup
+        Constants.TELEMETRY_MAX_EVENT_COUNT_THROTTLE = event_count_max_throttle_backup
+        Constants.TELEMETRY_EVENT_QUEUE_MAX_SIZE = event_queue_max_size_backup
+
+    def __get_event_files_by_task_name(self, task_names):
+        """ Returns (event file, task names found) for every event file containing events of the given task names """
+        event_files = []
+        events_folder_path = self.runtime.telemetry_writer.events_folder_path
+        for event_file in os.listdir(events_folder_path):
+            with open(os.path.join(events_folder_path, event_file), 'r') as f:
+                found_task_names = [event["TaskName"] for event in json.load(f) if event["TaskName"] in task_names]
+            if len(found_task_names) > 0:
+                event_files.append((event_file, found_task_names))
+        return event_files
+
+    def test_large_diagnostic_payloads_referenced(self):
+        telemetry_writer = self.runtime.telemetry_writer
+        telemetry_writer.set_operation_id("activity1")
+        telemetry_writer.set_task_name(Constants.TelemetryTaskName.EXEC)
+        packages = ["package{0}".format(str(i)) for i in range(0, 1000)]
+
+        telemetry_writer.write_diagnostic_artifact("Initial package list", packages)
+        telemetry_writer.write_package_info("package1", "1.0", "1MB", 10, Constants.FAILED, "code_path", "install_cmd", "x" * 5000)
+        telemetry_writer.write_package_info("package2", "1.0", "1MB", 10, Constants.INSTALLED, "code_path", "install_cmd", "short output")
+        telemetry_writer.flush_events()
+
+        messages = []
+        for event_file in os.listdir(telemetry_writer.events_folder_path):
+            with open(os.path.join(telemetry_writer.events_folder_path, event_file), 'r') as f:
+                messages.extend([event["Message"] for event in json.load(f)])
+
+        # only references (and digests) of large payloads are sent, and no output continuation events
+        self.assertEqual(len([message for message in messages if "Initial package list" in message and '"count": 1000' in message and "package999" not in message]), 1)
+        self.assertEqual(len([message for message in messages if "package1" in message and "sha256" in message and "xxx" not in message]), 1)
+        self.assertEqual(len([message for message in messages if "package2" in message and "short output" in message]), 1)
+        self.assertEqual(len([message for message in messages if "output_continuation" in message]), 0)
+
+        # payloads are kept in the diagnostic artifact of the operation
+        artifact_store = telemetry_writer.diagnostic_artifact_store
+        self.assertEqual(artifact_store.get_artifact_file_names("activity1"), ["activity1.Core.Exec.json.gz"])
+        records = artifact_store.read("activity1.Core.Exec.json.gz")
+        self.assertEqual([record['name'] for record in records], ["Initial package list", "Package install output"])
+        self.assertEqual(json.loads(records[0]['payload']), packages)
+        self.assertEqual(records[1]['payload'], "x" * 5000)
+
     def test_events_deleted_outside_of_extension_while_extension_is_running(self):
         backup_os_listdir = os.listdir
         os.listdir = self.mock_os_listdir
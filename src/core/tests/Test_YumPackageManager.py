@@ -60,6 +60,32 @@ class TestYumPackageManager(unittest.TestCase):
         self.assertEqual(len(available_updates), 6)
         self.assertEqual(len(package_versions), 6)
 
+    def test_update_list_parsed_from_streamed_output(self):
+        package_manager = self.container.get('package_manager')
+        output = "Loaded plugins: product-id, search-disabled-repos, subscription-manager\n" + \
+                 "\n" + \
+                 "kernel.x86_64                  3.10.0-693.21.1.el7            rhui-rhel-7-server-rhui-rpms\n" + \
+                 "libgcc.i686\n" + \
+                 "                               4.8.5-28.el7                   rhui-rhel-7-server-rhui-rpms\n" + \
+                 "selinux-policy.noarch          3.13.1-192.el7_5.3\n" + \
+                 "                                                              rhui-rhel-7-server-rhui-rpms\n" + \
+                 "kernel.x86_64                  3.10.0-693.21.1.el7            rhui-rhel-7-server-rhui-rpms\n"
+        expected_packages = ["kernel.x86_64", "libgcc.i686", "selinux-policy.noarch"]
+        expected_versions = ["3.10.0-693.21.1.el7", "4.8.5-28.el7", "3.13.1-192.el7_5.3"]
+        self.assertEqual(package_manager.extract_packages_and_versions(output), (expected_packages, expected_versions))
+
+        # fed in chunks ending mid-line, with a discarded attempt first
+        def invoke_package_manager_advanced(command, raise_on_exception=True):
+            package_manager.active_output_parser.feed("kernel.x86_64  3.10.0-693.21.1.el7  rhui-rhel-7-server-rhui-rpms\nlibgcc")
+            package_manager.active_output_parser.reset()
+            for index in range(0, len(output), 7):
+                package_manager.active_output_parser.feed(output[index:index + 7])
+            return output, 0
+        package_manager.invoke_package_manager_advanced = invoke_package_manager_advanced
+
+        self.assertEqual(package_manager.get_all_updates(), (expected_packages, expected_versions))
+        self.assertTrue(package_manager.active_output_parser is None)
+
     def test_do_processes_require_restart(self):
         """Unit test for yum package manager"""
 
@@ -125,6 +151,20 @@ class TestYumPackageManager(unittest.TestCase):
         self.assertEqual(len(dependent_list), 1)
         self.assertEqual(dependent_list[0], "kernel.x86_64")
 
+        # test for get_dependent_lists - dependencies stay within the set, so a single simulation is enough
+        dependent_lists = package_manager.get_dependent_lists(["selinux-policy.noarch", "selinux-policy-targeted.noarch"])
+        self.assertEqual(len(dependent_lists), 2)
+        self.assertEqual(dependent_lists["selinux-policy.noarch"], [])
+        self.assertEqual(dependent_lists["selinux-policy-targeted.noarch"], [])
+
+        # test for get_dependent_lists - a pending update outside of the set is pulled in, so packages need to be resolved individually
+        dependent_lists = package_manager.get_dependent_lists(["selinux-policy.noarch"])
+        self.assertEqual(len(dependent_lists), 0)
+
+        # test for get_dependent_lists - dependency outside of the set does not require attribution
+        dependent_lists = package_manager.get_dependent_lists(["selinux-policy.noarch"], is_attribution_required=lambda dependency: False)
+        self.assertEqual(dependent_lists["selinux-policy.noarch"], [])
+
         # test for epoch removal
         self.assertEqual(package_manager.get_package_version_without_epoch('2.02.177-4.el7'), '2.02.177-4.el7')
         self.assertEqual(package_manager.get_package_version_without_epoch('7:2.02.177-4.el7'), '2.02.177-4.el7')
@@ -0,0 +1,169 @@
+# Copyright 2020 Microsoft Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Requires Python 2.7+
+
+""" Benchmarks full assessment and installation runs of Core against emulated machines with 10 to 5000 pending packages, for each package manager.
+    Usage (from src): python -m core.tests.benchmarks.RuntimeBenchmark [--package-counts 10 100] [--package-managers apt yum] [--output results.json]
+    Wall time, subprocess invocations, status file writes, telemetry events written and peak memory are recorded per scenario, so that paths that
+    grow quadratically with the package count show up as regressions between runs. Core runs with the production configuration (status write
+    coalescing, telemetry events writer thread, package metadata caching, read-only query concurrency, prefetching, ...) against the emulated machine. """
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from core.src.CoreMain import CoreMain
+from core.src.bootstrap.Constants import Constants
+from core.src.service_interfaces.TelemetryWriter import TelemetryWriter
+from core.tests.library.ArgumentComposer import ArgumentComposer
+from core.tests.library.RuntimeCompositor import RuntimeCompositor
+from core.tests.library.SyntheticEnvLayerExtensions import SyntheticEnvLayerExtensions
+
+try:
+    import tracemalloc      # Python 3.4+
+except ImportError:
+    tracemalloc = None
+
+try:
+    from StringIO import StringIO ## for Python 2
+except ImportError:
+    from io import StringIO ## for Python 3
+
+
+class RuntimeBenchmark(object):
+    PACKAGE_COUNTS = [10, 100, 1000, 5000]
+    PACKAGE_MANAGERS = [Constants.APT, Constants.YUM, Constants.ZYPPER]
+    OPERATIONS = [Constants.ASSESSMENT, Constants.INSTALLATION]
+
+    def __init__(self, package_counts=None, package_managers=None, operations=None, measure_memory=True):
+        self.package_counts = package_counts or self.PACKAGE_COUNTS
+        self.package_managers = package_managers or self.PACKAGE_MANAGERS
+        self.operations = operations or self.OPERATIONS
+        self.measure_memory = measure_memory and tracemalloc is not None
+
+    def run(self):
+        """ Runs every scenario, and returns the results """
+        scenarios = []
+        for package_manager_name in self.package_managers:
+            for package_count in self.package_counts:
+                for operation in self.operations:
+                    scenarios.append(self.run_scenario(package_manager_name, package_count, operation))
+        return {
+            'timestamp': time.strftime(Constants.UTC_DATETIME_FORMAT, time.gmtime()),
+            'python_version': sys.version.split(' ')[0],
+            'scenarios': scenarios
+        }
+
+    def run_scenario(self, package_manager_name, package_count, operation):
+        """ Runs Core once for the scenario to measure wall time and counts, and once more under tracemalloc for peak memory (so that tracing overhead
+            does not distort wall time) """
+        result = self.__run_core(package_manager_name, package_count, operation, trace_memory=False)
+        result['peak_memory_in_bytes'] = self.__run_core(package_manager_name, package_count, operation, trace_memory=True)['peak_memory_in_bytes'] if self.measure_memory else None
+        return result
+
+    def __run_core(self, package_manager_name, package_count, operation, trace_memory):
+        backup_stdout = sys.stdout
+        sys.stdout = StringIO()     # Core writes its log to stdout as well
+        try:
+            return self.__run_core_with_counters(package_manager_name, package_count, operation, trace_memory)
+        finally:
+            sys.stdout = backup_stdout
+
+    @staticmethod
+    def __run_core_with_counters(package_manager_name, package_count, operation, trace_memory):
+        argument_composer = ArgumentComposer()
+        argument_composer.operation = operation
+        argument_composer.classifications_to_include = [Constants.PackageClassification.CRITICAL, Constants.PackageClassification.SECURITY, Constants.PackageClassification.OTHER] \
+            if operation == Constants.INSTALLATION else []
+        argument_composer.maximum_duration = 'PT4H'
+        argv = argument_composer.get_composed_arguments()
+
+        runtime = RuntimeCompositor(argv, True, package_manager_name, current_env=Constants.PROD)    # measured with the production component settings
+        synthetic_env_layer_extensions = SyntheticEnvLayerExtensions(package_manager_name, package_count)
+        runtime.env_layer.run_command_output = synthetic_env_layer_extensions.run_command_output
+
+        counters = {'status_file_writes': 0, 'telemetry_events': 0}
+        status_file_path = runtime.execution_config.status_file_path
+        backup_write_state_file = runtime.env_layer.file_system.write_state_file
+        backup_write_event = TelemetryWriter.write_event
+
+        def write_state_file(file_path, data, *args, **kwargs):
+            if file_path == status_file_path:
+                counters['status_file_writes'] += 1
+            return backup_write_state_file(file_path, data, *args, **kwargs)
+
+        def write_event(self, *args, **kwargs):
+            counters['telemetry_events'] += 1
+            return backup_write_event(self, *args, **kwargs)
+
+        runtime.env_layer.file_system.write_state_file = write_state_file
+        TelemetryWriter.write_event = write_event
+        peak_memory_in_bytes = None
+        try:
+            if trace_memory:
+                tracemalloc.start()
+            start_time = time.time()
+            CoreMain(argv)
+            wall_time_in_secs = time.time() - start_time
+            if trace_memory:
+                peak_memory_in_bytes = tracemalloc.get_traced_memory()[1]
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+            TelemetryWriter.write_event = backup_write_event
+            runtime.env_layer.file_system.write_state_file = backup_write_state_file
+            runtime.stop()
+
+        with open(status_file_path, 'r') as file_handle:
+            substatus_json = json.loads(file_handle.read())[0]['status']['substatus']
+
+        return {
+            'package_manager': package_manager_name,
+            'package_count': package_count,
+            'operation': operation,
+            'substatus': dict((substatus['name'], substatus['status']) for substatus in substatus_json),
+            'pending_package_count': len(synthetic_env_layer_extensions.get_pending_packages()),
+            'wall_time_in_secs': round(wall_time_in_secs, 3),
+            'subprocess_invocations': synthetic_env_layer_extensions.command_count,
+            'status_file_writes': counters['status_file_writes'],
+            'telemetry_events': counters['telemetry_events'],
+            'peak_memory_in_bytes': peak_memory_in_bytes
+        }
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Benchmarks Core assessment and installation runs against emulated machines")
+    parser.add_argument('--package-counts', type=int, nargs='+', default=RuntimeBenchmark.PACKAGE_COUNTS)
+    parser.add_argument('--package-managers', nargs='+', choices=RuntimeBenchmark.PACKAGE_MANAGERS, default=RuntimeBenchmark.PACKAGE_MANAGERS)
+    parser.add_argument('--operations', nargs='+', choices=RuntimeBenchmark.OPERATIONS, default=RuntimeBenchmark.OPERATIONS)
+    parser.add_argument('--no-memory', action='store_true', help="skip the (slower) traced runs that measure peak memory")
+    parser.add_argument('--output', default='benchmark_results.json')
+    options = parser.parse_args(args)
+
+    results = RuntimeBenchmark(options.package_counts, options.package_managers, options.operations, not options.no_memory).run()
+    with open(options.output, 'w') as file_handle:
+        file_handle.write(json.dumps(results, indent=2))
+
+    for scenario in results['scenarios']:
+        print("{0:<8}{1:>6} {2:<14}{3:>10.3f}s {4:>8} invocations {5:>6} status writes {6:>8} events {7} bytes peak".format(
+            scenario['package_manager'], scenario['package_count'], scenario['operation'], scenario['wall_time_in_secs'], scenario['subprocess_invocations'],
+            scenario['status_file_writes'], scenario['telemetry_events'], str(scenario['peak_memory_in_bytes'])))
+    print("Results written to " + os.path.abspath(options.output))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -51,7 +51,7 @@ class LegacyEnvLayerExtensions():
             return sys.version_info[0]  # python 2.6 doesn't have attributes like 'major' within sys.version_info
 
     # To be deprecated over time
-    def run_command_output(self, cmd, no_output=False, chk_err=True):
+    def run_command_output(self, cmd, no_output=False, chk_err=True, timeout_in_secs=None, output_handler=None):
         if no_output:
             return 0, None
         else:
@@ -40,9 +40,9 @@ except ImportError:
     from io import StringIO ## for Python 3
 
 class RuntimeCompositor(object):
-    def __init__(self, argv=Constants.DEFAULT_UNSPECIFIED_VALUE, legacy_mode=False, package_manager_name=Constants.APT, vm_cloud_type=Constants.VMCloudType.AZURE):
+    def __init__(self, argv=Constants.DEFAULT_UNSPECIFIED_VALUE, legacy_mode=False, package_manager_name=Constants.APT, vm_cloud_type=Constants.VMCloudType.AZURE, current_env=Constants.DEV):
         # Init data
-        self.current_env = Constants.DEV
+        self.current_env = current_env
         os.environ[Constants.LPE_ENV_VARIABLE] = self.current_env
         self.argv = argv if argv != Constants.DEFAULT_UNSPECIFIED_VALUE else ArgumentComposer().get_composed_arguments()
         self.vm_cloud_type = vm_cloud_type
@@ -80,7 +80,8 @@ class RuntimeCompositor(object):
         self.composite_logger = bootstrapper.composite_logger
 
         # re-initializing telemetry_writer, outside of Bootstrapper, to correctly set the env_layer configured for tests
-        self.telemetry_writer = TelemetryWriter(self.env_layer, self.composite_logger, bootstrapper.telemetry_writer.events_folder_path, bootstrapper.telemetry_supported)
+        self.telemetry_writer = TelemetryWriter(self.env_layer, self.composite_logger, bootstrapper.telemetry_writer.events_folder_path, bootstrapper.telemetry_supported,
+                                                diagnostic_artifacts_folder_path=bootstrapper.telemetry_writer.diagnostic_artifacts_folder_path)
         bootstrapper.telemetry_writer = self.telemetry_writer
         bootstrapper.composite_logger.telemetry_writer = self.telemetry_writer
 
@@ -146,6 +147,11 @@ class RuntimeCompositor(object):
     def reconfigure_package_manager(self):
         self.backup_get_current_auto_os_patch_state = self.package_manager.get_current_auto_os_patch_state
         self.package_manager.get_current_auto_os_patch_state = self.get_current_auto_os_patch_state
+        if hasattr(self.package_manager, 'dpkg_status_file_path'):
+            self.package_manager.dpkg_status_file_path = os.path.join(self.execution_config.config_folder, "dpkg_status")   # the test machine's packages are not the emulated ones
+        if hasattr(self.package_manager, 'package_archive_folder'):
+            self.package_manager.download_prefetch_folder = os.path.join(self.execution_config.config_folder, "prefetch")   # nor is its package cache
+            self.package_manager.package_archive_folder = os.path.join(self.execution_config.config_folder, "archives")
 
     def mock_sleep(self, seconds):
         pass
@@ -0,0 +1,140 @@
+# Copyright 2020 Microsoft Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Requires Python 2.7+
+
+import re
+import threading
+from core.src.bootstrap.Constants import Constants
+
+
+class SyntheticEnvLayerExtensions(object):
+    """Emulates a machine with any number of pending package updates, for the package manager commands of a full assessment and installation.
+       Unlike LegacyEnvLayerExtensions, output is generated from the state of the emulated machine - installs update the installed versions - so that
+       runs with many packages behave as they would on a real machine. Every command run is counted, as each would be a subprocess invocation."""
+
+    SECURITY_PACKAGE_INTERVAL = 5   # every n-th package is a security update
+
+    def __init__(self, package_manager_name, package_count):
+        self.package_manager_name = package_manager_name
+        self.package_count = package_count
+        self.command_count = 0
+        self.__lock = threading.Lock()
+
+        arch = '.x86_64' if package_manager_name == Constants.YUM else ''
+        self.packages = ["synthetic-package-{0}{1}".format(str(index).zfill(5), arch) for index in range(0, package_count)]
+        self.security_packages = set(self.packages[::self.SECURITY_PACKAGE_INTERVAL])
+        self.available_versions = dict((package, "1.1.{0}-1".format(str(index))) for index, package in enumerate(self.packages))
+        self.installed_versions = dict((package, "1.0.{0}-1".format(str(index))) for index, package in enumerate(self.packages))
+
+    def run_command_output(self, cmd, no_output=False, chk_err=True, timeout_in_secs=None, output_handler=None):
+        with self.__lock:
+            self.command_count += 1
+            if no_output:
+                return 0, None
+            if self.package_manager_name == Constants.APT:
+                return self.__run_apt_command(cmd)
+            elif self.package_manager_name == Constants.YUM:
+                return self.__run_yum_command(cmd)
+            elif self.package_manager_name == Constants.ZYPPER:
+                return self.__run_zypper_command(cmd)
+            return 0, ''
+
+    def get_pending_packages(self, packages=None):
+        return [package for package in (packages if packages is not None else self.packages) if self.installed_versions[package] != self.available_versions[package]]
+
+    def __install(self, packages):
+        for package in packages:
+            if package in self.available_versions:
+                self.installed_versions[package] = self.available_versions[package]
+
+    # region - Apt
+    def __run_apt_command(self, cmd):
+        if cmd.find("dist-upgrade") > -1:
+            return 0, self.__get_apt_simulation_output(self.get_pending_packages())
+        elif cmd.find("apt-get -y --only-upgrade true -s install") > -1:
+            return 0, self.__get_apt_simulation_output(self.get_pending_packages(self.__get_known_packages(cmd.split(" install ")[-1].split())))
+        elif cmd.find("apt-get -y --only-upgrade true install") > -1:
+            packages = self.__get_known_packages([package.split('=')[0] for package in cmd.split(" install ")[-1].split()])
+            self.__install(packages)
+            return 0, "Need to get 1,024 kB of archives.\n" + "".join(["Setting up {0} ({1}) ...\n".format(package, self.installed_versions[package]) for package in packages])
+        elif cmd.find("dpkg-query -W") > -1:
+            if cmd.count("'") == 2 and cmd.split("'")[-1].strip():
+                return 0, "".join(["{0} amd64 {1} install ok installed\n".format(package, self.installed_versions[package]) for package in self.__get_known_packages(cmd.split("'")[-1].split())])
+            return 0, "dpkg amd64 1.19.7ubuntu3 install ok installed\n" + "".join(["{0} amd64 {1} install ok installed\n".format(package, self.installed_versions[package]) for package in self.packages])
+        return 0, ''
+
+    def __get_apt_simulation_output(self, packages):
+        # Inst samba-libs [2:4.4.5+dfsg-2ubuntu5.2] (2:4.4.5+dfsg-2ubuntu5.4 Ubuntu:16.10/yakkety-updates, Ubuntu:16.10/yakkety-security [amd64])
+        return "".join(["Inst {0} [{1}] ({2} Ubuntu:20.04/focal-updates{3} [amd64])\n".format(package, self.installed_versions[package], self.available_versions[package],
+                                                                                                ", Ubuntu:20.04/focal-security" if package in self.security_packages else "")
+                        for package in packages])
+    # endregion
+
+    # region - Yum
+    def __run_yum_command(self, cmd):
+        if cmd.find("check-update") > -1:
+            packages = self.get_pending_packages([package for package in self.packages if cmd.find("--security") < 0 or package in self.security_packages])
+            output = "".join(["{0}    {1}    rhui-rhel-7-server-rhui-rpms\n".format(package, self.available_versions[package]) for package in packages])
+            return (100 if len(packages) != 0 else 0), output
+        elif cmd.find("sudo yum install --assumeno") > -1:
+            packages = self.get_pending_packages(self.__get_known_packages(cmd.split("--assumeno")[-1].split()))
+            return 1, "".join(["---> Package {0} 0:{1} will be updated\n".format(package, self.installed_versions[package]) for package in packages])
+        elif cmd.find("sudo yum -y install ") > -1:
+            package_identifiers = set(cmd.split("sudo yum -y install ")[-1].split())
+            self.__install([package for package in self.packages if self.__get_yum_package_identifier(package) in package_identifiers])
+            return 0, "Total download size: 1.0 M\nComplete!\n"
+        elif cmd.find("rpm -q") > -1:
+            return 0, self.__get_rpm_query_output(cmd)
+        return 0, ''
+
+    def __get_yum_package_identifier(self, package):
+        return package[:-len('.x86_64')] + '-' + self.available_versions[package] + '.x86_64'
+    # endregion
+
+    # region - Zypper
+    def __run_zypper_command(self, cmd):
+        if cmd.find("list-updates") > -1:
+            output = "Loading repository data...\nReading installed packages...\n" + \
+                     "S | Repository         | Name               | Current Version | Available Version | Arch\n" + \
+                     "--+--------------------+--------------------+-----------------+-------------------+-------\n"
+            output += "".join(["v | SLES15-SP2-Updates | {0} | {1} | {2} | x86_64\n".format(package, self.installed_versions[package], self.available_versions[package])
+                               for package in self.get_pending_packages()])
+            return 0, output
+        elif cmd.find("patch --category security --dry-run") > -1:
+            packages = self.get_pending_packages([package for package in self.packages if package in self.security_packages])
+            return 0, self.__get_zypper_simulation_output(packages)
+        elif cmd.find("update --dry-run") > -1:
+            return 0, self.__get_zypper_simulation_output(self.get_pending_packages(self.__get_known_packages(cmd.split("--dry-run")[-1].split())))
+        elif cmd.find("zypper --non-interactive update ") > -1:
+            self.__install(self.__get_known_packages([package.split('=')[0] for package in cmd.split(" update ")[-1].split()]))
+            return 0, "Overall download size: 1.0 MiB. Already cached: 0 B. After the operation, additional 1.0 MiB will be used.\n"
+        elif cmd.find("rpm -q") > -1:
+            return 0, self.__get_rpm_query_output(cmd)
+        return 0, ''
+
+    @staticmethod
+    def __get_zypper_simulation_output(packages):
+        if len(packages) == 0:
+            return "Nothing to do.\n"
+        return "The following {0} packages are going to be upgraded:\n  {1}\n\n".format(str(len(packages)), " ".join(packages))
+    # endregion
+
+    def __get_rpm_query_output(self, cmd):
+        queried_packages = cmd.split("'")[-1].split() if cmd.find("rpm -qa") < 0 else []
+        packages = self.__get_known_packages(queried_packages) if len(queried_packages) != 0 else self.packages
+        return "".join(["{0} {1}\n".format(package, self.installed_versions[package]) for package in packages])
+
+    def __get_known_packages(self, packages):
+        return [package for package in packages if package in self.installed_versions and not re.match('^-', package)]
@@ -64,18 +64,25 @@ class JsonFileHandler(object):
         return None
 
     def write_to_json_file(self, dir_path, file_name, content):
-        """ Retries create operation for a set number of times before failing """
+        """ Retries create operation for a set number of times before failing. The file is replaced atomically (readers, such as the core, never see partial
+            content) and durably - content is written and synced to a temp file in the same directory, which is then renamed over the file. """
         if os.path.exists(dir_path):
             file_path = os.path.join(dir_path, file_name)
+            temp_file_path = "{0}.{1}.tmp".format(file_path, str(os.getpid()))
             error_message = ""
             self.logger.log("Writing JSON file. [File={0}] [Content={1}]".format(file_name, str(content)))
             for retry in range(0, self.retry_count):
                 try:
                     time.sleep(retry)
-                    with open(file_path, 'w') as json_file:
+                    with open(temp_file_path, 'w') as json_file:
                         json.dump(content, json_file, default=self.json_default_converter)
-                        return
+                        json_file.flush()
+                        os.fsync(json_file.fileno())
+                    self.__replace_file(temp_file_path, file_path)
+                    return
                 except Exception as error:
+                    if os.path.isfile(temp_file_path):
+                        os.remove(temp_file_path)
                     error_message = "Trial {0}: Could not write to file. [File={1}] [Location={2}] [Exception={3}]".format(retry+1, file_name, str(file_path), error)
                     self.logger.log_warning(error_message)
 
@@ -89,3 +96,14 @@ class JsonFileHandler(object):
     def json_default_converter(value):
         return value.__str__()
 
+    # Deliberate mirror of EnvLayer.FileSystem.replace_file in core, as the extension is packaged without core - keep the two in sync
+    @staticmethod
+    def __replace_file(source_file_path, target_file_path):
+        """ Renames a file over another. os.rename does not replace an existing file on Windows, and os.replace is not available in Python 2. """
+        if hasattr(os, 'replace'):
+            os.replace(source_file_path, target_file_path)
+            return
+        if os.name == 'nt' and os.path.exists(target_file_path):
+            os.remove(target_file_path)     # not atomic, but only on Windows with Python 2
+        os.rename(source_file_path, target_file_path)
+